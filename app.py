@@ -6,14 +6,19 @@ Interface limpa e focada em assinaturas reais.
 
 import streamlit as st
 import numpy as np
-import tensorflow as tf
 from pathlib import Path
 import os
 import sys
-import cv2
-from PIL import Image
 
-from data_preprocessing import binarize_image, resize_image, normalize_image
+from data_preprocessing import binarize_image, resize_image, decode_reduced
+from verification_cache import VerificationCache, content_hash
+from model_registry import ModelRegistry, DEFAULT_THRESHOLD
+from metrics import medir_etapa, medir_verificacao, configurar_exportacao
+from profiling import perfilar
+from cpu_tuning import aplicar_ajuste
+
+# Threads do TensorFlow calibradas para esta CPU (antes de carregar o modelo)
+aplicar_ajuste('servico')
 
 # Configuração da página
 st.set_page_config(
@@ -23,113 +28,156 @@ st.set_page_config(
 )
 
 def preprocess_streamlit_image(uploaded_file):
-    """Preprocessa imagem carregada via Streamlit."""
+    """Preprocessa imagem carregada via Streamlit (uint8; a escala para [0, 1] fica no modelo)."""
     try:
-        # Converter arquivo Streamlit para PIL Image
-        image = Image.open(uploaded_file)
-        
-        # Converter para numpy array
-        img_array = np.array(image)
-        
-        # Se a imagem tem 3 canais (RGB), converter para escala de cinza
-        if len(img_array.shape) == 3:
-            img_array = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
+        # Decodificar em escala de cinza já na resolução de trabalho (4x o alvo)
+        with medir_etapa('decode'):
+            img_array = decode_reduced(uploaded_file)
         
         # Aplicar processamento igual ao data_preprocessing.py
-        img_processed = binarize_image(img_array)
-        img_processed = resize_image(img_processed)
-        img_processed = normalize_image(img_processed)
+        with medir_etapa('binarizacao'):
+            img_processed = binarize_image(img_array)
+        with medir_etapa('redimensionamento'):
+            img_processed = resize_image(img_processed)
         
         return img_processed
     except Exception as e:
         raise Exception(f"Erro no preprocessamento: {str(e)}")
 
+# Configuração de preprocessamento que entra na chave do cache
+PREPROCESS_CONFIG = ('streamlit', 220, 155, 'reduzido-4x')
+
+def ler_bytes(uploaded_file):
+    """Lê o conteúdo do arquivo enviado sem consumir o stream."""
+    if hasattr(uploaded_file, 'getvalue'):
+        return uploaded_file.getvalue()
+    data = uploaded_file.read()
+    uploaded_file.seek(0)
+    return data
+
 class SignatureVerifier:
-    def __init__(self):
-        self.model = None
-        self.threshold = 0.10  # Valor otimizado pela avaliação
+    def __init__(self, cache=None, registry=None):
+        self.cache = cache if cache is not None else VerificationCache()
+        # Modelo e threshold vêm do registro, que recarrega versões novas a quente
+        self.registry = registry if registry is not None else ModelRegistry()
+    
+    @property
+    def model(self):
+        versao = self.registry.atual()
+        return versao.model if versao is not None else None
+    
+    @property
+    def threshold(self):
+        versao = self.registry.atual()
+        return versao.threshold if versao is not None else DEFAULT_THRESHOLD  # Valor otimizado pela avaliação
         
     def carregar_modelo(self):
-        """Carrega o modelo treinado."""
-        model_path = Path("modelos/modelo_assinaturas_manuscritas.h5")
-        
-        if not model_path.exists():
-            return False
-        
-        try:
-            # Importar funções personalizadas
-            from model import euclidean_distance, contrastive_loss
-            
-            self.model = tf.keras.models.load_model(
-                str(model_path),
-                custom_objects={
-                    'euclidean_distance': euclidean_distance,
-                    'contrastive_loss': contrastive_loss
-                }
-            )
+        """Carrega o modelo treinado (versão inicial do registro)."""
+        if self.registry.carregar():
             return True
-        except Exception as e:
-            st.error(f"Erro ao carregar modelo: {e}")
-            return False
+        if self.registry.ultimo_erro and Path(self.registry.model_path).exists():
+            st.error(self.registry.ultimo_erro)
+        return False
     
     def carregar_threshold_otimo(self):
-        """Carrega threshold ótimo se disponível."""
-        threshold_path = Path("resultados_avaliacao/threshold_otimo.txt")
-        
-        if threshold_path.exists():
-            try:
-                with open(threshold_path, 'r') as f:
-                    self.threshold = float(f.read().strip())
-                return True
-            except:
-                pass
-        return False
+        """Indica se o threshold em uso foi calibrado (lido de threshold_otimo.txt)."""
+        versao = self.registry.atual()
+        return versao is not None and versao.threshold_calibrado
     
     def euclidean_distance(self, predictions):
         """Calcula distância euclidiana."""
         return np.sqrt(np.sum(np.square(predictions[0] - predictions[1]), axis=1))
     
+    def calcular_embedding(self, versao, uploaded_file, image_hash):
+        """Calcula (ou recupera do cache) o embedding de uma imagem."""
+        chave = self.cache.chave_imagem(image_hash, versao.fingerprint, PREPROCESS_CONFIG)
+        embedding = self.cache.obter_embedding(chave)
+        if embedding is not None:
+            return embedding
+        
+        from model import compute_embeddings
+        
+        proc_img = preprocess_streamlit_image(uploaded_file)
+        if proc_img.ndim == 2:
+            proc_img = np.expand_dims(proc_img, axis=-1)
+        
+        with medir_etapa('embedding'):
+            embedding = compute_embeddings(versao.embedding_model, np.expand_dims(proc_img, axis=0))[0]
+        self.cache.guardar_embedding(chave, embedding)
+        return embedding
+    
+    @perfilar('verificacao_par')
     def verificar_assinaturas(self, img1, img2):
-        """Verifica se duas assinaturas são da mesma pessoa."""
-        if self.model is None:
+        """
+        Verifica se duas assinaturas são da mesma pessoa.
+        
+        A distância é cacheada pelo conteúdo das duas imagens (em qualquer
+        ordem); cada embedding também é cacheado individualmente. A distância
+        entre embeddings da rede base é a mesma calculada pelo modelo siamês.
+        A requisição usa do início ao fim a versão do modelo vigente ao começar.
+        """
+        with medir_verificacao('par') as registro:
+            resultado, erro = self._verificar(img1, img2)
+            if erro:
+                registro['resultado'] = 'erro'
+        return resultado, erro
+    
+    def _verificar(self, img1, img2):
+        versao = self.registry.atual()
+        if versao is None:
             return None, "Modelo não carregado"
         
         try:
-            # Preprocessar imagens do Streamlit
-            proc_img1 = preprocess_streamlit_image(img1)
-            proc_img2 = preprocess_streamlit_image(img2)
-            
-            if proc_img1.ndim == 2:
-                proc_img1 = np.expand_dims(proc_img1, axis=-1)
-            if proc_img2.ndim == 2:
-                proc_img2 = np.expand_dims(proc_img2, axis=-1)
+            from model import embedding_distance
             
-            # Adicionar dimensão batch
-            proc_img1 = np.expand_dims(proc_img1, axis=0)
-            proc_img2 = np.expand_dims(proc_img2, axis=0)
+            hash1 = content_hash(ler_bytes(img1))
+            hash2 = content_hash(ler_bytes(img2))
+            chave = self.cache.chave_par(hash1, hash2, versao.fingerprint, PREPROCESS_CONFIG)
             
-            # Calcular distância usando o modelo siamês
-            distance = self.model.predict([proc_img1, proc_img2], verbose=0)[0]
-            
-            # Se retorna array, pegar primeiro valor
-            if hasattr(distance, '__len__'):
-                distance = distance[0]
+            distance = self.cache.obter_distancia(chave)
+            if distance is None:
+                emb1 = self.calcular_embedding(versao, img1, hash1)
+                emb2 = self.calcular_embedding(versao, img2, hash2)
+                with medir_etapa('distancia'):
+                    distance = float(embedding_distance(emb1, emb2))
+                self.cache.guardar_distancia(chave, distance)
             
             # Classificar
-            mesma_pessoa = distance <= self.threshold
-            confianca = 1 - (distance / (self.threshold * 2))  # Normalizada
+            threshold = versao.threshold
+            mesma_pessoa = distance <= threshold
+            confianca = 1 - (distance / (threshold * 2))  # Normalizada
             confianca = max(0, min(1, confianca))
             
             return {
                 'mesma_pessoa': mesma_pessoa,
                 'distancia': distance,
                 'confianca': confianca,
-                'threshold_usado': self.threshold
+                'threshold_usado': threshold
             }, None
             
         except Exception as e:
             return None, f"Erro na verificação: {str(e)}"
 
+@st.cache_resource
+def obter_servicos():
+    """
+    Registro do modelo e cache compartilhados entre sessões do mesmo processo.
+    Ao trocar o modelo, as entradas do cache da versão antiga são descartadas;
+    distâncias e embeddings não dependem do threshold, então uma troca só de
+    threshold mantém o cache.
+    """
+    cache = VerificationCache()
+    registry = ModelRegistry()
+
+    def ao_trocar_versao(antiga, nova):
+        if antiga.fingerprint != nova.fingerprint:
+            cache.invalidar_modelo(antiga.fingerprint)
+
+    registry.adicionar_ouvinte(ao_trocar_versao)
+    registry.iniciar_observacao()
+    configurar_exportacao()
+    return cache, registry
+
 def main():
     # Título e descrição
     st.title("✍️ Verificação de Assinaturas Manuscritas")
@@ -146,7 +194,8 @@ def main():
     
     # Inicializar verificador
     if 'verifier' not in st.session_state:
-        st.session_state.verifier = SignatureVerifier()
+        cache, registry = obter_servicos()
+        st.session_state.verifier = SignatureVerifier(cache=cache, registry=registry)
     
     verifier = st.session_state.verifier
     
@@ -154,7 +203,6 @@ def main():
     if verifier.model is None:
         with st.spinner("Carregando modelo..."):
             if verifier.carregar_modelo():
-                verifier.carregar_threshold_otimo()
                 st.success("✅ Modelo carregado com sucesso!")
             else:
                 st.error("❌ **Modelo não encontrado!**")
@@ -267,6 +315,18 @@ def main():
             st.write(f"**Threshold padrão:** {verifier.threshold:.4f}")
         
         st.write("**Para melhor performance:** Execute `python scripts/avaliar_modelo.py` para calibrar threshold")
+        
+        stats = verifier.cache.estatisticas()
+        st.write(
+            f"**Cache de verificações:** {stats['resultados']['acertos']} acertos / "
+            f"{stats['resultados']['falhas']} falhas "
+            f"({stats['resultados']['entradas']} pares)"
+        )
+        st.write(
+            f"**Cache de embeddings:** {stats['embeddings']['acertos']} acertos / "
+            f"{stats['embeddings']['falhas']} falhas "
+            f"({stats['embeddings']['entradas']} imagens)"
+        )
 
 if __name__ == "__main__":
     main()
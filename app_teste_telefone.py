@@ -5,17 +5,24 @@ Sistema de teste para assinaturas capturadas por telefone vs registradas.
 
 import streamlit as st
 import numpy as np
-import tensorflow as tf
 from pathlib import Path
 import os
 import sys
-import cv2
-from PIL import Image
 
 # Adicionar src ao path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
-from data_preprocessing import binarize_image, resize_image, normalize_image
+from data_preprocessing import preprocess_image, preprocess_phone_image
+from candidate_pruning import CandidateIndex
+from enrollment import SignatureEnrollment
+from model import compute_embeddings, embedding_distance
+from model_registry import ModelRegistry, DEFAULT_THRESHOLD
+from metrics import medir_etapa, medir_verificacao, configurar_exportacao
+from profiling import perfilar
+from cpu_tuning import aplicar_ajuste
+
+# Threads do TensorFlow calibradas para esta CPU (antes de carregar o modelo)
+aplicar_ajuste('servico')
 
 st.set_page_config(
     page_title="📱 Teste Assinaturas por Telefone",
@@ -23,66 +30,47 @@ st.set_page_config(
     layout="wide"
 )
 
-def preprocess_phone_image(uploaded_file, enhance_quality=True):
-    """Preprocessa imagem capturada por telefone com melhorias."""
-    try:
-        # Converter arquivo Streamlit para PIL Image
-        image = Image.open(uploaded_file)
-        img_array = np.array(image)
-        
-        # Converter para escala de cinza se necessário
-        if len(img_array.shape) == 3:
-            img_array = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
-        
-        # Melhorias específicas para fotos de telefone
-        if enhance_quality:
-            # Redução de ruído
-            img_array = cv2.medianBlur(img_array, 3)
-            
-            # Melhorar contraste
-            img_array = cv2.equalizeHist(img_array)
-            
-            # Detecção automática de threshold para binarização
-            threshold_value = cv2.threshold(img_array, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[0]
-        else:
-            threshold_value = 127
-        
-        # Aplicar processamento padrão
-        img_processed = binarize_image(img_array, threshold=threshold_value)
-        img_processed = resize_image(img_processed)
-        img_processed = normalize_image(img_processed)
-        
-        return img_processed, threshold_value
-    except Exception as e:
-        raise Exception(f"Erro no preprocessamento: {str(e)}")
-
 class PhoneSignatureVerifier:
-    def __init__(self):
-        self.model = None
-        self.threshold = 0.10  # Threshold otimizado
+    def __init__(self, registry=None):
+        # Modelo e threshold vêm do registro, que recarrega versões novas a quente
+        self.registry = registry if registry is not None else ModelRegistry()
         self.registered_signatures = {}
+        self.tamanho_shortlist = 10  # Pessoas avaliadas pelo modelo completo
+        self.recortar = False  # Recorte da região com tinta (modelos atuais: sem recorte)
+        self.referencias = {}
+        self.indice_triagem = CandidateIndex()
+        self.ultima_triagem = None
+        self._chave_referencias = None
+        self._fingerprint_embeddings = None
+        self._cadastro = SignatureEnrollment()
+    
+    @property
+    def model(self):
+        versao = self.registry.atual()
+        return versao.model if versao is not None else None
+    
+    @property
+    def threshold(self):
+        versao = self.registry.atual()
+        return versao.threshold if versao is not None else DEFAULT_THRESHOLD  # Valor otimizado pela avaliação
+    
+    @property
+    def cadastro(self):
+        """Galeria de templates calculada com a versão atual do modelo."""
+        versao = self.registry.atual()
+        if versao is not None and self._cadastro.model_fingerprint != versao.fingerprint:
+            self._cadastro = SignatureEnrollment(
+                versao.embedding_model, model_fingerprint=versao.fingerprint
+            ).carregar()
+        return self._cadastro
         
     def carregar_modelo(self):
-        """Carrega o modelo treinado."""
-        model_path = Path("modelos/modelo_assinaturas_manuscritas.h5")
-        
-        if not model_path.exists():
-            return False
-        
-        try:
-            from model import euclidean_distance, contrastive_loss
-            
-            self.model = tf.keras.models.load_model(
-                str(model_path),
-                custom_objects={
-                    'euclidean_distance': euclidean_distance,
-                    'contrastive_loss': contrastive_loss
-                }
-            )
+        """Carrega o modelo treinado (versão inicial do registro)."""
+        if self.registry.carregar():
             return True
-        except Exception as e:
-            st.error(f"Erro ao carregar modelo: {e}")
-            return False
+        if self.registry.ultimo_erro and Path(self.registry.model_path).exists():
+            st.error(self.registry.ultimo_erro)
+        return False
     
     def carregar_assinaturas_registradas(self):
         """Carrega assinaturas já registradas no sistema."""
@@ -105,72 +93,217 @@ class PhoneSignatureVerifier:
         
         return registered
     
-    def verificar_contra_registradas(self, phone_image, pessoa_selecionada=None):
-        """Verifica assinatura do telefone contra registradas."""
-        if self.model is None:
+    def preparar_referencias(self, signatures):
+        """
+        Preprocessa as assinaturas registradas uma única vez por sessão e monta
+        o índice de triagem. Só refaz o trabalho se algum arquivo mudar; os
+        embeddings das referências são descartados junto.
+        """
+        chave = tuple(sorted(
+            (pessoa, str(path), path.stat().st_mtime)
+            for pessoa, paths in signatures.items()
+            for path in paths
+        ))
+        if chave == self._chave_referencias:
+            return
+
+        referencias = {}
+        for pessoa, paths in signatures.items():
+            imagens = []
+            for signature_path in paths:
+                registered_img = preprocess_image(str(signature_path), dtype=np.uint8)
+                if registered_img.ndim == 2:
+                    registered_img = np.expand_dims(registered_img, axis=-1)
+                imagens.append(registered_img)
+            referencias[pessoa] = {
+                'imagens': np.stack(imagens),
+                'arquivos': [path.name for path in paths]
+            }
+
+        self.referencias = referencias
+        self.indice_triagem = CandidateIndex.from_images(
+            {pessoa: ref['imagens'] for pessoa, ref in referencias.items()}
+        )
+        self._chave_referencias = chave
+        self._fingerprint_embeddings = None
+    
+    def embeddings_referencias(self, versao, pessoas):
+        """
+        Embeddings das referências das pessoas indicadas, calculados com a
+        rede base da versão dada e reaproveitados até os arquivos ou o modelo
+        mudarem. Pessoas ainda sem embedding entram em uma única predição.
+        
+        Args:
+            versao: Versão do modelo (ver ModelRegistry.atual)
+            pessoas: Lista de pessoas presentes em self.referencias
+        
+        Returns:
+            dict: pessoa -> embeddings float32 (n_referencias, 128)
+        """
+        if self._fingerprint_embeddings != versao.fingerprint:
+            for ref in self.referencias.values():
+                ref.pop('embeddings', None)
+            self._fingerprint_embeddings = versao.fingerprint
+
+        faltando = [p for p in pessoas if 'embeddings' not in self.referencias[p]]
+        if faltando:
+            embeddings = compute_embeddings(
+                versao.embedding_model,
+                np.concatenate([self.referencias[p]['imagens'] for p in faltando])
+            )
+            inicio = 0
+            for pessoa in faltando:
+                n = len(self.referencias[pessoa]['imagens'])
+                self.referencias[pessoa]['embeddings'] = embeddings[inicio:inicio + n]
+                inicio += n
+
+        return {p: self.referencias[p]['embeddings'] for p in pessoas}
+    
+    def verificar_por_templates(self, phone_image, pessoa_selecionada=None, threshold=None):
+        """
+        Verifica a assinatura do telefone contra os templates da galeria
+        (centroide + medoides por pessoa): uma única passada da rede base e
+        comparações proporcionais ao número de pessoas.
+        """
+        cadastro = self.cadastro
+        threshold = self.threshold if threshold is None else threshold
+        phone_processed, phone_threshold = preprocess_phone_image(phone_image, recortar=self.recortar)
+        if phone_processed.ndim == 2:
+            phone_processed = np.expand_dims(phone_processed, axis=-1)
+
+        with medir_etapa('embedding'):
+            embedding = compute_embeddings(cadastro.embedding_model, phone_processed[None])[0]
+        pessoas = [pessoa_selecionada] if pessoa_selecionada else None
+
+        with medir_etapa('distancia'):
+            comparacoes = cadastro.comparar(embedding, pessoas)
+
+        resultados = []
+        for comparacao in comparacoes:
+            pessoa_resultados = [
+                {
+                    'arquivo': medoide['arquivo'],
+                    'distancia': medoide['distancia'],
+                    'mesma_pessoa': medoide['distancia'] <= threshold
+                }
+                for medoide in comparacao['medoides']
+            ]
+            distancias = [r['distancia'] for r in pessoa_resultados]
+            matches = sum(1 for r in pessoa_resultados if r['mesma_pessoa'])
+            total_tests = len(pessoa_resultados)
+            min_dist = np.min(distancias)
+
+            resultados.append({
+                'pessoa': comparacao['pessoa'],
+                'testes_individuais': pessoa_resultados,
+                'media_distancia': np.mean(distancias),
+                'min_distancia': min_dist,
+                'max_distancia': np.max(distancias),
+                'distancia_centroide': comparacao['distancia_centroide'],
+                'matches': matches,
+                'total_tests': total_tests,
+                'percentual_match': (matches / total_tests) * 100,
+                'melhor_match': min_dist <= threshold,
+                'phone_threshold': phone_threshold
+            })
+
+        self.ultima_triagem = None
+        return resultados, None
+
+    @perfilar('verificacao_telefone')
+    def verificar_contra_registradas(self, phone_image, pessoa_selecionada=None, tamanho_shortlist=None,
+                                     usar_templates=False):
+        """
+        Verifica assinatura do telefone contra registradas.
+
+        Sem pessoa selecionada, uma triagem barata por descritores escolhe as
+        `tamanho_shortlist` pessoas mais prováveis e só elas são comparadas pela
+        rede base: a imagem do telefone é embutida uma vez e os embeddings das
+        referências ficam em cache por versão do modelo. Com `usar_templates`, compara
+        contra os templates da galeria (ver scripts/gerenciar_cadastro.py).
+        A requisição usa do início ao fim a versão do modelo vigente ao começar.
+        """
+        with medir_verificacao('telefone') as registro:
+            resultados, erro = self._verificar(phone_image, pessoa_selecionada, tamanho_shortlist, usar_templates)
+            if erro:
+                registro['resultado'] = 'erro'
+        return resultados, erro
+
+    def _verificar(self, phone_image, pessoa_selecionada, tamanho_shortlist, usar_templates):
+        versao = self.registry.atual()
+        if versao is None:
             return None, "Modelo não carregado"
         
+        if usar_templates and self.cadastro.pessoas:
+            try:
+                return self.verificar_por_templates(phone_image, pessoa_selecionada, versao.threshold)
+            except Exception as e:
+                return None, f"Erro na verificação: {str(e)}"
+        
         signatures = self.carregar_assinaturas_registradas()
         
         if not signatures:
             return None, "Nenhuma assinatura registrada encontrada"
         
         try:
+            self.preparar_referencias(signatures)
+
             # Preprocessar imagem do telefone
-            phone_processed, phone_threshold = preprocess_phone_image(phone_image)
+            phone_processed, phone_threshold = preprocess_phone_image(phone_image, recortar=self.recortar)
             
             if phone_processed.ndim == 2:
                 phone_processed = np.expand_dims(phone_processed, axis=-1)
-            phone_processed = np.expand_dims(phone_processed, axis=0)
-            
-            resultados = []
             
-            # Testar contra pessoas específicas ou todas
-            pessoas_testar = [pessoa_selecionada] if pessoa_selecionada else signatures.keys()
+            # Testar contra pessoas específicas ou candidatas da triagem
+            with medir_etapa('triagem'):
+                if pessoa_selecionada:
+                    pessoas_testar = [pessoa_selecionada]
+                else:
+                    k = tamanho_shortlist or self.tamanho_shortlist
+                    if k and k < len(self.indice_triagem):
+                        pessoas_testar = self.indice_triagem.shortlist(phone_processed, k)
+                    else:
+                        pessoas_testar = list(self.referencias.keys())
+            pessoas_testar = [p for p in pessoas_testar if p in self.referencias]
+
+            self.ultima_triagem = {
+                'pessoas_avaliadas': len(pessoas_testar),
+                'pessoas_registradas': len(self.referencias)
+            }
+
+            if not pessoas_testar:
+                return [], None
+
+            # Embedding do telefone uma única vez; referências vêm do cache
+            with medir_etapa('embedding'):
+                embedding = compute_embeddings(versao.embedding_model, phone_processed[None])[0]
+                embeddings_ref = self.embeddings_referencias(versao, pessoas_testar)
+
+            with medir_etapa('distancia'):
+                resultados = []
             
-            for pessoa in pessoas_testar:
-                if pessoa not in signatures:
-                    continue
-                
-                pessoa_resultados = []
-                
-                # Testar contra todas as assinaturas registradas da pessoa
-                for signature_path in signatures[pessoa]:
-                    try:
-                        # Preprocessar assinatura registrada
-                        from data_preprocessing import preprocess_image
-                        registered_img = preprocess_image(str(signature_path))
-                        
-                        if registered_img.ndim == 2:
-                            registered_img = np.expand_dims(registered_img, axis=-1)
-                        registered_img = np.expand_dims(registered_img, axis=0)
-                        
-                        # Calcular distância
-                        distance = self.model.predict([phone_processed, registered_img], verbose=0)[0]
-                        
-                        if hasattr(distance, '__len__'):
-                            distance = distance[0]
-                        
-                        pessoa_resultados.append({
-                            'arquivo': signature_path.name,
-                            'distancia': distance,
-                            'mesma_pessoa': distance <= self.threshold
-                        })
-                        
-                    except Exception as e:
-                        st.warning(f"Erro ao processar {signature_path}: {e}")
+                for pessoa in pessoas_testar:
+                    arquivos = self.referencias[pessoa]['arquivos']
+                    distancias = embedding_distance(embeddings_ref[pessoa], embedding)
+
+                    pessoa_resultados = [
+                        {
+                            'arquivo': arquivo,
+                            'distancia': float(distance),
+                            'mesma_pessoa': distance <= versao.threshold
+                        }
+                        for arquivo, distance in zip(arquivos, distancias)
+                    ]
                 
-                if pessoa_resultados:
                     # Estatísticas da pessoa
-                    distancias = [r['distancia'] for r in pessoa_resultados]
                     media_dist = np.mean(distancias)
                     min_dist = np.min(distancias)
                     max_dist = np.max(distancias)
-                    
+                
                     # Decisão: maioria ou distância mínima
                     matches = sum(1 for r in pessoa_resultados if r['mesma_pessoa'])
                     total_tests = len(pessoa_resultados)
-                    
+                
                     resultados.append({
                         'pessoa': pessoa,
                         'testes_individuais': pessoa_resultados,
@@ -180,7 +313,7 @@ class PhoneSignatureVerifier:
                         'matches': matches,
                         'total_tests': total_tests,
                         'percentual_match': (matches / total_tests) * 100,
-                        'melhor_match': min_dist <= self.threshold,
+                        'melhor_match': min_dist <= versao.threshold,
                         'phone_threshold': phone_threshold
                     })
             
@@ -189,6 +322,14 @@ class PhoneSignatureVerifier:
         except Exception as e:
             return None, f"Erro na verificação: {str(e)}"
 
+@st.cache_resource
+def obter_registro():
+    """Registro do modelo compartilhado entre sessões, com recarga a quente."""
+    registry = ModelRegistry()
+    registry.iniciar_observacao()
+    configurar_exportacao()
+    return registry
+
 def main():
     st.title("📱 Verificação de Assinaturas por Telefone")
     st.markdown("---")
@@ -204,7 +345,7 @@ def main():
     
     # Inicializar verificador
     if 'verifier' not in st.session_state:
-        st.session_state.verifier = PhoneSignatureVerifier()
+        st.session_state.verifier = PhoneSignatureVerifier(registry=obter_registro())
     
     verifier = st.session_state.verifier
     
@@ -229,6 +370,21 @@ def main():
     for pessoa, files in signatures.items():
         st.sidebar.write(f"**{pessoa}**: {len(files)} assinaturas")
     
+    usar_templates = False
+    if verifier.cadastro.pessoas:
+        st.sidebar.markdown("### 🗂️ Galeria:")
+        desatualizadas = verifier.cadastro.desatualizadas()
+        if desatualizadas:
+            st.sidebar.warning(
+                f"{len(desatualizadas)} pessoa(s) com embeddings de outro modelo. "
+                "Execute `python scripts/gerenciar_cadastro.py sincronizar`"
+            )
+        usar_templates = st.sidebar.checkbox(
+            f"Usar templates ({len(verifier.cadastro.pessoas)} pessoas)",
+            value=True,
+            help="Compara contra centroide e medoides de cada pessoa (scripts/gerenciar_cadastro.py)"
+        )
+    
     # Seleção de pessoa (opcional)
     st.markdown("### 🎯 Opções de Teste:")
     
@@ -242,11 +398,20 @@ def main():
     
     with col2:
         pessoa_especifica = None
+        tamanho_shortlist = None
         if "específica" in test_mode:
             pessoa_especifica = st.selectbox(
                 "Selecione a pessoa:",
                 list(signatures.keys())
             )
+        else:
+            tamanho_shortlist = st.number_input(
+                "Candidatos avaliados pelo modelo completo:",
+                min_value=1,
+                max_value=len(signatures),
+                value=min(verifier.tamanho_shortlist, len(signatures)),
+                help="Uma triagem rápida escolhe as pessoas mais prováveis antes da rede siamesa"
+            )
     
     # Upload da assinatura do telefone
     st.markdown("### 📱 Upload da Assinatura Capturada:")
@@ -276,6 +441,13 @@ def main():
                 value=False
             )
         
+        verifier.recortar = st.checkbox(
+            "✂️ Recortar região da assinatura",
+            value=False,
+            help="Localiza a tinta numa prévia em baixa resolução e descarta o fundo "
+                 "(use com modelos treinados com recorte)"
+        )
+        
         # Mostrar preview da imagem
         st.image(phone_image, caption="📱 Assinatura Capturada", width=300)
         
@@ -287,19 +459,18 @@ def main():
                 if show_processing:
                     st.markdown("#### 🔬 Processamento da Imagem:")
                     
-                    processed_img, threshold_used = preprocess_phone_image(phone_image, enhance_quality)
+                    processed_img, threshold_used = preprocess_phone_image(
+                        phone_image, enhance_quality, recortar=verifier.recortar)
                     
                     col_proc1, col_proc2 = st.columns(2)
                     with col_proc1:
                         st.image(phone_image, caption="Original", width=200)
                     with col_proc2:
-                        # Converter para exibição
-                        display_img = (processed_img * 255).astype(np.uint8)
-                        st.image(display_img, caption=f"Processada (threshold: {threshold_used})", width=200)
+                        st.image(processed_img, caption=f"Processada (threshold: {threshold_used})", width=200)
                 
                 # Executar verificação
                 resultados, erro = verifier.verificar_contra_registradas(
-                    phone_image, pessoa_especifica
+                    phone_image, pessoa_especifica, tamanho_shortlist, usar_templates
                 )
                 
                 if erro:
@@ -308,6 +479,13 @@ def main():
                     st.markdown("---")
                     st.markdown("## 📊 Resultados da Verificação:")
                     
+                    triagem = verifier.ultima_triagem
+                    if triagem and triagem['pessoas_avaliadas'] < triagem['pessoas_registradas']:
+                        st.caption(
+                            f"🔎 Triagem: {triagem['pessoas_avaliadas']} de "
+                            f"{triagem['pessoas_registradas']} pessoas avaliadas pelo modelo completo"
+                        )
+                    
                     # Ordenar por melhor match
                     resultados.sort(key=lambda x: x['min_distancia'])
                     
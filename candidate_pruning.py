@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Módulo de triagem de candidatos para identificação 1:N.
+Calcula descritores baratos (miniatura, densidade de tinta, perfis de
+projeção e proporção) para cada referência e seleciona uma lista curta de
+pessoas candidatas, que depois são avaliadas pelo modelo siamês completo.
+"""
+
+import numpy as np
+import cv2
+
+
+# Tamanho da miniatura usada no descritor (largura, altura)
+THUMBNAIL_SIZE = (22, 16)
+
+# Número de faixas de cada perfil de projeção
+PROFILE_BINS = 16
+
+
+def compute_descriptor(img):
+    """
+    Calcula o descritor de baixa dimensão de uma imagem preprocessada.
+
+    Args:
+        img (np.array): Imagem preprocessada (altura, largura[, 1]) em [0, 1]
+            ou uint8, com tinta clara sobre fundo escuro (saída de preprocess_image)
+
+    Returns:
+        np.array: Vetor float32 com miniatura, perfis, densidade e proporção
+    """
+    img = np.asarray(img)
+    if img.ndim == 3:
+        img = img[..., 0]
+    img = img.astype(np.float32)
+    if img.max() > 1.0:
+        img = img / 255.0
+
+    # Miniatura (equivalente barato de um embedding reduzido)
+    thumbnail = cv2.resize(img, THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA).ravel()
+
+    # Perfis de projeção horizontal e vertical normalizados
+    total = float(img.sum()) + 1e-6
+    perfil_h = _resample_profile(img.sum(axis=0) / total, PROFILE_BINS)
+    perfil_v = _resample_profile(img.sum(axis=1) / total, PROFILE_BINS)
+
+    # Densidade de tinta e proporção da caixa que contém a tinta
+    densidade = img.mean()
+    ys, xs = np.nonzero(img > 0.5)
+    if len(xs) > 0:
+        proporcao = (xs.max() - xs.min() + 1) / (ys.max() - ys.min() + 1)
+    else:
+        proporcao = 0.0
+
+    return np.concatenate([
+        thumbnail,
+        perfil_h,
+        perfil_v,
+        np.array([densidade, np.log1p(proporcao)], dtype=np.float32)
+    ]).astype(np.float32)
+
+
+def _resample_profile(profile, bins):
+    """Reamostra um perfil 1D para um número fixo de faixas (somando)."""
+    edges = np.linspace(0, len(profile), bins + 1).astype(int)
+    return np.add.reduceat(profile, edges[:-1]).astype(np.float32)
+
+
+class CandidateIndex:
+    """
+    Índice de descritores por referência para gerar a lista curta (shortlist).
+
+    Os descritores são padronizados (z-score) com as estatísticas da galeria e
+    a pontuação de cada pessoa é a menor distância entre a consulta e suas
+    referências.
+    """
+
+    def __init__(self):
+        self.descriptors = np.zeros((0, 0), dtype=np.float32)
+        self.owners = np.zeros(0, dtype=np.int32)
+        self.persons = []
+        self.mean = None
+        self.std = None
+
+    @classmethod
+    def from_images(cls, references):
+        """
+        Constrói o índice a partir das imagens preprocessadas de cada pessoa.
+
+        Args:
+            references (dict): pessoa -> lista/array de imagens preprocessadas
+
+        Returns:
+            CandidateIndex: Índice pronto para consulta
+        """
+        index = cls()
+        descriptors = []
+        owners = []
+        for person_id, (pessoa, images) in enumerate(references.items()):
+            index.persons.append(pessoa)
+            for img in images:
+                descriptors.append(compute_descriptor(img))
+                owners.append(person_id)
+
+        if not descriptors:
+            return index
+
+        matrix = np.stack(descriptors)
+        index.mean = matrix.mean(axis=0)
+        index.std = matrix.std(axis=0) + 1e-6
+        index.descriptors = (matrix - index.mean) / index.std
+        index.owners = np.array(owners, dtype=np.int32)
+        return index
+
+    def __len__(self):
+        return len(self.persons)
+
+    def person_scores(self, query_img, exclude=None):
+        """
+        Pontua todas as pessoas para uma consulta (menor = mais parecida).
+
+        Args:
+            query_img (np.array): Imagem preprocessada da consulta
+            exclude (int, optional): Índice de referência a ignorar
+                (avaliação leave-one-out)
+
+        Returns:
+            np.array: Distância mínima do descritor por pessoa
+        """
+        query = (compute_descriptor(query_img) - self.mean) / self.std
+        distances = np.sqrt(np.sum(np.square(self.descriptors - query), axis=1))
+        if exclude is not None:
+            distances[exclude] = np.inf
+
+        scores = np.full(len(self.persons), np.inf, dtype=np.float32)
+        np.minimum.at(scores, self.owners, distances)
+        return scores
+
+    def shortlist(self, query_img, k, exclude=None):
+        """
+        Retorna as `k` pessoas mais prováveis segundo os descritores.
+
+        Args:
+            query_img (np.array): Imagem preprocessada da consulta
+            k (int): Tamanho da lista curta
+            exclude (int, optional): Índice de referência a ignorar
+
+        Returns:
+            list: Nomes das pessoas candidatas, da mais para a menos provável
+        """
+        if len(self.persons) == 0:
+            return []
+        scores = self.person_scores(query_img, exclude=exclude)
+        k = min(k, len(self.persons))
+        top = np.argpartition(scores, k - 1)[:k]
+        top = top[np.argsort(scores[top])]
+        return [self.persons[i] for i in top]
+
+
+def shortlist_recall(index, queries, exhaustive_best, k, excludes=None):
+    """
+    Mede a perda de recall da triagem em relação à busca exaustiva.
+
+    Args:
+        index (CandidateIndex): Índice de descritores
+        queries (list): Imagens preprocessadas de consulta
+        exhaustive_best (list): Pessoa vencedora na busca exaustiva para cada consulta
+        k (int): Tamanho da lista curta
+        excludes (list, optional): Referência a ignorar para cada consulta
+
+    Returns:
+        float: Fração das consultas em que o vencedor exaustivo está na lista curta
+    """
+    if len(queries) == 0:
+        return 0.0
+    if excludes is None:
+        excludes = [None] * len(queries)
+    hits = sum(
+        1 for query, best, exclude in zip(queries, exhaustive_best, excludes)
+        if best in index.shortlist(query, k, exclude=exclude)
+    )
+    return hits / len(queries)
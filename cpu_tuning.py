@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Módulo de ajuste automático de threads e tamanhos de lote para a CPU local.
+Mede a rede base (pesos aleatórios, mesmo custo do modelo treinado) com
+diferentes números de threads intra/inter-op e tamanhos de lote e grava a
+melhor configuração por perfil, indexada pela impressão digital da CPU:
+
+    servico   menor latência com uma imagem (apps Streamlit)
+    lote      maior vazão em imagens/s (verificação em lote)
+    treino    lote de treino: o menor com pelo menos 90% da vazão máxima
+              (lotes maiores mudam a dinâmica do treino sem ganho real)
+
+O TensorFlow só aceita configurar threads antes de executar a primeira
+operação, então cada combinação de threads é medida num processo novo.
+
+Variáveis de ambiente:
+    ASSINATURAS_CPU_AJUSTE      "0" desliga o ajuste (padrões do TensorFlow)
+    ASSINATURAS_INTRA_OP        força as threads intra-op
+    ASSINATURAS_INTER_OP        força as threads inter-op
+    ASSINATURAS_BATCH           força o tamanho de lote do perfil
+"""
+
+import hashlib
+import json
+import multiprocessing as mp
+import os
+import platform
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+
+DEFAULT_TUNING_PATH = "modelos/ajuste_cpu.json"
+INPUT_SHAPE = (155, 220, 1)
+BATCHES_INFERENCIA = (1, 8, 16, 32, 64, 128)
+BATCHES_TREINO = (16, 32, 64, 128)
+
+# Threads só podem ser definidas uma vez por processo
+_aplicado = None
+
+
+def cpus_disponiveis():
+    """CPUs que este processo pode usar (respeita affinity/cgroups quando possível)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def cpu_fingerprint():
+    """
+    Identifica o host para fins de desempenho: modelo da CPU, CPUs
+    disponíveis, arquitetura e versão do TensorFlow.
+
+    Returns:
+        tuple: (chave curta, descrição legível)
+    """
+    modelo = platform.processor() or ""
+    try:
+        with open("/proc/cpuinfo") as f:
+            for linha in f:
+                if linha.startswith("model name"):
+                    modelo = linha.split(":", 1)[1].strip()
+                    break
+    except OSError:
+        pass
+    try:
+        from importlib.metadata import version
+        versao_tf = version("tensorflow")
+    except Exception:
+        versao_tf = "?"
+    descricao = f"{modelo or platform.machine()} | {cpus_disponiveis()} CPUs | {platform.machine()} | TF {versao_tf}"
+    return hashlib.sha1(descricao.encode()).hexdigest()[:16], descricao
+
+
+def _candidatos_intra(n_cpus, maximo=6):
+    """Potências de 2 até n_cpus, mais o próprio n_cpus (no máximo `maximo` valores)."""
+    valores = sorted({min(2 ** i, n_cpus) for i in range(n_cpus.bit_length() + 1)} | {n_cpus})
+    if len(valores) > maximo:
+        indices = np.unique(np.round(np.linspace(0, len(valores) - 1, maximo)).astype(int))
+        valores = [valores[i] for i in indices]
+    return valores
+
+
+def _medir_combinacao(intra, inter, batches, batches_treino, duracao):
+    """Mede inferência (e treino, se pedido) com uma combinação de threads (processo novo)."""
+    os.environ["OMP_NUM_THREADS"] = str(intra)
+    os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(intra)
+    tf.config.threading.set_inter_op_parallelism_threads(inter)
+
+    from model import build_base_network, build_siamese_network, make_contrastive_loss
+
+    rng = np.random.default_rng(0)
+
+    def cronometrar(func, *args):
+        func(*args)  # aquecimento (traçado do grafo)
+        tempos, inicio = [], time.perf_counter()
+        while time.perf_counter() - inicio < duracao or len(tempos) < 3:
+            t0 = time.perf_counter()
+            func(*args)
+            tempos.append(time.perf_counter() - t0)
+        return float(np.median(tempos))
+
+    rede = build_base_network(INPUT_SHAPE)
+
+    @tf.function(reduce_retracing=True)
+    def inferir(x):
+        return rede(x, training=False)
+
+    resultado = {'intra_op': intra, 'inter_op': inter, 'inferencia': {}, 'treino': {}}
+    for b in batches:
+        x = tf.constant(rng.integers(0, 256, (b,) + INPUT_SHAPE, dtype=np.uint8))
+        segundos = cronometrar(lambda v: inferir(v).numpy(), x)
+        resultado['inferencia'][str(b)] = {'latencia_ms': 1000 * segundos, 'imagens_por_s': b / segundos}
+
+    if batches_treino:
+        model = build_siamese_network(INPUT_SHAPE)
+        otimizador = tf.keras.optimizers.Adam(learning_rate=0.001)
+        perda = make_contrastive_loss()
+
+        @tf.function(reduce_retracing=True)
+        def passo(xa, xb, y):
+            with tf.GradientTape() as tape:
+                loss = perda(y, model([xa, xb], training=True))
+            grads = tape.gradient(loss, model.trainable_variables)
+            otimizador.apply_gradients(zip(grads, model.trainable_variables))
+            return loss
+
+        for b in batches_treino:
+            xa = tf.constant(rng.integers(0, 256, (b,) + INPUT_SHAPE, dtype=np.uint8))
+            xb = tf.constant(rng.integers(0, 256, (b,) + INPUT_SHAPE, dtype=np.uint8))
+            y = tf.constant(rng.integers(0, 2, (b, 1)).astype(np.float32))
+            segundos = cronometrar(lambda *v: passo(*v).numpy(), xa, xb, y)
+            resultado['treino'][str(b)] = {'pares_por_s': b / segundos}
+    return resultado
+
+
+def _em_processo_novo(*args):
+    """Executa _medir_combinacao num processo recém-criado (threads do TF ainda livres)."""
+    with ProcessPoolExecutor(max_workers=1, mp_context=mp.get_context("spawn")) as executor:
+        return executor.submit(_medir_combinacao, *args).result()
+
+
+def calibrar(duracao=0.5, batches=BATCHES_INFERENCIA, batches_treino=BATCHES_TREINO, verbose=True):
+    """
+    Mede as combinações de threads e lotes e escolhe a configuração de cada perfil.
+    Primeiro varia as threads intra-op (inter-op = 1); depois testa
+    inter-op = 2 na melhor delas e, por fim, mede o treino só na
+    combinação vencedora.
+
+    Args:
+        duracao (float): Segundos de medição por tamanho de lote
+        batches (tuple): Lotes de inferência testados
+        batches_treino (tuple): Lotes de treino testados (vazio = não mede treino)
+        verbose (bool): Imprime o progresso
+
+    Returns:
+        dict: Perfis escolhidos e todas as medições
+    """
+    n_cpus = cpus_disponiveis()
+    medicoes = []
+
+    def medir(intra, inter, treino=()):
+        resultado = _em_processo_novo(intra, inter, tuple(batches), tuple(treino), duracao)
+        if verbose:
+            um = resultado['inferencia'].get('1', {}).get('latencia_ms', float('nan'))
+            vazao = max(r['imagens_por_s'] for r in resultado['inferencia'].values())
+            print(f"   intra={intra:<3} inter={inter}: {um:7.2f} ms/imagem | até {vazao:7.1f} imagens/s")
+        medicoes.append(resultado)
+        return resultado
+
+    for intra in _candidatos_intra(n_cpus):
+        medir(intra, 1)
+    melhor_vazao = max(medicoes, key=lambda m: max(r['imagens_por_s'] for r in m['inferencia'].values()))
+    if n_cpus > 1:
+        medir(melhor_vazao['intra_op'], 2)
+
+    # Serviço: menor latência com uma imagem
+    servico = min(medicoes, key=lambda m: m['inferencia'].get('1', {}).get('latencia_ms', float('inf')))
+
+    # Lote: maior vazão; entre lotes com >= 95% do máximo, o menor (menos memória)
+    def melhor_lote(m):
+        vazao_max = max(r['imagens_por_s'] for r in m['inferencia'].values())
+        return min(int(b) for b, r in m['inferencia'].items() if r['imagens_por_s'] >= 0.95 * vazao_max), vazao_max
+
+    lote = max(medicoes, key=lambda m: melhor_lote(m)[1])
+    batch_lote, vazao_lote = melhor_lote(lote)
+
+    perfis = {
+        'servico': {'intra_op': servico['intra_op'], 'inter_op': servico['inter_op'], 'batch': 1},
+        'lote': {'intra_op': lote['intra_op'], 'inter_op': lote['inter_op'], 'batch': batch_lote,
+                 'imagens_por_s': vazao_lote},
+    }
+
+    if batches_treino:
+        treino = medir(lote['intra_op'], lote['inter_op'], batches_treino)['treino']
+        vazao_max = max(r['pares_por_s'] for r in treino.values())
+        batch_treino = min(int(b) for b, r in treino.items() if r['pares_por_s'] >= 0.9 * vazao_max)
+        perfis['treino'] = {'intra_op': lote['intra_op'], 'inter_op': lote['inter_op'], 'batch': batch_treino,
+                            'pares_por_s': treino[str(batch_treino)]['pares_por_s']}
+
+    chave, descricao = cpu_fingerprint()
+    return {'chave': chave, 'cpu': descricao, 'medido_em': time.time(), 'perfis': perfis, 'medicoes': medicoes}
+
+
+def carregar_ajuste(path=DEFAULT_TUNING_PATH):
+    """Ajuste gravado para a CPU atual (ou None)."""
+    try:
+        with open(path) as f:
+            ajustes = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return ajustes.get(cpu_fingerprint()[0])
+
+
+def salvar_ajuste(ajuste, path=DEFAULT_TUNING_PATH):
+    """Grava o ajuste desta CPU sem apagar os de outros hosts (escrita atômica)."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        with open(path) as f:
+            ajustes = json.load(f)
+    except (OSError, ValueError):
+        ajustes = {}
+    ajustes[ajuste['chave']] = ajuste
+    temp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(temp_path, "w") as f:
+        json.dump(ajustes, f, indent=2)
+    os.replace(temp_path, path)
+
+
+def obter_ajuste(perfil, path=DEFAULT_TUNING_PATH, calibrar_se_ausente=False):
+    """
+    Configuração de um perfil para esta CPU, com as variáveis de ambiente
+    aplicadas por cima.
+
+    Args:
+        perfil (str): 'servico', 'lote' ou 'treino'
+        path (str): Arquivo dos ajustes
+        calibrar_se_ausente (bool): Calibra (e grava) se esta CPU ainda não foi medida
+
+    Returns:
+        dict: 'intra_op', 'inter_op' e 'batch' (None = padrão do chamador) e 'origem'
+    """
+    config = {'intra_op': None, 'inter_op': None, 'batch': None, 'origem': 'padrao'}
+    if os.environ.get("ASSINATURAS_CPU_AJUSTE", "1") != "0":
+        ajuste = carregar_ajuste(path)
+        if (ajuste is None or perfil not in ajuste['perfis']) and calibrar_se_ausente:
+            print("⏱️ CPU ainda não calibrada; medindo threads e lotes (uma vez por host)...")
+            ajuste = calibrar()
+            salvar_ajuste(ajuste, path)
+        if ajuste is not None and perfil in ajuste['perfis']:
+            medido = ajuste['perfis'][perfil]
+            config.update({k: medido[k] for k in ('intra_op', 'inter_op', 'batch')}, origem='calibrado')
+
+    for chave, variavel in (('intra_op', "ASSINATURAS_INTRA_OP"), ('inter_op', "ASSINATURAS_INTER_OP"),
+                            ('batch', "ASSINATURAS_BATCH")):
+        if os.environ.get(variavel):
+            config[chave] = int(os.environ[variavel])
+            config['origem'] = 'ambiente'
+    return config
+
+
+def aplicar_ajuste(perfil, path=DEFAULT_TUNING_PATH, calibrar_se_ausente=False):
+    """
+    Aplica as threads do perfil ao TensorFlow deste processo. Deve ser
+    chamada antes da primeira operação do TensorFlow (carregar o modelo).
+
+    Chamadas repetidas no mesmo processo (ex.: reexecuções do script do
+    Streamlit) devolvem a configuração já aplicada.
+
+    Returns:
+        dict: Configuração aplicada (ver obter_ajuste)
+    """
+    global _aplicado
+    if _aplicado is not None:
+        return _aplicado
+    config = obter_ajuste(perfil, path, calibrar_se_ausente)
+    _aplicado = config
+    if config['intra_op'] is None and config['inter_op'] is None:
+        return config
+
+    import tensorflow as tf
+    try:
+        if config['intra_op'] is not None:
+            tf.config.threading.set_intra_op_parallelism_threads(config['intra_op'])
+        if config['inter_op'] is not None:
+            tf.config.threading.set_inter_op_parallelism_threads(config['inter_op'])
+    except RuntimeError:
+        # O runtime já foi inicializado: as threads não mudam mais neste processo
+        print("⚠️ TensorFlow já inicializado; ajuste de threads ignorado")
+        config['origem'] = 'ignorado'
+    return config
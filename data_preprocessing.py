@@ -2,51 +2,90 @@
 """
 Módulo de preprocessamento de dados para assinaturas manuscritas.
 Contém funções para carregar, redimensionar, binarizar e normalizar imagens.
+
+As funções aceitam `dtype=np.uint8` para manter a imagem em 0-255 (34 KB por
+imagem em vez de 136 KB em float32); os modelos novos fazem a escala para
+[0, 1] dentro do grafo (ver model.prepare_model_input para modelos antigos).
 """
 
+import io
+
 import cv2
 import numpy as np
 from PIL import Image
 
+from metrics import medir_etapa
+
 
-def preprocess_image(image_path, target_size=(220, 155)):
+def preprocess_image(image_path, target_size=(220, 155), strict=False, dtype=np.float32, recortar=False):
     """
     Preprocessa uma imagem de assinatura para o formato esperado pelo modelo.
     
     Args:
         image_path (str): Caminho para a imagem
         target_size (tuple): Tamanho alvo (largura, altura)
+        strict (bool): Se True, propaga o erro em vez de retornar imagem vazia
+        dtype: np.float32 (normalizada em [0, 1]) ou np.uint8 (0-255)
+        recortar (bool): Recorta a região com tinta antes de binarizar
+            (desligado por padrão: os modelos atuais foram treinados sem recorte)
     
     Returns:
-        np.array: Imagem preprocessada normalizada
+        np.array: Imagem preprocessada
     """
     try:
         # Carregar imagem
-        img = cv2.imread(str(image_path), cv2.IMREAD_GRAYSCALE)
+        with medir_etapa('decode'):
+            img = cv2.imread(str(image_path), cv2.IMREAD_GRAYSCALE)
         if img is None:
             raise ValueError(f"Não foi possível carregar a imagem: {image_path}")
         
-        # Binarizar usando threshold OTSU
-        _, img_binary = cv2.threshold(img, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
-        
-        # Redimensionar
-        img_resized = cv2.resize(img_binary, target_size, interpolation=cv2.INTER_AREA)
-        
-        # Normalizar para [0, 1]
-        img_normalized = img_resized.astype(np.float32) / 255.0
-        
-        # Expandir dimensões para o formato esperado pelo modelo
-        img_final = np.expand_dims(img_normalized, axis=-1)
+        if recortar:
+            with medir_etapa('recorte'):
+                img = crop_to_ink(img)
         
-        return img_final
+        return preprocess_gray(img, target_size, dtype)
         
     except Exception as e:
+        if strict:
+            raise
         print(f"Erro ao preprocessar imagem {image_path}: {e}")
         # Retorna imagem vazia em caso de erro
-        empty_img = np.zeros((155, 220, 1), dtype=np.float32)  # (altura, largura, canais)
+        empty_img = np.zeros((155, 220, 1), dtype=dtype)  # (altura, largura, canais)
         return empty_img
 
 
+def preprocess_gray(img_gray, target_size=(220, 155), dtype=np.float32):
+    """
+    Aplica o preprocessamento do modelo a uma imagem já decodificada
+    (ex.: um recorte de página): Otsu invertido, redimensionamento e escala.
+    
+    Args:
+        img_gray (np.array): Imagem uint8 em escala de cinza
+        target_size (tuple): Tamanho alvo (largura, altura)
+        dtype: np.float32 (normalizada em [0, 1]) ou np.uint8 (0-255)
+    
+    Returns:
+        np.array: Imagem preprocessada (altura, largura, 1)
+    """
+    # Binarizar usando threshold OTSU
+    with medir_etapa('binarizacao'):
+        _, img_binary = cv2.threshold(img_gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    
+    # Redimensionar
+    with medir_etapa('redimensionamento'):
+        img_resized = cv2.resize(img_binary, target_size, interpolation=cv2.INTER_AREA)
+    
+    # Normalizar para [0, 1]
+    if dtype == np.uint8:
+        img_normalized = img_resized
+    else:
+        with medir_etapa('normalizacao'):
+            img_normalized = img_resized.astype(np.float32) / 255.0
+    
+    # Expandir dimensões para o formato esperado pelo modelo
+    return np.expand_dims(img_normalized, axis=-1)
+
+
 def binarize_image(img_array, threshold=None):
     """
     Binariza uma imagem usando threshold OTSU ou valor específico.
@@ -100,27 +139,211 @@ def normalize_image(img_array):
     return img_array.astype(np.float32)
 
 
-def preprocess_streamlit_image(uploaded_file, target_size=(220, 155)):
+def locate_ink_bbox(img_gray, lado_max=256, area_minima=0.0005, margem=0.05):
+    """
+    Localiza a região com tinta numa passada barata em baixa resolução.
+    A imagem é reduzida para no máximo `lado_max` pixels no maior lado,
+    binarizada por Otsu e analisada por componentes conexos; componentes
+    muito pequenos (ruído) são descartados, assim como os que tocam a borda
+    (sombras e bordas do papel em fotos), a menos que só existam esses.
+    
+    Args:
+        img_gray (np.array): Imagem uint8 em escala de cinza
+        lado_max (int): Maior lado da imagem usada na busca
+        area_minima (float): Área mínima de um componente (fração da imagem)
+        margem (float): Margem adicionada em volta da caixa (fração do tamanho dela)
+    
+    Returns:
+        tuple: (x0, y0, x1, y1) nas coordenadas de `img_gray`, ou None sem tinta
+    """
+    altura, largura = img_gray.shape[:2]
+    escala = min(1.0, lado_max / max(altura, largura))
+    if escala < 1.0:
+        pequena = cv2.resize(img_gray, (max(1, round(largura * escala)), max(1, round(altura * escala))),
+                             interpolation=cv2.INTER_AREA)
+    else:
+        pequena = img_gray
+    _, tinta = cv2.threshold(pequena, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    
+    n, _, stats, _ = cv2.connectedComponentsWithStats(tinta, connectivity=8)
+    h, w = tinta.shape
+    minimo = max(1, area_minima * tinta.size)
+    caixas = [stats[i, :4] for i in range(1, n) if stats[i, cv2.CC_STAT_AREA] >= minimo]
+    internas = [c for c in caixas if c[0] > 0 and c[1] > 0 and c[0] + c[2] < w and c[1] + c[3] < h]
+    caixas = internas or caixas
+    if not caixas:
+        return None
+    
+    caixas = np.array(caixas)
+    x0, y0 = caixas[:, 0].min(), caixas[:, 1].min()
+    x1, y1 = (caixas[:, 0] + caixas[:, 2]).max(), (caixas[:, 1] + caixas[:, 3]).max()
+    
+    # Volta para a resolução original, com margem (e pelo menos 1 pixel da busca)
+    fator = 1.0 / escala
+    dx = max(fator, margem * (x1 - x0) * fator)
+    dy = max(fator, margem * (y1 - y0) * fator)
+    return (max(0, int(x0 * fator - dx)), max(0, int(y0 * fator - dy)),
+            min(largura, int(np.ceil(x1 * fator + dx))), min(altura, int(np.ceil(y1 * fator + dy))))
+
+
+def crop_to_ink(img_gray, **kwargs):
+    """
+    Recorta a imagem na região com tinta (ver locate_ink_bbox).
+    
+    Returns:
+        np.array: Recorte (ou a imagem inteira se não houver tinta)
+    """
+    caixa = locate_ink_bbox(img_gray, **kwargs)
+    if caixa is None:
+        return img_gray
+    x0, y0, x1, y1 = caixa
+    return img_gray[y0:y1, x0:x1]
+
+
+def decode_reduced(source, target_size=(220, 155), fator_trabalho=4, recortar=False):
+    """
+    Decodifica uma imagem em escala de cinza já em resolução reduzida.
+    Lê apenas o cabeçalho para saber o tamanho e escolhe a maior redução
+    (1/2, 1/4 ou 1/8) que ainda deixa a imagem com pelo menos
+    `fator_trabalho` vezes o tamanho alvo. Em JPEG a redução acontece na
+    própria decodificação (escala da DCT), sem alocar o quadro inteiro; nos
+    demais formatos a imagem é decodificada e reduzida logo em seguida.
+    Por fim a imagem é levada por INTER_AREA à resolução de trabalho.
+    
+    Com `recortar=True`, uma prévia a 1/8 localiza a tinta; a redução é
+    escolhida pelo tamanho dessa região e só ela segue adiante, então a
+    assinatura ocupa a resolução de trabalho inteira.
+    
+    Quadros já decodificados (np.array, ex.: de cv2.VideoCapture) pulam a
+    decodificação: são convertidos para cinza, recortados e reduzidos.
+    
+    Args:
+        source: Caminho, bytes, arquivo (ex.: UploadedFile do Streamlit) ou
+            quadro np.array (BGR ou escala de cinza)
+        target_size (tuple): Tamanho alvo (largura, altura)
+        fator_trabalho (int): Resolução de trabalho em múltiplos do alvo
+        recortar (bool): Recorta a região com tinta antes de reduzir
+    
+    Returns:
+        np.array: Imagem uint8 em escala de cinza na resolução de trabalho
+    """
+    trabalho = (target_size[0] * fator_trabalho, target_size[1] * fator_trabalho)
+    if isinstance(source, np.ndarray):
+        img_array = cv2.cvtColor(source, cv2.COLOR_BGR2GRAY) if source.ndim == 3 else source
+        if recortar:
+            img_array = crop_to_ink(img_array)
+        escala = min(img_array.shape[1] / trabalho[0], img_array.shape[0] / trabalho[1])
+        if escala > 1:
+            novo_tamanho = (max(1, round(img_array.shape[1] / escala)), max(1, round(img_array.shape[0] / escala)))
+            img_array = cv2.resize(img_array, novo_tamanho, interpolation=cv2.INTER_AREA)
+        return img_array
+    
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    pil_image = Image.open(source)  # só lê o cabeçalho
+    largura, altura = pil_image.size
+    
+    caixa = (0, 0, largura, altura)
+    if recortar:
+        jpeg = pil_image.format == 'JPEG'
+        if jpeg:
+            pil_image.draft('L', (largura // 8, altura // 8))
+        previa = np.array(pil_image.convert('L'))
+        encontrada = locate_ink_bbox(previa)
+        if encontrada is not None:
+            fx, fy = largura / previa.shape[1], altura / previa.shape[0]
+            caixa = (int(encontrada[0] * fx), int(encontrada[1] * fy),
+                     min(largura, int(np.ceil(encontrada[2] * fx))), min(altura, int(np.ceil(encontrada[3] * fy))))
+        # JPEG: nova decodificação, com a redução da região; demais formatos
+        # já foram decodificados inteiros na prévia
+        pil_image = Image.open(source) if jpeg else Image.fromarray(previa)
+    
+    escala = min((caixa[2] - caixa[0]) / trabalho[0], (caixa[3] - caixa[1]) / trabalho[1])
+    reducao = 1
+    while reducao < 8 and escala >= reducao * 2:
+        reducao *= 2
+    
+    if reducao > 1 and pil_image.format == 'JPEG':
+        pil_image.draft('L', (largura // reducao, altura // reducao))
+        reducao = 1  # já aplicada na decodificação
+    if pil_image.mode != 'L':
+        pil_image = pil_image.convert('L')
+    if caixa != (0, 0, largura, altura):
+        fx, fy = pil_image.size[0] / largura, pil_image.size[1] / altura
+        pil_image = pil_image.crop((int(caixa[0] * fx), int(caixa[1] * fy),
+                                    int(np.ceil(caixa[2] * fx)), int(np.ceil(caixa[3] * fy))))
+    if reducao > 1:
+        pil_image = pil_image.reduce(reducao)
+    img_array = np.array(pil_image)
+    
+    # Ajuste fino até a resolução de trabalho
+    escala = min(img_array.shape[1] / trabalho[0], img_array.shape[0] / trabalho[1])
+    if escala > 1:
+        novo_tamanho = (max(1, round(img_array.shape[1] / escala)), max(1, round(img_array.shape[0] / escala)))
+        img_array = cv2.resize(img_array, novo_tamanho, interpolation=cv2.INTER_AREA)
+    return img_array
+
+
+def preprocess_phone_image(source, enhance_quality=True, target_size=(220, 155), fator_trabalho=4,
+                           recortar=False):
+    """
+    Preprocessa uma foto de assinatura tirada por telefone.
+    A decodificação e as melhorias (filtro de mediana, equalização, Otsu)
+    rodam na resolução de trabalho, não na resolução cheia da câmera.
+    
+    Args:
+        source: Caminho, bytes, arquivo (ex.: UploadedFile do Streamlit) ou quadro np.array
+        enhance_quality (bool): Aplica redução de ruído e equalização
+        target_size (tuple): Tamanho alvo (largura, altura)
+        fator_trabalho (int): Resolução de trabalho em múltiplos do alvo
+        recortar (bool): Recorta a região com tinta antes de processar
+    
+    Returns:
+        tuple: (imagem uint8 (altura, largura), threshold usado em 0-255)
+    """
+    with medir_etapa('decode'):
+        img_array = decode_reduced(source, target_size, fator_trabalho, recortar)
+    
+    # Melhorias específicas para fotos de telefone
+    with medir_etapa('melhoria'):
+        if enhance_quality:
+            # Redução de ruído
+            img_array = cv2.medianBlur(img_array, 3)
+            
+            # Melhorar contraste
+            img_array = cv2.equalizeHist(img_array)
+            
+            # Detecção automática de threshold para binarização
+            threshold_value = cv2.threshold(img_array, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[0]
+        else:
+            threshold_value = 127
+    
+    # Threshold já está em 0-255 (binarize_image espera [0, 1])
+    with medir_etapa('binarizacao'):
+        _, img_processed = cv2.threshold(img_array, threshold_value, 255, cv2.THRESH_BINARY_INV)
+    with medir_etapa('redimensionamento'):
+        img_processed = resize_image(img_processed, target_size)
+    
+    return img_processed, threshold_value
+
+
+def preprocess_streamlit_image(uploaded_file, target_size=(220, 155), dtype=np.float32, recortar=False):
     """
     Preprocessa uma imagem carregada via Streamlit.
     
     Args:
         uploaded_file: Objeto UploadedFile do Streamlit
         target_size (tuple): Tamanho alvo (largura, altura)
+        dtype: np.float32 (normalizada em [0, 1]) ou np.uint8 (0-255)
+        recortar (bool): Recorta a região com tinta antes de binarizar
+            (desligado por padrão: os modelos atuais foram treinados sem recorte)
     
     Returns:
         np.array: Imagem preprocessada
     """
     try:
-        # Converter para PIL Image
-        pil_image = Image.open(uploaded_file)
-        
-        # Converter para escala de cinza se necessário
-        if pil_image.mode != 'L':
-            pil_image = pil_image.convert('L')
-        
-        # Converter para numpy array
-        img_array = np.array(pil_image)
+        # Decodificar em escala de cinza, já reduzida para a resolução de trabalho
+        img_array = decode_reduced(uploaded_file, target_size, recortar=recortar)
         
         # Binarizar
         img_binary = binarize_image(img_array)
@@ -129,7 +352,7 @@ def preprocess_streamlit_image(uploaded_file, target_size=(220, 155)):
         img_resized = resize_image(img_binary, target_size)
         
         # Normalizar
-        img_normalized = normalize_image(img_resized)
+        img_normalized = img_resized if dtype == np.uint8 else normalize_image(img_resized)
         
         # Expandir dimensões
         img_final = np.expand_dims(img_normalized, axis=-1)
@@ -139,7 +362,7 @@ def preprocess_streamlit_image(uploaded_file, target_size=(220, 155)):
     except Exception as e:
         print(f"Erro ao preprocessar imagem do Streamlit: {e}")
         # Retorna imagem vazia em caso de erro
-        empty_img = np.zeros((155, 220, 1), dtype=np.float32)  # (altura, largura, canais)
+        empty_img = np.zeros((155, 220, 1), dtype=dtype)  # (altura, largura, canais)
         return empty_img
 
 
@@ -174,20 +397,55 @@ def enhance_phone_image(img_array):
         return img_array
 
 
-def load_and_preprocess_batch(image_paths, target_size=(220, 155)):
+def load_and_preprocess_batch(image_paths, target_size=(220, 155), dtype=np.float32):
     """
     Carrega e preprocessa um lote de imagens.
     
     Args:
         image_paths (list): Lista de caminhos para as imagens
         target_size (tuple): Tamanho alvo
+        dtype: np.float32 (normalizada em [0, 1]) ou np.uint8 (0-255)
     
     Returns:
         np.array: Array com todas as imagens preprocessadas
     """
-    images = []
-    for path in image_paths:
-        img = preprocess_image(path, target_size)
-        images.append(img)
+    images = np.empty((len(image_paths), target_size[1], target_size[0], 1), dtype=dtype)
+    for i, path in enumerate(image_paths):
+        images[i] = preprocess_image(path, target_size, dtype=dtype)
+    
+    return images
+
+
+def pack_bits(images, threshold=128):
+    """
+    Compacta imagens binarizadas em 1 bit por pixel (32x menor que float32).
+    O redimensionamento INTER_AREA deixa tons intermediários nas bordas do
+    traço; aqui eles são arredondados pelo `threshold`, então a compactação
+    só é exata para imagens estritamente binárias.
+    
+    Args:
+        images (np.array): Array uint8 (n, altura, largura, 1)
+        threshold (int): Valor a partir do qual o pixel é tinta
+    
+    Returns:
+        np.array: Array uint8 (n, ceil(altura * largura / 8))
+    """
+    images = np.asarray(images)
+    flat = images.reshape(len(images), -1) >= threshold
+    return np.packbits(flat, axis=1)
+
+
+def unpack_bits(packed, image_shape=(155, 220, 1)):
+    """
+    Reverte pack_bits.
+    
+    Args:
+        packed (np.array): Saída de pack_bits
+        image_shape (tuple): Formato de cada imagem
     
-    return np.array(images)
+    Returns:
+        np.array: Imagens uint8 (n, altura, largura, 1) com valores 0 ou 255
+    """
+    n_pixels = int(np.prod(image_shape))
+    bits = np.unpackbits(np.asarray(packed), axis=1, count=n_pixels)
+    return (bits * 255).reshape((len(packed),) + tuple(image_shape))
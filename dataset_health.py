@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Módulo de varredura de saúde do dataset.
+Cada imagem é verificada em paralelo: dimensões pelo cabeçalho (sem
+decodificar), decodificação válida, nitidez (variância do Laplaciano),
+cobertura de tinta (Otsu), hash do arquivo (duplicatas exatas) e dHash
+(quase-duplicatas, via near_duplicates.HashBandIndex). A decodificação usa
+decode_reduced, então uma foto de 12 MP é lida em 1/8 da resolução.
+
+Os resultados por arquivo ficam num cache indexado por caminho, mtime e
+tamanho: uma nova varredura só decodifica arquivos novos ou alterados.
+"""
+
+import io
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from data_preprocessing import decode_reduced
+from near_duplicates import DEFAULT_LIMITE, dhash, encontrar_duplicatas
+from verification_cache import content_hash
+
+
+DEFAULT_CACHE_PATH = "resultados_avaliacao/analise_dados_cache.json"
+
+# Muda quando as métricas mudam (invalida o cache)
+CACHE_VERSAO = 1
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+# Limites padrão dos alertas por imagem
+LADO_MINIMO = 100
+NITIDEZ_MINIMA = 20.0
+TINTA = (0.005, 0.40)
+
+
+def analisar_imagem(path):
+    """
+    Métricas de uma imagem (sem os alertas, que dependem dos limites).
+
+    Args:
+        path: Caminho do arquivo
+
+    Returns:
+        dict: 'hash', 'formato', 'largura', 'altura' e, se a imagem decodificar,
+            'nitidez', 'tinta' e 'dhash'; caso contrário 'erro'
+    """
+    try:
+        with open(path, 'rb') as f:
+            dados = f.read()
+    except OSError as e:
+        return {'hash': None, 'erro': f"{type(e).__name__}: {e}"}
+    resultado = {'hash': content_hash(dados)}
+    try:
+        with Image.open(io.BytesIO(dados)) as cabecalho:  # só lê o cabeçalho
+            resultado.update(formato=cabecalho.format, largura=cabecalho.size[0], altura=cabecalho.size[1])
+        # Resolução de trabalho 2x o alvo do modelo: nitidez comparável entre fotos de tamanhos diferentes
+        img = decode_reduced(dados, fator_trabalho=2)
+    except Exception as e:
+        resultado['erro'] = f"{type(e).__name__}: {e}"
+        return resultado
+
+    _, binaria = cv2.threshold(img, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    resultado.update(
+        nitidez=float(cv2.Laplacian(img, cv2.CV_32F).var()),
+        tinta=cv2.countNonZero(binaria) / binaria.size,
+        dhash=format(dhash(img), "016x")
+    )
+    return resultado
+
+
+def listar_imagens(pasta):
+    """
+    Lista as imagens de pasta/pessoa/arquivo numa única passada por diretório.
+
+    Returns:
+        list: (nome relativo, pessoa, caminho, mtime_ns, tamanho)
+    """
+    itens = []
+    with os.scandir(pasta) as pessoas:
+        for pessoa in sorted(pessoas, key=lambda e: e.name):
+            if not pessoa.is_dir():
+                continue
+            with os.scandir(pessoa.path) as arquivos:
+                for arquivo in arquivos:
+                    if not arquivo.is_file() or os.path.splitext(arquivo.name)[1].lower() not in IMAGE_EXTENSIONS:
+                        continue
+                    info = arquivo.stat()
+                    itens.append((f"{pessoa.name}/{arquivo.name}", pessoa.name, arquivo.path,
+                                  info.st_mtime_ns, info.st_size))
+    return sorted(itens)
+
+
+class DatasetHealthScanner:
+    """
+    Varredura incremental de uma pasta com uma subpasta por pessoa.
+
+    Args:
+        pasta (str): Pasta do dataset
+        cache_path (str): Cache das métricas por arquivo (None = sem cache)
+        workers (int): Threads de leitura e decodificação
+        lado_minimo (int): Menor lado aceitável em pixels (cabeçalho)
+        nitidez_minima (float): Variância do Laplaciano mínima na resolução de trabalho
+        tinta (tuple): Faixa aceitável de fração de tinta
+        limite_hash (int): Distância de Hamming das quase-duplicatas
+    """
+
+    def __init__(self, pasta, cache_path=DEFAULT_CACHE_PATH, workers=None, lado_minimo=LADO_MINIMO,
+                 nitidez_minima=NITIDEZ_MINIMA, tinta=TINTA, limite_hash=DEFAULT_LIMITE):
+        self.pasta = Path(pasta)
+        self.cache_path = Path(cache_path) if cache_path else None
+        self.workers = workers or min(32, (os.cpu_count() or 1) * 2)
+        self.lado_minimo = lado_minimo
+        self.nitidez_minima = nitidez_minima
+        self.tinta = tinta
+        self.limite_hash = limite_hash
+
+    def _carregar_cache(self):
+        if self.cache_path is None or not self.cache_path.exists():
+            return {}
+        try:
+            with open(self.cache_path) as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if cache.get('versao') != CACHE_VERSAO:
+            return {}
+        return cache.get('pastas', {}).get(str(self.pasta.resolve()), {})
+
+    def _salvar_cache(self, entradas):
+        if self.cache_path is None:
+            return
+        cache = {'versao': CACHE_VERSAO, 'pastas': {}}
+        if self.cache_path.exists():
+            try:
+                with open(self.cache_path) as f:
+                    anterior = json.load(f)
+                if anterior.get('versao') == CACHE_VERSAO:
+                    cache['pastas'] = anterior.get('pastas', {})
+            except (OSError, ValueError):
+                pass
+        cache['pastas'][str(self.pasta.resolve())] = entradas
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        temp = self.cache_path.with_suffix(".json.tmp")
+        with open(temp, "w") as f:
+            json.dump(cache, f)
+        os.replace(temp, self.cache_path)
+
+    def alertas(self, metricas):
+        """Problemas de uma imagem a partir das métricas."""
+        if 'erro' in metricas:
+            return ['ilegivel']
+        problemas = []
+        if min(metricas['largura'], metricas['altura']) < self.lado_minimo:
+            problemas.append('pequena')
+        if metricas['nitidez'] < self.nitidez_minima:
+            problemas.append('desfocada')
+        if metricas['tinta'] < self.tinta[0]:
+            problemas.append('sem_tinta')
+        elif metricas['tinta'] > self.tinta[1]:
+            problemas.append('tinta_excessiva')
+        return problemas
+
+    def varrer(self):
+        """
+        Varre a pasta (só decodifica arquivos novos ou alterados).
+
+        Returns:
+            dict: Relatório com resumo, pessoas, pares estimados, problemas
+                do dataset e imagens com alertas
+        """
+        inicio = time.perf_counter()
+        itens = listar_imagens(self.pasta)
+        cache = self._carregar_cache()
+
+        entradas, pendentes = {}, []
+        for nome, pessoa, path, mtime_ns, tamanho in itens:
+            anterior = cache.get(nome)
+            if anterior and anterior['mtime_ns'] == mtime_ns and anterior['tamanho'] == tamanho:
+                entradas[nome] = anterior
+            else:
+                pendentes.append((nome, path, mtime_ns, tamanho))
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for (nome, _, mtime_ns, tamanho), metricas in zip(
+                    pendentes, executor.map(lambda item: analisar_imagem(item[1]), pendentes)):
+                entradas[nome] = dict(metricas, mtime_ns=mtime_ns, tamanho=tamanho)
+        self._salvar_cache(entradas)
+
+        imagens = []
+        for nome, pessoa, _, _, _ in itens:
+            metricas = entradas[nome]
+            imagens.append(dict(metricas, nome=nome, pessoa=pessoa, problemas=self.alertas(metricas)))
+
+        self._marcar_duplicatas(imagens)
+        relatorio = self._resumir(imagens)
+        relatorio.update(
+            pasta=str(self.pasta),
+            gerado_em=time.time(),
+            segundos=time.perf_counter() - inicio,
+            decodificadas=len(pendentes),
+            em_cache=len(itens) - len(pendentes)
+        )
+        return relatorio
+
+    def _marcar_duplicatas(self, imagens):
+        primeiro = {}
+        for img in imagens:
+            if img['hash'] is None:
+                continue
+            if img['hash'] in primeiro:
+                img['problemas'].append('duplicata_exata')
+                img['igual_a'] = primeiro[img['hash']]
+            else:
+                primeiro[img['hash']] = img['nome']
+
+        registros = [{'nome': img['nome'], 'pessoa': img['pessoa'], 'dhash': int(img['dhash'], 16)}
+                     for img in imagens if 'dhash' in img and 'duplicata_exata' not in img['problemas']]
+        resultado = encontrar_duplicatas(registros, self.limite_hash)
+        por_nome = {img['nome']: img for img in imagens}
+        for item in resultado['duplicatas']:
+            por_nome[item['nome']]['problemas'].append('quase_duplicata')
+            por_nome[item['nome']]['igual_a'] = item['igual_a']
+        for item in resultado['entre_pessoas']:
+            por_nome[item['nome']]['problemas'].append('igual_outra_pessoa')
+            por_nome[item['nome']]['igual_a'] = item['igual_a']
+
+    def _resumir(self, imagens):
+        pessoas = {}
+        for img in imagens:
+            pessoa = pessoas.setdefault(img['pessoa'], {'imagens': 0, 'validas': 0, 'com_problemas': 0})
+            pessoa['imagens'] += 1
+            pessoa['validas'] += 'erro' not in img
+            pessoa['com_problemas'] += bool(img['problemas'])
+
+        # Pares positivos C(n, 2); negativos min(3, n) x min(3, m) entre pessoas diferentes
+        validas = np.array([p['validas'] for p in pessoas.values()], dtype=np.int64)
+        ate_tres = np.minimum(validas, 3)
+        pares_positivos = int(np.sum(validas * (validas - 1) // 2))
+        pares_negativos = int(np.sum(ate_tres * (ate_tres.sum() - ate_tres)))
+
+        problemas = []
+        for nome, pessoa in pessoas.items():
+            if pessoa['validas'] < 2:
+                problemas.append(f"{nome}: apenas {pessoa['validas']} imagem(ns) válida(s) - impossível criar pares positivos")
+            elif pessoa['validas'] < 5:
+                problemas.append(f"{nome}: apenas {pessoa['validas']} imagens válidas - poucos pares positivos")
+        if pares_positivos == 0:
+            problemas.append("CRÍTICO: nenhum par positivo será criado")
+        elif pares_negativos / pares_positivos > 10:
+            problemas.append(f"dataset desbalanceado: {pares_negativos / pares_positivos:.1f}x mais pares negativos")
+
+        contagem = {}
+        for img in imagens:
+            for problema in img['problemas']:
+                contagem[problema] = contagem.get(problema, 0) + 1
+
+        return {
+            'total_imagens': len(imagens),
+            'total_pessoas': len(pessoas),
+            'alertas': contagem,
+            'pessoas': pessoas,
+            'pares': {'positivos': pares_positivos, 'negativos': pares_negativos},
+            'problemas_dataset': problemas,
+            'imagens_com_problemas': [
+                {k: img[k] for k in ('nome', 'problemas', 'largura', 'altura', 'nitidez', 'tinta', 'igual_a', 'erro')
+                 if k in img}
+                for img in imagens if img['problemas']
+            ]
+        }
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Módulo de armazenamento do dataset em shards.
+Em vez de milhares de PNGs pequenos, as imagens preprocessadas ficam em poucos
+arquivos .npy grandes (uint8, formato fixo (n, 155, 220, 1)) acompanhados do
+índice da pessoa de cada imagem, mais um manifest.json com a lista de shards
+e de pessoas. Carregar o dataset passa a ser a leitura sequencial de alguns
+arquivos grandes, o que faz diferença em sistemas de arquivos de rede.
+
+Estrutura:
+    dataset_shards/
+        manifest.json
+        shard_00000_imagens.npy   (n, 155, 220, 1) uint8
+        shard_00000_labels.npy    (n,) int32 -> manifest['pessoas']
+        ...
+
+Com `bitpack=True` as imagens são guardadas com 1 bit por pixel
+(data_preprocessing.pack_bits), 8x menor que uint8; os tons intermediários
+das bordas do traço são arredondados.
+"""
+
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from data_preprocessing import preprocess_image, pack_bits, unpack_bits
+
+
+MANIFEST_NAME = "manifest.json"
+DEFAULT_SHARDS_DIR = "dataset_shards"
+SHARD_SIZE = 2048
+IMAGE_SHAPE = (155, 220, 1)
+
+
+def to_uint8(img):
+    """Converte uma imagem preprocessada [0, 1] para uint8 [0, 255]."""
+    if img.dtype == np.uint8:
+        return img
+    return np.clip(np.rint(img * 255.0), 0, 255).astype(np.uint8)
+
+
+def has_manifest(shards_dir):
+    """Indica se a pasta contém um dataset em shards."""
+    return (Path(shards_dir) / MANIFEST_NAME).exists()
+
+
+class ShardWriter:
+    """
+    Escreve imagens e labels em shards de tamanho fixo.
+    Cada shard é gravado de forma atômica (.tmp + rename) e o manifest só é
+    escrito em `fechar`, então um dataset incompleto nunca é lido.
+
+    Args:
+        output_dir (str): Pasta dos shards
+        shard_size (int): Imagens por shard
+        image_shape (tuple): Formato de cada imagem
+        bitpack (bool): Guarda 1 bit por pixel em vez de uint8
+    """
+
+    def __init__(self, output_dir=DEFAULT_SHARDS_DIR, shard_size=SHARD_SIZE, image_shape=IMAGE_SHAPE,
+                 bitpack=False):
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.shard_size = shard_size
+        self.image_shape = tuple(image_shape)
+        self.bitpack = bitpack
+        self.pessoas = []
+        self._indice_pessoa = {}
+        self._shards = []
+        self._buffer = np.empty((shard_size,) + self.image_shape, dtype=np.uint8)
+        self._labels = np.empty(shard_size, dtype=np.int32)
+        self._n = 0
+
+        # Manifest antigo deixa de valer enquanto a escrita não termina
+        (self.output_dir / MANIFEST_NAME).unlink(missing_ok=True)
+
+    def adicionar(self, img, pessoa):
+        """Adiciona uma imagem preprocessada (float [0, 1] ou uint8)."""
+        if pessoa not in self._indice_pessoa:
+            self._indice_pessoa[pessoa] = len(self.pessoas)
+            self.pessoas.append(pessoa)
+        self._buffer[self._n] = to_uint8(np.asarray(img)).reshape(self.image_shape)
+        self._labels[self._n] = self._indice_pessoa[pessoa]
+        self._n += 1
+        if self._n == self.shard_size:
+            self._gravar_shard()
+
+    def _gravar_shard(self):
+        if self._n == 0:
+            return
+        indice = len(self._shards)
+        arquivos = {}
+        imagens = self._buffer[:self._n]
+        if self.bitpack:
+            imagens = pack_bits(imagens)
+        for tipo, dados in (("imagens", imagens), ("labels", self._labels[:self._n])):
+            nome = f"shard_{indice:05d}_{tipo}.npy"
+            temp = self.output_dir / f".{nome}.tmp"
+            with open(temp, "wb") as f:
+                np.save(f, dados)
+            os.replace(temp, self.output_dir / nome)
+            arquivos[tipo] = nome
+        self._shards.append({'imagens': arquivos['imagens'], 'labels': arquivos['labels'], 'n': self._n})
+        self._n = 0
+
+    def fechar(self, origem=None):
+        """
+        Grava o último shard, remove shards antigos excedentes e escreve o manifest.
+
+        Returns:
+            dict: Manifest gravado
+        """
+        self._gravar_shard()
+        atuais = {nome for shard in self._shards for nome in (shard['imagens'], shard['labels'])}
+        for antigo in self.output_dir.glob("shard_*.npy"):
+            if antigo.name not in atuais:
+                antigo.unlink()
+
+        manifest = {
+            'versao': 1,
+            'image_shape': list(self.image_shape),
+            'dtype': 'bits' if self.bitpack else 'uint8',
+            'pessoas': self.pessoas,
+            'shards': self._shards,
+            'total': sum(shard['n'] for shard in self._shards),
+            'origem': str(origem) if origem else None,
+            'criado_em': time.time()
+        }
+        temp = self.output_dir / f".{MANIFEST_NAME}.tmp"
+        with open(temp, "w") as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+        os.replace(temp, self.output_dir / MANIFEST_NAME)
+        return manifest
+
+
+class ShardedDataset:
+    """
+    Leitura de um dataset em shards.
+
+    Args:
+        shards_dir (str): Pasta com manifest.json e shards
+    """
+
+    def __init__(self, shards_dir=DEFAULT_SHARDS_DIR):
+        self.shards_dir = Path(shards_dir)
+        with open(self.shards_dir / MANIFEST_NAME) as f:
+            self.manifest = json.load(f)
+        self.pessoas = self.manifest['pessoas']
+        self.shards = self.manifest['shards']
+        self.image_shape = tuple(self.manifest['image_shape'])
+
+    def __len__(self):
+        return self.manifest['total']
+
+    def desatualizado(self, data_dir):
+        """
+        Indica se alguma pasta de pessoa em `data_dir` mudou depois da
+        criação dos shards (checa apenas o mtime das pastas, sem listar arquivos).
+        """
+        data_dir = Path(data_dir)
+        if not data_dir.exists():
+            return False
+        criado_em = self.manifest['criado_em']
+        return any(p.is_dir() and p.stat().st_mtime > criado_em for p in data_dir.iterdir())
+
+    def ler_shard(self, indice, mmap=False):
+        """
+        Lê um shard.
+
+        Returns:
+            tuple: (imagens uint8 (n, 155, 220, 1), labels int32 (n,))
+        """
+        shard = self.shards[indice]
+        modo = "r" if mmap else None
+        imagens = np.load(self.shards_dir / shard['imagens'], mmap_mode=modo)
+        if self.manifest['dtype'] == 'bits':
+            imagens = unpack_bits(imagens, self.image_shape)
+        labels = np.load(self.shards_dir / shard['labels'])
+        return imagens, labels
+
+    def carregar(self, dtype=np.float32):
+        """
+        Carrega o dataset inteiro, lendo os shards em sequência.
+
+        Args:
+            dtype: np.float32 devolve imagens em [0, 1] (como preprocess_image);
+                np.uint8 devolve os valores armazenados
+
+        Returns:
+            tuple: (imagens, nomes das pessoas por imagem)
+        """
+        imagens = np.empty((len(self),) + self.image_shape, dtype=dtype)
+        labels = np.empty(len(self), dtype=np.int32)
+        inicio = 0
+        for i in range(len(self.shards)):
+            shard_imagens, shard_labels = self.ler_shard(i)
+            fim = inicio + len(shard_labels)
+            if dtype == np.uint8:
+                imagens[inicio:fim] = shard_imagens
+            else:
+                np.divide(shard_imagens, 255.0, out=imagens[inicio:fim], dtype=dtype)
+            labels[inicio:fim] = shard_labels
+            inicio = fim
+        return imagens, np.array(self.pessoas)[labels]
+
+    def iterar(self, batch_size=256, embaralhar=False, seed=None, shards_buffer=4, dtype=np.float32):
+        """
+        Percorre o dataset em lotes sem carregá-lo inteiro na memória.
+        No modo embaralhado a ordem dos shards é sorteada e as imagens são
+        misturadas dentro de uma janela de `shards_buffer` shards.
+
+        Yields:
+            tuple: (imagens (b, 155, 220, 1), índices das pessoas (b,))
+        """
+        rng = np.random.default_rng(seed)
+        ordem = np.arange(len(self.shards))
+        if embaralhar:
+            rng.shuffle(ordem)
+        janela = shards_buffer if embaralhar else 1
+
+        for inicio in range(0, len(ordem), janela):
+            partes = [self.ler_shard(i) for i in ordem[inicio:inicio + janela]]
+            imagens = np.concatenate([p[0] for p in partes])
+            labels = np.concatenate([p[1] for p in partes])
+            indices = rng.permutation(len(labels)) if embaralhar else np.arange(len(labels))
+            for b in range(0, len(indices), batch_size):
+                selecao = indices[b:b + batch_size]
+                lote = imagens[selecao]
+                if dtype != np.uint8:
+                    lote = lote.astype(dtype) / 255.0
+                yield lote, labels[selecao]
+
+
+def empacotar_pasta(data_dir="dataset_processado", output_dir=DEFAULT_SHARDS_DIR,
+                    shard_size=SHARD_SIZE, workers=8, bitpack=False):
+    """
+    Converte um dataset em pastas (pessoa/*.png) para shards, aplicando o
+    mesmo preprocessamento usado pelo ModelTrainer ao ler os PNGs.
+
+    Args:
+        data_dir (str): Pasta com uma subpasta por pessoa
+        output_dir (str): Pasta dos shards
+        shard_size (int): Imagens por shard
+        workers (int): Threads de decodificação
+        bitpack (bool): Guarda 1 bit por pixel
+
+    Returns:
+        dict: Manifest gravado
+    """
+    data_dir = Path(data_dir)
+    arquivos = []
+    for pessoa_dir in sorted(p for p in data_dir.iterdir() if p.is_dir()):
+        arquivos.extend((path, pessoa_dir.name) for path in sorted(pessoa_dir.glob("*.png")))
+
+    writer = ShardWriter(output_dir, shard_size, bitpack=bitpack)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # map preserva a ordem; a decodificação das próximas imagens
+        # acontece enquanto o shard atual é preenchido
+        imagens = executor.map(lambda item: preprocess_image(str(item[0]), dtype=np.uint8), arquivos)
+        for (_, pessoa), img in zip(arquivos, imagens):
+            writer.adicionar(img, pessoa)
+    return writer.fechar(origem=data_dir)
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Módulo de quantização escalar de embeddings.
+Os embeddings de 128 dimensões em float32 ocupam 512 bytes por referência;
+em float16 ocupam 256 e em int8 128 (mais 8 bytes de escala e mínimo por
+dimensão para a galeria inteira). No int8 cada dimensão tem sua faixa,
+calibrada com embeddings de treino (percentis, para que poucos valores
+extremos não desperdicem os 256 níveis):
+
+    código = round((x - mínimo) / escala) - 128
+
+As distâncias são calculadas direto sobre os códigos, com a consulta em
+float no espaço dos códigos (y = (x - mínimo) / escala - 128):
+
+    d² = Σ escala² (y - q)² = Σ escala² y² - 2 Σ (escala² y) q + Σ escala² q²
+
+O último termo é guardado por linha, então a busca é um produto matriz-vetor
+sobre a matriz de códigos, que é 4x menor que a de floats. Opcionalmente as
+melhores linhas são reordenadas com a distância exata, lida do EmbeddingStore.
+
+Em NumPy a conversão de float16 para float32 é feita em software: float16
+economiza memória, mas a busca fica mais lenta que em float32; int8 economiza
+memória e tempo (ver scripts/avaliar_quantizacao.py).
+"""
+
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+from embedding_store import EPSILON, melhores_por_pessoa
+
+
+DEFAULT_QUANTIZATION_PATH = "modelos/quantizacao.json"
+MODOS = ("float32", "float16", "int8")
+
+
+class ScalarQuantizer:
+    """
+    Quantizador escalar por dimensão.
+
+    Args:
+        modo (str): 'float32' (sem quantização), 'float16' ou 'int8'
+        minimo (np.array, optional): Mínimo por dimensão (int8)
+        escala (np.array, optional): Passo por dimensão (int8)
+        modelo (str, optional): Impressão digital do modelo calibrado
+    """
+
+    def __init__(self, modo="int8", minimo=None, escala=None, modelo=None):
+        if modo not in MODOS:
+            raise ValueError(f"Modo de quantização inválido: {modo} (use {', '.join(MODOS)})")
+        if modo == "int8" and (minimo is None or escala is None):
+            raise ValueError("int8 exige mínimo e escala (ver ScalarQuantizer.calibrar)")
+        self.modo = modo
+        self.minimo = None if minimo is None else np.asarray(minimo, dtype=np.float32)
+        self.escala = None if escala is None else np.asarray(escala, dtype=np.float32)
+        self.modelo = modelo
+
+    @classmethod
+    def calibrar(cls, embeddings, modo="int8", percentil=99.9, modelo=None):
+        """
+        Calibra a faixa de cada dimensão com embeddings de treino.
+
+        Args:
+            embeddings (np.array): Embeddings (n, d) de treino
+            modo (str): Modo de quantização
+            percentil (float): Valores fora de [100 - p, p] são saturados
+            modelo (str, optional): Impressão digital do modelo
+
+        Returns:
+            ScalarQuantizer
+        """
+        if modo != "int8":
+            return cls(modo, modelo=modelo)
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        minimo = np.percentile(embeddings, 100 - percentil, axis=0)
+        maximo = np.percentile(embeddings, percentil, axis=0)
+        escala = np.maximum(maximo - minimo, 1e-6) / 255.0
+        return cls(modo, minimo, escala, modelo)
+
+    @property
+    def dtype(self):
+        return np.dtype({"float32": np.float32, "float16": np.float16, "int8": np.int8}[self.modo])
+
+    def bytes_por_vetor(self, dim):
+        return dim * self.dtype.itemsize
+
+    def quantizar(self, embeddings):
+        """Converte embeddings float para códigos."""
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if self.modo != "int8":
+            return embeddings.astype(self.dtype)
+        codigos = np.rint((embeddings - self.minimo) / self.escala) - 128
+        return np.clip(codigos, -128, 127).astype(np.int8)
+
+    def dequantizar(self, codigos):
+        """Reconstrói embeddings float aproximados."""
+        if self.modo != "int8":
+            return np.asarray(codigos, dtype=np.float32)
+        return (codigos.astype(np.float32) + 128) * self.escala + self.minimo
+
+    def normas(self, codigos, bloco=65536):
+        """Termo Σ escala² q² (ou Σ x² em float) de cada linha, guardado junto aos códigos."""
+        pesos = self.escala ** 2 if self.modo == "int8" else None
+        normas = np.empty(len(codigos), dtype=np.float32)
+        for inicio in range(0, len(codigos), bloco):
+            parte = np.asarray(codigos[inicio:inicio + bloco], dtype=np.float32)
+            quadrados = np.square(parte)
+            normas[inicio:inicio + len(parte)] = quadrados @ pesos if pesos is not None else quadrados.sum(axis=1)
+        return normas
+
+    def distancias(self, embedding, codigos, normas, bloco=2048):
+        """
+        Distâncias euclidianas aproximadas entre um embedding float e códigos.
+
+        Args:
+            embedding (np.array): Consulta (d,) em float
+            codigos (np.array): Códigos (n, d)
+            normas (np.array): Saída de `normas` para os códigos
+            bloco (int): Linhas convertidas por vez
+
+        Returns:
+            np.array: Distâncias (n,)
+        """
+        consulta = np.asarray(embedding, dtype=np.float32).ravel()
+        if self.modo == "int8":
+            y = (consulta - self.minimo) / self.escala - 128
+            pesos = (self.escala ** 2) * y
+            termo_consulta = float(np.dot(pesos, y))
+        else:
+            pesos = consulta
+            termo_consulta = float(np.dot(consulta, consulta))
+
+        produtos = np.empty(len(codigos), dtype=np.float32)
+        for inicio in range(0, len(codigos), bloco):
+            # Blocos pequenos: a cópia em float32 ainda está no cache L2 quando o sgemv a lê
+            parte = codigos[inicio:inicio + bloco]
+            produtos[inicio:inicio + len(parte)] = parte.astype(np.float32, copy=False) @ pesos
+        quadrados = termo_consulta - 2 * produtos + normas
+        return np.sqrt(np.maximum(quadrados, EPSILON))
+
+    def para_dict(self):
+        return {
+            'modo': self.modo,
+            'minimo': None if self.minimo is None else self.minimo.tolist(),
+            'escala': None if self.escala is None else self.escala.tolist(),
+            'modelo': self.modelo
+        }
+
+    def salvar(self, path=DEFAULT_QUANTIZATION_PATH):
+        """Grava a calibração (escrita atômica)."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp = path.with_suffix(".json.tmp")
+        with open(temp, "w") as f:
+            json.dump(self.para_dict(), f)
+        os.replace(temp, path)
+        return path
+
+    @classmethod
+    def carregar(cls, path=DEFAULT_QUANTIZATION_PATH):
+        with open(path) as f:
+            dados = json.load(f)
+        return cls(dados['modo'], dados.get('minimo'), dados.get('escala'), dados.get('modelo'))
+
+
+class QuantizedGallery:
+    """
+    Galeria quantizada alinhada às linhas de um EmbeddingStore.
+    A linha i dos códigos corresponde à linha i do store; linhas removidas
+    são filtradas na busca e acréscimos no store são quantizados em
+    `atualizar`, sem refazer o resto.
+
+    Args:
+        store: EmbeddingStore com os embeddings float
+        quantizador (ScalarQuantizer): Quantizador calibrado
+    """
+
+    def __init__(self, store, quantizador):
+        self.store = store
+        self.quantizador = quantizador
+        self._blocos = []
+        self._geracao = None
+        self.atualizar()
+
+    def __len__(self):
+        return sum(len(codigos) for codigos, _ in self._blocos)
+
+    @property
+    def bytes_codigos(self):
+        return sum(codigos.nbytes + normas.nbytes for codigos, normas in self._blocos)
+
+    def _quantizar_linhas(self, inicio, fim, bloco=65536):
+        partes = [self.quantizador.quantizar(self.store.vetores[i:min(i + bloco, fim)])
+                  for i in range(inicio, fim, bloco)]
+        codigos = np.concatenate(partes) if partes else np.zeros((0, self.store.dim), self.quantizador.dtype)
+        return codigos, self.quantizador.normas(codigos)
+
+    def atualizar(self):
+        """Acompanha o store: quantiza só as linhas acrescentadas (ou tudo após uma compactação)."""
+        self.store.atualizar()
+        if self.store.geracao != self._geracao:
+            self._blocos, self._geracao = [], self.store.geracao
+        total = len(self.store.registros)
+        if total > len(self):
+            self._blocos.append(self._quantizar_linhas(len(self), total))
+        return self
+
+    def distancias(self, embedding):
+        """Distâncias aproximadas a todas as linhas (inclusive removidas)."""
+        partes = [self.quantizador.distancias(embedding, codigos, normas) for codigos, normas in self._blocos]
+        return np.concatenate(partes) if partes else np.zeros(0, dtype=np.float32)
+
+    def buscar(self, embedding, k=5, rerank=None):
+        """
+        Identificação 1:N sobre os códigos.
+
+        Args:
+            embedding (np.array): Embedding float (d,) da assinatura
+            k (int): Número de pessoas
+            rerank (int, optional): Reordena as `rerank` linhas mais próximas
+                com a distância exata em float (lida do store mapeado)
+
+        Returns:
+            list: dicts com 'pessoa', 'amostra' e 'distancia', do mais próximo
+        """
+        linhas = self.store.ativas()
+        linhas = linhas[linhas < len(self)]
+        distancias = self.distancias(embedding)[linhas]
+        if rerank and len(linhas) > 0:
+            m = min(rerank, len(linhas))
+            melhores = np.argpartition(distancias, m - 1)[:m]
+            linhas, distancias = self.store.distancias(embedding, np.sort(linhas[melhores]))
+        return melhores_por_pessoa(self.store.registros, linhas, distancias, k)
+
+    def salvar(self, pasta):
+        """
+        Grava os códigos ao lado do store, para abrir com mmap na próxima vez.
+
+        Returns:
+            Path: Pasta gravada
+        """
+        pasta = Path(pasta)
+        pasta.mkdir(parents=True, exist_ok=True)
+        codigos = np.concatenate([c for c, _ in self._blocos]) if self._blocos else \
+            np.zeros((0, self.store.dim), self.quantizador.dtype)
+        normas = np.concatenate([n for _, n in self._blocos]) if self._blocos else np.zeros(0, np.float32)
+        for nome, dados in (("codigos.npy", codigos), ("normas.npy", normas)):
+            temp = pasta / f".{nome}.tmp"
+            with open(temp, "wb") as f:
+                np.save(f, dados)
+            os.replace(temp, pasta / nome)
+        meta = {'geracao': self._geracao, 'linhas': len(codigos), 'quantizador': self.quantizador.para_dict()}
+        temp = pasta / ".meta.json.tmp"
+        with open(temp, "w") as f:
+            json.dump(meta, f)
+        os.replace(temp, pasta / "meta.json")
+        return pasta
+
+    @classmethod
+    def carregar(cls, pasta, store):
+        """
+        Abre códigos gravados (mmap) e quantiza só o que o store ganhou
+        depois; se o store foi compactado, refaz a partir dele.
+        """
+        pasta = Path(pasta)
+        with open(pasta / "meta.json") as f:
+            meta = json.load(f)
+        q = meta['quantizador']
+        galeria = cls.__new__(cls)
+        galeria.store = store
+        galeria.quantizador = ScalarQuantizer(q['modo'], q['minimo'], q['escala'], q['modelo'])
+        galeria._blocos, galeria._geracao = [], None
+        store.atualizar()
+        if meta['geracao'] == store.geracao and meta['linhas'] <= len(store.registros):
+            galeria._geracao = meta['geracao']
+            galeria._blocos = [(np.load(pasta / "codigos.npy", mmap_mode="r"),
+                                np.load(pasta / "normas.npy", mmap_mode="r"))]
+        return galeria.atualizar()
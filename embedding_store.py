@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+Módulo de armazenamento de embeddings em disco, só de acréscimo.
+Os vetores ficam numa matriz float32 de largura fixa, gravada em sequência
+num arquivo binário e lida com np.memmap: vários processos (workers do
+Streamlit, jobs em lote) compartilham as mesmas páginas pelo page cache, sem
+cópia no heap de cada um, e abrir a galeria não depende do tamanho dela.
+
+Um índice JSONL registra, para cada linha da matriz, a pessoa e a amostra;
+remoções são lápides (linhas marcadas como mortas) no mesmo índice. Leitores
+acompanham o fim do índice (`atualizar`) e passam a ver novas linhas sem
+recarregar nada. `compactar` reescreve só as linhas vivas numa nova geração
+de arquivos e troca o meta.json de forma atômica.
+
+Estrutura:
+    galeria/store/
+        meta.json               {"dim": 128, "dtype": "float32", "geracao": 3}
+        vetores_0003.f32        (n, dim) float32, linha i = entrada i do índice
+        indice_0003.jsonl       {"linha": i, "pessoa": ..., "amostra": ..., ...}
+                                {"remover": [i, j]}
+"""
+
+import json
+import os
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos (um escritor por vez)
+    fcntl = None
+
+
+META_NAME = "meta.json"
+DTYPE = np.float32
+
+# Mesmo epsilon de model.embedding_distance (K.epsilon()), sem importar o TensorFlow
+EPSILON = 1e-7
+
+
+def melhores_por_pessoa(registros, linhas, distancias, k):
+    """
+    As k pessoas mais próximas a partir das distâncias por linha do store.
+
+    Args:
+        registros (list): Registros do índice do store
+        linhas (np.array): Linhas avaliadas
+        distancias (np.array): Distância de cada linha
+        k (int): Número de pessoas
+
+    Returns:
+        list: dicts com 'pessoa', 'amostra' e 'distancia', do mais próximo
+    """
+    # Ordena só as linhas mais próximas; amplia se elas cobrirem menos de k pessoas
+    m = min(len(distancias), max(8 * k, 64))
+    while True:
+        if m < len(distancias):
+            ordem = np.argpartition(distancias, m - 1)[:m]
+            ordem = ordem[np.argsort(distancias[ordem], kind="stable")]
+        else:
+            ordem = np.argsort(distancias, kind="stable")
+        resultados, vistas = [], set()
+        for i in ordem:
+            registro = registros[linhas[i]]
+            if registro['pessoa'] in vistas:
+                continue
+            vistas.add(registro['pessoa'])
+            resultados.append({'pessoa': registro['pessoa'], 'amostra': registro['amostra'],
+                               'distancia': float(distancias[i])})
+            if len(resultados) == k:
+                return resultados
+        if m >= len(distancias):
+            return resultados
+        m *= 4
+
+
+class EmbeddingStore:
+    """
+    Galeria de embeddings mapeada em memória.
+
+    Args:
+        pasta (str): Pasta do store
+        dim (int, optional): Dimensão dos embeddings (só para criar um store
+            novo; sem ela o store é criado no primeiro `adicionar`)
+    """
+
+    def __init__(self, pasta, dim=None):
+        self.pasta = Path(pasta)
+        self.dim = dim
+        self.geracao = None
+        self._limpar_estado()
+        if (self.pasta / META_NAME).exists():
+            self.atualizar()
+        elif dim:
+            with self._trava():
+                pass
+
+    def _limpar_estado(self):
+        self.registros = []
+        self._mortas = set()
+        self._linhas_pessoa = {}
+        self._offset_indice = 0
+        self._vetores = np.zeros((0, self.dim or 0), dtype=DTYPE)
+        self._cache_ativas = None
+
+    def _arquivo(self, tipo, geracao=None):
+        geracao = self.geracao if geracao is None else geracao
+        extensao = "f32" if tipo == "vetores" else "jsonl"
+        return self.pasta / f"{tipo}_{geracao:04d}.{extensao}"
+
+    def _ler_meta(self):
+        with open(self.pasta / META_NAME) as f:
+            return json.load(f)
+
+    def _gravar_meta(self, geracao):
+        temp = self.pasta / f".{META_NAME}.tmp"
+        with open(temp, "w") as f:
+            json.dump({'dim': self.dim, 'dtype': np.dtype(DTYPE).name, 'geracao': geracao}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp, self.pasta / META_NAME)
+
+    # ------------------------------------------------------------------
+    # Leitura
+    # ------------------------------------------------------------------
+
+    def atualizar(self):
+        """
+        Aplica as entradas do índice gravadas desde a última leitura e
+        remapeia a matriz se ela cresceu (custo proporcional ao que mudou).
+
+        Returns:
+            int: Linhas novas
+        """
+        if not (self.pasta / META_NAME).exists():
+            return 0
+        meta = self._ler_meta()
+        if meta['geracao'] != self.geracao:
+            # Store compactado por outro processo: reabre a nova geração
+            self.geracao, self.dim = meta['geracao'], meta['dim']
+            self._limpar_estado()
+
+        with open(self._arquivo("indice"), "rb") as f:
+            f.seek(self._offset_indice)
+            dados = f.read()
+        fim = dados.rfind(b"\n") + 1  # uma linha incompleta ainda está sendo escrita
+        if fim == 0:
+            return 0
+
+        antes = len(self.registros)
+        for linha in dados[:fim].splitlines():
+            entrada = json.loads(linha)
+            if 'remover' in entrada:
+                for i in entrada['remover']:
+                    if i < len(self.registros) and i not in self._mortas:
+                        self._mortas.add(i)
+                        self._linhas_pessoa[self.registros[i]['pessoa']].remove(i)
+            else:
+                self._linhas_pessoa.setdefault(entrada['pessoa'], []).append(len(self.registros))
+                self.registros.append(entrada)
+        self._offset_indice += fim
+        self._cache_ativas = None
+
+        novas = len(self.registros) - antes
+        if novas:
+            # Os vetores são gravados antes do índice: as n linhas indexadas já existem
+            self._vetores = np.memmap(self._arquivo("vetores"), dtype=DTYPE, mode="r",
+                                      shape=(len(self.registros), self.dim))
+        return novas
+
+    def __len__(self):
+        return len(self.registros) - len(self._mortas)
+
+    @property
+    def vetores(self):
+        """Matriz mapeada com todas as linhas (inclusive mortas)."""
+        return self._vetores
+
+    @property
+    def pessoas(self):
+        """Pessoas com pelo menos uma amostra viva."""
+        return sorted(p for p, linhas in self._linhas_pessoa.items() if linhas)
+
+    def ativas(self):
+        """Índices das linhas vivas."""
+        if self._cache_ativas is None:
+            vivas = np.ones(len(self.registros), dtype=bool)
+            vivas[list(self._mortas)] = False
+            self._cache_ativas = np.flatnonzero(vivas)
+        return self._cache_ativas
+
+    def linhas_pessoa(self, pessoa):
+        """Linhas vivas de uma pessoa."""
+        return list(self._linhas_pessoa.get(pessoa, []))
+
+    def amostras_pessoa(self, pessoa):
+        """
+        Amostras vivas de uma pessoa.
+
+        Returns:
+            tuple: (registros do índice, embeddings (n, dim))
+        """
+        linhas = self.linhas_pessoa(pessoa)
+        return [self.registros[i] for i in linhas], np.asarray(self._vetores[linhas])
+
+    def distancias(self, embedding, linhas=None, bloco=65536):
+        """
+        Distância euclidiana de um embedding a linhas do store, percorrendo a
+        matriz mapeada em blocos contíguos (mesma regra de epsilon de
+        model.embedding_distance).
+
+        Args:
+            embedding (np.array): Embedding (dim,)
+            linhas (array, optional): Linhas (padrão: todas as vivas)
+            bloco (int): Linhas por bloco
+
+        Returns:
+            tuple: (linhas, distâncias)
+        """
+        linhas = self.ativas() if linhas is None else np.asarray(linhas, dtype=np.int64)
+        consulta = np.asarray(embedding, dtype=DTYPE).reshape(1, -1)
+        distancias = np.empty(len(linhas), dtype=DTYPE)
+        for inicio in range(0, len(linhas), bloco):
+            selecao = linhas[inicio:inicio + bloco]
+            if len(selecao) and selecao[-1] - selecao[0] + 1 == len(selecao):
+                vetores = self._vetores[selecao[0]:selecao[-1] + 1]  # fatia sem cópia
+            else:
+                vetores = self._vetores[selecao]
+            diferenca = vetores - consulta
+            distancias[inicio:inicio + len(selecao)] = np.einsum('ij,ij->i', diferenca, diferenca)
+        return linhas, np.sqrt(np.maximum(distancias, EPSILON))
+
+    def buscar(self, embedding, k=5, pessoas=None):
+        """
+        Identificação 1:N: as k pessoas com a amostra mais próxima.
+
+        Args:
+            embedding (np.array): Embedding (dim,) da assinatura
+            k (int): Número de pessoas
+            pessoas (list, optional): Restringe a busca a essas pessoas
+
+        Returns:
+            list: dicts com 'pessoa', 'amostra' e 'distancia', do mais próximo
+        """
+        linhas = None
+        if pessoas is not None:
+            linhas = np.array(sorted(i for p in pessoas for i in self._linhas_pessoa.get(p, [])), dtype=np.int64)
+        linhas, distancias = self.distancias(embedding, linhas)
+        return melhores_por_pessoa(self.registros, linhas, distancias, k)
+
+    # ------------------------------------------------------------------
+    # Escrita
+    # ------------------------------------------------------------------
+
+    @contextmanager
+    def _trava(self):
+        """Exclusão mútua entre escritores; cria o store se ainda não existe."""
+        self.pasta.mkdir(parents=True, exist_ok=True)
+        with open(self.pasta / ".trava", "a+") as trava:
+            if fcntl is not None:
+                fcntl.flock(trava, fcntl.LOCK_EX)
+            try:
+                if not (self.pasta / META_NAME).exists():
+                    if not self.dim:
+                        raise ValueError("Dimensão dos embeddings não definida")
+                    self._arquivo("vetores", 1).touch()
+                    self._arquivo("indice", 1).touch()
+                    self._gravar_meta(1)
+                self.atualizar()
+                # Escritor anterior interrompido no meio de uma linha do índice
+                indice = self._arquivo("indice")
+                if indice.stat().st_size > self._offset_indice:
+                    with open(indice, "r+b") as f:
+                        f.truncate(self._offset_indice)
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(trava, fcntl.LOCK_UN)
+
+    def _anexar_indice(self, entradas):
+        with open(self._arquivo("indice"), "ab") as f:
+            f.write("".join(json.dumps(e, ensure_ascii=False) + "\n" for e in entradas).encode())
+            f.flush()
+            os.fsync(f.fileno())
+
+    def adicionar(self, pessoa, amostras, embeddings, mtimes=None, modelo=""):
+        """
+        Acrescenta amostras de uma pessoa.
+
+        Args:
+            pessoa (str): Nome da pessoa
+            amostras (list): Nome de cada amostra
+            embeddings (np.array): Embeddings (n, dim)
+            mtimes (list, optional): mtime do arquivo de cada amostra
+            modelo (str): Impressão digital do modelo que gerou os embeddings
+
+        Returns:
+            list: Linhas gravadas
+        """
+        embeddings = np.ascontiguousarray(embeddings, dtype=DTYPE)
+        if self.dim is None:
+            self.dim = embeddings.shape[-1]
+        if embeddings.shape[-1] != self.dim:
+            raise ValueError(f"Embeddings de dimensão {embeddings.shape[-1]}; o store usa {self.dim}")
+        embeddings = embeddings.reshape(-1, self.dim)
+        if len(amostras) != len(embeddings):
+            raise ValueError("Número de amostras e de embeddings diferente")
+        mtimes = mtimes if mtimes is not None else [None] * len(amostras)
+
+        with self._trava():
+            inicio = len(self.registros)
+            with open(self._arquivo("vetores"), "r+b") as f:
+                # Sobrescreve bytes de uma gravação interrompida (vetor sem entrada no índice)
+                f.seek(inicio * self.dim * np.dtype(DTYPE).itemsize)
+                f.write(embeddings.tobytes())
+                f.truncate()
+                f.flush()
+                os.fsync(f.fileno())
+            self._anexar_indice([
+                {'linha': inicio + i, 'pessoa': pessoa, 'amostra': str(amostra),
+                 'mtime': None if mtime is None else float(mtime), 'modelo': modelo}
+                for i, (amostra, mtime) in enumerate(zip(amostras, mtimes))
+            ])
+            self.atualizar()
+        return list(range(inicio, inicio + len(amostras)))
+
+    def remover(self, linhas):
+        """Marca linhas como removidas (lápide no índice)."""
+        linhas = [int(i) for i in linhas]
+        if not linhas:
+            return
+        with self._trava():
+            self._anexar_indice([{'remover': linhas}])
+            self.atualizar()
+
+    def remover_pessoa(self, pessoa):
+        """Marca todas as amostras de uma pessoa como removidas."""
+        self.remover(self.linhas_pessoa(pessoa))
+
+    def substituir_pessoa(self, pessoa, amostras, embeddings, mtimes=None, modelo=""):
+        """Remove as amostras atuais da pessoa e grava as novas."""
+        self.remover_pessoa(pessoa)
+        if len(amostras):
+            self.adicionar(pessoa, amostras, embeddings, mtimes, modelo)
+
+    def compactar(self, bloco=65536):
+        """
+        Reescreve só as linhas vivas numa nova geração de arquivos.
+        Leitores que ainda mapeiam a geração anterior continuam válidos até
+        chamarem `atualizar` (em POSIX o arquivo removido segue acessível).
+
+        Returns:
+            dict: Linhas antes e depois e bytes liberados
+        """
+        with self._trava():
+            antiga = self.geracao
+            ativas = self.ativas()
+            nova = antiga + 1
+            tamanho_antes = self._arquivo("vetores").stat().st_size
+
+            with open(self._arquivo("vetores", nova), "wb") as f:
+                for inicio in range(0, len(ativas), bloco):
+                    f.write(np.ascontiguousarray(self._vetores[ativas[inicio:inicio + bloco]]).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            with open(self._arquivo("indice", nova), "wb") as f:
+                for j, i in enumerate(ativas):
+                    f.write((json.dumps(dict(self.registros[i], linha=j), ensure_ascii=False) + "\n").encode())
+                f.flush()
+                os.fsync(f.fileno())
+
+            self._gravar_meta(nova)
+            linhas_antes = len(self.registros)
+            self.atualizar()
+            for tipo in ("vetores", "indice"):
+                try:
+                    self._arquivo(tipo, antiga).unlink()
+                except OSError:
+                    pass  # Windows: ainda mapeado por um leitor
+
+        return {
+            'linhas_antes': linhas_antes,
+            'linhas_depois': len(self.registros),
+            'bytes_liberados': tamanho_antes - len(self.registros) * self.dim * np.dtype(DTYPE).itemsize
+        }
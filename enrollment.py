@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+"""
+Módulo de cadastro incremental de assinaturas.
+Mantém os embeddings de cada pessoa registrada e um template compacto
+(centroide, dispersão e subconjunto de medoides), atualizados a cada
+inclusão ou remoção, sem reprocessar a pasta inteira.
+
+Estrutura em disco:
+
+    assinaturas_reais/<pessoa>/<amostra>.png   # imagens (fonte da verdade)
+    galeria/<pessoa>.npz                       # embeddings + template da pessoa
+    galeria/store/                             # opcional: espelho mapeado em memória
+                                               # (embedding_store.EmbeddingStore)
+"""
+
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+from data_preprocessing import preprocess_image
+from embedding_store import EmbeddingStore
+from model import compute_embeddings, embedding_distance
+
+
+IMAGE_PATTERNS = ("*.png", "*.jpg")
+
+
+def compute_template(embeddings, n_medoids=3):
+    """
+    Calcula o template compacto de uma pessoa.
+
+    O primeiro medoide é a amostra mais central; os seguintes são escolhidos
+    pelo critério do ponto mais distante, para cobrir a variação da pessoa.
+
+    Args:
+        embeddings (np.array): Embeddings (n, d) da pessoa
+        n_medoids (int): Tamanho máximo do subconjunto de medoides
+
+    Returns:
+        dict: centroide, dispersao (média e desvio da distância ao centroide)
+            e índices dos medoides
+    """
+    centroid = embeddings.mean(axis=0)
+    to_centroid = embedding_distance(embeddings, centroid)
+
+    pairwise = embedding_distance(embeddings[:, None, :], embeddings[None, :, :])
+    medoids = [int(np.argmin(pairwise.sum(axis=1)))]
+    while len(medoids) < min(n_medoids, len(embeddings)):
+        nearest = pairwise[:, medoids].min(axis=1)
+        nearest[medoids] = -1
+        medoids.append(int(np.argmax(nearest)))
+
+    return {
+        'centroide': centroid.astype(np.float32),
+        'dispersao': np.array([to_centroid.mean(), to_centroid.std()], dtype=np.float32),
+        'medoides': np.array(medoids, dtype=np.int32)
+    }
+
+
+class SignatureEnrollment:
+    """
+    Cadastro de pessoas e amostras com atualização incremental da galeria.
+
+    Args:
+        embedding_model: Rede base para gerar embeddings (pode ser None para
+            operações que não calculam embeddings, como a checagem de consistência)
+        signatures_dir (str): Pasta com as imagens por pessoa
+        gallery_dir (str): Pasta com os embeddings e templates por pessoa
+        n_medoids (int): Medoides mantidos por pessoa
+        model_fingerprint (str, optional): Impressão digital do modelo que gera
+            os embeddings; amostras calculadas com outro modelo ficam desatualizadas
+        store_dir (str, optional): Store mapeado em memória que espelha as
+            amostras da galeria a cada alteração (lido por outros processos)
+    """
+
+    def __init__(self, embedding_model=None, signatures_dir="assinaturas_reais",
+                 gallery_dir="galeria", n_medoids=3, model_fingerprint=None, store_dir=None):
+        self.embedding_model = embedding_model
+        self.model_fingerprint = model_fingerprint
+        self.signatures_dir = Path(signatures_dir)
+        self.gallery_dir = Path(gallery_dir)
+        self.n_medoids = n_medoids
+        self.pessoas = {}
+        self._templates = None
+        self.store = EmbeddingStore(store_dir) if store_dir else None
+
+    # ------------------------------------------------------------------
+    # Persistência
+    # ------------------------------------------------------------------
+
+    def carregar(self):
+        """Carrega os embeddings e templates de todas as pessoas da galeria."""
+        self.pessoas = {}
+        if self.gallery_dir.exists():
+            for path in sorted(self.gallery_dir.glob("*.npz")):
+                if path.name.startswith('.'):
+                    continue
+                with np.load(path, allow_pickle=False) as data:
+                    self.pessoas[path.stem] = {key: data[key] for key in data.files}
+        self._templates = None
+        return self
+
+    def _salvar_pessoa(self, pessoa):
+        """Grava a galeria de uma pessoa (escrita atômica)."""
+        self.gallery_dir.mkdir(parents=True, exist_ok=True)
+        final = self.gallery_dir / f"{pessoa}.npz"
+        temp = self.gallery_dir / f".{pessoa}.tmp.npz"
+        np.savez(temp, **self.pessoas[pessoa])
+        temp.replace(final)
+        self._templates = None
+
+    def _atualizar_pessoa(self, pessoa, amostras, embeddings, mtimes):
+        """Recalcula o template e salva (ou remove, se ficou sem amostras)."""
+        if len(amostras) == 0:
+            self.pessoas.pop(pessoa, None)
+            (self.gallery_dir / f"{pessoa}.npz").unlink(missing_ok=True)
+            self._templates = None
+            self._espelhar_store(pessoa)
+            return
+
+        template = compute_template(embeddings, self.n_medoids)
+        self.pessoas[pessoa] = {
+            'amostras': np.array(amostras),
+            'embeddings': embeddings.astype(np.float32),
+            'mtimes': np.array(mtimes, dtype=np.float64),
+            'modelo': np.array(self.model_fingerprint or ''),
+            **template
+        }
+        self._salvar_pessoa(pessoa)
+        self._espelhar_store(pessoa)
+
+    def _espelhar_store(self, pessoa):
+        """Leva ao store só as amostras da pessoa que mudaram (lápides + acréscimos)."""
+        if self.store is None:
+            return
+        dados = self.pessoas.get(pessoa)
+        novas = {}
+        if dados is not None:
+            novas = {str(amostra): j for j, amostra in enumerate(dados['amostras'])}
+            modelo = str(dados.get('modelo', ''))
+
+        remover, mantidas = [], set()
+        for linha in self.store.linhas_pessoa(pessoa):
+            registro = self.store.registros[linha]
+            j = novas.get(registro['amostra'])
+            if j is None or registro['mtime'] != float(dados['mtimes'][j]) or registro['modelo'] != modelo:
+                remover.append(linha)
+            else:
+                mantidas.add(registro['amostra'])
+        self.store.remover(remover)
+
+        incluir = [j for amostra, j in novas.items() if amostra not in mantidas]
+        if incluir:
+            self.store.adicionar(pessoa, [str(dados['amostras'][j]) for j in incluir], dados['embeddings'][incluir],
+                                 mtimes=[float(dados['mtimes'][j]) for j in incluir], modelo=modelo)
+
+    def sincronizar_store(self):
+        """
+        Espelha a galeria inteira no store (ex.: store novo ou apagado).
+
+        Returns:
+            int: Pessoas verificadas
+        """
+        if self.store is None:
+            raise RuntimeError("Store não configurado")
+        pessoas = sorted(set(self.pessoas) | set(self.store.pessoas))
+        for pessoa in pessoas:
+            self._espelhar_store(pessoa)
+        return len(pessoas)
+
+    def _embeddings(self, paths):
+        """Preprocessa as imagens e calcula seus embeddings em um único lote."""
+        if self.embedding_model is None:
+            raise RuntimeError("Modelo de embeddings não carregado")
+        images = np.stack([preprocess_image(str(p), dtype=np.uint8) for p in paths])
+        return compute_embeddings(self.embedding_model, images)
+
+    # ------------------------------------------------------------------
+    # API de cadastro
+    # ------------------------------------------------------------------
+
+    def adicionar_pessoa(self, pessoa, image_paths):
+        """
+        Cadastra uma nova pessoa copiando as imagens para a pasta de assinaturas.
+
+        Args:
+            pessoa (str): Nome da pessoa (nome da pasta)
+            image_paths (list): Imagens de assinatura
+        """
+        if pessoa in self.pessoas or (self.signatures_dir / pessoa).exists():
+            raise ValueError(f"Pessoa já cadastrada: {pessoa}")
+        (self.signatures_dir / pessoa).mkdir(parents=True)
+        self.adicionar_amostras(pessoa, image_paths)
+
+    def adicionar_amostras(self, pessoa, image_paths):
+        """Adiciona amostras a uma pessoa, calculando só os novos embeddings."""
+        pasta = self.signatures_dir / pessoa
+        if not pasta.exists():
+            raise ValueError(f"Pessoa não cadastrada: {pessoa}")
+
+        destinos = []
+        for image_path in image_paths:
+            image_path = Path(image_path)
+            destino = pasta / image_path.name
+            if destino.exists() and destino.resolve() != image_path.resolve():
+                raise ValueError(f"Amostra já existe: {destino}")
+            if destino.resolve() != image_path.resolve():
+                shutil.copy2(image_path, destino)
+            destinos.append(destino)
+
+        self._incluir_embeddings(pessoa, destinos)
+
+    def adicionar_amostra(self, pessoa, image_path):
+        """Adiciona uma amostra a uma pessoa já cadastrada."""
+        self.adicionar_amostras(pessoa, [image_path])
+
+    def remover_amostra(self, pessoa, nome_amostra):
+        """Remove uma amostra (arquivo e embedding) de uma pessoa."""
+        (self.signatures_dir / pessoa / nome_amostra).unlink(missing_ok=True)
+        self._excluir_embeddings(pessoa, {nome_amostra})
+
+    def remover_pessoa(self, pessoa):
+        """Remove a pessoa da galeria e sua pasta de assinaturas."""
+        pasta = self.signatures_dir / pessoa
+        if pasta.exists():
+            shutil.rmtree(pasta)
+        self._atualizar_pessoa(pessoa, [], None, [])
+
+    def _incluir_embeddings(self, pessoa, paths):
+        """Acrescenta (ou substitui) embeddings das amostras informadas."""
+        atual = self.pessoas.get(pessoa)
+        if pessoa in self.desatualizadas():
+            # Embeddings de outro modelo não podem ser misturados: refaz a pessoa
+            atual = None
+            paths = list(self._arquivos_pasta().get(pessoa, {}).values())
+        nomes_novos = {p.name for p in paths}
+        if atual is not None:
+            manter = [i for i, nome in enumerate(atual['amostras']) if nome not in nomes_novos]
+            amostras = [str(atual['amostras'][i]) for i in manter]
+            embeddings = atual['embeddings'][manter]
+            mtimes = list(atual['mtimes'][manter])
+        else:
+            amostras, embeddings, mtimes = [], np.zeros((0, 0), dtype=np.float32), []
+
+        novos = self._embeddings(paths)
+        if embeddings.size == 0:
+            embeddings = novos
+        else:
+            embeddings = np.concatenate([embeddings, novos])
+        amostras += [p.name for p in paths]
+        mtimes += [p.stat().st_mtime for p in paths]
+
+        self._atualizar_pessoa(pessoa, amostras, embeddings, mtimes)
+
+    def _excluir_embeddings(self, pessoa, nomes):
+        """Remove embeddings das amostras informadas."""
+        atual = self.pessoas.get(pessoa)
+        if atual is None:
+            return
+        manter = [i for i, nome in enumerate(atual['amostras']) if nome not in nomes]
+        self._atualizar_pessoa(
+            pessoa,
+            [str(atual['amostras'][i]) for i in manter],
+            atual['embeddings'][manter],
+            list(atual['mtimes'][manter])
+        )
+
+    # ------------------------------------------------------------------
+    # Consistência com a pasta
+    # ------------------------------------------------------------------
+
+    def desatualizadas(self):
+        """Pessoas cujos embeddings foram calculados com outro modelo."""
+        if not self.model_fingerprint:
+            return []
+        return sorted(
+            pessoa for pessoa, dados in self.pessoas.items()
+            if str(dados.get('modelo', '')) != self.model_fingerprint
+        )
+
+    def _arquivos_pasta(self):
+        """Lista as imagens de cada pessoa na pasta de assinaturas."""
+        arquivos = {}
+        if not self.signatures_dir.exists():
+            return arquivos
+        for pessoa_dir in self.signatures_dir.iterdir():
+            if not pessoa_dir.is_dir():
+                continue
+            paths = []
+            for pattern in IMAGE_PATTERNS:
+                paths.extend(pessoa_dir.glob(pattern))
+            if paths:
+                arquivos[pessoa_dir.name] = {p.name: p for p in sorted(paths)}
+        return arquivos
+
+    def verificar_consistencia(self):
+        """
+        Compara a galeria com a pasta de assinaturas.
+
+        Returns:
+            dict: pessoa -> {'faltando': [...], 'orfas': [...], 'alteradas': [...]}
+                apenas para pessoas com divergências
+        """
+        divergencias = {}
+        arquivos = self._arquivos_pasta()
+        desatualizadas = set(self.desatualizadas())
+
+        for pessoa in sorted(set(arquivos) | set(self.pessoas)):
+            na_pasta = arquivos.get(pessoa, {})
+            galeria = self.pessoas.get(pessoa)
+            na_galeria = {}
+            if galeria is not None:
+                na_galeria = dict(zip((str(a) for a in galeria['amostras']), galeria['mtimes']))
+
+            faltando = sorted(set(na_pasta) - set(na_galeria))
+            orfas = sorted(set(na_galeria) - set(na_pasta))
+            alteradas = sorted(
+                nome for nome in set(na_pasta) & set(na_galeria)
+                if pessoa in desatualizadas or na_pasta[nome].stat().st_mtime != na_galeria[nome]
+            )
+
+            if faltando or orfas or alteradas:
+                divergencias[pessoa] = {
+                    'faltando': faltando,
+                    'orfas': orfas,
+                    'alteradas': alteradas
+                }
+
+        return divergencias
+
+    def sincronizar(self):
+        """
+        Aplica na galeria apenas as diferenças encontradas na pasta.
+
+        Returns:
+            dict: Divergências corrigidas (mesmo formato de verificar_consistencia)
+        """
+        divergencias = self.verificar_consistencia()
+        arquivos = self._arquivos_pasta()
+
+        for pessoa, diff in divergencias.items():
+            if diff['orfas']:
+                self._excluir_embeddings(pessoa, set(diff['orfas']))
+            atualizar = diff['faltando'] + diff['alteradas']
+            if atualizar:
+                self._incluir_embeddings(pessoa, [arquivos[pessoa][nome] for nome in atualizar])
+
+        return divergencias
+
+    # ------------------------------------------------------------------
+    # Verificação contra templates
+    # ------------------------------------------------------------------
+
+    def _matriz_templates(self):
+        """Empilha centroides e medoides para comparação vetorizada."""
+        if self._templates is None:
+            desatualizadas = set(self.desatualizadas())
+            nomes = [p for p in self.pessoas if p not in desatualizadas]
+            centroides = np.stack([self.pessoas[p]['centroide'] for p in nomes]) if nomes else None
+            medoides, donos, arquivos = [], [], []
+            for i, pessoa in enumerate(nomes):
+                dados = self.pessoas[pessoa]
+                for idx in dados['medoides']:
+                    medoides.append(dados['embeddings'][idx])
+                    donos.append(i)
+                    arquivos.append(str(dados['amostras'][idx]))
+            self._templates = {
+                'pessoas': nomes,
+                'centroides': centroides,
+                'medoides': np.stack(medoides) if medoides else None,
+                'donos': np.array(donos, dtype=np.int32),
+                'arquivos': arquivos
+            }
+        return self._templates
+
+    def comparar(self, embedding, pessoas=None):
+        """
+        Compara um embedding com os templates de cada pessoa.
+
+        O custo é proporcional ao número de pessoas (centroide + poucos
+        medoides), não ao número total de amostras. Pessoas com embeddings de
+        outro modelo são ignoradas até a galeria ser sincronizada.
+
+        Args:
+            embedding (np.array): Embedding (d,) da assinatura a verificar
+            pessoas (list, optional): Restringe a comparação a essas pessoas
+
+        Returns:
+            list: Um dict por pessoa com distâncias ao centroide e aos medoides
+        """
+        templates = self._matriz_templates()
+        if not templates['pessoas']:
+            return []
+
+        dist_centroides = embedding_distance(templates['centroides'], embedding)
+        dist_medoides = embedding_distance(templates['medoides'], embedding)
+
+        selecionadas = set(pessoas) if pessoas is not None else None
+        resultados = []
+        for i, pessoa in enumerate(templates['pessoas']):
+            if selecionadas is not None and pessoa not in selecionadas:
+                continue
+            mascara = templates['donos'] == i
+            dados = self.pessoas[pessoa]
+            resultados.append({
+                'pessoa': pessoa,
+                'distancia_centroide': float(dist_centroides[i]),
+                'dispersao': float(dados['dispersao'][0]),
+                'medoides': [
+                    {'arquivo': arquivo, 'distancia': float(d)}
+                    for arquivo, d in zip(np.array(templates['arquivos'])[mascara], dist_medoides[mascara])
+                ],
+                'total_amostras': len(dados['amostras'])
+            })
+        return resultados
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+Módulo de busca de hiperparâmetros em paralelo.
+O dataset preprocessado é gravado uma única vez num .npy uint8 que os trials
+abrem com `mmap_mode='r'`: os processos compartilham o cache de páginas do
+sistema operacional em vez de cada um carregar sua cópia. Os pares de treino
+e validação (índices) também são sorteados uma vez, então todos os trials
+veem exatamente os mesmos dados.
+
+Cada trial roda num processo separado com limite de threads do TensorFlow e
+devolve perda de validação, F1 no melhor threshold, tamanho do modelo e
+latência de inferência da rede base. Trials são comparados pelo F1 no
+melhor threshold: a perda de validação depende da margem de cada trial e
+não serve para comparar margens diferentes.
+
+Estrutura da pasta de saída:
+    busca/
+        dados/imagens.npy, labels.npy, pares.npz
+        trials/trial_000/modelo.h5
+        leaderboard.json, leaderboard.csv
+"""
+
+import csv
+import itertools
+import json
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from dataset_shards import IMAGE_SHAPE, ShardedDataset, has_manifest
+
+
+ESPACO_PADRAO = {
+    'learning_rate': [0.0003, 0.001, 0.003],
+    'margin': [0.5, 1.0, 2.0],
+    'batch_size': [16, 32],
+    'filtros': [[32, 64, 128, 256], [16, 32, 64, 128]],
+    'densas': [[512, 256], [256]],
+    'dropout': [0.0, 0.2]
+}
+
+# Valores de ModelTrainer.treinar para o que o espaço de busca não define
+CONFIG_PADRAO = {'learning_rate': 0.001, 'margin': 1.0, 'batch_size': 16}
+
+ARQUITETURA = ('filtros', 'densas', 'embedding_dim', 'dropout')
+
+
+def gerar_grade(espaco):
+    """Todas as combinações do espaço de busca."""
+    chaves = sorted(espaco)
+    return [dict(zip(chaves, valores)) for valores in itertools.product(*(espaco[c] for c in chaves))]
+
+
+def gerar_aleatorio(espaco, n_trials, seed=42):
+    """`n_trials` combinações distintas sorteadas do espaço (no máximo a grade inteira)."""
+    grade = gerar_grade(espaco)
+    rng = np.random.default_rng(seed)
+    return [grade[i] for i in rng.permutation(len(grade))[:n_trials]]
+
+
+def criar_pares_indices(labels, rng):
+    """
+    Pares (índice_a, índice_b, label) com um positivo e um negativo por
+    imagem, a mesma regra de ModelTrainer.criar_pares, mas só com índices.
+    """
+    pessoas = np.unique(labels)
+    por_pessoa = {p: np.where(labels == p)[0] for p in pessoas}
+    pares = []
+    for idx, pessoa in enumerate(labels):
+        mesmas = por_pessoa[pessoa][por_pessoa[pessoa] != idx]
+        if len(mesmas):
+            pares.append((idx, rng.choice(mesmas), 0))
+        if len(pessoas) > 1:
+            outra = rng.choice(pessoas[pessoas != pessoa])
+            pares.append((idx, rng.choice(por_pessoa[outra]), 1))
+    pares = np.array(pares, dtype=np.int64).reshape(-1, 3)
+    return pares[:, 0], pares[:, 1], pares[:, 2].astype(np.float32)
+
+
+def preparar_dados_compartilhados(pasta, data_dir="dataset_processado", shards_dir=None,
+                                  fracao_validacao=0.2, seed=42):
+    """
+    Grava imagens, labels e pares sorteados na pasta da busca.
+    Com shards, as imagens são copiadas shard a shard direto para o .npy
+    mapeado, sem montar o dataset inteiro em memória.
+
+    Returns:
+        dict: Caminhos e tamanhos (entrada dos trials)
+    """
+    from data_preprocessing import preprocess_image
+
+    pasta = Path(pasta)
+    pasta.mkdir(parents=True, exist_ok=True)
+    imagens_path = pasta / "imagens.npy"
+
+    if shards_dir is not None and has_manifest(shards_dir):
+        dataset = ShardedDataset(shards_dir)
+        imagens = np.lib.format.open_memmap(imagens_path, mode='w+', dtype=np.uint8,
+                                            shape=(len(dataset),) + tuple(IMAGE_SHAPE))
+        labels, inicio = [], 0
+        for i in range(len(dataset.shards)):
+            lote, indices = dataset.ler_shard(i, mmap=True)
+            imagens[inicio:inicio + len(lote)] = lote
+            labels.extend(dataset.pessoas[j] for j in indices)
+            inicio += len(lote)
+    else:
+        paths = sorted(p for p in Path(data_dir).glob("*/*.png"))
+        imagens = np.lib.format.open_memmap(imagens_path, mode='w+', dtype=np.uint8,
+                                            shape=(len(paths),) + tuple(IMAGE_SHAPE))
+        for i, path in enumerate(paths):
+            imagens[i] = preprocess_image(str(path), dtype=np.uint8)
+        labels = [p.parent.name for p in paths]
+    imagens.flush()
+    del imagens
+
+    labels = np.array(labels)
+    np.save(pasta / "labels.npy", labels)
+
+    rng = np.random.default_rng(seed)
+    a, b, y = criar_pares_indices(labels, rng)
+    ordem = rng.permutation(len(y))
+    n_val = int(len(y) * fracao_validacao)
+    val, treino = ordem[:n_val], ordem[n_val:]
+    np.savez(pasta / "pares.npz", treino_a=a[treino], treino_b=b[treino], treino_y=y[treino],
+             val_a=a[val], val_b=b[val], val_y=y[val])
+
+    return {
+        'imagens': str(imagens_path),
+        'pares': str(pasta / "pares.npz"),
+        'n_imagens': int(len(labels)),
+        'n_pessoas': int(len(np.unique(labels))),
+        'pares_treino': int(len(treino)),
+        'pares_validacao': int(n_val)
+    }
+
+
+def _f1_melhor_threshold(distancias, labels):
+    """F1 de "mesma pessoa" (label 0) no melhor threshold de uma grade."""
+    melhor_f1, melhor_t = 0.0, None
+    for t in np.quantile(distancias, np.linspace(0.02, 0.98, 49)):
+        mesma = distancias <= t
+        tp = np.sum(mesma & (labels == 0))
+        fp = np.sum(mesma & (labels == 1))
+        fn = np.sum(~mesma & (labels == 0))
+        f1 = 2 * tp / (2 * tp + fp + fn) if tp > 0 else 0.0
+        if f1 > melhor_f1:
+            melhor_f1, melhor_t = float(f1), float(t)
+    return melhor_f1, melhor_t
+
+
+def executar_trial(trial_id, config, dados, epochs, epoca_inicial, threads, pasta_trials, seed=42):
+    """
+    Treina (ou continua treinando) um trial; executa em processo separado.
+
+    Args:
+        trial_id (int): Identificador do trial
+        config (dict): Hiperparâmetros (learning_rate, margin, batch_size e arquitetura)
+        dados (dict): Saída de preparar_dados_compartilhados
+        epochs (int): Época final deste treino
+        epoca_inicial (int): Épocas já treinadas (successive halving continua do modelo salvo)
+        threads (int): Threads do TensorFlow para este trial
+        pasta_trials (str): Pasta dos modelos dos trials
+
+    Returns:
+        dict: Configuração e métricas do trial
+    """
+    # Limitar threads antes de inicializar o TensorFlow
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+    tf.keras.utils.set_random_seed(seed + trial_id)
+
+    from model import build_siamese_network, euclidean_distance, get_embedding_network, make_contrastive_loss
+
+    imagens = np.load(dados['imagens'], mmap_mode='r')
+    pares = np.load(dados['pares'])
+
+    class Pares(tf.keras.utils.Sequence):
+        """Lotes de pares lidos do .npy mapeado (nenhuma cópia do dataset)."""
+
+        def __init__(self, a, b, y, batch_size, embaralhar):
+            super().__init__()
+            self.a, self.b, self.y = a, b, y
+            self.batch_size = batch_size
+            self.embaralhar = embaralhar
+            self.ordem = np.arange(len(y))
+            self.rng = np.random.default_rng(seed + trial_id)
+            self.on_epoch_end()
+
+        def __len__(self):
+            return int(np.ceil(len(self.y) / self.batch_size))
+
+        def __getitem__(self, i):
+            idx = np.sort(self.ordem[i * self.batch_size:(i + 1) * self.batch_size])
+            return [imagens[self.a[idx]], imagens[self.b[idx]]], self.y[idx]
+
+        def on_epoch_end(self):
+            if self.embaralhar:
+                self.rng.shuffle(self.ordem)
+
+    pasta = Path(pasta_trials) / f"trial_{trial_id:03d}"
+    pasta.mkdir(parents=True, exist_ok=True)
+    modelo_path = pasta / "modelo.h5"
+    perda = make_contrastive_loss(config['margin'])
+
+    inicio = time.perf_counter()
+    if epoca_inicial > 0 and modelo_path.exists():
+        model = tf.keras.models.load_model(str(modelo_path), custom_objects={
+            'euclidean_distance': euclidean_distance, 'contrastive_loss': perda})
+    else:
+        epoca_inicial = 0
+        arquitetura = {k: config[k] for k in ARQUITETURA if k in config}
+        model = build_siamese_network(IMAGE_SHAPE, **arquitetura)
+        model.compile(optimizer=tf.keras.optimizers.Adam(learning_rate=config['learning_rate']), loss=perda)
+
+    treino = Pares(pares['treino_a'], pares['treino_b'], pares['treino_y'], config['batch_size'], True)
+    validacao = Pares(pares['val_a'], pares['val_b'], pares['val_y'], 64, False)
+    history = model.fit(treino, validation_data=validacao, epochs=epochs, initial_epoch=epoca_inicial, verbose=0)
+    model.save(str(modelo_path))
+    duracao = time.perf_counter() - inicio
+
+    distancias = model.predict(validacao, verbose=0).ravel()
+    f1, melhor_t = _f1_melhor_threshold(distancias, pares['val_y'])
+
+    # Latência da rede base para uma imagem (o que o app paga por verificação)
+    rede = get_embedding_network(model)
+    exemplo = tf.convert_to_tensor(np.asarray(imagens[:1]))
+    rede(exemplo, training=False)
+    tempos = []
+    for _ in range(20):
+        t0 = time.perf_counter()
+        rede(exemplo, training=False)
+        tempos.append(time.perf_counter() - t0)
+
+    return {
+        'trial': trial_id,
+        'config': config,
+        'epocas': epochs,
+        'val_loss': float(history.history['val_loss'][-1]),
+        'f1_melhor': f1,
+        'melhor_threshold': melhor_t,
+        'parametros': int(rede.count_params()),
+        'tamanho_mb': modelo_path.stat().st_size / 2**20,
+        'latencia_ms': 1000 * float(np.median(tempos)),
+        'segundos_treino': duracao,
+        'modelo': str(modelo_path)
+    }
+
+
+class HyperparameterSweep:
+    """
+    Executa trials em paralelo sobre os mesmos dados mapeados em memória.
+
+    Args:
+        dados (dict): Saída de preparar_dados_compartilhados
+        pasta (str): Pasta da busca (trials e leaderboard)
+        workers (int): Trials simultâneos (processos)
+        threads_por_trial (int): Threads do TensorFlow em cada trial
+    """
+
+    def __init__(self, dados, pasta, workers=2, threads_por_trial=None):
+        self.dados = dados
+        self.pasta = Path(pasta)
+        self.workers = workers
+        self.threads_por_trial = threads_por_trial or max(1, (os.cpu_count() or 1) // workers)
+        self.resultados = {}
+
+    def _rodada(self, executor, trials, epochs, epoca_inicial=0):
+        """Treina um conjunto de trials até `epochs` e guarda os resultados."""
+        futuros = {
+            executor.submit(executar_trial, trial_id, config, self.dados, epochs, epoca_inicial,
+                            self.threads_por_trial, str(self.pasta / "trials")): trial_id
+            for trial_id, config in trials
+        }
+        for futuro in futuros:
+            trial_id = futuros[futuro]
+            try:
+                resultado = futuro.result()
+            except Exception as e:
+                resultado = {'trial': trial_id, 'config': dict(trials)[trial_id], 'erro': str(e)}
+            self.resultados[trial_id] = resultado
+            status = "❌" if 'erro' in resultado else "✅"
+            detalhe = resultado.get('erro') or (f"val_loss {resultado['val_loss']:.4f} | "
+                                                f"F1 {resultado['f1_melhor']:.3f}")
+            print(f"   {status} trial {trial_id:03d} ({epochs} épocas): {detalhe}")
+            self.salvar_leaderboard()
+
+    def executar(self, configs, epochs=10, halving=False, eta=3, epochs_min=1):
+        """
+        Executa a busca.
+
+        Args:
+            configs (list): Configurações (gerar_grade / gerar_aleatorio)
+            epochs (int): Épocas de cada trial (máximo no successive halving)
+            halving (bool): Successive halving: todos treinam `epochs_min`
+                épocas, o melhor 1/eta continua com eta vezes mais épocas,
+                até `epochs`
+            eta (int): Fator de redução do successive halving
+            epochs_min (int): Épocas da primeira rodada do successive halving
+
+        Returns:
+            list: Leaderboard (melhor primeiro)
+        """
+        trials = [(i, dict(CONFIG_PADRAO, **config)) for i, config in enumerate(configs)]
+        contexto = mp.get_context("spawn")  # TensorFlow não sobrevive a fork
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=contexto) as executor:
+            if not halving:
+                print(f"🔬 {len(trials)} trials, {epochs} épocas, {self.workers} em paralelo "
+                      f"({self.threads_por_trial} threads cada)")
+                self._rodada(executor, trials, epochs)
+            else:
+                rodada_epochs, anteriores = max(1, epochs_min), 0
+                while trials:
+                    print(f"🔬 Rodada: {len(trials)} trials até a época {rodada_epochs}")
+                    self._rodada(executor, trials, rodada_epochs, anteriores)
+                    if rodada_epochs >= epochs or len(trials) == 1:
+                        break
+                    validos = [t for t in trials if 'erro' not in self.resultados[t[0]]]
+                    validos.sort(key=lambda t: -self.resultados[t[0]]['f1_melhor'])
+                    trials = validos[:max(1, len(validos) // eta)]
+                    anteriores, rodada_epochs = rodada_epochs, min(epochs, rodada_epochs * eta)
+        return self.salvar_leaderboard()
+
+    def salvar_leaderboard(self):
+        """Grava o leaderboard (JSON e CSV) ordenado pelo F1 no melhor threshold."""
+        ordenados = sorted(self.resultados.values(),
+                           key=lambda r: (0, -r['epocas'], -r['f1_melhor'], r['trial']) if 'erro' not in r
+                           else (1, 0, 0, r['trial']))
+        self.pasta.mkdir(parents=True, exist_ok=True)
+        temp_path = self.pasta / "leaderboard.json.tmp"
+        with open(temp_path, "w") as f:
+            json.dump({'dados': self.dados, 'trials': ordenados}, f, indent=2)
+        os.replace(temp_path, self.pasta / "leaderboard.json")
+
+        colunas = ['trial', 'epocas', 'val_loss', 'f1_melhor', 'melhor_threshold', 'parametros',
+                   'tamanho_mb', 'latencia_ms', 'segundos_treino', 'config', 'erro']
+        with open(self.pasta / "leaderboard.csv", "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=colunas, extrasaction='ignore')
+            writer.writeheader()
+            for r in ordenados:
+                writer.writerow(dict(r, config=json.dumps(r['config'])))
+        return ordenados
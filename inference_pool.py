@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Módulo de pool de inferência multiprocesso para CPU.
+Cada worker é um processo com sua própria cópia da rede base (embedding) e
+um par de buffers em memória compartilhada (`multiprocessing.shared_memory`):
+as imagens preprocessadas (155, 220, 1) uint8 são copiadas direto para o
+buffer do worker e os embeddings voltam pelo buffer de saída, sem serializar
+arrays.
+Pelas filas trafegam apenas mensagens pequenas de controle.
+"""
+
+import multiprocessing as mp
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+INPUT_SHAPE = (155, 220, 1)
+EMBEDDING_DIM = 128
+
+
+def _worker_main(indice, model_path, threads, nome_entrada, nome_saida, max_batch,
+                 input_shape, input_dtype, embedding_dim, requisicoes, respostas):
+    """Laço principal de um worker (executa em processo separado)."""
+    # Limitar threads antes de inicializar o TensorFlow
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+    from model import build_base_network, load_model_with_custom_objects, get_embedding_network, model_input_dtype
+
+    if model_path:
+        rede = get_embedding_network(load_model_with_custom_objects(model_path))
+    else:
+        # Sem modelo treinado (benchmarks/CI): pesos aleatórios, mesmo custo
+        rede = build_base_network(input_shape)
+
+    shm_entrada = shared_memory.SharedMemory(name=nome_entrada)
+    shm_saida = shared_memory.SharedMemory(name=nome_saida)
+    entrada = np.ndarray((max_batch,) + tuple(input_shape), dtype=input_dtype, buffer=shm_entrada.buf)
+    saida = np.ndarray((max_batch, embedding_dim), dtype=np.float32, buffer=shm_saida.buf)
+
+    # Modelos antigos esperam float em [0, 1]: a conversão do uint8 fica no grafo
+    modelo_float = model_input_dtype(rede) != np.uint8
+    buffer_uint8 = np.dtype(input_dtype) == np.uint8
+
+    @tf.function(input_signature=[tf.TensorSpec((None,) + tuple(input_shape), tf.as_dtype(input_dtype))])
+    def inferir(lote):
+        if modelo_float and buffer_uint8:
+            lote = tf.cast(lote, tf.float32) / 255.0
+        elif not modelo_float and not buffer_uint8:
+            lote = tf.cast(tf.round(lote * 255.0), tf.uint8)
+        return rede(lote, training=False)
+
+    # Aquecimento
+    inferir(tf.convert_to_tensor(entrada[:1]))
+    respostas.put(('pronto', indice, None))
+
+    try:
+        while True:
+            mensagem = requisicoes.get()
+            if mensagem is None:
+                break
+            tipo, req_id, n = mensagem
+            if tipo == 'ping':
+                respostas.put(('pong', req_id, None))
+                continue
+            try:
+                saida[:n] = inferir(tf.convert_to_tensor(entrada[:n])).numpy()
+                respostas.put(('ok', req_id, n))
+            except Exception as e:
+                respostas.put(('erro', req_id, str(e)))
+    finally:
+        del entrada, saida
+        shm_entrada.close()
+        shm_saida.close()
+
+
+class _Worker:
+    """Processo worker e seus buffers (mantidos pelo processo principal)."""
+
+    def __init__(self, indice, pool, esperar=True):
+        self.indice = indice
+        self.pool = pool
+        tamanho_entrada = pool.max_batch * int(np.prod(pool.input_shape)) * np.dtype(pool.input_dtype).itemsize
+        tamanho_saida = pool.max_batch * pool.embedding_dim * 4
+        self.shm_entrada = shared_memory.SharedMemory(create=True, size=tamanho_entrada)
+        self.shm_saida = shared_memory.SharedMemory(create=True, size=tamanho_saida)
+        self.entrada = np.ndarray((pool.max_batch,) + tuple(pool.input_shape), dtype=pool.input_dtype,
+                                  buffer=self.shm_entrada.buf)
+        self.saida = np.ndarray((pool.max_batch, pool.embedding_dim), dtype=np.float32,
+                                buffer=self.shm_saida.buf)
+        self.processo = None
+        self.requisicoes = None
+        self.respostas = None
+        self._seq = 0
+        self.iniciar(esperar)
+
+    def iniciar(self, esperar=True):
+        """(Re)inicia o processo do worker, reaproveitando os buffers."""
+        ctx = self.pool.ctx
+        self.requisicoes = ctx.Queue()
+        self.respostas = ctx.Queue()
+        self.processo = ctx.Process(
+            target=_worker_main,
+            args=(self.indice, self.pool.model_path, self.pool.threads_por_worker,
+                  self.shm_entrada.name, self.shm_saida.name, self.pool.max_batch,
+                  self.pool.input_shape, self.pool.input_dtype, self.pool.embedding_dim,
+                  self.requisicoes, self.respostas),
+            name=f"inferencia-{self.indice}",
+            daemon=True
+        )
+        self.processo.start()
+        if esperar:
+            self.aguardar_pronto()
+
+    def aguardar_pronto(self):
+        """Espera o worker carregar e aquecer o modelo."""
+        self._aguardar('pronto', self.indice, self.pool.timeout_inicio)
+
+    def _aguardar(self, tipo_esperado, req_id, timeout):
+        """Espera a resposta de uma requisição, checando se o processo vive."""
+        restante = timeout
+        while restante > 0:
+            try:
+                tipo, rid, valor = self.respostas.get(timeout=min(1.0, restante))
+            except queue.Empty:
+                restante -= 1.0
+                if not self.processo.is_alive():
+                    raise WorkerMorto(f"Worker {self.indice} terminou (código {self.processo.exitcode})")
+                continue
+            if rid != req_id:
+                continue  # resposta atrasada de uma requisição anterior
+            if tipo == 'erro':
+                raise RuntimeError(f"Worker {self.indice}: {valor}")
+            if tipo != tipo_esperado:
+                continue
+            return valor
+        raise WorkerMorto(f"Worker {self.indice} não respondeu em {timeout}s")
+
+    def inferir(self, lote):
+        """Copia o lote para a memória compartilhada e retorna os embeddings."""
+        n = len(lote)
+        self._seq += 1
+        self.entrada[:n] = lote
+        self.requisicoes.put(('embed', self._seq, n))
+        self._aguardar('ok', self._seq, self.pool.timeout)
+        return self.saida[:n].copy()
+
+    def ping(self, timeout=5.0):
+        self._seq += 1
+        self.requisicoes.put(('ping', self._seq, 0))
+        self._aguardar('pong', self._seq, timeout)
+
+    def parar(self):
+        if self.processo is not None and self.processo.is_alive():
+            self.requisicoes.put(None)
+            self.processo.join(timeout=5)
+            if self.processo.is_alive():
+                self.processo.terminate()
+                self.processo.join()
+
+    def reiniciar(self):
+        if self.processo is not None and self.processo.is_alive():
+            self.processo.terminate()
+            self.processo.join()
+        self.iniciar()
+
+    def liberar(self):
+        self.parar()
+        del self.entrada, self.saida
+        self.shm_entrada.close()
+        self.shm_entrada.unlink()
+        self.shm_saida.close()
+        self.shm_saida.unlink()
+
+
+class WorkerMorto(RuntimeError):
+    """O processo worker terminou ou parou de responder."""
+
+
+class InferencePool:
+    """
+    Pool de N processos de inferência alimentados por memória compartilhada.
+
+    Args:
+        n_workers (int): Número de processos
+        model_path (str, optional): Modelo siamês salvo; None usa pesos
+            aleatórios (útil para benchmarks sem modelo treinado)
+        threads_por_worker (int): Threads intra-op do TensorFlow em cada worker
+        max_batch (int): Maior lote enviado a um worker de uma vez
+        input_dtype: Tipo das imagens nos buffers (uint8 = 4x menos cópia que float32)
+        timeout (float): Tempo máximo (s) de uma inferência antes de reiniciar o worker
+        max_tentativas (int): Tentativas por lote quando um worker morre
+
+    Exemplo:
+        with InferencePool(8, "modelos/modelo_assinaturas_manuscritas.h5") as pool:
+            embeddings = pool.embed(imagens)
+    """
+
+    def __init__(self, n_workers, model_path=None, threads_por_worker=1, max_batch=64,
+                 input_shape=INPUT_SHAPE, input_dtype=np.uint8, embedding_dim=EMBEDDING_DIM,
+                 timeout=60.0, timeout_inicio=180.0, max_tentativas=2):
+        self.model_path = str(model_path) if model_path else None
+        self.threads_por_worker = threads_por_worker
+        self.max_batch = max_batch
+        self.input_shape = tuple(input_shape)
+        self.input_dtype = np.dtype(input_dtype)
+        self.embedding_dim = embedding_dim
+        self.timeout = timeout
+        self.timeout_inicio = timeout_inicio
+        self.max_tentativas = max_tentativas
+        self.ctx = mp.get_context("spawn")  # TensorFlow não é seguro com fork
+
+        # Todos os processos sobem em paralelo; depois espera cada um ficar pronto
+        self.workers = [_Worker(i, self, esperar=False) for i in range(n_workers)]
+        for worker in self.workers:
+            worker.aguardar_pronto()
+        self._livres = queue.Queue()
+        for worker in self.workers:
+            self._livres.put(worker)
+        self._executor = ThreadPoolExecutor(max_workers=n_workers, thread_name_prefix="pool-despacho")
+        self._lock_saude = threading.Lock()
+        self.reinicios = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+    def _executar_lote(self, lote):
+        """Roteia um lote para o próximo worker livre, com nova tentativa se ele morrer."""
+        ultima_falha = None
+        for _ in range(self.max_tentativas):
+            worker = self._livres.get()
+            try:
+                return worker.inferir(lote)
+            except WorkerMorto as e:
+                ultima_falha = e
+                worker.reiniciar()
+                self.reinicios += 1
+            finally:
+                self._livres.put(worker)
+        raise ultima_falha
+
+    def _converter(self, images):
+        """Converte as imagens (uint8 0-255 ou float 0-1) para o tipo dos buffers."""
+        images = np.asarray(images)
+        if self.input_dtype == np.uint8 and images.dtype != np.uint8:
+            return np.clip(np.rint(images * 255.0), 0, 255).astype(np.uint8)
+        if self.input_dtype != np.uint8 and images.dtype == np.uint8:
+            return images.astype(self.input_dtype) / 255.0
+        return images
+
+    def embed(self, images):
+        """
+        Calcula os embeddings de um conjunto de imagens preprocessadas,
+        dividindo em lotes distribuídos entre os workers.
+
+        Args:
+            images (np.array): (n, 155, 220, 1) uint8
+
+        Returns:
+            np.array: Embeddings float32 (n, 128)
+        """
+        images = self._converter(images)
+        if len(images) == 0:
+            return np.zeros((0, self.embedding_dim), dtype=np.float32)
+        lotes = [images[i:i + self.max_batch] for i in range(0, len(images), self.max_batch)]
+        resultados = list(self._executor.map(self._executar_lote, lotes))
+        return np.concatenate(resultados)
+
+    def submit(self, images):
+        """Versão assíncrona de `embed` para um único lote (até max_batch)."""
+        return self._executor.submit(self._executar_lote, self._converter(images))
+
+    def verificar_saude(self):
+        """
+        Faz ping nos workers livres e reinicia os que não respondem.
+
+        Returns:
+            dict: índice do worker -> 'ok' ou 'reiniciado'
+        """
+        estado = {}
+        with self._lock_saude:
+            # Reserva todos os workers (espera os lotes em andamento terminarem)
+            reservados = [self._livres.get() for _ in range(len(self.workers))]
+            try:
+                for worker in reservados:
+                    try:
+                        worker.ping()
+                        estado[worker.indice] = 'ok'
+                    except (WorkerMorto, RuntimeError):
+                        worker.reiniciar()
+                        self.reinicios += 1
+                        estado[worker.indice] = 'reiniciado'
+            finally:
+                for worker in reservados:
+                    self._livres.put(worker)
+        return estado
+
+    def fechar(self):
+        """Encerra os workers e libera a memória compartilhada."""
+        self._executor.shutdown(wait=True)
+        for worker in self.workers:
+            worker.liberar()
+        self.workers = []
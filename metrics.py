@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Módulo de métricas de latência da verificação de assinaturas.
+Cada etapa (decodificação já em escala de cinza, melhoria, binarização,
+redimensionamento, normalização, embedding e distância/agregação) alimenta
+um histograma com o fluxo da verificação em andamento ('par', 'telefone',
+...); as métricas são exportadas no formato texto do Prometheus, por um
+endpoint HTTP local ou por arquivo. As etapas ficam em funções compartilhadas
+com o treino e os scripts de dataset: fora de `medir_verificacao` elas não
+são registradas, para não misturar esse uso com a latência das requisições.
+
+Configuração por variáveis de ambiente (lidas por `configurar_exportacao`):
+    ASSINATURAS_METRICAS_PORTA     porta do endpoint /metrics (127.0.0.1)
+    ASSINATURAS_METRICAS_ARQUIVO   arquivo .prom reescrito periodicamente
+"""
+
+import bisect
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# Limites dos buckets de latência, em segundos
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names, values, extra=None):
+    pares = list(zip(names, values))
+    if extra:
+        pares.append(extra)
+    if not pares:
+        return ""
+    conteudo = ",".join(f'{nome}="{str(valor)}"' for nome, valor in pares)
+    return "{" + conteudo + "}"
+
+
+class Counter:
+    """Contador monotônico com labels."""
+
+    tipo = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def exportar(self):
+        with self._lock:
+            itens = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labels, k)} {v}" for k, v in itens]
+
+
+class Histogram:
+    """Histograma cumulativo (estilo Prometheus) com labels."""
+
+    tipo = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        indice = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            serie = self._series.get(label_values)
+            if serie is None:
+                serie = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            serie[0][indice] += 1
+            serie[1] += value
+            serie[2] += 1
+
+    def exportar(self):
+        with self._lock:
+            itens = sorted((k, (list(v[0]), v[1], v[2])) for k, v in self._series.items())
+        linhas = []
+        for label_values, (contagens, soma, total) in itens:
+            acumulado = 0
+            for limite, contagem in zip(self.buckets + (float("inf"),), contagens):
+                acumulado += contagem
+                le = "+Inf" if limite == float("inf") else repr(limite)
+                linhas.append(f"{self.name}_bucket{_format_labels(self.labels, label_values, ('le', le))} {acumulado}")
+            linhas.append(f"{self.name}_sum{_format_labels(self.labels, label_values)} {soma}")
+            linhas.append(f"{self.name}_count{_format_labels(self.labels, label_values)} {total}")
+        return linhas
+
+
+class MetricsRegistry:
+    """Conjunto de métricas exportadas juntas."""
+
+    def __init__(self):
+        self._metricas = {}
+        self._lock = threading.Lock()
+
+    def _registrar(self, metrica):
+        with self._lock:
+            return self._metricas.setdefault(metrica.name, metrica)
+
+    def counter(self, name, help_text, labels=()):
+        return self._registrar(Counter(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        return self._registrar(Histogram(name, help_text, labels, buckets))
+
+    def exportar(self):
+        """Texto no formato de exposição do Prometheus."""
+        with self._lock:
+            metricas = list(self._metricas.values())
+        linhas = []
+        for metrica in metricas:
+            linhas.append(f"# HELP {metrica.name} {metrica.help}")
+            linhas.append(f"# TYPE {metrica.name} {metrica.tipo}")
+            linhas.extend(metrica.exportar())
+        return "\n".join(linhas) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_LATENCY = REGISTRY.histogram(
+    "assinaturas_etapa_segundos",
+    "Latência de cada etapa da verificação",
+    labels=("fluxo", "etapa")
+)
+STAGE_ERRORS = REGISTRY.counter(
+    "assinaturas_etapa_erros_total",
+    "Erros por etapa da verificação",
+    labels=("fluxo", "etapa")
+)
+REQUEST_LATENCY = REGISTRY.histogram(
+    "assinaturas_verificacao_segundos",
+    "Latência total de cada verificação",
+    labels=("fluxo",)
+)
+REQUESTS = REGISTRY.counter(
+    "assinaturas_verificacoes_total",
+    "Verificações por fluxo e resultado",
+    labels=("fluxo", "resultado")
+)
+
+# Fluxo da verificação em andamento nesta thread/tarefa (None fora de uma verificação)
+_FLUXO = contextvars.ContextVar("assinaturas_fluxo", default=None)
+
+
+@contextmanager
+def medir_etapa(etapa):
+    """
+    Mede a duração de uma etapa e registra no histograma, com o fluxo da
+    verificação em andamento. Fora de `medir_verificacao` não registra nada.
+
+    Exemplo:
+        with medir_etapa('decode'):
+            image = Image.open(uploaded_file)
+    """
+    fluxo = _FLUXO.get()
+    if fluxo is None:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(fluxo, etapa)
+        raise
+    finally:
+        STAGE_LATENCY.observe(time.perf_counter() - inicio, fluxo, etapa)
+
+
+@contextmanager
+def no_fluxo(fluxo):
+    """
+    Marca o fluxo das etapas medidas neste bloco, sem contar uma verificação.
+    Use em threads auxiliares (ex.: preprocessamento em paralelo de um lote),
+    que não herdam o fluxo de quem as agendou.
+    """
+    token = _FLUXO.set(fluxo)
+    try:
+        yield
+    finally:
+        _FLUXO.reset(token)
+
+
+@contextmanager
+def medir_verificacao(fluxo):
+    """
+    Mede a verificação completa; o resultado ('ok' ou 'erro') é contado.
+    Use `registro['resultado'] = 'erro'` para erros tratados sem exceção.
+    """
+    registro = {'resultado': 'ok'}
+    token = _FLUXO.set(fluxo)
+    inicio = time.perf_counter()
+    try:
+        yield registro
+    except Exception:
+        registro['resultado'] = 'erro'
+        raise
+    finally:
+        REQUEST_LATENCY.observe(time.perf_counter() - inicio, fluxo)
+        REQUESTS.inc(fluxo, registro['resultado'])
+        _FLUXO.reset(token)
+
+
+# ----------------------------------------------------------------------
+# Exportação
+# ----------------------------------------------------------------------
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        corpo = REGISTRY.exportar().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_servidor = None
+_exportador_arquivo = None
+_inicio_lock = threading.Lock()
+
+
+def iniciar_servidor_metricas(porta=9108, host="127.0.0.1"):
+    """
+    Inicia (uma única vez por processo) o endpoint HTTP /metrics.
+
+    Returns:
+        ThreadingHTTPServer: Servidor em execução
+    """
+    global _servidor
+    with _inicio_lock:
+        if _servidor is None:
+            _servidor = ThreadingHTTPServer((host, porta), _MetricsHandler)
+            threading.Thread(target=_servidor.serve_forever, name="metricas-http", daemon=True).start()
+        return _servidor
+
+
+def salvar_metricas(path):
+    """Escreve as métricas em arquivo (escrita atômica, ex.: textfile collector)."""
+    temp = f"{path}.tmp"
+    with open(temp, "w") as f:
+        f.write(REGISTRY.exportar())
+    os.replace(temp, path)
+
+
+def iniciar_exportacao_arquivo(path, intervalo=15.0):
+    """Reescreve o arquivo de métricas periodicamente (uma thread por processo)."""
+    global _exportador_arquivo
+    with _inicio_lock:
+        if _exportador_arquivo is None:
+            def loop():
+                while True:
+                    salvar_metricas(path)
+                    time.sleep(intervalo)
+
+            _exportador_arquivo = threading.Thread(target=loop, name="metricas-arquivo", daemon=True)
+            _exportador_arquivo.start()
+
+
+def configurar_exportacao():
+    """Ativa endpoint e/ou arquivo conforme as variáveis de ambiente."""
+    porta = os.environ.get("ASSINATURAS_METRICAS_PORTA")
+    if porta:
+        iniciar_servidor_metricas(int(porta))
+    arquivo = os.environ.get("ASSINATURAS_METRICAS_ARQUIVO")
+    if arquivo:
+        iniciar_exportacao_arquivo(arquivo)
@@ -6,7 +6,7 @@ Contém a arquitetura da rede, funções de perda e métricas.
 
 import tensorflow as tf
 from tensorflow.keras.models import Model
-from tensorflow.keras.layers import Input, Conv2D, MaxPooling2D, Flatten, Dense, Lambda
+from tensorflow.keras.layers import Input, Conv2D, MaxPooling2D, Flatten, Dense, Dropout, Lambda, Rescaling
 from tensorflow.keras import backend as K
 import numpy as np
 
@@ -26,9 +26,32 @@ def euclidean_distance(vectors):
     return K.sqrt(K.maximum(sum_square, K.epsilon()))
 
 
+def make_contrastive_loss(margin=1.0):
+    """
+    Cria a perda contrastiva com a margem dada.
+    A função devolvida se chama `contrastive_loss`, então modelos treinados
+    com qualquer margem carregam com load_model_with_custom_objects.
+    
+    Args:
+        margin: Distância mínima desejada entre pessoas diferentes
+    
+    Returns:
+        function: Perda (y_true, y_pred) -> tensor
+    """
+    def contrastive_loss(y_true, y_pred):
+        # y_true = 0 para mesma pessoa, 1 para pessoas diferentes
+        y_true = K.cast(y_true, y_pred.dtype)
+        square_pred = K.square(y_pred)
+        margin_square = K.square(K.maximum(margin - y_pred, 0))
+        
+        return K.mean((1 - y_true) * square_pred + y_true * margin_square)
+    
+    return contrastive_loss
+
+
 def contrastive_loss(y_true, y_pred):
     """
-    Função de perda contrastiva para treinamento da rede siamesa.
+    Função de perda contrastiva para treinamento da rede siamesa (margem 1.0).
     
     Args:
         y_true: Labels verdadeiros (0 = mesma pessoa, 1 = pessoas diferentes)
@@ -37,68 +60,71 @@ def contrastive_loss(y_true, y_pred):
     Returns:
         tensor: Valor da perda contrastiva
     """
-    margin = 1.0
-    
-    # y_true = 0 para mesma pessoa, 1 para pessoas diferentes
-    square_pred = K.square(y_pred)
-    margin_square = K.square(K.maximum(margin - y_pred, 0))
-    
-    return K.mean((1 - y_true) * square_pred + y_true * margin_square)
+    return _contrastive_loss_padrao(y_true, y_pred)
+
+
+_contrastive_loss_padrao = make_contrastive_loss(1.0)
 
 
-def build_base_network(input_shape):
+def build_base_network(input_shape, input_dtype='uint8', filtros=(32, 64, 128, 256), densas=(512, 256),
+                       embedding_dim=128, dropout=0.0):
     """
     Constrói a rede base (CNN) para extração de features.
+    Os valores padrão reproduzem a arquitetura dos modelos já treinados.
     
     Args:
         input_shape: Formato da entrada (altura, largura, canais)
+        input_dtype: 'uint8' (imagens 0-255, escaladas dentro do grafo)
+            ou 'float32' (imagens já em [0, 1], formato dos modelos antigos)
+        filtros: Filtros de cada bloco Conv2D 3x3 + MaxPooling 2x2
+        densas: Unidades das camadas densas intermediárias
+        embedding_dim: Dimensão do vetor de features
+        dropout: Dropout antes de cada camada densa (0 = sem dropout)
     
     Returns:
         Model: Modelo da rede base
     """
-    input_layer = Input(shape=input_shape)
+    input_layer = Input(shape=input_shape, dtype=input_dtype)
     
-    # Primeira camada convolucional
-    x = Conv2D(32, (3, 3), activation='relu', padding='same')(input_layer)
-    x = MaxPooling2D((2, 2))(x)
+    # Escala para [0, 1] dentro do grafo: as imagens trafegam como uint8
+    x = Rescaling(1.0 / 255)(input_layer) if input_dtype == 'uint8' else input_layer
     
-    # Segunda camada convolucional
-    x = Conv2D(64, (3, 3), activation='relu', padding='same')(x)
-    x = MaxPooling2D((2, 2))(x)
-    
-    # Terceira camada convolucional
-    x = Conv2D(128, (3, 3), activation='relu', padding='same')(x)
-    x = MaxPooling2D((2, 2))(x)
-    
-    # Quarta camada convolucional
-    x = Conv2D(256, (3, 3), activation='relu', padding='same')(x)
-    x = MaxPooling2D((2, 2))(x)
+    # Camadas convolucionais
+    for n_filtros in filtros:
+        x = Conv2D(n_filtros, (3, 3), activation='relu', padding='same')(x)
+        x = MaxPooling2D((2, 2))(x)
     
     # Flatten e camadas densas
     x = Flatten()(x)
-    x = Dense(512, activation='relu')(x)
-    x = Dense(256, activation='relu')(x)
-    output = Dense(128, activation='relu')(x)  # Feature vector de 128 dimensões
+    for unidades in densas:
+        if dropout > 0:
+            x = Dropout(dropout)(x)
+        x = Dense(unidades, activation='relu')(x)
+    if dropout > 0:
+        x = Dropout(dropout)(x)
+    output = Dense(embedding_dim, activation='relu')(x)  # Feature vector
     
     return Model(input_layer, output)
 
 
-def build_siamese_network(input_shape):
+def build_siamese_network(input_shape, input_dtype='uint8', **arquitetura):
     """
     Constrói a rede siamesa completa.
     
     Args:
         input_shape: Formato da entrada (altura, largura, canais)
+        input_dtype: Tipo das imagens de entrada (ver build_base_network)
+        **arquitetura: filtros, densas, embedding_dim e dropout (ver build_base_network)
     
     Returns:
         Model: Modelo da rede siamesa
     """
     # Construir rede base
-    base_network = build_base_network(input_shape)
+    base_network = build_base_network(input_shape, input_dtype, **arquitetura)
     
     # Definir entradas para as duas imagens
-    input_a = Input(shape=input_shape)
-    input_b = Input(shape=input_shape)
+    input_a = Input(shape=input_shape, dtype=input_dtype)
+    input_b = Input(shape=input_shape, dtype=input_dtype)
     
     # Processar ambas as imagens com a mesma rede base
     processed_a = base_network(input_a)
@@ -175,8 +201,8 @@ def predict_similarity(model, img1, img2):
         float: Distância entre as imagens (menor = mais similar)
     """
     # Expandir dimensões para batch
-    img1_batch = np.expand_dims(img1, axis=0)
-    img2_batch = np.expand_dims(img2, axis=0)
+    img1_batch = prepare_model_input(model, np.expand_dims(img1, axis=0))
+    img2_batch = prepare_model_input(model, np.expand_dims(img2, axis=0))
     
     # Fazer predição
     distance = model.predict([img1_batch, img2_batch])[0][0]
@@ -184,6 +210,90 @@ def predict_similarity(model, img1, img2):
     return float(distance)
 
 
+def model_input_dtype(model):
+    """
+    Tipo de imagem que o modelo espera na entrada.
+    
+    Returns:
+        np.dtype: uint8 (modelos com escala no grafo) ou float32 (modelos antigos)
+    """
+    return np.dtype(tf.as_dtype(model.inputs[0].dtype).as_numpy_dtype)
+
+
+def prepare_model_input(model, images):
+    """
+    Adapta imagens preprocessadas ao tipo de entrada do modelo.
+    Imagens uint8 são passadas direto para modelos uint8 e convertidas para
+    [0, 1] apenas quando o modelo é antigo (entrada float32).
+    
+    Args:
+        model: Modelo siamês ou rede base
+        images: Array uint8 (0-255) ou float (0-1)
+    
+    Returns:
+        np.array: Imagens no tipo esperado pelo modelo
+    """
+    images = np.asarray(images)
+    if model_input_dtype(model) == np.uint8:
+        if images.dtype == np.uint8:
+            return images
+        return np.clip(np.rint(images * 255.0), 0, 255).astype(np.uint8)
+    if images.dtype == np.uint8:
+        return images.astype(np.float32) / 255.0
+    return images.astype(np.float32, copy=False)
+
+
+def get_embedding_network(model):
+    """
+    Extrai a rede base (compartilhada pelos dois ramos) de um modelo siamês.
+    
+    Args:
+        model: Modelo siamês carregado
+    
+    Returns:
+        Model: Rede base que gera o vetor de 128 dimensões
+    """
+    for layer in model.layers:
+        if isinstance(layer, tf.keras.Model):
+            return layer
+    raise ValueError("Modelo siamês sem rede base interna")
+
+
+def compute_embeddings(embedding_model, images, batch_size=64):
+    """
+    Calcula os embeddings de um lote de imagens preprocessadas.
+    
+    Args:
+        embedding_model: Rede base (ver get_embedding_network)
+        images: Array (n, altura, largura, 1) de imagens preprocessadas (uint8 ou float)
+        batch_size: Tamanho do lote de inferência
+    
+    Returns:
+        np.array: Embeddings float32 (n, 128)
+    """
+    images = np.asarray(images)
+    if len(images) == 0:
+        return np.zeros((0, embedding_model.output_shape[-1]), dtype=np.float32)
+    images = prepare_model_input(embedding_model, images)
+    embeddings = embedding_model.predict(images, batch_size=batch_size, verbose=0)
+    return np.asarray(embeddings, dtype=np.float32)
+
+
+def embedding_distance(a, b):
+    """
+    Distância euclidiana entre embeddings em NumPy, igual à camada do modelo.
+    
+    Args:
+        a: Embedding (128,) ou matriz (n, 128)
+        b: Embedding (128,) ou matriz (n, 128)
+    
+    Returns:
+        np.array: Distâncias (mesma regra de epsilon de euclidean_distance)
+    """
+    sum_square = np.sum(np.square(np.asarray(a) - np.asarray(b)), axis=-1)
+    return np.sqrt(np.maximum(sum_square, K.epsilon()))
+
+
 def evaluate_threshold(model, test_pairs, test_labels, thresholds=None):
     """
     Avalia diferentes thresholds para determinar o ótimo.
@@ -201,6 +311,8 @@ def evaluate_threshold(model, test_pairs, test_labels, thresholds=None):
         thresholds = np.arange(0.05, 0.31, 0.05)
     
     # Fazer predições para todos os pares
+    if isinstance(test_pairs, (list, tuple)):
+        test_pairs = [prepare_model_input(model, imgs) for imgs in test_pairs]
     predictions = model.predict(test_pairs)
     
     results = {}
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Módulo de registro do modelo em uso, com recarga a quente.
+Observa o arquivo do modelo e o do threshold; quando mudam, a nova versão é
+carregada e aquecida em segundo plano e só então substitui a atual, de forma
+atômica. Requisições em andamento continuam com a versão que obtiveram.
+"""
+
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+
+from model import load_model_with_custom_objects, get_embedding_network, prepare_model_input
+from verification_cache import file_fingerprint
+
+
+DEFAULT_MODEL_PATH = "modelos/modelo_assinaturas_manuscritas.h5"
+DEFAULT_THRESHOLD_PATH = "resultados_avaliacao/threshold_otimo.txt"
+DEFAULT_THRESHOLD = 0.10
+
+
+@dataclass(frozen=True)
+class ModelVersion:
+    """Versão imutável do modelo + threshold em uso."""
+    model: object
+    embedding_model: object
+    fingerprint: str
+    threshold: float
+    threshold_calibrado: bool
+    carregado_em: float = field(default_factory=time.time)
+
+
+def _file_signature(path):
+    """Assinatura barata de um arquivo (mtime, tamanho) ou None se não existe."""
+    try:
+        stat = Path(path).stat()
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def read_threshold(threshold_path, default=DEFAULT_THRESHOLD):
+    """
+    Lê o threshold calibrado.
+
+    Returns:
+        tuple: (threshold, calibrado) — calibrado=False quando usa o padrão
+    """
+    try:
+        with open(threshold_path, 'r') as f:
+            return float(f.read().strip()), True
+    except (OSError, ValueError):
+        return default, False
+
+
+class ModelRegistry:
+    """
+    Mantém a versão atual do modelo e troca por uma nova sem interrupção.
+
+    Args:
+        model_path (str): Arquivo do modelo siamês
+        threshold_path (str): Arquivo com o threshold ótimo
+        default_threshold (float): Threshold quando não há calibração
+        poll_interval (float): Intervalo (s) entre verificações dos arquivos
+        input_shape (tuple): Formato de entrada usado no aquecimento
+    """
+
+    def __init__(self, model_path=DEFAULT_MODEL_PATH, threshold_path=DEFAULT_THRESHOLD_PATH,
+                 default_threshold=DEFAULT_THRESHOLD, poll_interval=2.0, input_shape=(155, 220, 1)):
+        self.model_path = Path(model_path)
+        self.threshold_path = Path(threshold_path)
+        self.default_threshold = default_threshold
+        self.poll_interval = poll_interval
+        self.input_shape = input_shape
+
+        self._versao = None
+        self._lock = threading.Lock()
+        self._carregando = threading.Lock()
+        self._ouvintes = []
+        self._assinatura_modelo = None
+        self._assinatura_threshold = None
+        self._pendente = None
+        self._parar = threading.Event()
+        self._observador = None
+        self.ultimo_erro = None
+
+    # ------------------------------------------------------------------
+    # Consulta
+    # ------------------------------------------------------------------
+
+    def atual(self):
+        """Versão em uso (None se nenhum modelo foi carregado)."""
+        return self._versao
+
+    def adicionar_ouvinte(self, callback):
+        """Registra `callback(antiga, nova)`, chamado após cada troca."""
+        self._ouvintes.append(callback)
+
+    # ------------------------------------------------------------------
+    # Carga e troca
+    # ------------------------------------------------------------------
+
+    def carregar(self):
+        """
+        Carrega a versão inicial de forma síncrona (se ainda não carregada).
+
+        Returns:
+            bool: True se há um modelo em uso
+        """
+        if self._versao is None:
+            self._recarregar_modelo()
+        return self._versao is not None
+
+    def _aquecer(self, model, embedding_model):
+        """Executa uma predição para compilar os grafos antes da troca."""
+        dummy = prepare_model_input(model, np.zeros((1,) + tuple(self.input_shape), dtype=np.uint8))
+        model.predict([dummy, dummy], verbose=0)
+        embedding_model.predict(dummy, verbose=0)
+
+    def _recarregar_modelo(self):
+        """Carrega, aquece e publica uma nova versão do modelo."""
+        with self._carregando:
+            assinatura = _file_signature(self.model_path)
+            if assinatura is None:
+                self.ultimo_erro = f"Modelo não encontrado em {self.model_path}"
+                return False
+            try:
+                fingerprint = file_fingerprint(self.model_path)
+                atual = self._versao
+                if atual is not None and atual.fingerprint == fingerprint:
+                    self._assinatura_modelo = assinatura
+                    return True
+
+                model = load_model_with_custom_objects(str(self.model_path))
+                embedding_model = get_embedding_network(model)
+                self._aquecer(model, embedding_model)
+                threshold, calibrado = read_threshold(self.threshold_path, self.default_threshold)
+            except Exception as e:
+                # Arquivo incompleto ou inválido: mantém a versão atual
+                self.ultimo_erro = f"Erro ao carregar modelo: {e}"
+                return False
+
+            self._assinatura_modelo = assinatura
+            self._assinatura_threshold = _file_signature(self.threshold_path)
+            self._publicar(ModelVersion(model, embedding_model, fingerprint, threshold, calibrado))
+            self.ultimo_erro = None
+            return True
+
+    def _recarregar_threshold(self):
+        """Publica a versão atual com o threshold relido do arquivo."""
+        # Com uma recarga de modelo em andamento, ela mesma lê o threshold; a
+        # assinatura não muda aqui e a próxima verificação tenta de novo
+        if not self._carregando.acquire(blocking=False):
+            return
+        try:
+            atual = self._versao
+            if atual is None:
+                return
+            threshold, calibrado = read_threshold(self.threshold_path, self.default_threshold)
+            self._assinatura_threshold = _file_signature(self.threshold_path)
+            if threshold != atual.threshold or calibrado != atual.threshold_calibrado:
+                self._publicar(ModelVersion(atual.model, atual.embedding_model, atual.fingerprint,
+                                            threshold, calibrado))
+        finally:
+            self._carregando.release()
+
+    def _publicar(self, nova):
+        """Troca atômica da versão em uso e aviso aos ouvintes."""
+        with self._lock:
+            antiga = self._versao
+            self._versao = nova
+        if antiga is not None:
+            for callback in self._ouvintes:
+                callback(antiga, nova)
+
+    # ------------------------------------------------------------------
+    # Observação dos arquivos
+    # ------------------------------------------------------------------
+
+    def verificar_atualizacoes(self):
+        """
+        Verifica se os arquivos mudaram e dispara a recarga necessária.
+
+        O modelo só é recarregado depois que o arquivo fica estável por duas
+        verificações seguidas (evita ler um arquivo ainda sendo escrito).
+        """
+        assinatura = _file_signature(self.model_path)
+        if assinatura is not None and assinatura != self._assinatura_modelo:
+            if self._pendente == assinatura:
+                self._pendente = None
+                threading.Thread(target=self._recarregar_modelo, daemon=True).start()
+            else:
+                self._pendente = assinatura
+        else:
+            self._pendente = None
+
+        if _file_signature(self.threshold_path) != self._assinatura_threshold:
+            self._recarregar_threshold()
+
+    def iniciar_observacao(self):
+        """Inicia a thread que observa os arquivos do modelo e do threshold."""
+        if self._observador is not None:
+            return
+        self._parar.clear()
+
+        def loop():
+            while not self._parar.wait(self.poll_interval):
+                self.verificar_atualizacoes()
+
+        self._observador = threading.Thread(target=loop, name="model-registry", daemon=True)
+        self._observador.start()
+
+    def parar(self):
+        """Interrompe a observação."""
+        self._parar.set()
+        if self._observador is not None:
+            self._observador.join()
+            self._observador = None
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Módulo de detecção de quase-duplicatas no dataset.
+Cada imagem preprocessada recebe um hash perceptual (dHash de 64 bits) e os
+hashes são divididos em faixas: duas imagens só são comparadas se tiverem
+alguma faixa idêntica. Com `limite + 1` faixas, dois hashes a até `limite`
+bits de distância sempre coincidem em pelo menos uma faixa (princípio da casa
+dos pombos), então o índice não perde pares e evita as n² comparações.
+
+A seleção é gulosa: as imagens são visitadas em ordem de preferência e cada
+uma vira representante, a menos que esteja a até `limite` bits de um
+representante já escolhido da mesma pessoa. Toda imagem excluída fica, assim,
+próxima de uma imagem mantida (não há encadeamento A~B~C que remova C por
+causa de A).
+
+A lista de exclusão usa o SHA-1 da imagem preprocessada em uint8, o mesmo
+valor para PNGs e shards, e fica na pasta dos dados que ela filtra:
+    dataset_processado/excluidas.json  -> lida pelo ModelTrainer
+    assinaturas_reais/excluidas.json   -> lida pelo DatasetPreparator
+"""
+
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import cv2
+
+
+EXCLUSION_NAME = "excluidas.json"
+
+# Lado do dHash: (lado + 1) x lado pixels -> lado² bits
+HASH_SIZE = 8
+
+# Distância de Hamming máxima (em bits) para considerar duas imagens quase iguais
+DEFAULT_LIMITE = 6
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+def dhash(img, lado=HASH_SIZE):
+    """
+    Hash perceptual por diferença de brilho entre colunas vizinhas.
+
+    Args:
+        img (np.array): Imagem em tons de cinza (altura, largura[, 1]), float ou uint8
+        lado (int): Lado da grade do hash
+
+    Returns:
+        int: Hash de lado² bits
+    """
+    img = np.asarray(img)
+    if img.ndim == 3:
+        img = img[..., 0]
+    reduzida = cv2.resize(img.astype(np.float32), (lado + 1, lado), interpolation=cv2.INTER_AREA)
+    bits = (reduzida[:, 1:] > reduzida[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def content_sha1(img):
+    """SHA-1 da imagem preprocessada em uint8 (chave da lista de exclusão)."""
+    return hashlib.sha1(np.ascontiguousarray(img).tobytes()).hexdigest()
+
+
+def hamming(a, b):
+    """Número de bits diferentes entre dois hashes."""
+    return bin(a ^ b).count("1")
+
+
+class HashBandIndex:
+    """
+    Índice de hashes por faixas de bits (LSH para distância de Hamming).
+
+    Args:
+        limite (int): Distância máxima garantida nas buscas
+        bits (int): Tamanho dos hashes
+    """
+
+    def __init__(self, limite=DEFAULT_LIMITE, bits=HASH_SIZE * HASH_SIZE):
+        self.limite = limite
+        n_faixas = min(limite + 1, bits)
+        largura = bits // n_faixas
+        # As últimas faixas absorvem os bits que sobram da divisão
+        self._faixas = []
+        inicio = 0
+        for i in range(n_faixas):
+            fim = inicio + largura + (1 if i >= n_faixas - bits % n_faixas else 0)
+            self._faixas.append((inicio, (1 << (fim - inicio)) - 1))
+            inicio = fim
+        self._baldes = {}
+        self.hashes = []
+        self.dados = []
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def _chaves(self, h):
+        return [(i, (h >> inicio) & mascara) for i, (inicio, mascara) in enumerate(self._faixas)]
+
+    def adicionar(self, h, dado=None):
+        """Indexa um hash (com um valor associado). Retorna a posição."""
+        posicao = len(self.hashes)
+        self.hashes.append(h)
+        self.dados.append(dado)
+        for chave in self._chaves(h):
+            self._baldes.setdefault(chave, []).append(posicao)
+        return posicao
+
+    def buscar(self, h, limite=None):
+        """
+        Hashes indexados a até `limite` bits de `h`.
+
+        Returns:
+            list: (distância, posição), do mais próximo ao mais distante
+        """
+        limite = self.limite if limite is None else min(limite, self.limite)
+        candidatos = set()
+        for chave in self._chaves(h):
+            candidatos.update(self._baldes.get(chave, ()))
+        encontrados = []
+        for posicao in candidatos:
+            distancia = hamming(h, self.hashes[posicao])
+            if distancia <= limite:
+                encontrados.append((distancia, posicao))
+        return sorted(encontrados)
+
+
+def _prioridade(nome):
+    # Em grupos do DatasetPreparator a variação "_original" é a representante
+    return (0 if "_original" in nome else 1, nome)
+
+
+def listar_pasta(data_dir):
+    """
+    Imagens de uma pasta com uma subpasta por pessoa.
+
+    Returns:
+        list: (caminho, pessoa), em ordem de pessoa e de preferência
+    """
+    data_dir = Path(data_dir)
+    itens = []
+    for pessoa_dir in sorted(p for p in data_dir.iterdir() if p.is_dir()):
+        arquivos = [p for p in pessoa_dir.iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS]
+        itens.extend((p, pessoa_dir.name) for p in sorted(arquivos, key=lambda p: _prioridade(p.name)))
+    return itens
+
+
+def hash_pasta(data_dir, workers=8):
+    """
+    Calcula hashes das imagens de uma pasta pessoa/arquivo com o mesmo
+    preprocessamento usado no treino.
+
+    Returns:
+        list: dicts com 'nome' (pessoa/arquivo), 'pessoa', 'dhash' e 'sha1'
+    """
+    from data_preprocessing import preprocess_image
+
+    data_dir = Path(data_dir)
+    itens = listar_pasta(data_dir)
+
+    def calcular(item):
+        path, pessoa = item
+        try:
+            img = preprocess_image(str(path), dtype=np.uint8)
+        except Exception:
+            return None
+        return {'nome': path.relative_to(data_dir).as_posix(), 'pessoa': pessoa,
+                'dhash': dhash(img), 'sha1': content_sha1(img)}
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return [r for r in executor.map(calcular, itens) if r is not None]
+
+
+def hash_shards(shards_dir):
+    """
+    Calcula hashes das imagens de um dataset em shards (lidos com mmap).
+
+    Returns:
+        list: dicts com 'nome' (shard:posição), 'pessoa', 'dhash' e 'sha1'
+    """
+    from dataset_shards import ShardedDataset
+
+    dataset = ShardedDataset(shards_dir)
+    registros = []
+    for i in range(len(dataset.shards)):
+        imagens, labels = dataset.ler_shard(i, mmap=True)
+        for j in range(len(labels)):
+            img = np.asarray(imagens[j])
+            registros.append({'nome': f"{i}:{j}", 'pessoa': dataset.pessoas[labels[j]],
+                              'dhash': dhash(img), 'sha1': content_sha1(img)})
+    return registros
+
+
+def encontrar_duplicatas(registros, limite=DEFAULT_LIMITE):
+    """
+    Seleciona representantes e marca as quase-duplicatas.
+
+    Args:
+        registros (list): Saída de hash_pasta/hash_shards, em ordem de preferência
+        limite (int): Distância de Hamming máxima
+
+    Returns:
+        dict: 'duplicatas' (mesma pessoa, excluíveis), 'entre_pessoas'
+            (imagens quase iguais em pessoas diferentes: possível erro de
+            rótulo, só reportadas) e 'mantidas'
+    """
+    indice = HashBandIndex(limite)
+    duplicatas, entre_pessoas = [], []
+    sha1_mantidas = set()
+
+    for registro in registros:
+        semelhantes = indice.buscar(registro['dhash'])
+        mesma = [(d, p) for d, p in semelhantes if indice.dados[p]['pessoa'] == registro['pessoa']]
+        if mesma:
+            distancia, posicao = mesma[0]
+            sha1 = registro.get('sha1')
+            # Cópia byte a byte de uma imagem mantida: o sha1 identifica as duas
+            duplicatas.append({'nome': registro['nome'], 'pessoa': registro['pessoa'], 'sha1': sha1,
+                               'igual_a': indice.dados[posicao]['nome'], 'distancia': distancia,
+                               'copia_exata': sha1 is not None and sha1 in sha1_mantidas})
+            continue
+        if registro.get('sha1') is not None:
+            sha1_mantidas.add(registro['sha1'])
+        if semelhantes:
+            distancia, posicao = semelhantes[0]
+            outro = indice.dados[posicao]
+            entre_pessoas.append({'nome': registro['nome'], 'pessoa': registro['pessoa'],
+                                  'igual_a': outro['nome'], 'pessoa_igual': outro['pessoa'],
+                                  'distancia': distancia})
+        indice.adicionar(registro['dhash'], registro)
+
+    return {'mantidas': len(indice), 'duplicatas': duplicatas, 'entre_pessoas': entre_pessoas}
+
+
+def salvar_exclusoes(data_dir, duplicatas, limite):
+    """
+    Grava a lista de exclusão da pasta (escrita atômica).
+
+    Returns:
+        Path: Arquivo gravado
+    """
+    path = Path(data_dir) / EXCLUSION_NAME
+    conteudo = {
+        'limite': limite,
+        'criado_em': time.time(),
+        # sha1 de imagens sem cópia mantida: todas saem do treino
+        'sha1': sorted({d['sha1'] for d in duplicatas if d['sha1'] is not None and not d.get('copia_exata')}),
+        # sha1 de cópias exatas de imagens mantidas: fica a primeira ocorrência
+        'sha1_copias': sorted({d['sha1'] for d in duplicatas if d['sha1'] is not None and d.get('copia_exata')}),
+        'arquivos': sorted(d['nome'] for d in duplicatas)
+    }
+    temp = path.with_suffix(".json.tmp")
+    with open(temp, "w") as f:
+        json.dump(conteudo, f, indent=2, ensure_ascii=False)
+    os.replace(temp, path)
+    return path
+
+
+def carregar_exclusoes(data_dir):
+    """
+    Lista de exclusão de uma pasta.
+
+    Returns:
+        dict: 'sha1' (set, excluir sempre), 'sha1_copias' (set, manter só a
+            primeira ocorrência) e 'arquivos' (set de pessoa/arquivo); vazios
+            se não houver lista
+    """
+    path = Path(data_dir) / EXCLUSION_NAME
+    if not path.exists():
+        return {'sha1': set(), 'sha1_copias': set(), 'arquivos': set()}
+    with open(path) as f:
+        conteudo = json.load(f)
+    return {'sha1': set(conteudo.get('sha1', [])), 'sha1_copias': set(conteudo.get('sha1_copias', [])),
+            'arquivos': set(conteudo.get('arquivos', []))}
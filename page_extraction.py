@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Módulo de extração de assinaturas de páginas digitalizadas.
+Uma página de contrato (escala de cinza, resolução de scanner) é reduzida,
+binarizada e analisada em blocos (tiles) com componentes conexos, em
+paralelo; as caixas dos blocos são unidas e filtradas por tamanho, proporção
+e densidade de tinta. Cada região candidata é recortada da página em
+resolução cheia e preprocessada, e todas passam pela rede base de uma vez.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from data_preprocessing import preprocess_gray
+from metrics import medir_etapa, medir_verificacao
+from model import compute_embeddings, embedding_distance
+
+
+def _tiles(altura, largura, tamanho, sobreposicao):
+    """Blocos (y0, x0, y1, x1) que cobrem a imagem com sobreposição."""
+    passo = max(1, tamanho - sobreposicao)
+    ys = list(range(0, max(1, altura - sobreposicao), passo))
+    xs = list(range(0, max(1, largura - sobreposicao), passo))
+    return [(y, x, min(altura, y + tamanho), min(largura, x + tamanho)) for y in ys for x in xs]
+
+
+def _componentes_tile(mascara, tile):
+    """Componentes conexos de um bloco, em coordenadas da imagem reduzida."""
+    y0, x0, y1, x1 = tile
+    n, _, stats, _ = cv2.connectedComponentsWithStats(mascara[y0:y1, x0:x1], connectivity=8)
+    caixas = []
+    for i in range(1, n):
+        x, y, w, h, _ = stats[i]
+        caixas.append((x0 + x, y0 + y, x0 + x + w, y0 + y + h))
+    return caixas
+
+
+def merge_boxes(caixas, distancia=0):
+    """
+    Une caixas que se sobrepõem ou estão a até `distancia` pixels
+    (componentes cortados pelas bordas dos blocos voltam a ser um só).
+
+    Args:
+        caixas (list): Caixas (x0, y0, x1, y1)
+        distancia (int): Folga para considerar duas caixas vizinhas
+
+    Returns:
+        np.array: Caixas unidas (n, 4)
+    """
+    caixas = np.array(caixas, dtype=np.int64).reshape(-1, 4)
+    mudou = True
+    while mudou and len(caixas) > 1:
+        mudou = False
+        unidas = []
+        restantes = caixas
+        while len(restantes):
+            atual, restantes = restantes[0], restantes[1:]
+            while True:
+                tocam = ((restantes[:, 0] <= atual[2] + distancia) & (restantes[:, 2] >= atual[0] - distancia) &
+                         (restantes[:, 1] <= atual[3] + distancia) & (restantes[:, 3] >= atual[1] - distancia))
+                if not tocam.any():
+                    break
+                grupo = restantes[tocam]
+                atual = np.array([min(atual[0], grupo[:, 0].min()), min(atual[1], grupo[:, 1].min()),
+                                  max(atual[2], grupo[:, 2].max()), max(atual[3], grupo[:, 3].max())])
+                restantes = restantes[~tocam]
+                mudou = True
+            unidas.append(atual)
+        caixas = np.array(unidas)
+    return caixas
+
+
+def find_signature_regions(page_gray, lado_trabalho=1600, tamanho_tile=512, workers=4,
+                           area=(0.002, 0.15), proporcao=(1.0, 12.0), densidade=(0.02, 0.30),
+                           max_regioes=8, margem=0.08):
+    """
+    Encontra regiões candidatas a assinatura numa página.
+
+    Args:
+        page_gray (np.array): Página uint8 em escala de cinza (resolução cheia)
+        lado_trabalho (int): Maior lado da versão reduzida usada na busca
+        tamanho_tile (int): Lado dos blocos da análise de componentes
+        workers (int): Threads para os blocos
+        area (tuple): Área mínima e máxima da região (fração da página)
+        proporcao (tuple): Largura/altura mínima e máxima
+        densidade (tuple): Fração de tinta dentro da caixa (traço manuscrito
+            é esparso; blocos de texto impresso tendem a ser mais densos)
+        max_regioes (int): Máximo de regiões retornadas (as de melhor pontuação)
+        margem (float): Margem do recorte (fração do tamanho da caixa)
+
+    Returns:
+        list: dicts com 'caixa' (x0, y0, x1, y1) na página cheia, 'densidade'
+            e 'pontuacao', ordenados de cima para baixo
+    """
+    altura, largura = page_gray.shape[:2]
+    escala = min(1.0, lado_trabalho / max(altura, largura))
+    reduzida = cv2.resize(page_gray, (round(largura * escala), round(altura * escala)),
+                          interpolation=cv2.INTER_AREA) if escala < 1.0 else page_gray
+    h, w = reduzida.shape[:2]
+
+    _, tinta = cv2.threshold(reduzida, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    # Linhas de assinatura e bordas de campos (traços horizontais longos) saem
+    # da máscara; senão a assinatura se une à linha e vira uma faixa estreita
+    linhas = cv2.morphologyEx(tinta, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (max(10, w // 15), 1)))
+    tinta = cv2.subtract(tinta, linhas)
+    # Fechamento horizontal: junta os traços de uma assinatura num único componente
+    kx, ky = max(3, w // 80), max(3, h // 160)
+    mascara = cv2.morphologyEx(tinta, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (kx, ky)))
+
+    tiles = _tiles(h, w, tamanho_tile, sobreposicao=2 * max(kx, ky))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        por_tile = executor.map(lambda t: _componentes_tile(mascara, t), tiles)
+        caixas = [c for lista in por_tile for c in lista]
+    caixas = merge_boxes(caixas, distancia=1)
+
+    area_total = float(h * w)
+    regioes = []
+    for x0, y0, x1, y1 in caixas:
+        cw, ch = x1 - x0, y1 - y0
+        fracao = cw * ch / area_total
+        if not (area[0] <= fracao <= area[1]) or not (proporcao[0] <= cw / max(ch, 1) <= proporcao[1]):
+            continue
+        dens = float(np.count_nonzero(tinta[y0:y1, x0:x1])) / (cw * ch)
+        if not (densidade[0] <= dens <= densidade[1]):
+            continue
+        # Prefere regiões esparsas e de tamanho intermediário
+        pontuacao = (1.0 - dens / densidade[1]) * min(1.0, fracao / (4 * area[0]))
+        mx, my = margem * cw, margem * ch
+        regioes.append({
+            'caixa': (max(0, int((x0 - mx) / escala)), max(0, int((y0 - my) / escala)),
+                      min(largura, int(np.ceil((x1 + mx) / escala))), min(altura, int(np.ceil((y1 + my) / escala)))),
+            'densidade': dens,
+            'pontuacao': float(pontuacao)
+        })
+
+    regioes = sorted(regioes, key=lambda r: -r['pontuacao'])[:max_regioes]
+    return sorted(regioes, key=lambda r: (r['caixa'][1], r['caixa'][0]))
+
+
+class PageVerifier:
+    """
+    Verifica todas as assinaturas de uma página contra as pessoas declaradas.
+
+    Args:
+        embedding_model: Rede base (ver model.get_embedding_network)
+        cadastro: SignatureEnrollment carregado (embeddings da galeria)
+        threshold (float): Distância máxima para "mesma pessoa"
+    """
+
+    def __init__(self, embedding_model, cadastro, threshold):
+        self.embedding_model = embedding_model
+        self.cadastro = cadastro
+        self.threshold = threshold
+
+    def processar(self, page_gray, pessoas, **kwargs):
+        """
+        Extrai as regiões, calcula todos os embeddings em uma única passada
+        e compara cada região com todas as amostras das pessoas declaradas.
+
+        Args:
+            page_gray (np.array): Página uint8 em escala de cinza
+            pessoas (list): Pessoas que deveriam ter assinado a página
+            **kwargs: Parâmetros de find_signature_regions
+
+        Returns:
+            tuple: (regiões com resultados, imagens preprocessadas (n, 155, 220, 1))
+        """
+        with medir_verificacao('pagina'):
+            return self._processar(page_gray, pessoas, **kwargs)
+
+    def _processar(self, page_gray, pessoas, **kwargs):
+        faltando = [p for p in pessoas if p not in self.cadastro.pessoas]
+        if faltando:
+            raise ValueError(f"Pessoas sem cadastro na galeria: {', '.join(faltando)}")
+
+        with medir_etapa('regioes'):
+            regioes = find_signature_regions(page_gray, **kwargs)
+        if not regioes:
+            return [], np.zeros((0, 155, 220, 1), dtype=np.uint8)
+
+        imagens = np.stack([
+            preprocess_gray(page_gray[y0:y1, x0:x1], dtype=np.uint8)
+            for x0, y0, x1, y1 in (r['caixa'] for r in regioes)
+        ])
+        with medir_etapa('embedding'):
+            embeddings = compute_embeddings(self.embedding_model, imagens, batch_size=len(imagens))
+
+        with medir_etapa('distancia'):
+            for regiao, embedding in zip(regioes, embeddings):
+                comparacoes = []
+                for pessoa in pessoas:
+                    distancias = embedding_distance(self.cadastro.pessoas[pessoa]['embeddings'], embedding)
+                    comparacoes.append({
+                        'pessoa': pessoa,
+                        'min_distancia': float(distancias.min()),
+                        'media_distancia': float(distancias.mean()),
+                        'mesma_pessoa': bool(distancias.min() <= self.threshold)
+                    })
+                comparacoes.sort(key=lambda c: c['min_distancia'])
+                regiao['comparacoes'] = comparacoes
+                regiao['melhor_pessoa'] = comparacoes[0]['pessoa'] if comparacoes[0]['mesma_pessoa'] else None
+        return regioes, imagens
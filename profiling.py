@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Módulo de perfilamento opcional das verificações.
+Amostra 1 a cada N requisições e/ou qualquer requisição acima de um limite
+de latência, gravando um arquivo de estatísticas do cProfile e, opcionalmente,
+um trace do profiler do TensorFlow. O número de arquivos em disco é limitado.
+
+Configuração por variáveis de ambiente:
+    ASSINATURAS_PROFILE_AMOSTRA    perfila 1 a cada N requisições (0 = desligado)
+    ASSINATURAS_PROFILE_LENTA_MS   grava o perfil de requisições acima deste limite
+    ASSINATURAS_PROFILE_DIR        pasta de saída (padrão: perfis/)
+    ASSINATURAS_PROFILE_TF         "1" grava também o trace do TensorFlow
+                                   (apenas nas requisições amostradas)
+    ASSINATURAS_PROFILE_MAX        máximo de perfis mantidos (padrão: 50)
+
+Observação: para capturar requisições lentas o cProfile precisa estar ativo
+em todas as requisições (a lentidão só é conhecida no fim), o que tem custo.
+Sem ASSINATURAS_PROFILE_LENTA_MS apenas as requisições amostradas pagam esse custo.
+"""
+
+import cProfile
+import functools
+import itertools
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+
+class RequestProfiler:
+    """
+    Decide quais requisições perfilar e grava os resultados.
+
+    Args:
+        amostra (int): Perfila 1 a cada `amostra` requisições (0 = nunca)
+        lenta_ms (float, optional): Grava requisições mais lentas que isso
+        output_dir (str): Pasta dos perfis
+        tf_trace (bool): Grava trace do TensorFlow nas requisições amostradas
+        max_perfis (int): Número máximo de perfis mantidos em disco
+    """
+
+    def __init__(self, amostra=0, lenta_ms=None, output_dir="perfis", tf_trace=False, max_perfis=50):
+        self.amostra = amostra
+        self.lenta_ms = lenta_ms
+        self.output_dir = Path(output_dir)
+        self.tf_trace = tf_trace
+        self.max_perfis = max_perfis
+        self._contador = itertools.count(1)
+        # cProfile e o profiler do TF são globais no processo: um de cada vez
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """Cria o perfilador a partir das variáveis de ambiente."""
+        lenta = os.environ.get("ASSINATURAS_PROFILE_LENTA_MS")
+        return cls(
+            amostra=int(os.environ.get("ASSINATURAS_PROFILE_AMOSTRA", "0")),
+            lenta_ms=float(lenta) if lenta else None,
+            output_dir=os.environ.get("ASSINATURAS_PROFILE_DIR", "perfis"),
+            tf_trace=os.environ.get("ASSINATURAS_PROFILE_TF", "0") == "1",
+            max_perfis=int(os.environ.get("ASSINATURAS_PROFILE_MAX", "50"))
+        )
+
+    @property
+    def ativo(self):
+        return self.amostra > 0 or self.lenta_ms is not None
+
+    @contextmanager
+    def perfilar(self, nome):
+        """
+        Envolve uma requisição; decide na entrada se é amostrada e na saída
+        se deve gravar o perfil.
+        """
+        if not self.ativo:
+            yield
+            return
+
+        n = next(self._contador)
+        amostrada = self.amostra > 0 and n % self.amostra == 0
+        if not (amostrada or self.lenta_ms is not None) or not self._lock.acquire(blocking=False):
+            # Outra requisição está sendo perfilada neste processo
+            yield
+            return
+
+        try:
+            trace_dir = None
+            if amostrada and self.tf_trace:
+                trace_dir = self._iniciar_trace_tf(nome, n)
+
+            profiler = cProfile.Profile()
+            inicio = time.perf_counter()
+            profiler.enable()
+            try:
+                yield
+            finally:
+                profiler.disable()
+                duracao_ms = (time.perf_counter() - inicio) * 1000
+                if trace_dir is not None:
+                    self._parar_trace_tf()
+
+                lenta = self.lenta_ms is not None and duracao_ms >= self.lenta_ms
+                if amostrada or lenta:
+                    self._salvar(profiler, nome, n, duracao_ms, "lenta" if lenta else "amostra")
+        finally:
+            self._lock.release()
+
+    def _iniciar_trace_tf(self, nome, n):
+        """Inicia o profiler do TensorFlow (retorna a pasta do trace)."""
+        try:
+            import tensorflow as tf
+        except ImportError:
+            return None
+        trace_dir = self.output_dir / f"{nome}_{n:08d}_tf"
+        try:
+            tf.profiler.experimental.start(str(trace_dir))
+        except Exception:
+            return None
+        return trace_dir
+
+    def _parar_trace_tf(self):
+        import tensorflow as tf
+        try:
+            tf.profiler.experimental.stop()
+        except Exception:
+            pass
+
+    def _salvar(self, profiler, nome, n, duracao_ms, motivo):
+        """Grava o arquivo .prof e aplica a retenção."""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        timestamp = time.strftime("%Y%m%d-%H%M%S")
+        path = self.output_dir / f"{nome}_{timestamp}_{n:08d}_{motivo}_{duracao_ms:.0f}ms.prof"
+        profiler.dump_stats(str(path))
+        self._aplicar_retencao()
+
+    def _aplicar_retencao(self):
+        """Mantém apenas os `max_perfis` perfis (e traces) mais recentes."""
+        entradas = sorted(self.output_dir.iterdir(), key=lambda p: p.stat().st_mtime, reverse=True)
+        for antiga in entradas[self.max_perfis:]:
+            if antiga.is_dir():
+                shutil.rmtree(antiga, ignore_errors=True)
+            else:
+                antiga.unlink(missing_ok=True)
+
+
+_perfilador = None
+_perfilador_lock = threading.Lock()
+
+
+def obter_perfilador():
+    """Perfilador do processo, configurado pelas variáveis de ambiente."""
+    global _perfilador
+    with _perfilador_lock:
+        if _perfilador is None:
+            _perfilador = RequestProfiler.from_env()
+        return _perfilador
+
+
+def perfilar(nome):
+    """
+    Decorador para pontos de entrada de verificação.
+
+    Exemplo:
+        @perfilar('verificacao_par')
+        def verificar_assinaturas(self, img1, img2): ...
+    """
+    def decorador(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with obter_perfilador().perfilar(nome):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorador
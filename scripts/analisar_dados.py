@@ -1,158 +1,117 @@
 #!/usr/bin/env python3
 """
 Script para analisar problemas nos dados de treinamento.
+Verifica todas as imagens em paralelo (dimensões, decodificação, nitidez,
+tinta, duplicatas) e grava um relatório JSON. Métricas ficam em cache por
+arquivo: rodar de novo só decodifica o que mudou.
+
+Exemplo:
+    python scripts/analisar_dados.py
+    python scripts/analisar_dados.py --pasta dataset_processado --saida relatorio.json
 """
 
+import argparse
+import json
 import os
 import sys
 from pathlib import Path
-import numpy as np
 
 # Adicionar diretório pai ao path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
-from data_preprocessing import preprocess_image
+from dataset_health import DEFAULT_CACHE_PATH, LADO_MINIMO, NITIDEZ_MINIMA, DatasetHealthScanner
+from near_duplicates import DEFAULT_LIMITE
 
-def analisar_dataset():
-    """Analisa a estrutura do dataset para identificar problemas."""
-    
-    print("🔍 ANÁLISE DO DATASET")
-    print("=" * 50)
-    
-    data_dir = Path("assinaturas_reais")
-    
-    if not data_dir.exists():
-        print("❌ Pasta assinaturas_reais não encontrada")
-        return
-    
-    pessoas = []
-    total_imagens = 0
-    problemas = []
-    
-    for pessoa_dir in data_dir.iterdir():
-        if not pessoa_dir.is_dir():
-            continue
-        
-        pessoa_name = pessoa_dir.name
-        pessoa_images = list(pessoa_dir.glob("*.png")) + list(pessoa_dir.glob("*.jpg"))
-        num_images = len(pessoa_images)
-        
-        pessoas.append({
-            'nome': pessoa_name,
-            'num_imagens': num_images,
-            'images': pessoa_images
-        })
-        
-        total_imagens += num_images
-        
-        print(f"👤 {pessoa_name}: {num_images} imagens")
-        
-        # Verificar se há imagens suficientes para pares positivos
-        if num_images < 2:
-            problemas.append(f"❌ {pessoa_name}: Apenas {num_images} imagem(ns) - Impossível criar pares positivos")
-        elif num_images < 5:
-            problemas.append(f"⚠️ {pessoa_name}: Apenas {num_images} imagens - Poucos pares positivos")
-    
-    print(f"\n📊 Resumo:")
-    print(f"   Total de pessoas: {len(pessoas)}")
-    print(f"   Total de imagens: {total_imagens}")
-    
-    # Calcular pares que serão criados
-    pares_positivos = 0
-    pares_negativos = 0
-    
-    for pessoa in pessoas:
-        n = pessoa['num_imagens']
-        # Pares positivos: C(n,2) = n*(n-1)/2
-        pares_pos_pessoa = n * (n - 1) // 2
-        pares_positivos += pares_pos_pessoa
-        
-        print(f"   {pessoa['nome']}: {pares_pos_pessoa} pares positivos")
-        
-        # Pares negativos: para cada pessoa, 3x3 com cada outra pessoa
-        for outra_pessoa in pessoas:
-            if pessoa['nome'] != outra_pessoa['nome']:
-                pares_neg = min(3, n) * min(3, outra_pessoa['num_imagens'])
-                pares_negativos += pares_neg
-    
-    print(f"\n🔗 Pares de treinamento:")
-    print(f"   Pares positivos (mesma pessoa): {pares_positivos}")
-    print(f"   Pares negativos (pessoas diferentes): {pares_negativos}")
-    print(f"   Total de pares: {pares_positivos + pares_negativos}")
-    
-    # Verificar balanceamento
-    if pares_positivos == 0:
-        problemas.append("❌ CRÍTICO: Nenhum par positivo será criado!")
-    elif pares_negativos / pares_positivos > 10:
-        problemas.append(f"⚠️ Dataset desbalanceado: {pares_negativos/pares_positivos:.1f}x mais pares negativos")
-    
-    # Exibir problemas
-    if problemas:
+DESCRICAO_ALERTAS = {
+    'ilegivel': "não decodifica",
+    'pequena': "resolução baixa",
+    'desfocada': "desfocada",
+    'sem_tinta': "sem tinta visível",
+    'tinta_excessiva': "tinta demais (fundo escuro/sombra?)",
+    'duplicata_exata': "arquivo repetido",
+    'quase_duplicata': "quase igual a outra da mesma pessoa",
+    'igual_outra_pessoa': "quase igual a uma de OUTRA pessoa (rótulo errado?)",
+}
+
+
+def imprimir_relatorio(relatorio, max_exemplos):
+    print(f"📂 {relatorio['pasta']}: {relatorio['total_imagens']} imagens de {relatorio['total_pessoas']} pessoas")
+    print(f"⏱️ {relatorio['segundos']:.1f}s ({relatorio['decodificadas']} decodificadas, "
+          f"{relatorio['em_cache']} do cache)")
+
+    print(f"\n👥 Por pessoa:")
+    for nome, pessoa in relatorio['pessoas'].items():
+        extra = f" | ⚠️ {pessoa['com_problemas']} com alertas" if pessoa['com_problemas'] else ""
+        print(f"   👤 {nome}: {pessoa['imagens']} imagens ({pessoa['validas']} válidas){extra}")
+
+    pares = relatorio['pares']
+    print(f"\n🔗 Pares de treinamento (estimativa):")
+    print(f"   Positivos (mesma pessoa): {pares['positivos']}")
+    print(f"   Negativos (pessoas diferentes): {pares['negativos']}")
+
+    if relatorio['alertas']:
+        print(f"\n🩺 Alertas por imagem:")
+        for alerta, quantidade in sorted(relatorio['alertas'].items(), key=lambda item: -item[1]):
+            print(f"   {quantidade:>6}  {DESCRICAO_ALERTAS.get(alerta, alerta)}")
+        for img in relatorio['imagens_com_problemas'][:max_exemplos]:
+            detalhe = f" ~ {img['igual_a']}" if 'igual_a' in img else ""
+            print(f"   📄 {img['nome']}: {', '.join(img['problemas'])}{detalhe}")
+        restantes = len(relatorio['imagens_com_problemas']) - max_exemplos
+        if restantes > 0:
+            print(f"   ... e mais {restantes} (ver relatório JSON)")
+
+    if relatorio['problemas_dataset']:
         print(f"\n⚠️ PROBLEMAS DETECTADOS:")
-        for problema in problemas:
+        for problema in relatorio['problemas_dataset']:
             print(f"   {problema}")
-    else:
+    elif not relatorio['alertas']:
         print(f"\n✅ Dataset parece estar bem estruturado!")
-    
-    # Recomendações
-    print(f"\n💡 RECOMENDAÇÕES:")
-    
-    if pares_positivos < 20:
-        print(f"   📈 Adicione mais assinaturas por pessoa (ideal: 5-10 por pessoa)")
-    
-    if len(pessoas) < 3:
-        print(f"   👥 Adicione mais pessoas diferentes (ideal: 3-5 pessoas)")
-    
-    print(f"   📁 Estrutura ideal:")
-    print(f"      assinaturas_reais/")
-    print(f"      ├── pessoa_A/")
-    print(f"      │   ├── assinatura1.png")
-    print(f"      │   ├── assinatura2.png") 
-    print(f"      │   └── assinatura3.png")
-    print(f"      ├── pessoa_B/")
-    print(f"      │   ├── assinatura1.png")
-    print(f"      │   └── assinatura2.png")
-    print(f"      └── pessoa_C/...")
-    
-    return pessoas, problemas
-
-def verificar_qualidade_dados():
-    """Verifica se todas as pessoas têm realmente assinaturas da mesma pessoa."""
-    
-    print(f"\n🔬 VERIFICAÇÃO DE QUALIDADE DOS DADOS")
-    print("=" * 50)
-    
-    print(f"⚠️  IMPORTANTE: Este script não pode verificar automaticamente se")
-    print(f"   as assinaturas dentro de cada pasta são realmente da mesma pessoa.")
-    print(f"   Você precisa verificar manualmente:")
-    
-    data_dir = Path("assinaturas_reais")
-    
-    for pessoa_dir in data_dir.iterdir():
-        if not pessoa_dir.is_dir():
-            continue
-        
-        pessoa_name = pessoa_dir.name
-        pessoa_images = list(pessoa_dir.glob("*.png")) + list(pessoa_dir.glob("*.jpg"))
-        
-        print(f"\n👤 {pessoa_name}:")
-        for img_path in pessoa_images:
-            print(f"   📄 {img_path.name}")
-        
-        print(f"   ❓ Todas essas assinaturas são da MESMA pessoa?")
-    
-    print(f"\n💡 Se NÃO:")
-    print(f"   1. Reorganize as pastas por pessoa real")
-    print(f"   2. Retreine o modelo: python scripts/treinar_modelo.py")
-    print(f"   3. Reavalie: python scripts/avaliar_modelo.py")
+
 
 def main():
-    pessoas, problemas = analisar_dataset()
-    verificar_qualidade_dados()
-    
-    if problemas:
-        print(f"\n🚨 AÇÃO NECESSÁRIA:")
-        print(f"   Corrija os problemas identificados antes de treinar novamente!")
+    parser = argparse.ArgumentParser(description="Analisa a saúde do dataset de assinaturas")
+    parser.add_argument("--pasta", default="assinaturas_reais", help="Pasta com uma subpasta por pessoa")
+    parser.add_argument("--saida", default="resultados_avaliacao/analise_dados.json")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH)
+    parser.add_argument("--sem-cache", action="store_true", help="Decodifica todas as imagens de novo")
+    parser.add_argument("--workers", type=int, default=None, help="Threads (padrão: 2x CPUs, máx. 32)")
+    parser.add_argument("--lado-minimo", type=int, default=LADO_MINIMO)
+    parser.add_argument("--nitidez-minima", type=float, default=NITIDEZ_MINIMA)
+    parser.add_argument("--limite-hash", type=int, default=DEFAULT_LIMITE,
+                        help="Distância de Hamming das quase-duplicatas")
+    parser.add_argument("--exemplos", type=int, default=10, help="Imagens com alerta mostradas no terminal")
+    args = parser.parse_args()
+
+    print("🔍 ANÁLISE DO DATASET")
+    print("=" * 50)
+
+    if not Path(args.pasta).exists():
+        print(f"❌ Pasta {args.pasta} não encontrada")
+        return
+
+    scanner = DatasetHealthScanner(args.pasta, cache_path=None if args.sem_cache else args.cache,
+                                   workers=args.workers, lado_minimo=args.lado_minimo,
+                                   nitidez_minima=args.nitidez_minima, limite_hash=args.limite_hash)
+    relatorio = scanner.varrer()
+    imprimir_relatorio(relatorio, args.exemplos)
+
+    Path(args.saida).parent.mkdir(parents=True, exist_ok=True)
+    with open(args.saida, "w") as f:
+        json.dump(relatorio, f, indent=2, ensure_ascii=False)
+    print(f"\n💾 Relatório salvo em: {args.saida}")
+
+    if relatorio['problemas_dataset'] or relatorio['alertas']:
+        print(f"\n💡 RECOMENDAÇÕES:")
+        if relatorio['pares']['positivos'] < 20:
+            print(f"   📈 Adicione mais assinaturas por pessoa (ideal: 5-10 por pessoa)")
+        if relatorio['total_pessoas'] < 3:
+            print(f"   👥 Adicione mais pessoas diferentes (ideal: 3-5 pessoas)")
+        if relatorio['alertas'].get('igual_outra_pessoa'):
+            print(f"   🏷️ Confira as imagens 'igual_outra_pessoa': podem estar na pasta errada")
+        if relatorio['alertas'].get('quase_duplicata') or relatorio['alertas'].get('duplicata_exata'):
+            print(f"   ♻️ Duplicatas: python scripts/detectar_duplicatas.py --excluir")
+        print(f"   🔁 Depois de corrigir: python scripts/preparar_dataset.py && python scripts/treinar_modelo.py")
+
 
 if __name__ == "__main__":
     main()
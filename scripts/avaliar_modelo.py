@@ -14,7 +14,7 @@ from sklearn.metrics import classification_report, confusion_matrix
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 from data_preprocessing import preprocess_image
-from model import euclidean_distance, contrastive_loss
+from model import euclidean_distance, contrastive_loss, prepare_model_input
 
 class ModelEvaluator:
     def __init__(self, model_path="modelos/modelo_assinaturas_manuscritas.h5", 
@@ -72,7 +72,7 @@ class ModelEvaluator:
             
             for img_path in pessoa_images:
                 try:
-                    img = preprocess_image(str(img_path))
+                    img = preprocess_image(str(img_path), dtype=np.uint8)
                     if img.ndim == 2:
                         img = np.expand_dims(img, axis=-1)
                     images.append(img)
@@ -178,7 +178,8 @@ class ModelEvaluator:
         print(f"\n🔮 Executando predições...")
         
         # O modelo siamês retorna a distância diretamente
-        distancias = self.model.predict([pairs_a, pairs_b], verbose=0)
+        distancias = self.model.predict(
+            [prepare_model_input(self.model, pairs_a), prepare_model_input(self.model, pairs_b)], verbose=0)
         
         # Se retorna array 2D, pegar a primeira coluna
         if distancias.ndim > 1:
@@ -233,12 +234,14 @@ class ModelEvaluator:
         resultados_dir = Path("resultados_avaliacao")
         resultados_dir.mkdir(exist_ok=True)
         
-        # Salvar threshold ótimo
-        with open(resultados_dir / "threshold_otimo.txt", "w") as f:
+        # Salvar threshold ótimo (escrita atômica, lido a quente pelos apps)
+        temp_path = resultados_dir / "threshold_otimo.txt.tmp"
+        with open(temp_path, "w") as f:
             f.write(f"{threshold_otimo:.4f}\n")
+        os.replace(temp_path, resultados_dir / "threshold_otimo.txt")
         
         print(f"💾 Threshold ótimo salvo em: resultados_avaliacao/threshold_otimo.txt")
-        print(f"💡 Use este valor no app.py para melhor performance!")
+        print(f"💡 Os apps em execução aplicam o novo threshold automaticamente")
         
         return threshold_otimo
 
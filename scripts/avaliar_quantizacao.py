@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Script para calibrar e avaliar a quantização escalar dos embeddings.
+Calcula embeddings do dataset, calibra a faixa de cada dimensão com a
+metade de treino e mede, na outra metade:
+- memória por referência (float32, float16, int8)
+- F1 "mesma pessoa" no threshold calibrado, com distâncias quantizadas
+- tempo de busca 1:N numa galeria ampliada e concordância do top-1 com a
+  busca exata, com e sem reordenação exata dos melhores candidatos
+
+Exemplo:
+    python scripts/avaliar_quantizacao.py
+    python scripts/avaliar_quantizacao.py --galeria-busca 500000 --rerank 100 --salvar
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Adicionar diretório pai ao path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from data_preprocessing import preprocess_image
+from dataset_shards import DEFAULT_SHARDS_DIR, ShardedDataset, has_manifest
+from embedding_quantization import DEFAULT_QUANTIZATION_PATH, ScalarQuantizer
+from model import compute_embeddings, get_embedding_network, load_model_with_custom_objects
+from model_registry import DEFAULT_MODEL_PATH, DEFAULT_THRESHOLD_PATH, read_threshold
+from verification_cache import file_fingerprint
+
+
+def carregar_imagens(dados, shards, max_imagens, rng):
+    """Imagens preprocessadas (uint8) e pessoas, amostradas até `max_imagens`."""
+    if has_manifest(shards):
+        imagens, labels = ShardedDataset(shards).carregar(dtype=np.uint8)
+    else:
+        paths = sorted(Path(dados).glob("*/*.png"))
+        if len(paths) > max_imagens:
+            paths = [paths[i] for i in sorted(rng.choice(len(paths), max_imagens, replace=False))]
+        imagens = np.stack([preprocess_image(str(p), dtype=np.uint8) for p in paths]) if paths else np.zeros(0)
+        labels = np.array([p.parent.name for p in paths])
+    if len(labels) > max_imagens:
+        selecao = np.sort(rng.choice(len(labels), max_imagens, replace=False))
+        imagens, labels = imagens[selecao], labels[selecao]
+    if imagens.ndim == 3:
+        imagens = imagens[..., None]
+    return imagens, labels
+
+
+def f1_mesma_pessoa(distancias, mesma, threshold):
+    """F1 da decisão "mesma pessoa" (distância <= threshold), como em avaliar_pares."""
+    previsto = distancias <= threshold
+    tp = np.sum(previsto & mesma)
+    fp = np.sum(previsto & ~mesma)
+    fn = np.sum(~previsto & mesma)
+    return float(2 * tp / (2 * tp + fp + fn)) if tp > 0 else 0.0
+
+
+def distancias_pares(quantizador, embeddings):
+    """Distâncias de todos os pares i < j, com a galeria quantizada."""
+    codigos = quantizador.quantizar(embeddings)
+    normas = quantizador.normas(codigos)
+    partes = [quantizador.distancias(embeddings[i], codigos[i + 1:], normas[i + 1:])
+              for i in range(len(embeddings) - 1)]
+    return np.concatenate(partes) if partes else np.zeros(0, dtype=np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibra e avalia embeddings quantizados")
+    parser.add_argument("--modelo", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--dados", default="dataset_processado")
+    parser.add_argument("--shards", default=DEFAULT_SHARDS_DIR)
+    parser.add_argument("--max-imagens", type=int, default=3000)
+    parser.add_argument("--threshold", type=float, default=None, help=f"Padrão: {DEFAULT_THRESHOLD_PATH}")
+    parser.add_argument("--percentil", type=float, default=99.9, help="Saturação da faixa int8 por dimensão")
+    parser.add_argument("--galeria-busca", type=int, default=200000, help="Linhas da galeria usada na medição de tempo")
+    parser.add_argument("--consultas", type=int, default=50)
+    parser.add_argument("--rerank", type=int, default=50, help="Linhas reordenadas com a distância exata")
+    parser.add_argument("--salvar", action="store_true", help=f"Grava a calibração int8 em {DEFAULT_QUANTIZATION_PATH}")
+    parser.add_argument("--saida", default="resultados_avaliacao/quantizacao.json")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print("🗜️ AVALIAÇÃO DA QUANTIZAÇÃO DE EMBEDDINGS")
+    print("=" * 50)
+
+    if not Path(args.modelo).exists():
+        print(f"❌ Modelo não encontrado em {args.modelo}")
+        return
+
+    rng = np.random.default_rng(args.seed)
+    imagens, labels = carregar_imagens(args.dados, args.shards, args.max_imagens, rng)
+    if len(set(labels)) < 2:
+        print(f"❌ São necessárias pelo menos 2 pessoas em {args.shards} ou {args.dados}")
+        return
+
+    threshold = args.threshold
+    if threshold is None:
+        threshold, _ = read_threshold(DEFAULT_THRESHOLD_PATH)
+    fingerprint = file_fingerprint(args.modelo)
+    rede = get_embedding_network(load_model_with_custom_objects(args.modelo))
+    print(f"🧠 Calculando embeddings de {len(imagens)} imagens...")
+    embeddings = compute_embeddings(rede, imagens)
+    dim = embeddings.shape[1]
+
+    # Metade para calibrar a faixa, metade para avaliar
+    ordem = rng.permutation(len(embeddings))
+    calibracao, avaliacao = ordem[:len(ordem) // 2], np.sort(ordem[len(ordem) // 2:])
+    aval, aval_labels = embeddings[avaliacao], labels[avaliacao]
+    i, j = np.triu_indices(len(aval), k=1)
+    mesma = aval_labels[i] == aval_labels[j]
+    print(f"🔢 Calibração: {len(calibracao)} | Avaliação: {len(aval)} ({len(mesma)} pares) | "
+          f"Threshold: {threshold:.4f}")
+
+    quantizadores = {modo: ScalarQuantizer.calibrar(embeddings[calibracao], modo, args.percentil, fingerprint)
+                     for modo in ("float32", "float16", "int8")}
+
+    # Galeria ampliada para medir tempo: avaliação repetida com ruído pequeno
+    repeticoes = max(1, args.galeria_busca // len(aval))
+    galeria = np.concatenate([aval + rng.normal(0, 0.01, aval.shape).astype(np.float32)
+                              for _ in range(repeticoes)])
+    consultas = aval[rng.choice(len(aval), min(args.consultas, len(aval)), replace=False)]
+    exato = quantizadores["float32"]
+    normas_exatas = exato.normas(galeria)
+    top1_exato = [int(np.argmin(exato.distancias(q, galeria, normas_exatas))) for q in consultas]
+
+    relatorio = {'threshold': threshold, 'dim': dim, 'pares': int(len(mesma)),
+                 'galeria_busca': int(len(galeria)), 'modos': {}}
+    print(f"\n{'modo':>8} {'bytes':>6} {'F1':>7} {'ΔF1':>7} {'ms/busca':>9} {'speedup':>8} "
+          f"{'top1':>6} {'top1+rr':>8}")
+    base_f1, base_ms = None, None
+    for modo, quantizador in quantizadores.items():
+        f1 = f1_mesma_pessoa(distancias_pares(quantizador, aval), mesma, threshold)
+
+        codigos = quantizador.quantizar(galeria)
+        normas = quantizador.normas(codigos)
+        quantizador.distancias(consultas[0], codigos, normas)  # aquecimento
+        inicio = time.perf_counter()
+        todas = [quantizador.distancias(q, codigos, normas) for q in consultas]
+        ms = 1000 * (time.perf_counter() - inicio) / len(consultas)
+
+        acertos, acertos_rr = 0, 0
+        for q, d, alvo in zip(consultas, todas, top1_exato):
+            acertos += int(np.argmin(d)) == alvo
+            m = min(args.rerank, len(d))
+            candidatos = np.argpartition(d, m - 1)[:m]
+            exatas = exato.distancias(q, galeria[candidatos], normas_exatas[candidatos])
+            acertos_rr += int(candidatos[np.argmin(exatas)]) == alvo
+
+        base_f1 = f1 if base_f1 is None else base_f1
+        base_ms = ms if base_ms is None else base_ms
+        relatorio['modos'][modo] = {
+            'bytes_por_vetor': quantizador.bytes_por_vetor(dim),
+            'mb_por_milhao': quantizador.bytes_por_vetor(dim) * 1e6 / 2 ** 20,
+            'f1': f1, 'delta_f1': f1 - base_f1,
+            'ms_por_busca': ms, 'speedup': base_ms / ms,
+            'top1_igual_exato': acertos / len(consultas),
+            'top1_igual_exato_rerank': acertos_rr / len(consultas)
+        }
+        r = relatorio['modos'][modo]
+        print(f"{modo:>8} {r['bytes_por_vetor']:>6} {f1:>7.4f} {r['delta_f1']:>+7.4f} {ms:>9.2f} "
+              f"{r['speedup']:>7.2f}x {r['top1_igual_exato']:>6.2f} {r['top1_igual_exato_rerank']:>8.2f}")
+
+    print(f"\n💾 Memória por milhão de referências: " + ", ".join(
+        f"{modo} {r['mb_por_milhao']:.0f} MB" for modo, r in relatorio['modos'].items()))
+    print(f"   (top1: consultas em que a busca quantizada acha a mesma linha que a exata; "
+          f"+rr: reordenando as {args.rerank} melhores em float)")
+
+    Path(args.saida).parent.mkdir(parents=True, exist_ok=True)
+    with open(args.saida, "w") as f:
+        json.dump(relatorio, f, indent=2)
+    print(f"💾 Relatório salvo em: {args.saida}")
+
+    if args.salvar:
+        path = quantizadores["int8"].salvar(DEFAULT_QUANTIZATION_PATH)
+        print(f"✅ Calibração int8 salva em: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Script para medir a perda de recall da triagem de candidatos (1:N) em
+relação à busca exaustiva com o modelo siamês completo.
+
+Cada assinatura da galeria é usada como consulta contra as demais
+(leave-one-out). Para cada tamanho de lista curta informa:
+- recall: fração das consultas em que a pessoa vencedora da busca exaustiva
+  está na lista curta (1.0 = nenhuma perda)
+- chamadas ao modelo completo por consulta, comparadas à busca exaustiva
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Adicionar diretório pai ao path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from data_preprocessing import preprocess_image
+from model import load_model_with_custom_objects, prepare_model_input
+from candidate_pruning import CandidateIndex
+
+
+def carregar_galeria(pasta):
+    """Carrega e preprocessa todas as referências da galeria."""
+    referencias = {}
+    for pessoa_dir in sorted(Path(pasta).iterdir()):
+        if not pessoa_dir.is_dir():
+            continue
+        paths = sorted(list(pessoa_dir.glob("*.png")) + list(pessoa_dir.glob("*.jpg")))
+        if paths:
+            referencias[pessoa_dir.name] = np.stack([preprocess_image(str(p), dtype=np.uint8) for p in paths])
+    return referencias
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Avalia a triagem de candidatos contra a busca exaustiva")
+    parser.add_argument("--pasta", default="assinaturas_reais", help="Galeria de assinaturas registradas")
+    parser.add_argument("--modelo", default="modelos/modelo_assinaturas_manuscritas.h5")
+    parser.add_argument("--shortlists", type=int, nargs="+", default=[1, 5, 10, 20, 50])
+    parser.add_argument("--consultas", type=int, default=200, help="Máximo de consultas (amostradas)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print("🔎 AVALIAÇÃO DA TRIAGEM DE CANDIDATOS")
+    print("=" * 50)
+
+    if not Path(args.modelo).exists():
+        print(f"❌ Modelo não encontrado em {args.modelo}")
+        return
+
+    model = load_model_with_custom_objects(args.modelo)
+    referencias = carregar_galeria(args.pasta)
+    if len(referencias) < 2:
+        print(f"❌ São necessárias pelo menos 2 pessoas em {args.pasta}")
+        return
+
+    indice = CandidateIndex.from_images(referencias)
+    galeria = prepare_model_input(model, np.concatenate(list(referencias.values())))
+    donos = indice.owners
+    tamanhos = np.bincount(donos, minlength=len(indice.persons))
+    tamanho_pessoa = dict(zip(indice.persons, tamanhos))
+    print(f"👥 {len(indice.persons)} pessoas, {len(galeria)} referências")
+
+    # Consultas: referências de pessoas com pelo menos 2 amostras
+    candidatas = [i for i in range(len(galeria)) if tamanhos[donos[i]] > 1]
+    rng = np.random.default_rng(args.seed)
+    if len(candidatas) > args.consultas:
+        candidatas = sorted(rng.choice(candidatas, args.consultas, replace=False))
+
+    # Busca exaustiva com o modelo completo
+    print(f"\n🧠 Busca exaustiva para {len(candidatas)} consultas...")
+    inicio = time.perf_counter()
+    vencedores = []
+    for i in candidatas:
+        consulta = np.repeat(galeria[i:i + 1], len(galeria), axis=0)
+        distancias = np.asarray(model.predict([consulta, galeria], batch_size=128, verbose=0)).reshape(-1)
+        distancias[i] = np.inf
+        por_pessoa = np.full(len(indice.persons), np.inf)
+        np.minimum.at(por_pessoa, donos, distancias)
+        vencedores.append(indice.persons[int(np.argmin(por_pessoa))])
+    tempo_exaustivo = (time.perf_counter() - inicio) / len(candidatas)
+
+    verdadeiros = [indice.persons[donos[i]] for i in candidatas]
+    acerto_exaustivo = np.mean([v == t for v, t in zip(vencedores, verdadeiros)])
+    print(f"   Acerto top-1 exaustivo: {acerto_exaustivo:.3f}")
+    print(f"   Chamadas ao modelo por consulta: {len(galeria) - 1}")
+    print(f"   Tempo médio por consulta: {tempo_exaustivo * 1000:.1f} ms")
+
+    # Triagem para cada tamanho de lista curta
+    relatorio = {
+        'pessoas': len(indice.persons),
+        'referencias': int(len(galeria)),
+        'consultas': len(candidatas),
+        'acerto_top1_exaustivo': float(acerto_exaustivo),
+        'chamadas_exaustivas': int(len(galeria) - 1),
+        'shortlists': []
+    }
+
+    print(f"\n📊 Triagem:")
+    for k in args.shortlists:
+        hits_exaustivo = 0
+        hits_verdadeiro = 0
+        chamadas = 0
+        inicio = time.perf_counter()
+        for i, vencedor, verdadeiro in zip(candidatas, vencedores, verdadeiros):
+            lista = indice.shortlist(galeria[i], k, exclude=i)
+            hits_exaustivo += vencedor in lista
+            hits_verdadeiro += verdadeiro in lista
+            chamadas += sum(tamanho_pessoa[p] for p in lista) - (verdadeiro in lista)
+        tempo_triagem = (time.perf_counter() - inicio) / len(candidatas)
+
+        resultado = {
+            'k': k,
+            'recall_vs_exaustivo': hits_exaustivo / len(candidatas),
+            'recall_pessoa_verdadeira': hits_verdadeiro / len(candidatas),
+            'chamadas_modelo_por_consulta': chamadas / len(candidatas),
+            'tempo_triagem_ms': tempo_triagem * 1000
+        }
+        relatorio['shortlists'].append(resultado)
+        print(f"   k={k:3d} | recall vs exaustivo: {resultado['recall_vs_exaustivo']:.3f} "
+              f"| recall pessoa: {resultado['recall_pessoa_verdadeira']:.3f} "
+              f"| chamadas: {resultado['chamadas_modelo_por_consulta']:.1f} "
+              f"| triagem: {resultado['tempo_triagem_ms']:.2f} ms")
+
+    resultados_dir = Path("resultados_avaliacao")
+    resultados_dir.mkdir(exist_ok=True)
+    with open(resultados_dir / "triagem.json", "w") as f:
+        json.dump(relatorio, f, indent=2)
+
+    print(f"\n💾 Relatório salvo em: resultados_avaliacao/triagem.json")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Benchmark da decodificação em resolução reduzida de fotos de telefone.
+Compara o caminho antigo (decodificar o quadro inteiro com PIL, converter para
+NumPy, aplicar mediana/equalização e só então reduzir) com `decode_reduced`.
+
+Exemplo:
+    python scripts/benchmark_decodificacao.py foto1.jpg foto2.jpg
+    python scripts/benchmark_decodificacao.py --sintetica 4000x3000
+"""
+
+import argparse
+import io
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+from PIL import Image
+
+# Adicionar diretório pai ao path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from data_preprocessing import decode_reduced, preprocess_phone_image, resize_image
+
+
+def caminho_completo(data):
+    """Pipeline anterior: tudo na resolução cheia."""
+    img_array = np.array(Image.open(io.BytesIO(data)).convert('L'))
+    img_array = cv2.medianBlur(img_array, 3)
+    img_array = cv2.equalizeHist(img_array)
+    _, binaria = cv2.threshold(img_array, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    return resize_image(binaria), img_array.size
+
+
+def foto_sintetica(tamanho):
+    """JPEG com traços escuros sobre papel claro no tamanho pedido."""
+    largura, altura = tamanho
+    rng = np.random.default_rng(0)
+    img = np.full((altura, largura), 225, dtype=np.uint8)
+    pontos = rng.integers(0, [largura, altura], size=(40, 2))
+    cv2.polylines(img, [pontos.reshape(-1, 1, 2).astype(np.int32)], False, 30, max(2, largura // 400))
+    img = cv2.add(img, rng.integers(0, 20, img.shape, dtype=np.uint8))
+    ok, dados = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    return dados.tobytes()
+
+
+def medir(func, repeticoes):
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = func()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da decodificação reduzida")
+    parser.add_argument("imagens", nargs="*")
+    parser.add_argument("--sintetica", default="4000x3000", help="Tamanho da foto sintética (LxA)")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args()
+
+    print("📷 BENCHMARK DE DECODIFICAÇÃO")
+    print("=" * 50)
+
+    entradas = [(p, open(p, "rb").read()) for p in args.imagens]
+    if not entradas:
+        tamanho = tuple(int(v) for v in args.sintetica.lower().split("x"))
+        entradas = [(f"sintética {args.sintetica}", foto_sintetica(tamanho))]
+
+    for nome, data in entradas:
+        t_completo, (ref, pixels_completo) = medir(lambda: caminho_completo(data), args.repeticoes)
+        t_reduzido, (novo, _) = medir(lambda: preprocess_phone_image(io.BytesIO(data)), args.repeticoes)
+        pixels_reduzido = decode_reduced(io.BytesIO(data)).size
+        concordancia = float(np.mean((ref > 127) == (novo > 127)))
+
+        print(f"\n🖼️ {nome}")
+        print(f"   Resolução cheia: {t_completo * 1000:8.1f} ms | {pixels_completo / 1e6:6.2f} MP processados")
+        print(f"   Reduzida:        {t_reduzido * 1000:8.1f} ms | {pixels_reduzido / 1e6:6.2f} MP processados")
+        print(f"   Ganho: {t_completo / t_reduzido:.1f}x tempo, {pixels_completo / pixels_reduzido:.1f}x pixels")
+        print(f"   Pixels iguais na saída 220x155: {concordancia:.2%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark de escalabilidade do pool de inferência multiprocesso.
+Mede a vazão (imagens/s) do cálculo de embeddings para diferentes números de
+workers e threads por worker, comparando com a inferência em um único processo.
+
+Exemplo:
+    python scripts/benchmark_pool.py --workers 1 2 4 8 16 --threads 1 --imagens 4096
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Adicionar diretório pai ao path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from inference_pool import InferencePool, INPUT_SHAPE
+
+
+def gerar_imagens(n, seed=42):
+    """Imagens binarizadas aleatórias no formato do modelo (conteúdo não afeta o custo)."""
+    rng = np.random.default_rng(seed)
+    return ((rng.random((n,) + INPUT_SHAPE) < 0.08) * 255).astype(np.uint8)
+
+
+def medir_processo_unico(imagens, model_path, batch_size):
+    """Vazão da inferência no próprio processo (referência)."""
+    from model import build_base_network, load_model_with_custom_objects, get_embedding_network, prepare_model_input
+
+    if model_path:
+        rede = get_embedding_network(load_model_with_custom_objects(model_path))
+    else:
+        rede = build_base_network(INPUT_SHAPE)
+    imagens = prepare_model_input(rede, imagens)
+    rede.predict(imagens[:batch_size], verbose=0)  # aquecimento
+
+    inicio = time.perf_counter()
+    rede.predict(imagens, batch_size=batch_size, verbose=0)
+    return len(imagens) / (time.perf_counter() - inicio)
+
+
+def medir_pool(imagens, n_workers, threads, model_path, batch_size, repeticoes):
+    """Vazão do pool com `n_workers` processos."""
+    with InferencePool(n_workers, model_path, threads_por_worker=threads, max_batch=batch_size) as pool:
+        pool.embed(imagens[:batch_size * n_workers])  # aquecimento
+        melhor = 0.0
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            pool.embed(imagens)
+            melhor = max(melhor, len(imagens) / (time.perf_counter() - inicio))
+        return melhor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do pool de inferência multiprocesso")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1], help="Threads por worker")
+    parser.add_argument("--imagens", type=int, default=2048)
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--modelo", default=None,
+                        help="Modelo salvo (padrão: pesos aleatórios, mesmo custo de inferência)")
+    parser.add_argument("--saida", default="resultados_avaliacao/benchmark_pool.json")
+    args = parser.parse_args()
+
+    print("🏎️ BENCHMARK DO POOL DE INFERÊNCIA")
+    print("=" * 50)
+    print(f"   CPUs: {os.cpu_count()} | Imagens: {args.imagens} | Lote: {args.batch}")
+
+    imagens = gerar_imagens(args.imagens)
+
+    base = medir_processo_unico(imagens, args.modelo, args.batch)
+    print(f"\n📏 Processo único: {base:.1f} imagens/s")
+
+    resultados = {'cpus': os.cpu_count(), 'processo_unico': base, 'pool': []}
+    print(f"\n{'workers':>8} {'threads':>8} {'imagens/s':>12} {'speedup':>8}")
+    for threads in args.threads:
+        for n_workers in args.workers:
+            vazao = medir_pool(imagens, n_workers, threads, args.modelo, args.batch, args.repeticoes)
+            resultados['pool'].append({
+                'workers': n_workers,
+                'threads_por_worker': threads,
+                'imagens_por_segundo': vazao,
+                'speedup': vazao / base
+            })
+            print(f"{n_workers:>8} {threads:>8} {vazao:>12.1f} {vazao / base:>7.2f}x")
+
+    Path(args.saida).parent.mkdir(parents=True, exist_ok=True)
+    with open(args.saida, "w") as f:
+        json.dump(resultados, f, indent=2)
+    print(f"\n💾 Resultados salvos em: {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
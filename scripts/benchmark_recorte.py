@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark do recorte automático da região com tinta.
+Mede tempo, pico de memória (arrays NumPy/OpenCV, via tracemalloc) e a fração
+da imagem 220x155 ocupada pela assinatura, com e sem recorte, para o
+preprocessamento de arquivos (preprocess_image) e de fotos (preprocess_phone_image).
+
+Exemplo:
+    python scripts/benchmark_recorte.py pagina1.jpg foto2.jpg
+    python scripts/benchmark_recorte.py --sintetica 4000x3000
+"""
+
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+# Adicionar diretório pai ao path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from data_preprocessing import preprocess_image, preprocess_phone_image
+
+
+def pagina_sintetica(tamanho, seed=0):
+    """Página clara com uma assinatura pequena perto do canto inferior direito."""
+    largura, altura = tamanho
+    rng = np.random.default_rng(seed)
+    pagina = np.full((altura, largura), 230, dtype=np.uint8)
+    x0, y0 = int(largura * 0.6), int(altura * 0.75)
+    pontos = np.column_stack([
+        rng.integers(x0, x0 + largura // 5, 30),
+        rng.integers(y0, y0 + altura // 12, 30)
+    ])
+    cv2.polylines(pagina, [pontos.reshape(-1, 1, 2).astype(np.int32)], False, 25, max(2, largura // 600))
+    return cv2.add(pagina, rng.integers(0, 15, pagina.shape, dtype=np.uint8))
+
+
+def medir(func, repeticoes):
+    """Melhor tempo e pico de memória rastreada de `func`."""
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = func()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    tracemalloc.start()
+    func()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return melhor, pico, resultado
+
+
+def fracao_tinta(img):
+    return float(np.mean(np.asarray(img) > 127))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do recorte da região com tinta")
+    parser.add_argument("imagens", nargs="*")
+    parser.add_argument("--sintetica", default="4000x3000", help="Tamanho da página sintética (LxA)")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args()
+
+    print("✂️ BENCHMARK DO RECORTE AUTOMÁTICO")
+    print("=" * 50)
+
+    temporarios = []
+    paths = list(args.imagens)
+    if not paths:
+        tamanho = tuple(int(v) for v in args.sintetica.lower().split("x"))
+        arquivo = tempfile.NamedTemporaryFile(suffix=".jpg", delete=False)
+        arquivo.close()
+        cv2.imwrite(arquivo.name, pagina_sintetica(tamanho), [cv2.IMWRITE_JPEG_QUALITY, 90])
+        paths = [arquivo.name]
+        temporarios.append(arquivo.name)
+
+    try:
+        for path in paths:
+            with open(path, "rb") as f:
+                data = f.read()
+            print(f"\n🖼️ {path}")
+            print(f"   {'caminho':<22} {'recorte':>8} {'tempo ms':>10} {'pico MB':>9} {'tinta':>7}")
+            for nome, func in (
+                ("preprocess_image", lambda r: preprocess_image(path, dtype=np.uint8, recortar=r)),
+                ("preprocess_phone_image", lambda r: preprocess_phone_image(io.BytesIO(data), recortar=r)[0]),
+            ):
+                base = None
+                for recortar in (False, True):
+                    tempo, pico, img = medir(lambda: func(recortar), args.repeticoes)
+                    ganho = "" if base is None else f"  ({base[0] / tempo:.1f}x tempo, {base[1] / max(pico, 1):.1f}x memória)"
+                    print(f"   {nome:<22} {'sim' if recortar else 'não':>8} {tempo * 1000:>10.1f} "
+                          f"{pico / 2**20:>9.1f} {fracao_tinta(img):>7.1%}{ganho}")
+                    base = base or (tempo, pico)
+    finally:
+        for path in temporarios:
+            os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
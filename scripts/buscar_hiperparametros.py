@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Script para busca de hiperparâmetros em paralelo.
+Prepara o dataset uma única vez (arquivo .npy mapeado em memória, lido por
+todos os trials) e executa os trials em processos com limite de threads.
+
+Exemplo:
+    python scripts/buscar_hiperparametros.py --modo aleatorio --trials 12 --workers 3
+    python scripts/buscar_hiperparametros.py --modo halving --epocas 27 --eta 3
+    python scripts/buscar_hiperparametros.py --modo grade --espaco espaco.json
+"""
+
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+# Adicionar diretório pai ao path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from dataset_shards import DEFAULT_SHARDS_DIR
+from hyperparameter_sweep import (ESPACO_PADRAO, ARQUITETURA, HyperparameterSweep, gerar_aleatorio,
+                                  gerar_grade, preparar_dados_compartilhados)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Busca de hiperparâmetros em paralelo")
+    parser.add_argument("--modo", choices=["grade", "aleatorio", "halving"], default="aleatorio")
+    parser.add_argument("--espaco", default=None, help="JSON com listas de valores por hiperparâmetro")
+    parser.add_argument("--trials", type=int, default=12, help="Trials nos modos aleatorio/halving")
+    parser.add_argument("--epocas", type=int, default=10, help="Épocas por trial (máximo no halving)")
+    parser.add_argument("--eta", type=int, default=3, help="Fator de redução do successive halving")
+    parser.add_argument("--epocas-min", type=int, default=1, help="Épocas da primeira rodada do halving")
+    parser.add_argument("--workers", type=int, default=2, help="Trials simultâneos")
+    parser.add_argument("--threads", type=int, default=None, help="Threads por trial (padrão: CPUs / workers)")
+    parser.add_argument("--dados", default="dataset_processado")
+    parser.add_argument("--shards", default=DEFAULT_SHARDS_DIR)
+    parser.add_argument("--saida", default="resultados_avaliacao/busca")
+    parser.add_argument("--reusar-dados", action="store_true", help="Reaproveita os dados já preparados em --saida")
+    args = parser.parse_args()
+
+    print("🔬 BUSCA DE HIPERPARÂMETROS")
+    print("=" * 50)
+
+    espaco = ESPACO_PADRAO
+    if args.espaco:
+        with open(args.espaco) as f:
+            espaco = json.load(f)
+
+    configs = gerar_grade(espaco) if args.modo == "grade" else gerar_aleatorio(espaco, args.trials)
+    if not configs:
+        print("❌ Espaço de busca vazio")
+        return
+
+    pasta_dados = Path(args.saida) / "dados"
+    info_path = pasta_dados / "info.json"
+    if args.reusar_dados and info_path.exists():
+        with open(info_path) as f:
+            dados = json.load(f)
+        print(f"♻️ Reusando dados de {pasta_dados}")
+    else:
+        print("📦 Preparando dados compartilhados...")
+        dados = preparar_dados_compartilhados(pasta_dados, args.dados, args.shards)
+        if dados['n_imagens'] == 0:
+            print(f"❌ Nenhuma imagem em {args.shards} ou {args.dados}")
+            print("Execute primeiro: python scripts/preparar_dataset.py")
+            return
+        with open(info_path, "w") as f:
+            json.dump(dados, f, indent=2)
+    print(f"✅ {dados['n_imagens']} imagens de {dados['n_pessoas']} pessoas | "
+          f"{dados['pares_treino']} pares de treino, {dados['pares_validacao']} de validação")
+
+    busca = HyperparameterSweep(dados, args.saida, workers=args.workers, threads_por_trial=args.threads)
+    leaderboard = busca.executar(configs, epochs=args.epocas, halving=args.modo == "halving",
+                                 eta=args.eta, epochs_min=args.epocas_min)
+
+    print(f"\n🏆 LEADERBOARD (top 5)")
+    print(f"   {'trial':>5} {'épocas':>6} {'val_loss':>9} {'F1':>6} {'params':>10} {'MB':>7} {'ms':>7}")
+    validos = [r for r in leaderboard if 'erro' not in r]
+    for r in validos[:5]:
+        print(f"   {r['trial']:>5} {r['epocas']:>6} {r['val_loss']:>9.4f} {r['f1_melhor']:>6.3f} "
+              f"{r['parametros']:>10,} {r['tamanho_mb']:>7.1f} {r['latencia_ms']:>7.2f}")
+    if len(validos) < len(leaderboard):
+        print(f"⚠️ {len(leaderboard) - len(validos)} trial(s) com erro (ver leaderboard.json)")
+
+    if validos:
+        melhor = validos[0]['config']
+        arquitetura = {k: melhor[k] for k in ARQUITETURA if k in melhor}
+        print(f"\n💡 Treinar com a melhor configuração:")
+        print(f"   python scripts/treinar_modelo.py --lr {melhor['learning_rate']} --margem {melhor['margin']} "
+              f"--batch {melhor['batch_size']} --arquitetura '{json.dumps(arquitetura)}'")
+    print(f"💾 Leaderboard salvo em: {Path(args.saida) / 'leaderboard.csv'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Script para calibrar threads e tamanhos de lote do TensorFlow nesta CPU.
+O resultado é gravado em modelos/ajuste_cpu.json, indexado pela impressão
+digital da CPU, e aplicado automaticamente pelos apps, pela verificação em
+lote e pelo treinamento.
+
+Exemplo:
+    python scripts/calibrar_cpu.py
+    python scripts/calibrar_cpu.py --duracao 1.0 --forcar
+    python scripts/calibrar_cpu.py --mostrar
+"""
+
+import argparse
+import os
+import sys
+
+# Adicionar diretório pai ao path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from cpu_tuning import (DEFAULT_TUNING_PATH, BATCHES_TREINO, calibrar, carregar_ajuste, cpu_fingerprint,
+                        salvar_ajuste)
+
+
+def mostrar(ajuste):
+    print(f"🖥️ CPU: {ajuste['cpu']}")
+    for perfil, config in ajuste['perfis'].items():
+        extra = ""
+        if 'imagens_por_s' in config:
+            extra = f" | {config['imagens_por_s']:.1f} imagens/s"
+        elif 'pares_por_s' in config:
+            extra = f" | {config['pares_por_s']:.1f} pares/s"
+        print(f"   {perfil:<8} intra={config['intra_op']:<3} inter={config['inter_op']} "
+              f"batch={config['batch']}{extra}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibra threads e lotes do TensorFlow nesta CPU")
+    parser.add_argument("--saida", default=DEFAULT_TUNING_PATH)
+    parser.add_argument("--duracao", type=float, default=0.5, help="Segundos de medição por lote")
+    parser.add_argument("--sem-treino", action="store_true", help="Não mede o passo de treino")
+    parser.add_argument("--forcar", action="store_true", help="Recalibra mesmo se a CPU já foi medida")
+    parser.add_argument("--mostrar", action="store_true", help="Só mostra o ajuste gravado")
+    args = parser.parse_args()
+
+    print("⏱️ CALIBRAÇÃO DE CPU")
+    print("=" * 50)
+
+    existente = carregar_ajuste(args.saida)
+    if args.mostrar or (existente and not args.forcar):
+        if existente is None:
+            print(f"❌ Nenhum ajuste para esta CPU ({cpu_fingerprint()[1]}) em {args.saida}")
+        else:
+            mostrar(existente)
+            if not args.mostrar:
+                print("💡 Já calibrada; use --forcar para medir de novo")
+        return
+
+    print(f"🖥️ {cpu_fingerprint()[1]}")
+    ajuste = calibrar(duracao=args.duracao, batches_treino=() if args.sem_treino else BATCHES_TREINO)
+    salvar_ajuste(ajuste, args.saida)
+
+    print()
+    mostrar(ajuste)
+    print(f"💾 Ajuste salvo em: {args.saida}")
+    print("💡 Para ignorar: ASSINATURAS_CPU_AJUSTE=0; para forçar valores: "
+          "ASSINATURAS_INTRA_OP, ASSINATURAS_INTER_OP, ASSINATURAS_BATCH")
+
+
+if __name__ == "__main__":
+    main()
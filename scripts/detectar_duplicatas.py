@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Script para detectar quase-duplicatas em assinaturas_reais/ e no dataset
+processado (hash perceptual + índice por faixas, sem comparar todos os pares).
+Com --excluir grava as listas de exclusão lidas pelo preparador e pelo treino.
+
+Exemplo:
+    python scripts/detectar_duplicatas.py
+    python scripts/detectar_duplicatas.py --limite 4 --excluir
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+# Adicionar diretório pai ao path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from dataset_shards import DEFAULT_SHARDS_DIR, has_manifest
+from near_duplicates import DEFAULT_LIMITE, encontrar_duplicatas, hash_pasta, hash_shards, salvar_exclusoes
+
+
+def analisar(nome, registros, limite):
+    inicio = time.perf_counter()
+    resultado = encontrar_duplicatas(registros, limite)
+    segundos = time.perf_counter() - inicio
+
+    total = len(registros)
+    n_dup = len(resultado['duplicatas'])
+    print(f"\n📂 {nome}: {total} imagens")
+    print(f"   ♻️ Quase-duplicatas (mesma pessoa): {n_dup} ({100 * n_dup / max(total, 1):.1f}%)")
+    print(f"   ✅ Mantidas: {resultado['mantidas']}")
+    if resultado['entre_pessoas']:
+        print(f"   ⚠️ Quase iguais em pessoas diferentes: {len(resultado['entre_pessoas'])} (rótulo errado?)")
+        for item in resultado['entre_pessoas'][:5]:
+            print(f"      {item['nome']} ~ {item['igual_a']} ({item['distancia']} bits)")
+    print(f"   ⏱️ Índice: {segundos:.2f}s")
+
+    por_pessoa = {}
+    for item in resultado['duplicatas']:
+        por_pessoa[item['pessoa']] = por_pessoa.get(item['pessoa'], 0) + 1
+    resultado.update(total=total, segundos_indice=segundos, duplicatas_por_pessoa=por_pessoa)
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detecta quase-duplicatas no dataset")
+    parser.add_argument("--reais", default="assinaturas_reais")
+    parser.add_argument("--dados", default="dataset_processado")
+    parser.add_argument("--shards", default=DEFAULT_SHARDS_DIR,
+                        help="Se houver manifest, o dataset processado é lido dos shards (como no treino)")
+    parser.add_argument("--limite", type=int, default=DEFAULT_LIMITE,
+                        help="Distância de Hamming máxima entre hashes de 64 bits")
+    parser.add_argument("--workers", type=int, default=8, help="Threads de decodificação")
+    parser.add_argument("--excluir", action="store_true",
+                        help="Grava excluidas.json em --reais e --dados (lidos pelo preparador e pelo treino)")
+    parser.add_argument("--saida", default="resultados_avaliacao/duplicatas.json")
+    args = parser.parse_args()
+
+    print("🔎 DETECÇÃO DE QUASE-DUPLICATAS")
+    print("=" * 50)
+
+    fontes = []
+    if Path(args.reais).exists():
+        fontes.append(("originais", args.reais, lambda: hash_pasta(args.reais, args.workers)))
+    if has_manifest(args.shards):
+        fontes.append(("processado", args.dados, lambda: hash_shards(args.shards)))
+    elif Path(args.dados).exists():
+        fontes.append(("processado", args.dados, lambda: hash_pasta(args.dados, args.workers)))
+    if not fontes:
+        print(f"❌ Nenhuma pasta encontrada ({args.reais}, {args.dados})")
+        return
+
+    relatorio = {'limite': args.limite, 'fontes': {}}
+    for nome, pasta, calcular_hashes in fontes:
+        inicio = time.perf_counter()
+        registros = calcular_hashes()
+        print(f"\n#️⃣ {pasta}: {len(registros)} hashes em {time.perf_counter() - inicio:.1f}s")
+        resultado = analisar(pasta, registros, args.limite)
+        relatorio['fontes'][nome] = dict(resultado, pasta=pasta)
+
+        if args.excluir:
+            path = salvar_exclusoes(pasta, resultado['duplicatas'], args.limite)
+            print(f"   🚫 Lista de exclusão: {path}")
+
+    Path(args.saida).parent.mkdir(parents=True, exist_ok=True)
+    with open(args.saida, "w") as f:
+        json.dump(relatorio, f, indent=2, ensure_ascii=False)
+    print(f"\n💾 Relatório salvo em: {args.saida}")
+
+    processado = relatorio['fontes'].get('processado')
+    if processado and processado['total']:
+        reducao = len(processado['duplicatas']) / processado['total']
+        print(f"💡 Épocas ~{100 * reducao:.0f}% menores com a exclusão (pares são formados por imagem)")
+    if not args.excluir:
+        print("💡 Para excluir: --excluir; o treino ignora a lista com --incluir-duplicatas")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Script para empacotar o dataset processado em shards.
+Converte dataset_processado/<pessoa>/*.png em poucos arquivos .npy grandes
+com manifest, que o treinamento passa a usar automaticamente.
+
+Exemplo:
+    python scripts/empacotar_dataset.py --tamanho-shard 4096
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# Adicionar diretório pai ao path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from dataset_shards import DEFAULT_SHARDS_DIR, SHARD_SIZE, ShardedDataset, empacotar_pasta
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Empacota o dataset processado em shards")
+    parser.add_argument("--entrada", default="dataset_processado")
+    parser.add_argument("--saida", default=DEFAULT_SHARDS_DIR)
+    parser.add_argument("--tamanho-shard", type=int, default=SHARD_SIZE, help="Imagens por shard")
+    parser.add_argument("--workers", type=int, default=8, help="Threads de decodificação")
+    parser.add_argument("--bitpack", action="store_true",
+                        help="1 bit por pixel (8x menor; bordas do traço arredondadas)")
+    args = parser.parse_args()
+
+    print("📦 EMPACOTAMENTO DO DATASET EM SHARDS")
+    print("=" * 50)
+
+    if not os.path.isdir(args.entrada):
+        print(f"❌ Dataset não encontrado em {args.entrada}")
+        print("Execute primeiro: python scripts/preparar_dataset.py")
+        return
+
+    inicio = time.perf_counter()
+    manifest = empacotar_pasta(args.entrada, args.saida, args.tamanho_shard, args.workers, args.bitpack)
+    print(f"✅ {manifest['total']} imagens de {len(manifest['pessoas'])} pessoas "
+          f"em {len(manifest['shards'])} shards ({time.perf_counter() - inicio:.1f}s)")
+
+    # Tempo de carga pelo caminho usado no treinamento
+    inicio = time.perf_counter()
+    ShardedDataset(args.saida).carregar()
+    print(f"⏱️ Carga dos shards: {time.perf_counter() - inicio:.2f}s")
+    print(f"💾 Shards salvos em: {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
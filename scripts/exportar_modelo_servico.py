@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Script para exportar o modelo de serviço (preprocessamento dentro do grafo).
+Antes de exportar, compara o preprocessamento em grafo com `preprocess_image`
+em imagens reais e só grava o modelo se a diferença estiver dentro da
+tolerância documentada em serving_model.py.
+
+Exemplo:
+    python scripts/exportar_modelo_servico.py --amostras 200
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+# Adicionar diretório pai ao path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from data_preprocessing import preprocess_image
+from model import load_model_with_custom_objects, get_embedding_network, compute_embeddings, embedding_distance
+from model_registry import DEFAULT_MODEL_PATH
+from serving_model import (build_preprocessing_model, build_serving_model, load_serving_model,
+                           agrupar_por_tamanho, TOLERANCIA_PIXEL, TOLERANCIA_DISTANCIA)
+
+
+def listar_imagens(pasta, limite, seed=42):
+    """Amostra imagens originais (todas as pessoas) para a verificação."""
+    paths = []
+    for ext in ("*.png", "*.jpg", "*.jpeg", "*.bmp"):
+        paths.extend(Path(pasta).rglob(ext))
+    paths = sorted(paths)
+    if len(paths) > limite:
+        rng = np.random.default_rng(seed)
+        paths = [paths[i] for i in sorted(rng.choice(len(paths), limite, replace=False))]
+    return paths
+
+
+def executar_em_grupos(modelo, imagens):
+    """Executa o modelo de serviço agrupando as imagens por tamanho."""
+    saidas = [None] * len(imagens)
+    for indices, lote in agrupar_por_tamanho(imagens).values():
+        resultado = modelo.predict(lote, batch_size=32, verbose=0)
+        for i, r in zip(indices, resultado):
+            saidas[i] = r
+    return np.stack(saidas)
+
+
+def verificar_tolerancia(paths, embedding_model, serving):
+    """
+    Compara o caminho OpenCV (preprocess_image) com o modelo em grafo.
+
+    Returns:
+        dict: Erros de pixel e de distância entre embeddings
+    """
+    brutas = [cv2.imread(str(p), cv2.IMREAD_GRAYSCALE) for p in paths]
+    validas = [i for i, img in enumerate(brutas) if img is not None]
+    brutas = [brutas[i] for i in validas]
+    paths = [paths[i] for i in validas]
+
+    referencia = np.stack([preprocess_image(str(p), dtype=np.uint8) for p in paths])
+    em_grafo = executar_em_grupos(build_preprocessing_model(), brutas)
+    erro_pixel = np.abs(referencia.astype(np.float32) - em_grafo.astype(np.float32)) / 255.0
+
+    emb_referencia = compute_embeddings(embedding_model, referencia)
+    emb_servico = executar_em_grupos(serving, brutas)
+    deriva = embedding_distance(emb_referencia, emb_servico)
+
+    return {
+        'imagens': len(paths),
+        'erro_pixel_medio': float(erro_pixel.mean()),
+        'erro_pixel_max_imagem': float(erro_pixel.mean(axis=(1, 2, 3)).max()),
+        'pixels_diferentes': float((erro_pixel > 0.5 / 255).mean()),
+        'deriva_embedding_media': float(deriva.mean()),
+        'deriva_embedding_max': float(deriva.max())
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta o modelo de serviço com preprocessamento em grafo")
+    parser.add_argument("--modelo", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--pasta", default="assinaturas_reais", help="Imagens para a verificação de tolerância")
+    parser.add_argument("--amostras", type=int, default=100)
+    parser.add_argument("--saida", default="modelos/modelo_servico")
+    parser.add_argument("--forcar", action="store_true", help="Exporta mesmo fora da tolerância")
+    args = parser.parse_args()
+
+    print("🧩 EXPORTAÇÃO DO MODELO DE SERVIÇO")
+    print("=" * 50)
+
+    if not Path(args.modelo).exists():
+        print(f"❌ Modelo não encontrado em {args.modelo}")
+        return
+
+    embedding_model = get_embedding_network(load_model_with_custom_objects(args.modelo))
+    serving = build_serving_model(embedding_model)
+
+    paths = listar_imagens(args.pasta, args.amostras)
+    if not paths:
+        print(f"❌ Nenhuma imagem em {args.pasta} para verificar a tolerância")
+        return
+
+    print(f"🔬 Comparando com preprocess_image em {len(paths)} imagens...")
+    relatorio = verificar_tolerancia(paths, embedding_model, serving)
+    print(f"   Erro médio por pixel: {relatorio['erro_pixel_medio']:.4f} (tolerância {TOLERANCIA_PIXEL})")
+    print(f"   Pixels diferentes: {relatorio['pixels_diferentes']:.2%}")
+    print(f"   Deriva máxima do embedding: {relatorio['deriva_embedding_max']:.4f} "
+          f"(tolerância {TOLERANCIA_DISTANCIA})")
+
+    dentro = (relatorio['erro_pixel_medio'] <= TOLERANCIA_PIXEL
+              and relatorio['deriva_embedding_max'] <= TOLERANCIA_DISTANCIA)
+    relatorio['dentro_tolerancia'] = dentro
+    if not dentro and not args.forcar:
+        print("❌ Fora da tolerância; modelo não exportado (use --forcar para exportar assim mesmo)")
+        return
+
+    serving.save(args.saida)
+    relatorio['exportado_em'] = time.time()
+    with open(Path(args.saida) / "tolerancia.json", "w") as f:
+        json.dump(relatorio, f, indent=2)
+
+    # Confere que o modelo exportado recarrega
+    load_serving_model(args.saida)
+    print(f"💾 Modelo de serviço salvo em: {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
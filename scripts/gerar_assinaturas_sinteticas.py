@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Script para gerar assinaturas sintéticas para testes de escala e carga.
+Cada "pessoa" sintética tem um estilo de traço paramétrico próprio e cada
+amostra recebe pequenas variações (jitter), simulando a variabilidade natural
+de quem assina. Opcionalmente aplica degradações típicas de fotos de telefone.
+
+A saída segue a mesma estrutura de `assinaturas_reais/`:
+
+    assinaturas_sinteticas/
+    ├── sintetica_00000/
+    │   ├── assinatura_01.png
+    │   └── ...
+    └── sintetica_00001/...
+
+Não depende de rede nem de dados reais: roda em qualquer máquina de CI.
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+# Adicionar diretório pai ao path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+
+class SyntheticSignatureGenerator:
+    def __init__(self, output_dir="assinaturas_sinteticas", amostras_por_pessoa=5,
+                 canvas_size=(600, 250), degradar=False, resolucao_foto=None, seed=42):
+        """
+        Args:
+            output_dir (str): Pasta de saída (mesma estrutura de assinaturas_reais/)
+            amostras_por_pessoa (int): Número de assinaturas por pessoa
+            canvas_size (tuple): Tamanho da assinatura limpa (largura, altura)
+            degradar (bool): Aplica degradações de foto de telefone
+            resolucao_foto (tuple, optional): Resolução final das fotos degradadas
+                (largura, altura), ex.: (4000, 3000). Se None, mantém o canvas.
+            seed (int): Semente base; cada pessoa usa uma semente derivada,
+                então o resultado não depende da ordem nem do número de workers
+        """
+        self.output_dir = Path(output_dir)
+        self.amostras_por_pessoa = amostras_por_pessoa
+        self.canvas_size = canvas_size
+        self.degradar = degradar
+        self.resolucao_foto = resolucao_foto
+        self.seed = seed
+
+    def nome_pessoa(self, indice):
+        """Nome da pasta da pessoa sintética."""
+        return f"sintetica_{indice:05d}"
+
+    def gerar_estilo(self, rng):
+        """Sorteia os parâmetros de traço que caracterizam uma pessoa."""
+        n_tracos = int(rng.integers(1, 4))
+        tracos = []
+        for _ in range(n_tracos):
+            n_harmonicos = int(rng.integers(2, 5))
+            tracos.append({
+                'inicio': float(rng.uniform(0.0, 0.35)),
+                'largura': float(rng.uniform(0.4, 0.9)),
+                'base': float(rng.uniform(0.35, 0.65)),
+                'freq_x': rng.uniform(1.0, 6.0, n_harmonicos),
+                'amp_x': rng.uniform(0.0, 0.06, n_harmonicos),
+                'fase_x': rng.uniform(0, 2 * np.pi, n_harmonicos),
+                'freq_y': rng.uniform(1.0, 9.0, n_harmonicos),
+                'amp_y': rng.uniform(0.03, 0.22, n_harmonicos),
+                'fase_y': rng.uniform(0, 2 * np.pi, n_harmonicos),
+            })
+
+        return {
+            'tracos': tracos,
+            'inclinacao': float(rng.uniform(-0.35, 0.35)),  # cisalhamento horizontal
+            'espessura': int(rng.integers(1, 5)),
+            'pressao': float(rng.uniform(0.0, 0.6)),  # variação de espessura no traço
+            'sublinhado': bool(rng.random() < 0.3),
+            'pontos': 200,
+        }
+
+    def renderizar(self, estilo, rng, jitter=True):
+        """
+        Desenha uma amostra de assinatura a partir do estilo da pessoa.
+
+        Returns:
+            np.array: Imagem uint8 em escala de cinza (fundo branco, tinta preta)
+        """
+        largura, altura = self.canvas_size
+        canvas = np.full((altura, largura), 255, dtype=np.uint8)
+
+        # Variações por amostra (a mesma pessoa nunca assina igual)
+        ruido = 0.012 if jitter else 0.0
+        escala = rng.uniform(0.92, 1.08) if jitter else 1.0
+        angulo = rng.uniform(-4, 4) if jitter else 0.0
+        dx = rng.uniform(-0.03, 0.03) if jitter else 0.0
+        dy = rng.uniform(-0.05, 0.05) if jitter else 0.0
+        espessura = max(1, estilo['espessura'] + (int(rng.integers(-1, 2)) if jitter else 0))
+
+        t = np.linspace(0.0, 1.0, estilo['pontos'])
+        for traco in estilo['tracos']:
+            x = traco['inicio'] + traco['largura'] * t
+            x = x + np.sum(traco['amp_x'][:, None] * np.sin(
+                2 * np.pi * traco['freq_x'][:, None] * t + traco['fase_x'][:, None]), axis=0)
+            y = traco['base'] + np.sum(traco['amp_y'][:, None] * np.sin(
+                2 * np.pi * traco['freq_y'][:, None] * t + traco['fase_y'][:, None]), axis=0)
+
+            if jitter:
+                # Ruído suave (passa-baixa) para deformar o traço sem quebrá-lo
+                suave = np.convolve(rng.normal(0, ruido, t.size + 20), np.ones(21) / 21, mode='valid')
+                x = x + suave
+                y = y + np.convolve(rng.normal(0, ruido, t.size + 20), np.ones(21) / 21, mode='valid')
+
+            x = x + estilo['inclinacao'] * (0.5 - y)
+            pontos = np.stack([x * largura, y * altura], axis=1)
+            espessuras = espessura * (1 + estilo['pressao'] * np.sin(np.pi * t))
+            self._desenhar_traco(canvas, pontos, espessuras)
+
+        if estilo['sublinhado']:
+            y_linha = 0.85 + (rng.uniform(-0.03, 0.03) if jitter else 0.0)
+            pontos = np.array([[0.1 * largura, y_linha * altura], [0.9 * largura, (y_linha - 0.03) * altura]])
+            self._desenhar_traco(canvas, pontos, np.full(2, espessura))
+
+        # Transformação global da amostra
+        centro = (largura / 2, altura / 2)
+        matriz = cv2.getRotationMatrix2D(centro, angulo, escala)
+        matriz[0, 2] += dx * largura
+        matriz[1, 2] += dy * altura
+        return cv2.warpAffine(canvas, matriz, (largura, altura), borderValue=255)
+
+    def _desenhar_traco(self, canvas, pontos, espessuras):
+        """Desenha uma polilinha com espessura variável."""
+        pontos = np.round(pontos).astype(np.int32).tolist()
+        for i in range(len(pontos) - 1):
+            cv2.line(canvas, tuple(pontos[i]), tuple(pontos[i + 1]), 0,
+                     thickness=max(1, int(round(espessuras[i]))), lineType=cv2.LINE_AA)
+
+    def degradar_como_telefone(self, img, rng):
+        """
+        Simula uma foto de telefone: papel em resolução alta, perspectiva,
+        iluminação irregular, desfoque e ruído de sensor.
+        """
+        altura, largura = img.shape
+
+        if self.resolucao_foto is not None:
+            foto_w, foto_h = self.resolucao_foto
+        else:
+            foto_w, foto_h = largura, altura
+
+        # Assinatura ocupa 40-80% da largura da foto
+        fracao = rng.uniform(0.4, 0.8)
+        assin_w = int(foto_w * fracao)
+        assin_h = max(1, int(assin_w * altura / largura))
+        if assin_h > foto_h:
+            assin_h = foto_h
+            assin_w = max(1, int(assin_h * largura / altura))
+        assinatura = cv2.resize(img, (assin_w, assin_h), interpolation=cv2.INTER_CUBIC)
+
+        papel = np.full((foto_h, foto_w), int(rng.integers(215, 250)), dtype=np.uint8)
+        x0 = int(rng.integers(0, foto_w - assin_w + 1))
+        y0 = int(rng.integers(0, foto_h - assin_h + 1))
+        regiao = papel[y0:y0 + assin_h, x0:x0 + assin_w]
+        papel[y0:y0 + assin_h, x0:x0 + assin_w] = np.minimum(regiao, assinatura)
+
+        # Perspectiva (câmera não paralela ao papel)
+        deslocamento = 0.06 * min(foto_w, foto_h)
+        origem = np.float32([[0, 0], [foto_w, 0], [foto_w, foto_h], [0, foto_h]])
+        destino = origem + rng.uniform(-deslocamento, deslocamento, origem.shape).astype(np.float32)
+        matriz = cv2.getPerspectiveTransform(origem, destino)
+        foto = cv2.warpPerspective(papel, matriz, (foto_w, foto_h),
+                                   borderMode=cv2.BORDER_REPLICATE)
+
+        # Iluminação irregular: gradiente linear + vinheta
+        ys, xs = np.mgrid[0:foto_h, 0:foto_w].astype(np.float32)
+        xs /= foto_w
+        ys /= foto_h
+        direcao = rng.uniform(-1, 1, 2)
+        gradiente = 1.0 - 0.35 * rng.random() * (direcao[0] * xs + direcao[1] * ys + 1) / 2
+        vinheta = 1.0 - 0.25 * rng.random() * ((xs - 0.5) ** 2 + (ys - 0.5) ** 2) * 2
+        foto = foto.astype(np.float32) * gradiente * vinheta
+
+        # Desfoque (foco/tremor) proporcional à resolução
+        sigma = rng.uniform(0.3, 1.5) * max(1.0, foto_w / 1000)
+        foto = cv2.GaussianBlur(foto, (0, 0), sigma)
+
+        # Ruído de sensor
+        foto += rng.normal(0, rng.uniform(2, 8), foto.shape).astype(np.float32)
+
+        return np.clip(foto, 0, 255).astype(np.uint8)
+
+    def gerar_pessoa(self, indice):
+        """
+        Gera todas as amostras de uma pessoa sintética.
+
+        Returns:
+            int: Número de imagens escritas
+        """
+        rng = np.random.default_rng([self.seed, indice])
+        estilo = self.gerar_estilo(rng)
+
+        pasta = self.output_dir / self.nome_pessoa(indice)
+        pasta.mkdir(parents=True, exist_ok=True)
+
+        for j in range(1, self.amostras_por_pessoa + 1):
+            img = self.renderizar(estilo, rng)
+            if self.degradar:
+                img = self.degradar_como_telefone(img, rng)
+                # Fotos de telefone chegam como JPEG
+                cv2.imwrite(str(pasta / f"assinatura_{j:02d}.jpg"), img,
+                            [cv2.IMWRITE_JPEG_QUALITY, int(rng.integers(70, 95))])
+            else:
+                cv2.imwrite(str(pasta / f"assinatura_{j:02d}.png"), img)
+
+        return self.amostras_por_pessoa
+
+    def gerar(self, n_pessoas, workers=None, inicio=0):
+        """
+        Gera `n_pessoas` pessoas sintéticas, em paralelo.
+
+        Args:
+            n_pessoas (int): Número de pessoas
+            workers (int, optional): Processos paralelos (padrão: nº de CPUs)
+            inicio (int): Índice da primeira pessoa (permite gerar em partes)
+
+        Returns:
+            int: Total de imagens geradas
+        """
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        indices = range(inicio, inicio + n_pessoas)
+
+        if workers == 1:
+            return sum(self.gerar_pessoa(i) for i in indices)
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return sum(executor.map(self.gerar_pessoa, indices, chunksize=16))
+
+
+def _parse_resolucao(valor):
+    """Converte 'LARGURAxALTURA' em tupla."""
+    largura, altura = valor.lower().split('x')
+    return int(largura), int(altura)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera assinaturas sintéticas para testes de escala e carga")
+    parser.add_argument("--pessoas", type=int, default=1000, help="Número de pessoas sintéticas")
+    parser.add_argument("--amostras", type=int, default=5, help="Assinaturas por pessoa")
+    parser.add_argument("--saida", default="assinaturas_sinteticas", help="Pasta de saída")
+    parser.add_argument("--inicio", type=int, default=0, help="Índice da primeira pessoa")
+    parser.add_argument("--seed", type=int, default=42, help="Semente base")
+    parser.add_argument("--degradar", action="store_true", help="Simula fotos de telefone")
+    parser.add_argument("--resolucao", type=_parse_resolucao, default=None,
+                        help="Resolução das fotos degradadas, ex.: 4000x3000")
+    parser.add_argument("--workers", type=int, default=None, help="Processos paralelos")
+    args = parser.parse_args()
+
+    print("🧪 GERADOR DE ASSINATURAS SINTÉTICAS")
+    print("=" * 50)
+
+    gerador = SyntheticSignatureGenerator(
+        output_dir=args.saida,
+        amostras_por_pessoa=args.amostras,
+        degradar=args.degradar,
+        resolucao_foto=args.resolucao,
+        seed=args.seed
+    )
+
+    inicio = time.perf_counter()
+    total = gerador.gerar(args.pessoas, workers=args.workers, inicio=args.inicio)
+    duracao = time.perf_counter() - inicio
+
+    print(f"✅ {total} imagens de {args.pessoas} pessoas em {duracao:.1f}s")
+    print(f"📁 Pasta de saída: {args.saida}")
+    print(f"\n💡 Para usar no pipeline:")
+    print(f"   DatasetPreparator(input_dir='{args.saida}')")
+    print(f"   ModelEvaluator(test_data_dir='{args.saida}')")
+
+
+if __name__ == "__main__":
+    main()
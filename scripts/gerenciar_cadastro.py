@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Script para gerenciar o cadastro de assinaturas de forma incremental.
+
+Exemplos:
+    python scripts/gerenciar_cadastro.py adicionar-pessoa maria foto1.png foto2.png
+    python scripts/gerenciar_cadastro.py adicionar-amostra maria foto3.png
+    python scripts/gerenciar_cadastro.py remover-amostra maria foto1.png
+    python scripts/gerenciar_cadastro.py remover-pessoa maria
+    python scripts/gerenciar_cadastro.py verificar
+    python scripts/gerenciar_cadastro.py sincronizar
+    python scripts/gerenciar_cadastro.py exportar-store
+    python scripts/gerenciar_cadastro.py compactar-store
+    python scripts/gerenciar_cadastro.py quantizar-store --modo int8
+"""
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+# Adicionar diretório pai ao path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from embedding_quantization import DEFAULT_QUANTIZATION_PATH, QuantizedGallery, ScalarQuantizer
+from enrollment import SignatureEnrollment
+from verification_cache import file_fingerprint
+
+
+def carregar_rede_base(model_path):
+    """Carrega o modelo siamês e extrai a rede base."""
+    from model import load_model_with_custom_objects, get_embedding_network
+
+    if not Path(model_path).exists():
+        print(f"❌ Modelo não encontrado em {model_path}")
+        print("Execute primeiro: python scripts/treinar_modelo.py")
+        sys.exit(1)
+    return get_embedding_network(load_model_with_custom_objects(model_path))
+
+
+def imprimir_divergencias(divergencias):
+    """Exibe as divergências entre galeria e pasta."""
+    if not divergencias:
+        print("✅ Galeria consistente com a pasta de assinaturas")
+        return
+    for pessoa, diff in divergencias.items():
+        print(f"👤 {pessoa}:")
+        for nome in diff['faltando']:
+            print(f"   ➕ sem embedding: {nome}")
+        for nome in diff['orfas']:
+            print(f"   ➖ arquivo removido: {nome}")
+        for nome in diff['alteradas']:
+            print(f"   ✏️ arquivo alterado: {nome}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cadastro incremental de assinaturas")
+    parser.add_argument("--pasta", default="assinaturas_reais", help="Pasta de assinaturas por pessoa")
+    parser.add_argument("--galeria", default="galeria", help="Pasta com embeddings e templates")
+    parser.add_argument("--modelo", default="modelos/modelo_assinaturas_manuscritas.h5")
+    parser.add_argument("--medoides", type=int, default=3, help="Medoides por pessoa")
+    parser.add_argument("--store", default=None,
+                        help="Store mapeado em memória espelhado a cada alteração (padrão: <galeria>/store)")
+    parser.add_argument("--sem-store", action="store_true", help="Não atualiza o store")
+
+    sub = parser.add_subparsers(dest="comando", required=True)
+    p = sub.add_parser("adicionar-pessoa", help="Cadastra uma nova pessoa")
+    p.add_argument("pessoa")
+    p.add_argument("imagens", nargs="+")
+    p = sub.add_parser("adicionar-amostra", help="Adiciona assinaturas a uma pessoa")
+    p.add_argument("pessoa")
+    p.add_argument("imagens", nargs="+")
+    p = sub.add_parser("remover-amostra", help="Remove uma assinatura de uma pessoa")
+    p.add_argument("pessoa")
+    p.add_argument("amostra", help="Nome do arquivo na pasta da pessoa")
+    p = sub.add_parser("remover-pessoa", help="Remove uma pessoa")
+    p.add_argument("pessoa")
+    sub.add_parser("verificar", help="Checa a consistência entre galeria e pasta")
+    sub.add_parser("sincronizar", help="Aplica na galeria as diferenças da pasta")
+    sub.add_parser("exportar-store", help="Espelha a galeria inteira no store")
+    sub.add_parser("compactar-store", help="Reescreve o store sem as amostras removidas")
+    p = sub.add_parser("quantizar-store", help="Grava a galeria quantizada ao lado do store")
+    p.add_argument("--modo", choices=["float16", "int8"], default="int8")
+    p.add_argument("--calibracao", default=DEFAULT_QUANTIZATION_PATH,
+                   help="Faixas int8 (python scripts/avaliar_quantizacao.py --salvar)")
+    args = parser.parse_args()
+    if args.comando in ("exportar-store", "compactar-store", "quantizar-store") and args.sem_store:
+        parser.error(f"{args.comando} não combina com --sem-store")
+    store_dir = None if args.sem_store else (args.store or str(Path(args.galeria) / "store"))
+
+    print("🗂️ CADASTRO DE ASSINATURAS")
+    print("=" * 50)
+
+    precisa_modelo = args.comando in ("adicionar-pessoa", "adicionar-amostra", "sincronizar")
+    rede_base = carregar_rede_base(args.modelo) if precisa_modelo else None
+    fingerprint = file_fingerprint(args.modelo) if Path(args.modelo).exists() else None
+
+    cadastro = SignatureEnrollment(
+        embedding_model=rede_base,
+        signatures_dir=args.pasta,
+        gallery_dir=args.galeria,
+        n_medoids=args.medoides,
+        model_fingerprint=fingerprint,
+        store_dir=store_dir
+    ).carregar()
+
+    try:
+        if args.comando == "adicionar-pessoa":
+            cadastro.adicionar_pessoa(args.pessoa, args.imagens)
+            print(f"✅ {args.pessoa} cadastrada com {len(args.imagens)} assinaturas")
+        elif args.comando == "adicionar-amostra":
+            cadastro.adicionar_amostras(args.pessoa, args.imagens)
+            print(f"✅ {len(args.imagens)} assinatura(s) adicionada(s) a {args.pessoa}")
+        elif args.comando == "remover-amostra":
+            cadastro.remover_amostra(args.pessoa, args.amostra)
+            print(f"✅ {args.amostra} removida de {args.pessoa}")
+        elif args.comando == "remover-pessoa":
+            cadastro.remover_pessoa(args.pessoa)
+            print(f"✅ {args.pessoa} removida")
+        elif args.comando == "verificar":
+            divergencias = cadastro.verificar_consistencia()
+            imprimir_divergencias(divergencias)
+            if divergencias:
+                print(f"\n💡 Execute: python scripts/gerenciar_cadastro.py sincronizar")
+                sys.exit(1)
+        elif args.comando == "sincronizar":
+            divergencias = cadastro.sincronizar()
+            imprimir_divergencias(divergencias)
+            if divergencias:
+                print(f"\n✅ Galeria sincronizada")
+        elif args.comando == "exportar-store":
+            n_pessoas = cadastro.sincronizar_store()
+            print(f"✅ {n_pessoas} pessoa(s) espelhada(s) em {store_dir}")
+        elif args.comando == "compactar-store":
+            resultado = cadastro.store.compactar()
+            print(f"✅ {resultado['linhas_antes']} -> {resultado['linhas_depois']} linhas "
+                  f"({resultado['bytes_liberados'] / 1e6:.1f} MB liberados)")
+        elif args.comando == "quantizar-store":
+            if args.modo == "int8":
+                if not Path(args.calibracao).exists():
+                    raise ValueError(f"Calibração não encontrada em {args.calibracao}; "
+                                     f"execute: python scripts/avaliar_quantizacao.py --salvar")
+                quantizador = ScalarQuantizer.carregar(args.calibracao)
+                if fingerprint and quantizador.modelo not in (None, fingerprint):
+                    raise ValueError("Calibração feita com outro modelo; recalibre")
+            else:
+                quantizador = ScalarQuantizer("float16")
+            galeria = QuantizedGallery(cadastro.store, quantizador)
+            pasta = galeria.salvar(Path(store_dir) / f"quantizado_{args.modo}")
+            print(f"✅ {len(galeria)} linhas em {args.modo}: {galeria.bytes_codigos / 1e6:.1f} MB "
+                  f"(float32: {cadastro.store.vetores.nbytes / 1e6:.1f} MB) -> {pasta}")
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    print(f"\n👥 Pessoas na galeria: {len(cadastro.pessoas)}")
+    if cadastro.store is not None and cadastro.store.geracao is not None:
+        store = cadastro.store
+        print(f"🗄️ Store: {len(store)} amostras vivas de {len(store.registros)} linhas "
+              f"(geração {store.geracao})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Script para a identificação 1:N com a galeria particionada em shards.
+Cada shard serve parte das pessoas por TCP; o coordenador consulta todos em
+paralelo e junta os resultados dentro de um prazo (ver sharded_identification).
+
+Exemplos:
+    # Divide o store da galeria em 4 shards e sobe os 4 nesta máquina
+    python scripts/identificacao_distribuida.py particionar --shards 4
+    python scripts/identificacao_distribuida.py servir-locais
+
+    # Em outro host: um shard só, ouvindo em todas as interfaces
+    python scripts/identificacao_distribuida.py servir s2 --host 0.0.0.0
+
+    python scripts/identificacao_distribuida.py identificar assinatura.png --prazo-ms 200
+    python scripts/identificacao_distribuida.py status
+    python scripts/identificacao_distribuida.py rebalancear --adicionar s4=10.0.0.5:9204
+    python scripts/identificacao_distribuida.py rebalancear --remover s1
+
+    # Busca sobre códigos int8 (calibração de scripts/avaliar_quantizacao.py --salvar)
+    python scripts/identificacao_distribuida.py servir-locais --quantizacao modelos/quantizacao.json
+
+    # Teste com galeria sintética e processos locais (inclui um shard lento)
+    python scripts/identificacao_distribuida.py testar-local --shards 4 --lento-ms 500
+    python scripts/identificacao_distribuida.py testar-local --quantizacao int8 --rerank 50
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Adicionar diretório pai ao path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from embedding_quantization import ScalarQuantizer
+from embedding_store import EmbeddingStore
+from sharded_identification import (DEFAULT_SHARDS_PATH, MAPA_NAME, PORTA_INICIAL, ScatterGatherCoordinator,
+                                    ShardMap, iniciar_shards_locais, particionar_store, servir_shard)
+
+
+def calcular_embedding(modelo, imagem):
+    """Embedding de uma imagem com a rede base do modelo siamês."""
+    from data_preprocessing import preprocess_image
+    from model import compute_embeddings, get_embedding_network, load_model_with_custom_objects
+
+    rede = get_embedding_network(load_model_with_custom_objects(modelo))
+    entrada = preprocess_image(imagem)
+    if entrada.ndim == 2:
+        entrada = entrada[..., None]
+    return compute_embeddings(rede, entrada[None])[0]
+
+
+def carregar_quantizador(valor):
+    """Quantizador da opção --quantizacao: 'float16' ou o caminho de uma calibração int8."""
+    if not valor:
+        return None
+    if valor == "float16":
+        return ScalarQuantizer("float16")
+    if not Path(valor).exists():
+        print(f"❌ Calibração não encontrada em {valor}")
+        print("Execute primeiro: python scripts/avaliar_quantizacao.py --salvar")
+        sys.exit(1)
+    return ScalarQuantizer.carregar(valor)
+
+
+def imprimir_resultado(resultado, threshold=None):
+    """Exibe o top-k e a situação dos shards."""
+    for posicao, r in enumerate(resultado['resultados'], 1):
+        marca = "✅" if threshold is not None and r['distancia'] <= threshold else "  "
+        print(f"   {marca} {posicao}. {r['pessoa']:<25} {r['distancia']:.4f}  ({r['amostra']} @ {r['shard']})")
+    print(f"⏱️ {resultado['ms']:.1f} ms | shards: {len(resultado['respondidos'])} responderam")
+    if resultado['atrasados']:
+        print(f"⚠️ Fora do prazo: {', '.join(resultado['atrasados'])}")
+    for nome, erro in resultado['falhas'].items():
+        print(f"❌ {nome}: {erro}")
+    if resultado['parcial']:
+        print("⚠️ Resultado parcial: pessoas dos shards acima não foram consultadas")
+
+
+def aguardar(processos):
+    """Mantém os shards locais no ar até Ctrl+C."""
+    try:
+        while all(p.is_alive() for p in processos):
+            time.sleep(1)
+        print("❌ Um shard parou; encerrando os demais")
+    except KeyboardInterrupt:
+        print("\n👋 Encerrando shards")
+    finally:
+        for p in processos:
+            p.terminate()
+
+
+def galeria_sintetica(pasta, n_pessoas, amostras, dim, rng):
+    """Store com pessoas sintéticas (centro por pessoa + ruído)."""
+    centros = rng.normal(0, 1, (n_pessoas, dim)).astype(np.float32)
+    store = EmbeddingStore(pasta, dim=dim)
+    for i, centro in enumerate(centros):
+        vetores = centro + rng.normal(0, 0.3, (amostras, dim)).astype(np.float32)
+        store.adicionar(f"pessoa_{i:06d}", [f"{j}.png" for j in range(amostras)], vetores)
+    return store, centros
+
+
+def medir(coordenador, store, consultas, k, prazo):
+    """Latências, respostas parciais e concordância do top-k com a busca num nó só."""
+    latencias, parciais, iguais = [], 0, 0
+    for consulta in consultas:
+        resultado = coordenador.identificar(consulta, k=k, prazo=prazo)
+        latencias.append(resultado['ms'])
+        parciais += resultado['parcial']
+        esperado = [r['pessoa'] for r in store.buscar(consulta, k=k)]
+        iguais += [r['pessoa'] for r in resultado['resultados']] == esperado
+    latencias = np.array(latencias)
+    return {
+        'consultas': len(consultas),
+        'p50_ms': float(np.percentile(latencias, 50)),
+        'p99_ms': float(np.percentile(latencias, 99)),
+        'parciais': parciais,
+        'topk_igual_no_unico': iguais / len(consultas)
+    }
+
+
+def imprimir_medicao(titulo, medicao):
+    print(f"{titulo}: p50 {medicao['p50_ms']:.1f} ms | p99 {medicao['p99_ms']:.1f} ms | "
+          f"parciais {medicao['parciais']}/{medicao['consultas']} | "
+          f"top-k igual ao nó único {medicao['topk_igual_no_unico']:.0%}")
+
+
+def testar_local(args):
+    """Galeria sintética em shards locais: exatidão, prazo e rebalanceamento."""
+    rng = np.random.default_rng(args.seed)
+    prazo = args.prazo_ms / 1000
+    relatorio = {}
+    with tempfile.TemporaryDirectory() as pasta:
+        print(f"🧪 Galeria sintética: {args.pessoas} pessoas x {args.amostras} amostras ({args.dim} dims)")
+        store, centros = galeria_sintetica(Path(pasta) / "store", args.pessoas, args.amostras, args.dim, rng)
+        mapa = particionar_store(store, Path(pasta) / "shards", args.shards, porta_inicial=args.porta)
+        consultas = centros[rng.choice(len(centros), args.consultas)] + \
+            rng.normal(0, 0.3, (args.consultas, args.dim)).astype(np.float32)
+
+        quantizador = None
+        if args.quantizacao:
+            quantizador = ScalarQuantizer.calibrar(store.vetores[store.ativas()], args.quantizacao)
+            print(f"🗜️ Busca {args.quantizacao} nos shards (rerank de {args.rerank} linhas)")
+
+        processos = iniciar_shards_locais(mapa, quantizador=quantizador, rerank=args.rerank)
+        try:
+            with ScatterGatherCoordinator(mapa) as coordenador:
+                coordenador.identificar(consultas[0], k=args.k, prazo=5.0)  # abre as conexões
+                relatorio['normal'] = medir(coordenador, store, consultas, args.k, prazo)
+                imprimir_medicao(f"✅ {args.shards} shards", relatorio['normal'])
+
+                # Novo shard vazio + rebalanceamento; consultas continuam exatas
+                nome = f"s{args.shards}"
+                mapa.shards[nome] = {'endereco': f"127.0.0.1:{args.porta + args.shards}",
+                                     'pasta': str(Path(pasta) / "shards" / nome)}
+                processos += iniciar_shards_locais(mapa, [nome], quantizador=quantizador, rerank=args.rerank)
+            with ScatterGatherCoordinator(mapa) as coordenador:
+                movimentos = coordenador.rebalancear(args.tolerancia)
+                linhas = {n: e['linhas'] for n, e in coordenador.info().items()}
+                print(f"⚖️ Rebalanceamento para {len(mapa.shards)} shards: {len(movimentos)} pessoas movidas | "
+                      f"linhas por shard: {linhas}")
+                relatorio['rebalanceamento'] = {'movimentos': len(movimentos), 'linhas_por_shard': linhas}
+                coordenador.identificar(consultas[0], k=args.k, prazo=5.0)
+                relatorio['rebalanceado'] = medir(coordenador, store, consultas, args.k, prazo)
+                imprimir_medicao(f"✅ {len(mapa.shards)} shards", relatorio['rebalanceado'])
+        finally:
+            for p in processos:
+                p.terminate()
+
+        if args.lento_ms:
+            # Mesmo mapa com s0 lento: o coordenador responde no prazo, sem s0
+            processos = iniciar_shards_locais(mapa, atrasos={"s0": args.lento_ms / 1000},
+                                              quantizador=quantizador, rerank=args.rerank)
+            try:
+                with ScatterGatherCoordinator(mapa) as coordenador:
+                    relatorio['shard_lento'] = medir(coordenador, store, consultas[:20], args.k, prazo)
+                    imprimir_medicao(f"🐢 s0 com +{args.lento_ms} ms", relatorio['shard_lento'])
+            finally:
+                for p in processos:
+                    p.terminate()
+    return relatorio
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Identificação com a galeria particionada em shards")
+    parser.add_argument("--mapa", default=os.path.join(DEFAULT_SHARDS_PATH, MAPA_NAME))
+
+    sub = parser.add_subparsers(dest="comando", required=True)
+    p = sub.add_parser("particionar", help="Divide um store por pessoa em N shards")
+    p.add_argument("--store", default="galeria/store")
+    p.add_argument("--shards", type=int, default=4)
+    p.add_argument("--host", default="127.0.0.1", help="Host dos endereços gravados no mapa")
+    p.add_argument("--porta", type=int, default=PORTA_INICIAL, help="Porta do primeiro shard")
+    p = sub.add_parser("servir", help="Executa um shard do mapa")
+    p.add_argument("shard")
+    p.add_argument("--host", default=None, help="Interface de escuta (padrão: a do mapa)")
+    p.add_argument("--pasta", default=None, help="Store do shard (padrão: a do mapa)")
+    p.add_argument("--atraso-ms", type=float, default=0, help="Atraso artificial por consulta")
+    servidores = [p, sub.add_parser("servir-locais", help="Executa todos os shards do mapa nesta máquina")]
+    for p in servidores:
+        p.add_argument("--quantizacao", default=None, metavar="CALIBRACAO|float16",
+                       help="Busca sobre códigos int8 (calibração .json) ou float16")
+        p.add_argument("--rerank", type=int, default=50, help="Linhas reordenadas com a distância exata")
+    p = sub.add_parser("identificar", help="Identifica uma assinatura em todos os shards")
+    p.add_argument("imagem")
+    p.add_argument("--modelo", default="modelos/modelo_assinaturas_manuscritas.h5")
+    p.add_argument("--k", type=int, default=5)
+    p.add_argument("--prazo-ms", type=float, default=250)
+    sub.add_parser("status", help="Linhas e pessoas de cada shard")
+    p = sub.add_parser("rebalancear", help="Equilibra as linhas entre shards")
+    p.add_argument("--adicionar", action="append", default=[], metavar="NOME=HOST:PORTA",
+                   help="Novo shard (já em execução)")
+    p.add_argument("--remover", action="append", default=[], metavar="NOME",
+                   help="Shard a esvaziar e tirar do mapa")
+    p.add_argument("--tolerancia", type=float, default=0.1, help="Desvio aceito da média de linhas")
+    p = sub.add_parser("testar-local", help="Teste com galeria sintética e shards locais")
+    p.add_argument("--shards", type=int, default=4)
+    p.add_argument("--pessoas", type=int, default=2000)
+    p.add_argument("--amostras", type=int, default=5)
+    p.add_argument("--dim", type=int, default=128)
+    p.add_argument("--consultas", type=int, default=200)
+    p.add_argument("--k", type=int, default=5)
+    p.add_argument("--prazo-ms", type=float, default=250)
+    p.add_argument("--lento-ms", type=float, default=0, help="Atraso de s0 no teste de resultado parcial")
+    p.add_argument("--tolerancia", type=float, default=0.1)
+    p.add_argument("--quantizacao", choices=["int8", "float16"], default=None,
+                   help="Busca quantizada nos shards (int8 calibrado na galeria sintética)")
+    p.add_argument("--rerank", type=int, default=50, help="Linhas reordenadas com a distância exata")
+    p.add_argument("--porta", type=int, default=PORTA_INICIAL + 100)
+    p.add_argument("--saida", default="resultados_avaliacao/identificacao_distribuida.json")
+    p.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print("🌐 IDENTIFICAÇÃO DISTRIBUÍDA")
+    print("=" * 50)
+
+    if args.comando == "testar-local":
+        relatorio = testar_local(args)
+        Path(args.saida).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.saida, "w") as f:
+            json.dump(relatorio, f, indent=2)
+        print(f"💾 Relatório salvo em: {args.saida}")
+        return
+
+    if args.comando == "particionar":
+        store = EmbeddingStore(args.store)
+        if not len(store):
+            print(f"❌ Store vazio em {args.store}")
+            print("Execute primeiro: python scripts/gerenciar_cadastro.py exportar-store")
+            sys.exit(1)
+        mapa = particionar_store(store, Path(args.mapa).parent, args.shards, args.host, args.porta)
+        for nome, shard in mapa.shards.items():
+            n = sum(1 for s in mapa.pessoas.values() if s == nome)
+            print(f"   {nome}: {n} pessoas -> {shard['pasta']} ({shard['endereco']})")
+        print(f"✅ Mapa salvo em: {mapa.path}")
+        return
+
+    mapa = ShardMap(args.mapa)
+    if not mapa.shards:
+        print(f"❌ Mapa não encontrado em {args.mapa}")
+        print("Execute primeiro: python scripts/identificacao_distribuida.py particionar")
+        sys.exit(1)
+
+    if args.comando == "servir":
+        if args.shard not in mapa.shards:
+            print(f"❌ Shard {args.shard} não está no mapa ({', '.join(mapa.shards)})")
+            sys.exit(1)
+        shard = mapa.shards[args.shard]
+        host, porta = shard['endereco'].rsplit(":", 1)
+        print(f"🚀 {args.shard} em {args.host or host}:{porta}")
+        try:
+            servir_shard(args.shard, args.pasta or shard['pasta'], args.host or host, int(porta),
+                         args.atraso_ms / 1000, carregar_quantizador(args.quantizacao), args.rerank)
+        except KeyboardInterrupt:
+            print("\n👋 Shard encerrado")
+    elif args.comando == "servir-locais":
+        processos = iniciar_shards_locais(mapa, quantizador=carregar_quantizador(args.quantizacao),
+                                          rerank=args.rerank)
+        print(f"🚀 {len(processos)} shards no ar: " +
+              ", ".join(f"{n}@{s['endereco']}" for n, s in mapa.shards.items()))
+        aguardar(processos)
+    elif args.comando == "identificar":
+        if not Path(args.modelo).exists():
+            print(f"❌ Modelo não encontrado em {args.modelo}")
+            sys.exit(1)
+        # TensorFlow só é carregado aqui: os shards não dependem dele
+        from model_registry import DEFAULT_THRESHOLD_PATH, read_threshold
+
+        threshold, _ = read_threshold(DEFAULT_THRESHOLD_PATH)
+        embedding = calcular_embedding(args.modelo, args.imagem)
+        with ScatterGatherCoordinator(mapa) as coordenador:
+            imprimir_resultado(coordenador.identificar(embedding, k=args.k, prazo=args.prazo_ms / 1000), threshold)
+    elif args.comando == "status":
+        with ScatterGatherCoordinator(mapa) as coordenador:
+            for nome, estado in coordenador.info().items():
+                if 'erro' in estado:
+                    print(f"   ❌ {nome} ({mapa.shards[nome]['endereco']}): {estado['erro']}")
+                else:
+                    print(f"   ✅ {nome} ({mapa.shards[nome]['endereco']}): {estado['pessoas']} pessoas, "
+                          f"{estado['linhas']} linhas")
+        print(f"🗺️ Mapa versão {mapa.versao}: {len(mapa.pessoas)} pessoas em {len(mapa.shards)} shards")
+    elif args.comando == "rebalancear":
+        for item in args.adicionar:
+            nome, endereco = item.split("=", 1)
+            mapa.shards[nome] = {'endereco': endereco, 'pasta': str(Path(args.mapa).parent / nome)}
+        # O coordenador ainda conecta nos shards removidos para esvaziá-los
+        with ScatterGatherCoordinator(mapa) as coordenador:
+            for nome in args.remover:
+                mapa.shards.pop(nome, None)
+            movimentos = coordenador.rebalancear(args.tolerancia)
+            mapa.salvar()
+            print(f"⚖️ {len(movimentos)} pessoa(s) movida(s)")
+            for nome, estado in coordenador.info().items():
+                if nome in mapa.shards:
+                    print(f"   {nome}: {estado.get('linhas', estado.get('erro'))} linhas")
+        print(f"✅ Mapa versão {mapa.versao} salvo em: {mapa.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,7 @@ Script para preparar dataset de assinaturas manuscritas.
 Aplica data augmentation e organiza os dados para treinamento.
 """
 
+import argparse
 import os
 import sys
 import cv2
@@ -14,12 +15,17 @@ from pathlib import Path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 from data_preprocessing import preprocess_image
+from dataset_shards import DEFAULT_SHARDS_DIR, empacotar_pasta
+from near_duplicates import carregar_exclusoes
 
 class DatasetPreparator:
-    def __init__(self, input_dir="assinaturas_reais", output_dir="dataset_processado"):
+    def __init__(self, input_dir="assinaturas_reais", output_dir="dataset_processado", shards_dir=None,
+                 recortar=False):
         self.input_dir = Path(input_dir)
+        self.recortar = recortar
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
+        self.shards_dir = shards_dir
     
     def aplicar_augmentation(self, img_path, output_folder, base_name):
         """Aplica data augmentation em uma imagem."""
@@ -31,9 +37,9 @@ class DatasetPreparator:
         count = 0
         
         # 1. Original
-        img_proc = preprocess_image(str(img_path))
+        img_proc = preprocess_image(str(img_path), dtype=np.uint8, recortar=self.recortar)
         cv2.imwrite(str(output_folder / f"{base_name}_original.png"), 
-                   (img_proc * 255).astype(np.uint8))
+                   img_proc)
         count += 1
         
         # 2. Rotações
@@ -47,9 +53,9 @@ class DatasetPreparator:
             temp_path = output_folder / f"temp_rot_{angle}.png"
             cv2.imwrite(str(temp_path), rotated)
             
-            img_proc = preprocess_image(str(temp_path))
+            img_proc = preprocess_image(str(temp_path), dtype=np.uint8, recortar=self.recortar)
             cv2.imwrite(str(output_folder / f"{base_name}_rot{angle:+d}.png"), 
-                       (img_proc * 255).astype(np.uint8))
+                       img_proc)
             temp_path.unlink()
             count += 1
         
@@ -73,9 +79,9 @@ class DatasetPreparator:
             temp_path = output_folder / f"temp_scale_{scale}.png"
             cv2.imwrite(str(temp_path), scaled_final)
             
-            img_proc = preprocess_image(str(temp_path))
+            img_proc = preprocess_image(str(temp_path), dtype=np.uint8, recortar=self.recortar)
             cv2.imwrite(str(output_folder / f"{base_name}_scale{scale:.2f}.png"), 
-                       (img_proc * 255).astype(np.uint8))
+                       img_proc)
             temp_path.unlink()
             count += 1
         
@@ -89,9 +95,9 @@ class DatasetPreparator:
             temp_path = output_folder / f"temp_trans_{dx}_{dy}.png"
             cv2.imwrite(str(temp_path), translated)
             
-            img_proc = preprocess_image(str(temp_path))
+            img_proc = preprocess_image(str(temp_path), dtype=np.uint8, recortar=self.recortar)
             cv2.imwrite(str(output_folder / f"{base_name}_trans{dx:+d}{dy:+d}.png"), 
-                       (img_proc * 255).astype(np.uint8))
+                       img_proc)
             temp_path.unlink()
             count += 1
         
@@ -105,9 +111,9 @@ class DatasetPreparator:
             temp_path = output_folder / f"temp_noise_{noise_level}.png"
             cv2.imwrite(str(temp_path), noisy)
             
-            img_proc = preprocess_image(str(temp_path))
+            img_proc = preprocess_image(str(temp_path), dtype=np.uint8, recortar=self.recortar)
             cv2.imwrite(str(output_folder / f"{base_name}_noise{noise_level:.2f}.png"), 
-                       (img_proc * 255).astype(np.uint8))
+                       img_proc)
             temp_path.unlink()
             count += 1
         
@@ -126,6 +132,7 @@ class DatasetPreparator:
         
         total_imagens = 0
         total_pessoas = 0
+        excluidas = carregar_exclusoes(self.input_dir)['arquivos']
         
         print("🔄 PREPARANDO DATASET DE ASSINATURAS MANUSCRITAS")
         print("=" * 50)
@@ -148,8 +155,14 @@ class DatasetPreparator:
                 print(f"⚠️ Nenhuma imagem encontrada em {pessoa_dir}")
                 continue
             
+            # Fotos repetidas marcadas por scripts/detectar_duplicatas.py
+            n_encontradas = len(image_files)
+            image_files = [f for f in image_files if f"{pessoa_name}/{f.name}" not in excluidas]
+            
             print(f"\n👤 Processando: {pessoa_name}")
             print(f"   Imagens originais: {len(image_files)}")
+            if len(image_files) < n_encontradas:
+                print(f"   ♻️ {n_encontradas - len(image_files)} duplicata(s) ignorada(s)")
             
             pessoa_count = 0
             for i, img_file in enumerate(image_files, 1):
@@ -173,13 +186,25 @@ class DatasetPreparator:
             print(f"   Adicione mais pastas em {self.input_dir}")
             return False
         
+        if self.shards_dir:
+            manifest = empacotar_pasta(self.output_dir, self.shards_dir)
+            print(f"📦 Shards: {len(manifest['shards'])} arquivos em {self.shards_dir}")
+        
         return True
 
 def main():
     print("📝 PREPARADOR DE DATASET PARA ASSINATURAS MANUSCRITAS")
     print("=" * 55)
     
-    preparador = DatasetPreparator()
+    parser = argparse.ArgumentParser(description="Prepara o dataset de assinaturas")
+    parser.add_argument("--recortar", action="store_true",
+                        help="Recorta a região com tinta (o modelo treinado exige recorte também na inferência)")
+    parser.add_argument("--shards", action="store_true",
+                        help=f"Também empacota o resultado em shards ({DEFAULT_SHARDS_DIR}/)")
+    args = parser.parse_args()
+    
+    preparador = DatasetPreparator(shards_dir=DEFAULT_SHARDS_DIR if args.shards else None,
+                                   recortar=args.recortar)
     
     if preparador.processar():
         print(f"\n✅ Pronto! Agora execute: python scripts/treinar_modelo.py")
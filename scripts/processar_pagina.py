@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Script para verificar todas as assinaturas de páginas digitalizadas.
+Encontra as regiões candidatas de cada página, calcula os embeddings de todas
+em uma única passada da rede e compara cada uma com a galeria das pessoas
+que deveriam ter assinado.
+
+Exemplo:
+    python scripts/processar_pagina.py contrato.png --pessoas maria joao
+    python scripts/processar_pagina.py pag1.jpg pag2.jpg --pessoas maria --recortes recortes/
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import cv2
+
+# Adicionar diretório pai ao path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from enrollment import SignatureEnrollment
+from model_registry import DEFAULT_MODEL_PATH, DEFAULT_THRESHOLD_PATH, read_threshold
+from page_extraction import PageVerifier
+from profiling import perfilar
+from verification_cache import file_fingerprint
+
+
+@perfilar('verificacao_pagina')
+def processar(verificador, path, pessoas, max_regioes, pasta_recortes=None):
+    """Processa uma página e, opcionalmente, grava os recortes preprocessados."""
+    pagina = cv2.imread(str(path), cv2.IMREAD_GRAYSCALE)
+    if pagina is None:
+        raise ValueError(f"Não foi possível carregar a página: {path}")
+
+    regioes, imagens = verificador.processar(pagina, pessoas, max_regioes=max_regioes)
+    if pasta_recortes:
+        pasta = Path(pasta_recortes)
+        pasta.mkdir(parents=True, exist_ok=True)
+        for i, img in enumerate(imagens):
+            cv2.imwrite(str(pasta / f"{Path(path).stem}_regiao{i + 1:02d}.png"), img)
+    return regioes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verifica as assinaturas de páginas digitalizadas")
+    parser.add_argument("paginas", nargs="+", help="Imagens das páginas (escala de cinza ou cor)")
+    parser.add_argument("--pessoas", nargs="+", required=True, help="Pessoas que deveriam ter assinado")
+    parser.add_argument("--modelo", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--galeria", default="galeria")
+    parser.add_argument("--threshold", type=float, default=None, help=f"Padrão: {DEFAULT_THRESHOLD_PATH}")
+    parser.add_argument("--max-regioes", type=int, default=8)
+    parser.add_argument("--recortes", default=None, help="Pasta para gravar os recortes preprocessados")
+    parser.add_argument("--saida", default="resultados_avaliacao/paginas.json")
+    args = parser.parse_args()
+
+    print("📄 VERIFICAÇÃO DE PÁGINAS")
+    print("=" * 50)
+
+    if not Path(args.modelo).exists():
+        print(f"❌ Modelo não encontrado em {args.modelo}")
+        return
+
+    from model import load_model_with_custom_objects, get_embedding_network
+
+    threshold = args.threshold
+    if threshold is None:
+        threshold, _ = read_threshold(DEFAULT_THRESHOLD_PATH)
+
+    rede_base = get_embedding_network(load_model_with_custom_objects(args.modelo))
+    cadastro = SignatureEnrollment(rede_base, gallery_dir=args.galeria,
+                                   model_fingerprint=file_fingerprint(args.modelo)).carregar()
+    desatualizadas = set(cadastro.desatualizadas()) & set(args.pessoas)
+    if desatualizadas:
+        print(f"❌ Galeria de outro modelo para: {', '.join(sorted(desatualizadas))}")
+        print("Execute: python scripts/gerenciar_cadastro.py sincronizar")
+        return
+
+    verificador = PageVerifier(rede_base, cadastro, threshold)
+    relatorio = {'threshold': threshold, 'pessoas': args.pessoas, 'paginas': []}
+    for path in args.paginas:
+        inicio = time.perf_counter()
+        try:
+            regioes = processar(verificador, path, args.pessoas, args.max_regioes, args.recortes)
+        except ValueError as e:
+            print(f"❌ {e}")
+            relatorio['paginas'].append({'pagina': str(path), 'erro': str(e)})
+            continue
+        duracao = time.perf_counter() - inicio
+
+        assinantes = {r['melhor_pessoa'] for r in regioes if r['melhor_pessoa']}
+        ausentes = [p for p in args.pessoas if p not in assinantes]
+        print(f"\n📄 {path}: {len(regioes)} região(ões) em {duracao * 1000:.0f} ms")
+        for i, regiao in enumerate(regioes, 1):
+            melhor = regiao['comparacoes'][0]
+            status = "✅" if regiao['melhor_pessoa'] else "❌"
+            print(f"   {status} Região {i} {regiao['caixa']}: {melhor['pessoa']} "
+                  f"(distância {melhor['min_distancia']:.4f})")
+        if ausentes:
+            print(f"   ⚠️ Sem assinatura reconhecida: {', '.join(ausentes)}")
+
+        relatorio['paginas'].append({
+            'pagina': str(path),
+            'segundos': duracao,
+            'regioes': regioes,
+            'pessoas_sem_assinatura': ausentes
+        })
+
+    Path(args.saida).parent.mkdir(parents=True, exist_ok=True)
+    with open(args.saida, "w") as f:
+        json.dump(relatorio, f, indent=2, ensure_ascii=False)
+    print(f"\n💾 Relatório salvo em: {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
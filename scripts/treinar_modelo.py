@@ -3,8 +3,12 @@
 Script para treinar modelo de verificação de assinaturas manuscritas.
 """
 
+import argparse
+import hashlib
+import json
 import os
 import sys
+import time
 import numpy as np
 import tensorflow as tf
 from sklearn.model_selection import train_test_split
@@ -13,18 +17,72 @@ from pathlib import Path
 # Adicionar diretório pai ao path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
+from cpu_tuning import aplicar_ajuste
 from data_preprocessing import preprocess_image
-from model import build_siamese_network, contrastive_loss
+from dataset_shards import DEFAULT_SHARDS_DIR, ShardedDataset, has_manifest
+from model import (build_siamese_network, make_contrastive_loss, get_embedding_network,
+                   load_model_with_custom_objects, prepare_model_input)
+from model_registry import DEFAULT_MODEL_PATH, DEFAULT_THRESHOLD_PATH, read_threshold
+from near_duplicates import EXCLUSION_NAME, carregar_exclusoes, content_sha1
+from training_checkpoint import PreemptionSignal, TrainingCheckpointer
 
 class ModelTrainer:
-    def __init__(self, data_dir="dataset_processado", model_dir="modelos"):
+    def __init__(self, data_dir="dataset_processado", model_dir="modelos", shards_dir=DEFAULT_SHARDS_DIR,
+                 excluir_duplicatas=True):
         self.data_dir = Path(data_dir)
+        self.excluir_duplicatas = excluir_duplicatas
         self.model_dir = Path(model_dir)
         self.model_dir.mkdir(exist_ok=True)
+        self.shards_dir = Path(shards_dir) if shards_dir else None
         self.input_shape = (155, 220, 1)
     
+    def carregar_shards(self):
+        """Carrega o dataset empacotado em shards (poucos arquivos grandes)."""
+        dataset = ShardedDataset(self.shards_dir)
+        if dataset.desatualizado(self.data_dir):
+            print(f"⚠️ {self.data_dir} mudou depois do empacotamento; "
+                  f"execute: python scripts/empacotar_dataset.py")
+        
+        print(f"📦 Carregando dataset de {self.shards_dir} ({len(dataset.shards)} shards)...")
+        images, labels = dataset.carregar(dtype=np.uint8)
+        print(f"✅ Dataset carregado: {len(images)} imagens de {len(dataset.pessoas)} pessoas")
+        return images, labels
+    
     def carregar_dataset(self):
-        """Carrega imagens do dataset processado."""
+        """Carrega imagens do dataset processado (shards, se houver, ou PNGs),
+        sem as quase-duplicatas listadas em excluidas.json."""
+        if self.shards_dir is not None and has_manifest(self.shards_dir):
+            images, labels = self.carregar_shards()
+        else:
+            images, labels = self.carregar_pngs()
+        if images is None or not self.excluir_duplicatas:
+            return images, labels
+        return self.filtrar_duplicatas(images, labels)
+    
+    def filtrar_duplicatas(self, images, labels):
+        """Remove as imagens marcadas por scripts/detectar_duplicatas.py --excluir."""
+        exclusoes = carregar_exclusoes(self.data_dir)
+        excluidas, copias = exclusoes['sha1'], exclusoes['sha1_copias']
+        if not excluidas and not copias:
+            return images, labels
+        manter = np.ones(len(images), dtype=bool)
+        vistas = set()
+        for i, img in enumerate(images):
+            sha1 = content_sha1(img)
+            if sha1 in excluidas:
+                manter[i] = False
+            elif sha1 in copias:
+                # Cópias idênticas: a primeira fica no treino
+                manter[i] = sha1 not in vistas
+                vistas.add(sha1)
+        if manter.all():
+            return images, labels
+        print(f"♻️ {int((~manter).sum())} quase-duplicatas ignoradas ({self.data_dir / EXCLUSION_NAME}); "
+              f"{int(manter.sum())} imagens no treino")
+        return images[manter], labels[manter]
+    
+    def carregar_pngs(self):
+        """Carrega as imagens a partir dos PNGs em pastas por pessoa."""
         if not self.data_dir.exists():
             print(f"❌ Dataset não encontrado em {self.data_dir}")
             print("Execute primeiro: python scripts/preparar_dataset.py")
@@ -46,7 +104,7 @@ class ModelTrainer:
             
             for img_path in pessoa_images:
                 try:
-                    img = preprocess_image(str(img_path))
+                    img = preprocess_image(str(img_path), dtype=np.uint8)
                     if img.ndim == 2:
                         img = np.expand_dims(img, axis=-1)
                     images.append(img)
@@ -57,8 +115,121 @@ class ModelTrainer:
         print(f"✅ Dataset carregado: {len(images)} imagens de {len(set(labels))} pessoas")
         return np.array(images), np.array(labels)
     
-    def criar_pares(self, images, labels):
-        """Cria pares de imagens para treinamento siamês."""
+    @property
+    def model_path(self):
+        return self.model_dir / "modelo_assinaturas_manuscritas.h5"
+    
+    @property
+    def registro_pessoas_path(self):
+        return self.model_dir / "modelo_assinaturas_manuscritas.pessoas.json"
+    
+    def salvar_modelo(self, model):
+        """Salva o modelo (escrita atômica: os apps recarregam o arquivo a quente
+        e nunca devem ler um modelo pela metade)."""
+        temp_path = self.model_dir / "modelo_assinaturas_manuscritas.tmp.h5"
+        model.save(str(temp_path))
+        os.replace(temp_path, self.model_path)
+        return self.model_path
+    
+    def impressoes_pessoas(self, images, labels):
+        """
+        Impressão digital das imagens de cada pessoa (independe da ordem e de
+        o dataset vir de shards ou de PNGs).
+        
+        Returns:
+            dict: pessoa -> hash SHA-1
+        """
+        por_pessoa = {}
+        for img, label in zip(images, labels):
+            por_pessoa.setdefault(str(label), []).append(hashlib.sha1(img.tobytes()).hexdigest())
+        return {
+            pessoa: hashlib.sha1("".join(sorted(hashes)).encode()).hexdigest()
+            for pessoa, hashes in sorted(por_pessoa.items())
+        }
+    
+    def salvar_registro_pessoas(self, impressoes):
+        """Registra com quais imagens de cada pessoa o modelo foi treinado."""
+        temp_path = self.registro_pessoas_path.with_suffix(".json.tmp")
+        with open(temp_path, "w") as f:
+            json.dump(impressoes, f, indent=2, ensure_ascii=False)
+        os.replace(temp_path, self.registro_pessoas_path)
+    
+    def pessoas_alteradas(self, impressoes):
+        """
+        Pessoas novas ou com imagens alteradas desde o último treinamento.
+        
+        Returns:
+            list: Nomes das pessoas, ou None se o modelo não tem registro
+        """
+        if not self.registro_pessoas_path.exists():
+            return None
+        with open(self.registro_pessoas_path) as f:
+            registradas = json.load(f)
+        return [p for p, h in impressoes.items() if registradas.get(p) != h]
+    
+    def separar_validacao(self, labels, fracao=0.2, seed=42):
+        """
+        Separa imagens de validação por pessoa (pessoas com menos de 3
+        imagens ficam inteiras no treino).
+        
+        Returns:
+            tuple: (índices de treino, índices de validação)
+        """
+        rng = np.random.default_rng(seed)
+        treino, validacao = [], []
+        for label in sorted(set(labels)):
+            indices = rng.permutation(np.where(labels == label)[0])
+            n_val = max(1, int(round(fracao * len(indices)))) if len(indices) >= 3 else 0
+            validacao.extend(indices[:n_val])
+            treino.extend(indices[n_val:])
+        return np.array(sorted(treino), dtype=np.int64), np.array(sorted(validacao), dtype=np.int64)
+    
+    def avaliar_pares(self, model, pairs_a, pairs_b, pair_labels, threshold):
+        """
+        Métricas de um conjunto de pares: perda contrastiva, acurácia no
+        threshold calibrado e F1 ("mesma pessoa") no melhor threshold.
+        
+        Returns:
+            dict: Métricas (vazio se não houver pares)
+        """
+        if len(pair_labels) == 0:
+            return {}
+        distancias = model.predict([prepare_model_input(model, pairs_a), prepare_model_input(model, pairs_b)],
+                                   batch_size=64, verbose=0).ravel()
+        perda = np.mean((1 - pair_labels) * distancias ** 2 +
+                        pair_labels * np.maximum(1.0 - distancias, 0) ** 2)
+        
+        melhor_f1, melhor_threshold = 0.0, None
+        for t in np.arange(0.1, 1.0, 0.05):
+            mesma = distancias <= t
+            tp = np.sum(mesma & (pair_labels == 0))
+            fp = np.sum(mesma & (pair_labels == 1))
+            fn = np.sum(~mesma & (pair_labels == 0))
+            f1 = 2 * tp / (2 * tp + fp + fn) if tp > 0 else 0.0
+            if f1 > melhor_f1:
+                melhor_f1, melhor_threshold = f1, float(t)
+        
+        return {
+            'pares': int(len(pair_labels)),
+            'perda': float(perda),
+            'acuracia_threshold': float(np.mean((distancias > threshold).astype(int) == pair_labels)),
+            'f1_melhor': float(melhor_f1),
+            'melhor_threshold': melhor_threshold
+        }
+    
+    def criar_pares(self, images, labels, ancoras=None, rng=None):
+        """
+        Cria pares de imagens para treinamento siamês.
+        
+        Args:
+            images (np.array): Imagens (n, altura, largura, 1)
+            labels (np.array): Pessoa de cada imagem
+            ancoras (array, optional): Índices das imagens que formam pares
+                (padrão: todas); os parceiros vêm de qualquer pessoa
+            rng (np.random.Generator, optional): Sorteio reprodutível dos
+                parceiros (padrão: estado global do NumPy)
+        """
+        rng = rng if rng is not None else np.random
         pairs_a, pairs_b, pair_labels = [], [], []
         unique_labels = list(set(labels))
         
@@ -67,13 +238,14 @@ class ModelTrainer:
         # Mapeamento label -> índices
         label_to_indices = {label: np.where(labels == label)[0] for label in unique_labels}
         
-        for idx, img_a in enumerate(images):
+        for idx in (range(len(images)) if ancoras is None else ancoras):
+            img_a = images[idx]
             label_a = labels[idx]
             
             # Par positivo (mesma pessoa)
             same_indices = [i for i in label_to_indices[label_a] if i != idx]
             if same_indices:
-                pos_idx = np.random.choice(same_indices)
+                pos_idx = rng.choice(same_indices)
                 pairs_a.append(img_a)
                 pairs_b.append(images[pos_idx])
                 pair_labels.append(0)  # 0 = mesma pessoa (distância pequena)
@@ -81,8 +253,8 @@ class ModelTrainer:
             # Par negativo (pessoas diferentes)
             different_labels = [l for l in unique_labels if l != label_a]
             if different_labels:
-                neg_label = np.random.choice(different_labels)
-                neg_idx = np.random.choice(label_to_indices[neg_label])
+                neg_label = rng.choice(different_labels)
+                neg_idx = rng.choice(label_to_indices[neg_label])
                 pairs_a.append(img_a)
                 pairs_b.append(images[neg_idx])
                 pair_labels.append(1)  # 1 = pessoas diferentes (distância grande)
@@ -97,19 +269,55 @@ class ModelTrainer:
         
         return pairs_a, pairs_b, pair_labels
     
-    def treinar(self, epochs=25, batch_size=16):
-        """Treina o modelo."""
+    def treinar(self, epochs=25, batch_size=16, learning_rate=0.001, margin=1.0, arquitetura=None,
+                retomar=False, checkpoint_passos=None, checkpoint_minutos=5.0, manter_checkpoints=3, seed=42):
+        """
+        Treina o modelo do zero, com checkpoints periódicos.
+        
+        O laço de treino grava pesos, estado do otimizador, época/passo,
+        histórico, estado do early stopping e da redução de LR a cada
+        `checkpoint_passos` passos ou `checkpoint_minutos` minutos, no fim de
+        cada época e ao receber SIGTERM/SIGINT. Os pares e a ordem de cada
+        época derivam de `seed`, então `retomar=True` continua do passo exato
+        em que o treino parou.
+        
+        Args:
+            epochs (int): Épocas de treinamento
+            batch_size (int): Tamanho do lote
+            learning_rate (float): Taxa de aprendizado inicial
+            margin (float): Margem da perda contrastiva
+            arquitetura (dict, optional): filtros, densas, embedding_dim e
+                dropout (ver model.build_base_network)
+            retomar (bool): Continua do último checkpoint em modelos/checkpoints
+            checkpoint_passos (int, optional): Intervalo em passos de treino
+            checkpoint_minutos (float, optional): Intervalo em minutos
+            manter_checkpoints (int): Checkpoints mantidos (os mais recentes)
+            seed (int): Seed do sorteio dos pares e da ordem das épocas
+        
+        Returns:
+            bool: True se o treino terminou (False em erro ou interrupção)
+        """
         # Carregar dados
         images, labels = self.carregar_dataset()
         if images is None:
             return False
         
-        # Criar pares
-        pairs_a, pairs_b, pair_labels = self.criar_pares(images, labels)
+        impressoes = self.impressoes_pessoas(images, labels)
+        dataset_hash = hashlib.sha1(json.dumps([impressoes, [str(l) for l in labels]]).encode()).hexdigest()
+        config = {
+            'epochs': epochs, 'batch_size': batch_size, 'learning_rate': learning_rate,
+            'margin': margin, 'arquitetura': arquitetura or {}, 'seed': seed
+        }
+        
+        # Criar pares (sorteio reprodutível: a retomada recria os mesmos pares)
+        pairs_a, pairs_b, pair_labels = self.criar_pares(images, labels, rng=np.random.default_rng(seed))
         
         # Dividir em treino e validação
         X_a_train, X_a_val, X_b_train, X_b_val, y_train, y_val = train_test_split(
             pairs_a, pairs_b, pair_labels, test_size=0.2, random_state=42, stratify=pair_labels)
+        del pairs_a, pairs_b
+        y_train = y_train.astype(np.float32)
+        y_val = y_val.astype(np.float32)
         
         print(f"\n📊 Divisão dos dados:")
         print(f"   Treinamento: {len(X_a_train)} pares")
@@ -117,69 +325,381 @@ class ModelTrainer:
         
         # Construir modelo
         print(f"\n🏗️ Construindo modelo...")
-        model = build_siamese_network(self.input_shape)
+        tf.keras.utils.set_random_seed(seed)
+        model = build_siamese_network(self.input_shape, **(arquitetura or {}))
+        perda = make_contrastive_loss(margin)
         model.compile(
-            optimizer=tf.keras.optimizers.Adam(learning_rate=0.001),
-            loss=contrastive_loss,
+            optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate),
+            loss=perda,
             metrics=['accuracy']
         )
         
         print(f"✅ Modelo construído")
         model.summary()
         
-        # Callbacks
-        callbacks = [
-            tf.keras.callbacks.EarlyStopping(
-                monitor='val_loss',
-                patience=5,
-                restore_best_weights=True
-            ),
-            tf.keras.callbacks.ReduceLROnPlateau(
-                monitor='val_loss',
-                factor=0.5,
-                patience=3,
-                min_lr=0.00001
-            )
-        ]
+        # Estado do laço (equivalente a EarlyStopping(patience=5, restore_best_weights=True)
+        # e ReduceLROnPlateau(factor=0.5, patience=3, min_lr=0.00001) sobre val_loss)
+        estado = {
+            'config': config,
+            'dataset': dataset_hash,
+            'epoca': 0,
+            'passo': 0,
+            'parcial': {'perda': 0.0, 'acertos': 0.0, 'vistos': 0},
+            'historico': {'loss': [], 'accuracy': [], 'val_loss': [], 'val_accuracy': [], 'lr': []},
+            'melhor_val_loss': None,
+            'espera_parada': 0,
+            'melhor_lr_val_loss': None,
+            'espera_lr': 0,
+            'learning_rate': learning_rate
+        }
+        melhores_pesos = None
+        
+        checkpointer = TrainingCheckpointer(
+            self.model_dir / "checkpoints", manter=manter_checkpoints, intervalo_passos=checkpoint_passos,
+            intervalo_segundos=checkpoint_minutos * 60 if checkpoint_minutos else None)
+        rastreaveis = {'model': model, 'optimizer': model.optimizer}
+        
+        ultimo = checkpointer.ultimo() if retomar else None
+        if retomar and ultimo is None:
+            print("⚠️ Nenhum checkpoint encontrado; começando do zero")
+        if ultimo is not None:
+            salvo, extras = checkpointer.restaurar(ultimo, rastreaveis)
+            # O número de épocas pode mudar (estender um treino); o resto não
+            mesma_config = {k: v for k, v in salvo['config'].items() if k != 'epochs'} == \
+                {k: v for k, v in config.items() if k != 'epochs'}
+            if salvo['dataset'] != dataset_hash or not mesma_config:
+                print(f"❌ O checkpoint {ultimo.name} é de outro dataset ou de outra configuração")
+                print("   Rode com os mesmos parâmetros ou sem --retomar para começar do zero")
+                return False
+            estado = {k: salvo[k] for k in estado}
+            estado['config'] = config
+            if extras:
+                melhores_pesos = [extras[f"peso_{i}"] for i in range(len(extras))]
+            tf.keras.backend.set_value(model.optimizer.learning_rate, estado['learning_rate'])
+            print(f"♻️ Retomando de {ultimo.name}: época {estado['epoca'] + 1}, passo {estado['passo']}")
+        elif not retomar:
+            checkpointer.limpar()
+        
+        @tf.function
+        def passo_treino(xa, xb, y):
+            y = tf.reshape(y, (-1, 1))
+            with tf.GradientTape() as tape:
+                distancias = model([xa, xb], training=True)
+                loss = perda(y, distancias)
+            grads = tape.gradient(loss, model.trainable_variables)
+            model.optimizer.apply_gradients(zip(grads, model.trainable_variables))
+            acertos = tf.reduce_sum(tf.cast(tf.equal(tf.cast(distancias > 0.5, tf.float32), y), tf.float32))
+            return loss, acertos
+        
+        def salvar_checkpoint():
+            extras = {f"peso_{i}": w for i, w in enumerate(melhores_pesos or [])}
+            caminho = checkpointer.salvar(passo_global, rastreaveis, estado, extras)
+            print(f"   💾 Checkpoint {caminho.name} (época {estado['epoca'] + 1}, passo {estado['passo']})")
         
         # Treinar
         print(f"\n🚀 Iniciando treinamento...")
         print(f"   Épocas: {epochs}")
         print(f"   Batch size: {batch_size}")
         
-        history = model.fit(
-            [X_a_train, X_b_train], y_train,
-            validation_data=([X_a_val, X_b_val], y_val),
-            batch_size=batch_size,
-            epochs=epochs,
-            callbacks=callbacks,
-            verbose=1
-        )
+        n_treino = len(y_train)
+        passos_por_epoca = int(np.ceil(n_treino / batch_size))
+        passo_global = estado['epoca'] * passos_por_epoca + estado['passo']
+        with PreemptionSignal() as parada:
+            while estado['epoca'] < epochs:
+                epoca = estado['epoca']
+                inicio = time.perf_counter()
+                ordem = np.random.default_rng([seed, epoca]).permutation(n_treino)
+                parcial = estado['parcial']
+                
+                while estado['passo'] < passos_por_epoca:
+                    idx = np.sort(ordem[estado['passo'] * batch_size:(estado['passo'] + 1) * batch_size])
+                    loss, acertos = passo_treino(X_a_train[idx], X_b_train[idx], y_train[idx])
+                    parcial['perda'] += float(loss) * len(idx)
+                    parcial['acertos'] += float(acertos)
+                    parcial['vistos'] += len(idx)
+                    estado['passo'] += 1
+                    passo_global += 1
+                    
+                    if parada.solicitada:
+                        salvar_checkpoint()
+                        print("🛑 Interrompido; continue com: python scripts/treinar_modelo.py --retomar")
+                        return False
+                    if checkpointer.deve_salvar(passo_global):
+                        salvar_checkpoint()
+                
+                # Validação
+                distancias = model.predict([X_a_val, X_b_val], batch_size=64, verbose=0).ravel()
+                val_loss = float(np.mean((1 - y_val) * distancias ** 2 +
+                                         y_val * np.maximum(margin - distancias, 0) ** 2))
+                val_acc = float(np.mean((distancias > 0.5) == y_val))
+                lr_atual = float(tf.keras.backend.get_value(model.optimizer.learning_rate))
+                historico = estado['historico']
+                historico['loss'].append(parcial['perda'] / max(parcial['vistos'], 1))
+                historico['accuracy'].append(parcial['acertos'] / max(parcial['vistos'], 1))
+                historico['val_loss'].append(val_loss)
+                historico['val_accuracy'].append(val_acc)
+                historico['lr'].append(lr_atual)
+                print(f"Época {epoca + 1}/{epochs} - {time.perf_counter() - inicio:.0f}s - "
+                      f"loss: {historico['loss'][-1]:.4f} - accuracy: {historico['accuracy'][-1]:.4f} - "
+                      f"val_loss: {val_loss:.4f} - val_accuracy: {val_acc:.4f} - lr: {lr_atual:.6f}")
+                
+                # Early stopping
+                parar = False
+                if estado['melhor_val_loss'] is None or val_loss < estado['melhor_val_loss']:
+                    estado['melhor_val_loss'] = val_loss
+                    estado['espera_parada'] = 0
+                    melhores_pesos = model.get_weights()
+                else:
+                    estado['espera_parada'] += 1
+                    parar = estado['espera_parada'] >= 5
+                
+                # Redução da taxa de aprendizado
+                if estado['melhor_lr_val_loss'] is None or val_loss < estado['melhor_lr_val_loss'] - 1e-4:
+                    estado['melhor_lr_val_loss'] = val_loss
+                    estado['espera_lr'] = 0
+                else:
+                    estado['espera_lr'] += 1
+                    if estado['espera_lr'] >= 3 and lr_atual > 0.00001:
+                        lr_atual = max(lr_atual * 0.5, 0.00001)
+                        tf.keras.backend.set_value(model.optimizer.learning_rate, lr_atual)
+                        estado['espera_lr'] = 0
+                        print(f"   📉 Taxa de aprendizado reduzida para {lr_atual:.6f}")
+                estado['learning_rate'] = lr_atual
+                
+                estado['epoca'] += 1
+                estado['passo'] = 0
+                estado['parcial'] = {'perda': 0.0, 'acertos': 0.0, 'vistos': 0}
+                if parar:
+                    print(f"⏹️ Early stopping: val_loss sem melhora há 5 épocas")
+                    estado['epoca'] = epochs
+                salvar_checkpoint()
         
-        # Salvar modelo
-        model_path = self.model_dir / "modelo_assinaturas_manuscritas.h5"
-        model.save(str(model_path))
+        if melhores_pesos is not None:
+            model.set_weights(melhores_pesos)
+        
+        model_path = self.salvar_modelo(model)
+        self.salvar_registro_pessoas(impressoes)
         
         print(f"\n✅ TREINAMENTO CONCLUÍDO!")
         print(f"📁 Modelo salvo em: {model_path}")
         
         # Estatísticas finais
-        final_loss = history.history['val_loss'][-1]
-        final_acc = history.history['val_accuracy'][-1]
+        final_loss = estado['historico']['val_loss'][-1]
+        final_acc = estado['historico']['val_accuracy'][-1]
         
         print(f"📊 Performance final:")
         print(f"   Loss de validação: {final_loss:.4f}")
         print(f"   Acurácia de validação: {final_acc:.4f}")
         
         return True
+    
+    def ajustar(self, pessoas_novas=None, replay=1.0, congelar_convs=False, epochs=5, batch_size=16,
+                learning_rate=0.0001, margin=1.0, modelo_base=DEFAULT_MODEL_PATH, tolerancia=0.02, forcar=False):
+        """
+        Ajuste fino do modelo atual após o cadastro de pessoas novas.
+        
+        Parte dos pesos de `modelo_base` e treina só com pares ancorados nas
+        imagens das pessoas novas ou alteradas, mais uma amostra de imagens
+        das pessoas já conhecidas (replay) para o modelo não esquecê-las.
+        As métricas antes/depois são medidas em imagens separadas de
+        validação, à parte para pessoas novas e existentes.
+        
+        Args:
+            pessoas_novas (list, optional): Pessoas a incluir; padrão: as que
+                mudaram desde o último treinamento (registro .pessoas.json)
+            replay (float): Imagens de pessoas existentes por imagem nova
+            congelar_convs (bool): Treina só as camadas densas
+            epochs (int): Épocas do ajuste
+            batch_size (int): Tamanho do lote
+            learning_rate (float): Taxa de aprendizado (menor que a do treino completo)
+            margin (float): Margem da perda contrastiva (a mesma do treino do modelo base)
+            modelo_base (str): Modelo de partida
+            tolerancia (float): Queda máxima de F1 nas pessoas existentes
+            forcar (bool): Salva o modelo mesmo se piorar além da tolerância
+        
+        Returns:
+            bool: True se o ajuste terminou (com ou sem troca do modelo)
+        """
+        if not Path(modelo_base).exists():
+            print(f"❌ Modelo base não encontrado em {modelo_base}")
+            print("Execute primeiro o treinamento completo")
+            return False
+        
+        images, labels = self.carregar_dataset()
+        if images is None:
+            return False
+        impressoes = self.impressoes_pessoas(images, labels)
+        
+        if pessoas_novas is None:
+            pessoas_novas = self.pessoas_alteradas(impressoes)
+            if pessoas_novas is None:
+                print(f"❌ {self.registro_pessoas_path} não existe; informe as pessoas com --novas")
+                return False
+        desconhecidas = [p for p in pessoas_novas if p not in impressoes]
+        if desconhecidas:
+            print(f"❌ Pessoas sem imagens no dataset: {', '.join(desconhecidas)}")
+            return False
+        if not pessoas_novas:
+            print("✅ Nenhuma pessoa nova ou alterada desde o último treinamento")
+            return True
+        print(f"🆕 Pessoas novas/alteradas: {', '.join(pessoas_novas)}")
+        
+        treino, validacao = self.separar_validacao(labels)
+        novas = np.isin(labels, pessoas_novas)
+        rng = np.random.default_rng(42)
+        
+        ancoras_novas = treino[novas[treino]]
+        existentes = treino[~novas[treino]]
+        n_replay = min(len(existentes), int(round(replay * len(ancoras_novas))))
+        ancoras = np.concatenate([ancoras_novas, rng.choice(existentes, n_replay, replace=False)])
+        print(f"   Âncoras de treino: {len(ancoras_novas)} novas + {n_replay} de replay")
+        
+        # Pares de treino só com imagens de treino; parceiros de qualquer pessoa
+        pairs_a, pairs_b, pair_labels = self.criar_pares(images[treino], labels[treino],
+                                                         ancoras=np.searchsorted(treino, ancoras))
+        X_a_train, X_a_val, X_b_train, X_b_val, y_train, y_val = train_test_split(
+            pairs_a, pairs_b, pair_labels, test_size=0.1, random_state=42, stratify=pair_labels)
+        
+        # Pares de validação separados: pessoas novas e uma amostra das existentes
+        val_novas = validacao[novas[validacao]]
+        val_existentes = validacao[~novas[validacao]]
+        val_existentes = rng.choice(val_existentes, min(len(val_existentes), max(len(val_novas), 200)),
+                                    replace=False)
+        conjuntos = {}
+        for nome, indices in (('novas', val_novas), ('existentes', val_existentes)):
+            ancoras_val = np.searchsorted(validacao, indices)
+            conjuntos[nome] = self.criar_pares(images[validacao], labels[validacao], ancoras=ancoras_val)
+        
+        threshold, _ = read_threshold(DEFAULT_THRESHOLD_PATH)
+        model = load_model_with_custom_objects(modelo_base)
+        antes = {nome: self.avaliar_pares(model, *pares, threshold) for nome, pares in conjuntos.items()}
+        # Modelos antigos (entrada float32) recebem as imagens em [0, 1]
+        X_a_train, X_b_train, X_a_val, X_b_val = (prepare_model_input(model, x)
+                                                  for x in (X_a_train, X_b_train, X_a_val, X_b_val))
+        
+        base = get_embedding_network(model)
+        if congelar_convs:
+            for layer in base.layers:
+                if isinstance(layer, tf.keras.layers.Conv2D):
+                    layer.trainable = False
+        model.compile(
+            optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate),
+            loss=make_contrastive_loss(margin),
+            metrics=['accuracy']
+        )
+        
+        print(f"\n🚀 Ajuste fino ({'convoluções congeladas' if congelar_convs else 'todas as camadas'})...")
+        print(f"   Pares: {len(y_train)} treino, {len(y_val)} validação | Épocas: {epochs} | LR: {learning_rate}")
+        model.fit(
+            [X_a_train, X_b_train], y_train,
+            validation_data=([X_a_val, X_b_val], y_val),
+            batch_size=batch_size,
+            epochs=epochs,
+            callbacks=[tf.keras.callbacks.EarlyStopping(monitor='val_loss', patience=2,
+                                                        restore_best_weights=True)],
+            verbose=1
+        )
+        for layer in base.layers:
+            layer.trainable = True
+        
+        depois = {nome: self.avaliar_pares(model, *pares, threshold) for nome, pares in conjuntos.items()}
+        
+        print(f"\n📊 Validação (threshold {threshold:.4f}):")
+        print(f"   {'conjunto':<12} {'métrica':<20} {'antes':>8} {'depois':>8}")
+        for nome in conjuntos:
+            for metrica in ('perda', 'acuracia_threshold', 'f1_melhor'):
+                if metrica in antes[nome]:
+                    print(f"   {nome:<12} {metrica:<20} {antes[nome][metrica]:>8.4f} {depois[nome][metrica]:>8.4f}")
+        
+        queda = antes['existentes'].get('f1_melhor', 0) - depois['existentes'].get('f1_melhor', 0)
+        aceito = queda <= tolerancia or forcar
+        relatorio = {
+            'pessoas_novas': list(pessoas_novas),
+            'modelo_base': str(modelo_base),
+            'replay': n_replay,
+            'congelar_convs': congelar_convs,
+            'antes': antes,
+            'depois': depois,
+            'modelo_salvo': aceito
+        }
+        Path("resultados_avaliacao").mkdir(exist_ok=True)
+        with open("resultados_avaliacao/ajuste_fino.json", "w") as f:
+            json.dump(relatorio, f, indent=2, ensure_ascii=False)
+        
+        if not aceito:
+            print(f"❌ F1 das pessoas existentes caiu {queda:.4f} (tolerância {tolerancia}); "
+                  f"modelo não substituído (use --forcar)")
+            return True
+        
+        model_path = self.salvar_modelo(model)
+        self.salvar_registro_pessoas(impressoes)
+        print(f"\n✅ AJUSTE FINO CONCLUÍDO!")
+        print(f"📁 Modelo salvo em: {model_path}")
+        return True
 
 def main():
+    parser = argparse.ArgumentParser(description="Treina o modelo de verificação de assinaturas")
+    parser.add_argument("--dados", default="dataset_processado")
+    parser.add_argument("--shards", default=DEFAULT_SHARDS_DIR)
+    parser.add_argument("--epocas", type=int, default=None, help="Padrão: 25 (completo) ou 5 (ajuste fino)")
+    parser.add_argument("--batch", type=int, default=None, help="Padrão: calibrado para a CPU, ou 16")
+    parser.add_argument("--ajuste-fino", action="store_true",
+                        help="Parte do modelo atual e treina só as pessoas novas/alteradas (+ replay)")
+    parser.add_argument("--novas", nargs="+", default=None,
+                        help="Pessoas do ajuste fino (padrão: detectadas pelo registro do modelo)")
+    parser.add_argument("--replay", type=float, default=1.0,
+                        help="Imagens de pessoas existentes por imagem nova no ajuste fino")
+    parser.add_argument("--congelar-convs", action="store_true", help="Ajuste fino só das camadas densas")
+    parser.add_argument("--lr", type=float, default=None, help="Padrão: 0.001 (completo) ou 0.0001 (ajuste fino)")
+    parser.add_argument("--margem", type=float, default=1.0, help="Margem da perda contrastiva (no ajuste fino, use a do treino do modelo base)")
+    parser.add_argument("--arquitetura", default=None,
+                        help='JSON, ex.: \'{"filtros": [32, 64, 128], "dropout": 0.2}\' (ver buscar_hiperparametros.py)')
+    parser.add_argument("--modelo-base", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--forcar", action="store_true",
+                        help="Salva o ajuste fino mesmo se as pessoas existentes piorarem")
+    parser.add_argument("--retomar", "--resume", action="store_true",
+                        help="Continua o treino do último checkpoint em modelos/checkpoints")
+    parser.add_argument("--checkpoint-minutos", type=float, default=5.0,
+                        help="Intervalo entre checkpoints (trabalho máximo perdido numa interrupção)")
+    parser.add_argument("--checkpoint-passos", type=int, default=None, help="Intervalo em passos de treino")
+    parser.add_argument("--manter-checkpoints", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42, help="Seed dos pares e da ordem das épocas")
+    parser.add_argument("--incluir-duplicatas", action="store_true",
+                        help="Ignora a lista de quase-duplicatas (excluidas.json em --dados)")
+    args = parser.parse_args()
+    
     print("🤖 TREINAMENTO DE MODELO PARA ASSINATURAS MANUSCRITAS")
     print("=" * 60)
     
-    trainer = ModelTrainer()
+    # Threads calibradas para esta CPU (precisam vir antes da primeira operação do TensorFlow)
+    ajuste = aplicar_ajuste('treino', calibrar_se_ausente=True)
+    if args.batch is None:
+        args.batch = ajuste['batch'] or 16
+    
+    trainer = ModelTrainer(data_dir=args.dados, shards_dir=args.shards,
+                           excluir_duplicatas=not args.incluir_duplicatas)
+    
+    if args.ajuste_fino:
+        sucesso = trainer.ajustar(
+            pessoas_novas=args.novas,
+            replay=args.replay,
+            congelar_convs=args.congelar_convs,
+            epochs=args.epocas or 5,
+            batch_size=args.batch,
+            learning_rate=args.lr or 0.0001,
+            margin=args.margem,
+            modelo_base=args.modelo_base,
+            forcar=args.forcar
+        )
+    else:
+        sucesso = trainer.treinar(epochs=args.epocas or 25, batch_size=args.batch,
+                                  learning_rate=args.lr or 0.001, margin=args.margem,
+                                  arquitetura=json.loads(args.arquitetura) if args.arquitetura else None,
+                                  retomar=args.retomar, checkpoint_passos=args.checkpoint_passos,
+                                  checkpoint_minutos=args.checkpoint_minutos,
+                                  manter_checkpoints=args.manter_checkpoints, seed=args.seed)
     
-    if trainer.treinar():
+    if sucesso:
         print(f"\n🎉 Sucesso! Próximos passos:")
         print(f"1. Testar: python scripts/avaliar_modelo.py")
         print(f"2. Usar: streamlit run app.py")
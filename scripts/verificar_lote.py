@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+"""
+Verificação em lote de pares documento/referência a partir de CSV ou JSONL.
+O preprocessamento roda em um pool de threads e alimenta, por uma fila
+limitada, a inferência em lotes; assim a leitura/decodificação das próximas
+imagens acontece enquanto a CNN processa o lote atual. Os resultados são
+gravados incrementalmente e um checkpoint permite retomar um job interrompido.
+
+Exemplo:
+    python scripts/verificar_lote.py pares.csv --saida resultados.csv
+    python scripts/verificar_lote.py pares.jsonl --saida resultados.jsonl --processos 4
+
+Entrada (CSV com cabeçalho ou JSONL, um objeto por linha):
+    documento,referencia[,id]
+"""
+
+import argparse
+import csv
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+# Adicionar diretório pai ao path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from cpu_tuning import aplicar_ajuste, obter_ajuste
+from data_preprocessing import preprocess_image
+from metrics import medir_etapa, medir_verificacao, no_fluxo
+from model import embedding_distance
+from model_registry import DEFAULT_MODEL_PATH, DEFAULT_THRESHOLD_PATH, read_threshold
+from profiling import perfilar
+from verification_cache import LRUCache, file_fingerprint
+
+
+CAMPOS_SAIDA = ['linha', 'id', 'documento', 'referencia', 'distancia', 'mesma_pessoa', 'erro']
+
+_FIM = object()
+
+
+def ler_pares(path, coluna_documento="documento", coluna_referencia="referencia",
+              coluna_id="id", inicio=0):
+    """
+    Lê os pares sob demanda (sem carregar o arquivo inteiro).
+
+    Args:
+        path (str): Arquivo .csv ou .jsonl
+        inicio (int): Primeira linha de dados a retornar (retomada)
+
+    Yields:
+        tuple: (linha, id, documento, referencia)
+    """
+    with open(path, newline='') as f:
+        if str(path).endswith(".jsonl"):
+            registros = (json.loads(texto) if texto.strip() else None for texto in f)
+        else:
+            registros = csv.DictReader(f)
+
+        for linha, registro in enumerate(registros):
+            if linha < inicio or registro is None:
+                continue
+            yield (linha, registro.get(coluna_id, linha),
+                   registro[coluna_documento], registro[coluna_referencia])
+
+
+class ResultWriter:
+    """
+    Grava os resultados em CSV ou JSONL (pela extensão) e mantém o checkpoint.
+    O checkpoint guarda quantas linhas da entrada já estão na saída e o
+    tamanho do arquivo naquele ponto; na retomada, o que passou desse
+    tamanho (lote gravado pela metade) é descartado.
+    """
+
+    def __init__(self, path, checkpoint_path, retomar=True, info=None):
+        self.path = Path(path)
+        self.checkpoint_path = Path(checkpoint_path)
+        self.jsonl = self.path.suffix == ".jsonl"
+        self.info = info or {}
+        self.linhas_concluidas = 0
+
+        checkpoint = self._ler_checkpoint() if retomar else None
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if checkpoint and self.path.exists():
+            self.linhas_concluidas = checkpoint['linhas_concluidas']
+            with open(self.path, 'r+b') as f:
+                f.truncate(checkpoint['bytes_saida'])
+            self._arquivo = open(self.path, 'a', newline='')
+        else:
+            self._arquivo = open(self.path, 'w', newline='')
+            if not self.jsonl:
+                csv.writer(self._arquivo).writerow(CAMPOS_SAIDA)
+            self._salvar_checkpoint()
+        self._csv = None if self.jsonl else csv.writer(self._arquivo)
+
+    def _ler_checkpoint(self):
+        try:
+            with open(self.checkpoint_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _salvar_checkpoint(self):
+        self._arquivo.flush()
+        os.fsync(self._arquivo.fileno())
+        estado = dict(self.info, linhas_concluidas=self.linhas_concluidas,
+                      bytes_saida=self._arquivo.tell())
+        temp = f"{self.checkpoint_path}.tmp"
+        with open(temp, 'w') as f:
+            json.dump(estado, f, indent=2)
+        os.replace(temp, self.checkpoint_path)
+
+    def escrever_lote(self, resultados, proxima_linha):
+        """Grava um lote de resultados e avança o checkpoint."""
+        for resultado in resultados:
+            if self.jsonl:
+                self._arquivo.write(json.dumps(resultado, ensure_ascii=False) + "\n")
+            else:
+                self._csv.writerow([resultado[campo] for campo in CAMPOS_SAIDA])
+        self.linhas_concluidas = proxima_linha
+        self._salvar_checkpoint()
+
+    def fechar(self):
+        self._arquivo.close()
+
+
+class BatchVerifier:
+    """
+    Pipeline produtor/consumidor da verificação em lote.
+
+    Args:
+        embed: Função imagens (n, 155, 220, 1) -> embeddings (n, 128)
+        threshold (float): Distância máxima para "mesma pessoa"
+        batch_size (int): Pares por lote de inferência
+        threads (int): Threads de preprocessamento
+        prefetch (int): Lotes preprocessados mantidos à frente da inferência
+        max_embeddings (int): Embeddings reaproveitados entre lotes
+            (referências costumam se repetir)
+        recortar (bool): Recorta a região com tinta antes do preprocessamento
+    """
+
+    def __init__(self, embed, threshold, batch_size=64, threads=None, prefetch=4, max_embeddings=4096,
+                 recortar=False):
+        self.embed = embed
+        self.recortar = recortar
+        self.threshold = threshold
+        self.batch_size = batch_size
+        self.threads = threads or min(8, os.cpu_count() or 1)
+        self.fila = queue.Queue(maxsize=prefetch * batch_size)
+        self.embeddings = LRUCache(max_embeddings)
+        self._parar = threading.Event()
+        self.erro_produtor = None
+
+    def _preprocessar(self, path):
+        # Roda nas threads de preprocessamento, fora do medir_verificacao do lote
+        with no_fluxo('lote'):
+            return preprocess_image(path, strict=True, dtype=np.uint8, recortar=self.recortar)
+
+    def _colocar(self, item):
+        """Põe um item na fila, desistindo se o consumidor pediu parada."""
+        while not self._parar.is_set():
+            try:
+                self.fila.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produzir(self, pares, executor):
+        """Thread produtora: agenda o preprocessamento de cada par na ordem de leitura."""
+        try:
+            for linha, id_par, documento, referencia in pares:
+                futuros = {}
+                for path in (documento, referencia):
+                    if path not in futuros and self.embeddings.get(path) is None:
+                        futuros[path] = executor.submit(self._preprocessar, path)
+                if not self._colocar((linha, id_par, documento, referencia, futuros)):
+                    return
+        except Exception as e:
+            self.erro_produtor = e
+        finally:
+            self._colocar(_FIM)
+
+    def _proximo_lote(self):
+        """Retira até `batch_size` pares da fila; indica também se a entrada acabou."""
+        lote = []
+        while len(lote) < self.batch_size:
+            item = self.fila.get()
+            if item is _FIM:
+                return lote or None, True
+            lote.append(item)
+        return lote, False
+
+    @perfilar('verificacao_lote')
+    def processar_lote(self, lote):
+        """
+        Espera o preprocessamento do lote, calcula os embeddings das imagens
+        únicas em uma única chamada e as distâncias de cada par.
+
+        Returns:
+            list: Resultados na ordem da entrada
+        """
+        with medir_verificacao('lote'):
+            return self._processar_lote(lote)
+
+    def _processar_lote(self, lote):
+        imagens = {}
+        erros = {}
+        for _, _, documento, referencia, futuros in lote:
+            for path, futuro in futuros.items():
+                if path in imagens or path in erros:
+                    continue
+                try:
+                    imagens[path] = futuro.result()
+                except Exception as e:
+                    erros[path] = str(e) or type(e).__name__
+
+        vetores = {}
+        pendentes = []
+        for _, _, documento, referencia, _ in lote:
+            for path in (documento, referencia):
+                if path in vetores or path in erros:
+                    continue
+                vetor = self.embeddings.get(path)
+                if vetor is not None:
+                    vetores[path] = vetor
+                elif path in imagens:
+                    pendentes.append(path)
+                else:
+                    # Saiu do cache depois de o produtor consultá-lo
+                    try:
+                        imagens[path] = self._preprocessar(path)
+                        pendentes.append(path)
+                    except Exception as e:
+                        erros[path] = str(e) or type(e).__name__
+
+        if pendentes:
+            with medir_etapa('embedding'):
+                calculados = self.embed(np.stack([imagens[path] for path in pendentes]))
+            for path, vetor in zip(pendentes, calculados):
+                vetores[path] = vetor
+                self.embeddings.put(path, vetor)
+
+        resultados = []
+        with medir_etapa('distancia'):
+            for linha, id_par, documento, referencia, _ in lote:
+                resultado = {'linha': linha, 'id': id_par, 'documento': documento,
+                             'referencia': referencia, 'distancia': None,
+                             'mesma_pessoa': None, 'erro': None}
+                falha = erros.get(documento) or erros.get(referencia)
+                if falha:
+                    resultado['erro'] = falha
+                else:
+                    distancia = float(embedding_distance(vetores[documento], vetores[referencia]))
+                    resultado['distancia'] = round(distancia, 6)
+                    resultado['mesma_pessoa'] = distancia <= self.threshold
+                resultados.append(resultado)
+        return resultados
+
+    def executar(self, pares, writer, intervalo_progresso=10.0):
+        """
+        Executa o pipeline até o fim da entrada (ou Ctrl+C).
+
+        Returns:
+            dict: Estatísticas da execução
+        """
+        inicio = time.perf_counter()
+        ultimo_progresso = inicio
+        processados = erros = 0
+
+        with ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="preprocessamento") as executor:
+            produtor = threading.Thread(target=self._produzir, args=(pares, executor),
+                                        name="leitor-pares", daemon=True)
+            produtor.start()
+            try:
+                while True:
+                    lote, fim = self._proximo_lote()
+                    if lote:
+                        resultados = self.processar_lote(lote)
+                        writer.escrever_lote(resultados, lote[-1][0] + 1)
+                        processados += len(resultados)
+                        erros += sum(1 for r in resultados if r['erro'])
+
+                    agora = time.perf_counter()
+                    if agora - ultimo_progresso >= intervalo_progresso or fim:
+                        ultimo_progresso = agora
+                        print(f"   {processados} pares | {processados / (agora - inicio):.1f} pares/s | "
+                              f"fila: {self.fila.qsize()}/{self.fila.maxsize} | erros: {erros}")
+                    if fim:
+                        break
+            finally:
+                self._parar.set()
+                produtor.join()
+
+        if self.erro_produtor is not None:
+            raise self.erro_produtor
+
+        duracao = time.perf_counter() - inicio
+        return {
+            'pares': processados,
+            'erros': erros,
+            'segundos': duracao,
+            'pares_por_segundo': processados / duracao if duracao else 0.0,
+            'cache_embeddings': self.embeddings.stats()
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verificação em lote de pares de assinaturas")
+    parser.add_argument("entrada", help="Arquivo .csv ou .jsonl com os pares")
+    parser.add_argument("--saida", required=True, help="Arquivo de resultados (.csv ou .jsonl)")
+    parser.add_argument("--modelo", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--threshold", type=float, default=None,
+                        help=f"Padrão: {DEFAULT_THRESHOLD_PATH}")
+    parser.add_argument("--batch", type=int, default=None,
+                        help="Pares por lote de inferência (padrão: calibrado para a CPU, ou 64)")
+    parser.add_argument("--threads", type=int, default=None, help="Threads de preprocessamento")
+    parser.add_argument("--prefetch", type=int, default=4, help="Lotes preprocessados à frente")
+    parser.add_argument("--processos", type=int, default=0,
+                        help="Processos de inferência (0 = no próprio processo)")
+    parser.add_argument("--coluna-documento", default="documento")
+    parser.add_argument("--coluna-referencia", default="referencia")
+    parser.add_argument("--coluna-id", default="id")
+    parser.add_argument("--recortar", action="store_true",
+                        help="Recorta a região com tinta (só para modelos treinados com recorte)")
+    parser.add_argument("--reiniciar", action="store_true", help="Ignora o checkpoint e começa do zero")
+    args = parser.parse_args()
+
+    print("📦 VERIFICAÇÃO EM LOTE")
+    print("=" * 50)
+
+    if not os.path.exists(args.modelo):
+        print(f"❌ Modelo não encontrado: {args.modelo}")
+        return
+
+    threshold = args.threshold
+    if threshold is None:
+        threshold, calibrado = read_threshold(DEFAULT_THRESHOLD_PATH)
+        if not calibrado:
+            print(f"⚠️ Threshold calibrado não encontrado, usando {threshold}")
+
+    fingerprint = file_fingerprint(args.modelo)
+    checkpoint_path = f"{args.saida}.checkpoint.json"
+    info = {'entrada': os.path.abspath(args.entrada), 'modelo': fingerprint, 'threshold': threshold,
+            'recortar': args.recortar}
+
+    retomar = not args.reiniciar
+    if retomar and os.path.exists(checkpoint_path):
+        with open(checkpoint_path) as f:
+            anterior = json.load(f)
+        if {k: anterior.get(k) for k in info} != info:
+            print("❌ O checkpoint existente é de outra entrada, modelo ou threshold. "
+                  "Use --reiniciar para começar do zero.")
+            return
+
+    # Threads e lote calibrados para esta CPU (o lote calibrado é em imagens; cada par tem duas)
+    ajuste = aplicar_ajuste('lote', calibrar_se_ausente=True) if args.processos == 0 else obter_ajuste('lote')
+    if args.batch is None:
+        args.batch = max(1, ajuste['batch'] // 2) if ajuste['batch'] else 64
+
+    writer = ResultWriter(args.saida, checkpoint_path, retomar=retomar, info=info)
+    if writer.linhas_concluidas:
+        print(f"↩️ Retomando a partir da linha {writer.linhas_concluidas}")
+
+    pool = None
+    try:
+        if args.processos > 0:
+            from inference_pool import InferencePool
+            pool = InferencePool(args.processos, args.modelo, max_batch=args.batch)
+            embed = pool.embed
+        else:
+            from model import load_model_with_custom_objects, get_embedding_network, compute_embeddings
+            rede = get_embedding_network(load_model_with_custom_objects(args.modelo))
+
+            def embed(imagens):
+                return compute_embeddings(rede, imagens, batch_size=len(imagens))
+
+        verificador = BatchVerifier(embed, threshold, batch_size=args.batch,
+                                    threads=args.threads, prefetch=args.prefetch, recortar=args.recortar)
+        pares = ler_pares(args.entrada, args.coluna_documento, args.coluna_referencia,
+                          args.coluna_id, inicio=writer.linhas_concluidas)
+
+        print(f"🔍 Threshold: {threshold:.4f} | Lote: {args.batch} | "
+              f"Threads: {verificador.threads} | Processos: {args.processos or 'local'}")
+        try:
+            estatisticas = verificador.executar(pares, writer)
+        except KeyboardInterrupt:
+            print(f"\n⏸️ Interrompido. Checkpoint na linha {writer.linhas_concluidas}; "
+                  f"execute novamente para retomar.")
+            return
+    finally:
+        writer.fechar()
+        if pool is not None:
+            pool.fechar()
+
+    print(f"\n✅ {estatisticas['pares']} pares em {estatisticas['segundos']:.1f}s "
+          f"({estatisticas['pares_por_segundo']:.1f} pares/s), {estatisticas['erros']} com erro")
+    print(f"💾 Resultados salvos em: {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Script para verificar uma assinatura a partir de vídeo (arquivo ou câmera).
+Pontua todos os quadros em baixa resolução, guarda os K melhores e só esses
+passam pelo preprocessamento de telefone e pela rede base, em um único lote.
+
+Exemplo:
+    python scripts/verificar_video.py gravacao.mp4 --pessoa maria
+    python scripts/verificar_video.py 0 --duracao 5 --k 7
+    python scripts/verificar_video.py gravacao.mp4 --apenas-pontuar
+"""
+
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+import cv2
+
+# Adicionar diretório pai ao path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from enrollment import SignatureEnrollment
+from model_registry import DEFAULT_MODEL_PATH, DEFAULT_THRESHOLD_PATH, read_threshold
+from profiling import perfilar
+from verification_cache import file_fingerprint
+from video_stream import StreamVerifier, iterar_quadros
+
+FPS_ALVO = 30
+
+
+@perfilar('verificacao_video')
+def processar(verificador, fonte, pessoas, max_quadros, duracao):
+    """Seleção dos quadros e verificação em lote (perfilada como uma requisição)."""
+    return verificador.processar(fonte, pessoas, max_quadros=max_quadros, duracao=duracao)
+
+
+def mostrar_selecao(selecionados, estatisticas):
+    fps = estatisticas['fps_pontuacao']
+    status = "✅" if fps >= FPS_ALVO else "⚠️"
+    print(f"🎞️ {estatisticas['quadros']} quadros em {estatisticas['segundos']:.2f} s")
+    print(f"{status} Pontuação: {estatisticas['ms_pontuacao_por_quadro']:.2f} ms/quadro "
+          f"({fps:.0f} fps; alvo {FPS_ALVO} fps)")
+    print(f"🏆 {len(selecionados)} quadro(s) escolhido(s):")
+    for s in selecionados:
+        print(f"   #{s['indice']:>5}  pontuação {s['pontuacao']:.3f}  (nitidez {s['nitidez']:.2f}, "
+              f"tinta {s['tinta']:.2f}, estabilidade {s['estabilidade']:.2f})")
+
+
+def salvar_quadros(selecionados, pasta):
+    """Grava os quadros escolhidos (resolução cheia) para inspeção."""
+    if not pasta:
+        return
+    pasta = Path(pasta)
+    pasta.mkdir(parents=True, exist_ok=True)
+    for s in selecionados:
+        cv2.imwrite(str(pasta / f"quadro_{s['indice']:05d}.png"), s['quadro'])
+    print(f"💾 Quadros gravados em: {pasta}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verifica uma assinatura a partir de vídeo")
+    parser.add_argument("fonte", help="Arquivo de vídeo ou índice da câmera (ex.: 0)")
+    parser.add_argument("--pessoa", nargs="*", default=None, help="Pessoa(s) declarada(s); padrão: todas")
+    parser.add_argument("--k", type=int, default=5, help="Quadros verificados")
+    parser.add_argument("--intervalo-minimo", type=int, default=5, help="Quadros entre dois escolhidos")
+    parser.add_argument("--max-quadros", type=int, default=None)
+    parser.add_argument("--duracao", type=float, default=None, help="Segundos de captura (câmera)")
+    parser.add_argument("--recortar", action="store_true", help="Recorta a região com tinta")
+    parser.add_argument("--threads-opencv", type=int, default=1,
+                        help="Threads do OpenCV (1 = orçamento de um núcleo)")
+    parser.add_argument("--apenas-pontuar", action="store_true",
+                        help="Só pontua e escolhe os quadros, sem carregar o modelo")
+    parser.add_argument("--quadros-escolhidos", default=None, help="Pasta para gravar os quadros escolhidos")
+    parser.add_argument("--modelo", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--galeria", default="galeria")
+    parser.add_argument("--threshold", type=float, default=None, help=f"Padrão: {DEFAULT_THRESHOLD_PATH}")
+    parser.add_argument("--saida", default="resultados_avaliacao/video.json")
+    args = parser.parse_args()
+
+    cv2.setNumThreads(args.threads_opencv)
+
+    print("🎥 VERIFICAÇÃO POR VÍDEO")
+    print("=" * 50)
+
+    if args.apenas_pontuar:
+        verificador = StreamVerifier(None, None, k=args.k, intervalo_minimo=args.intervalo_minimo)
+        try:
+            selecionados, estatisticas = verificador.selecionar(
+                iterar_quadros(args.fonte, args.max_quadros, args.duracao))
+        except ValueError as e:
+            print(f"❌ {e}")
+            return
+        mostrar_selecao(selecionados, estatisticas)
+        salvar_quadros(selecionados, args.quadros_escolhidos)
+        return
+
+    if not Path(args.modelo).exists():
+        print(f"❌ Modelo não encontrado em {args.modelo}")
+        return
+
+    from model import load_model_with_custom_objects, get_embedding_network
+
+    threshold = args.threshold
+    if threshold is None:
+        threshold, _ = read_threshold(DEFAULT_THRESHOLD_PATH)
+
+    rede_base = get_embedding_network(load_model_with_custom_objects(args.modelo))
+    cadastro = SignatureEnrollment(rede_base, gallery_dir=args.galeria,
+                                   model_fingerprint=file_fingerprint(args.modelo)).carregar()
+    if cadastro.desatualizadas():
+        print(f"⚠️ {len(cadastro.desatualizadas())} pessoa(s) com embeddings de outro modelo serão ignoradas")
+        print("Execute: python scripts/gerenciar_cadastro.py sincronizar")
+
+    verificador = StreamVerifier(cadastro, threshold, k=args.k, intervalo_minimo=args.intervalo_minimo,
+                                 recortar=args.recortar)
+    try:
+        relatorio = processar(verificador, args.fonte, args.pessoa, args.max_quadros, args.duracao)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return
+
+    mostrar_selecao(relatorio['selecionados'], relatorio['estatisticas'])
+    if args.quadros_escolhidos:
+        pasta = Path(args.quadros_escolhidos)
+        pasta.mkdir(parents=True, exist_ok=True)
+        for s, img in zip(relatorio['selecionados'], relatorio['imagens']):
+            cv2.imwrite(str(pasta / f"quadro_{s['indice']:05d}_preprocessado.png"), img)
+
+    print(f"\n🎯 Resultados (threshold {threshold:.4f}):")
+    if not relatorio['resultados']:
+        print("   ❌ Nenhum quadro com assinatura ou nenhuma pessoa na galeria")
+    for r in relatorio['resultados'][:5]:
+        status = "✅" if r['mesma_pessoa'] else "❌"
+        print(f"   {status} {r['pessoa']}: mediana {r['mediana_distancia']:.4f}, "
+              f"mínima {r['min_distancia']:.4f}, {r['votos']}/{r['quadros']} quadros")
+
+    del relatorio['imagens']
+    relatorio['threshold'] = threshold
+    relatorio['fonte'] = str(args.fonte)
+    Path(args.saida).parent.mkdir(parents=True, exist_ok=True)
+    with open(args.saida, "w") as f:
+        json.dump(relatorio, f, indent=2, ensure_ascii=False)
+    print(f"\n💾 Relatório salvo em: {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Módulo do modelo de serviço com preprocessamento dentro do grafo.
+As etapas de `preprocess_image` (binarização Otsu invertida, redimensionamento
+por área para 220x155 e escala) viram camadas do TensorFlow, de modo que um
+lote de imagens cruas em escala de cinza é preprocessado de forma vetorizada
+e multithread pelo runtime, sem passar imagem por imagem pelo OpenCV.
+
+Entrada: lote uint8 (n, altura, largura, 1) em escala de cinza. As imagens de
+um mesmo lote precisam ter o mesmo tamanho (use `agrupar_por_tamanho`); o
+tamanho pode variar de um lote para outro.
+
+Tolerância em relação a `preprocess_image` (verificada na exportação):
+    - Otsu: mesmo critério do OpenCV (variância entre classes, primeiro
+      máximo), então o limiar é idêntico.
+    - Redimensionamento: a área do TensorFlow e o INTER_AREA do OpenCV
+      diferem em alguns pixels de borda do traço (arredondamento e, ao
+      ampliar imagens menores que 220x155, o método de interpolação).
+      Exige-se erro absoluto médio <= TOLERANCIA_PIXEL (escala [0, 1]) e
+      diferença de distância entre embeddings <= TOLERANCIA_DISTANCIA.
+"""
+
+from collections import defaultdict
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras.layers import Input, Layer
+
+from model import model_input_dtype
+
+
+TARGET_SIZE = (220, 155)  # (largura, altura), como em data_preprocessing
+TOLERANCIA_PIXEL = 0.01
+TOLERANCIA_DISTANCIA = 0.01
+
+
+class OtsuBinarization(Layer):
+    """
+    Binarização Otsu por imagem, invertida (tinta = 255), como
+    cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU.
+    """
+
+    def call(self, inputs):
+        imagens = tf.cast(inputs, tf.int32)
+        n = tf.shape(imagens)[0]
+        valores = tf.reshape(imagens, (n, -1))
+
+        # Histograma de 256 níveis de cada imagem em uma única contagem
+        deslocados = valores + tf.range(n)[:, None] * 256
+        histograma = tf.math.bincount(tf.reshape(deslocados, [-1]), minlength=n * 256,
+                                      maxlength=n * 256, dtype=tf.float64)
+        histograma = tf.reshape(histograma, (n, 256))
+        p = histograma / tf.reduce_sum(histograma, axis=1, keepdims=True)
+
+        niveis = tf.range(256, dtype=tf.float64)
+        q1 = tf.cumsum(p, axis=1)
+        q2 = 1.0 - q1
+        m1 = tf.cumsum(p * niveis, axis=1)
+        mu = m1[:, -1:]
+        mu1 = tf.math.divide_no_nan(m1, q1)
+        mu2 = tf.math.divide_no_nan(mu - m1, q2)
+        sigma = q1 * q2 * tf.square(mu1 - mu2)
+
+        # Mesmos níveis ignorados pelo OpenCV (classe vazia)
+        eps = float(np.finfo(np.float32).eps)
+        valido = (tf.minimum(q1, q2) >= eps) & (tf.maximum(q1, q2) <= 1.0 - eps)
+        sigma = tf.where(valido, sigma, tf.zeros_like(sigma))
+        limiar = tf.argmax(sigma, axis=1, output_type=tf.int32)
+
+        binaria = tf.where(imagens > limiar[:, None, None, None], 0, 255)
+        return tf.cast(binaria, tf.uint8)
+
+
+class AreaResize(Layer):
+    """Redimensionamento por área para (altura, largura), com saída uint8 arredondada."""
+
+    def __init__(self, target_size=TARGET_SIZE, **kwargs):
+        super().__init__(**kwargs)
+        self.target_size = tuple(target_size)
+
+    def call(self, inputs):
+        largura, altura = self.target_size
+        redimensionada = tf.image.resize(tf.cast(inputs, tf.float32), (altura, largura), method='area')
+        return tf.cast(tf.clip_by_value(tf.round(redimensionada), 0, 255), tf.uint8)
+
+    def get_config(self):
+        config = super().get_config()
+        config['target_size'] = self.target_size
+        return config
+
+
+CUSTOM_OBJECTS = {'OtsuBinarization': OtsuBinarization, 'AreaResize': AreaResize}
+
+
+def build_preprocessing_model(target_size=TARGET_SIZE):
+    """
+    Modelo só de preprocessamento: imagem crua -> imagem uint8 (155, 220, 1).
+
+    Returns:
+        Model: Equivalente vetorizado de preprocess_image(..., dtype=np.uint8)
+    """
+    entrada = Input(shape=(None, None, 1), dtype='uint8', name='imagem_cinza')
+    binaria = OtsuBinarization(name='otsu')(entrada)
+    saida = AreaResize(target_size, name='redimensionamento')(binaria)
+    return tf.keras.Model(entrada, saida, name='preprocessamento')
+
+
+def build_serving_model(embedding_model, target_size=TARGET_SIZE):
+    """
+    Modelo de serviço: imagem crua em escala de cinza -> embedding.
+
+    Args:
+        embedding_model: Rede base (ver model.get_embedding_network)
+        target_size (tuple): Tamanho alvo (largura, altura)
+
+    Returns:
+        Model: Modelo com preprocessamento no grafo
+    """
+    preprocessamento = build_preprocessing_model(target_size)
+    entrada = Input(shape=(None, None, 1), dtype='uint8', name='imagem_cinza')
+    x = preprocessamento(entrada)
+    if model_input_dtype(embedding_model) != np.uint8:
+        # Modelos antigos (entrada float em [0, 1])
+        x = tf.keras.layers.Rescaling(1.0 / 255)(x)
+    saida = embedding_model(x)
+    return tf.keras.Model(entrada, saida, name='servico_assinaturas')
+
+
+def load_serving_model(path):
+    """Carrega um modelo de serviço exportado."""
+    return tf.keras.models.load_model(path, custom_objects=CUSTOM_OBJECTS, compile=False)
+
+
+def agrupar_por_tamanho(imagens):
+    """
+    Agrupa imagens cruas pelo tamanho, para montar lotes do modelo de serviço.
+
+    Args:
+        imagens (list): Arrays (altura, largura) ou (altura, largura, 1) uint8
+
+    Returns:
+        dict: (altura, largura) -> (índices originais, lote (n, altura, largura, 1))
+    """
+    grupos = defaultdict(list)
+    for i, img in enumerate(imagens):
+        grupos[img.shape[:2]].append(i)
+    return {
+        tamanho: (indices, np.stack([imagens[i].reshape(tamanho + (1,)) for i in indices]))
+        for tamanho, indices in grupos.items()
+    }
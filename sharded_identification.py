@@ -0,0 +1,542 @@
+#!/usr/bin/env python3
+"""
+Módulo de identificação 1:N distribuída (scatter-gather).
+A galeria é particionada por pessoa entre shards; cada shard é um processo
+(local ou em outro host) que serve seu EmbeddingStore por TCP. O coordenador
+envia o embedding da consulta a todos os shards em paralelo, espera até o
+prazo e junta os top-k locais num top-k global. Shards que não respondem a
+tempo ou falham são informados no resultado, que sai marcado como parcial.
+
+Protocolo: cada mensagem é um JSON precedido do tamanho (4 bytes, big-endian);
+embeddings trafegam como float32 em base64.
+
+Mapa dos shards (mapa.json), que também registra a pessoa -> shard:
+    {"versao": 2,
+     "shards": {"s0": {"endereco": "127.0.0.1:9200", "pasta": "galeria/shards/s0"}, ...},
+     "pessoas": {"maria": "s0", ...}}
+
+O rebalanceamento move pessoas inteiras do shard mais cheio para o mais
+vazio pelo próprio protocolo (exportar, importar no destino, atualizar o
+mapa, remover da origem); durante a cópia a pessoa existe nos dois shards e
+a junção por pessoa evita resultados duplicados.
+
+Com um quantizador (embedding_quantization), cada shard busca sobre códigos
+float16/int8 e reordena as melhores linhas com a distância exata do store.
+"""
+
+import base64
+import itertools
+import json
+import os
+import socket
+import socketserver
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from pathlib import Path
+
+import numpy as np
+
+from embedding_quantization import QuantizedGallery
+from embedding_store import EmbeddingStore
+
+
+MAPA_NAME = "mapa.json"
+DEFAULT_SHARDS_PATH = "galeria/shards"
+PORTA_INICIAL = 9200
+
+_CABECALHO = struct.Struct(">I")
+
+
+# ----------------------------------------------------------------------
+# Protocolo
+# ----------------------------------------------------------------------
+
+def enviar_mensagem(sock, mensagem):
+    dados = json.dumps(mensagem).encode()
+    sock.sendall(_CABECALHO.pack(len(dados)) + dados)
+
+
+def _ler_exato(sock, n):
+    partes = []
+    while n:
+        parte = sock.recv(n)
+        if not parte:
+            return None
+        partes.append(parte)
+        n -= len(parte)
+    return b"".join(partes)
+
+
+def receber_mensagem(sock):
+    """Lê uma mensagem (None se a conexão foi fechada)."""
+    cabecalho = _ler_exato(sock, _CABECALHO.size)
+    if cabecalho is None:
+        return None
+    dados = _ler_exato(sock, _CABECALHO.unpack(cabecalho)[0])
+    return None if dados is None else json.loads(dados)
+
+
+def codificar_vetores(vetores):
+    return base64.b64encode(np.ascontiguousarray(vetores, dtype=np.float32).tobytes()).decode()
+
+
+def decodificar_vetores(texto, dim):
+    return np.frombuffer(base64.b64decode(texto), dtype=np.float32).reshape(-1, dim)
+
+
+def _endereco(texto):
+    host, porta = texto.rsplit(":", 1)
+    return host, int(porta)
+
+
+# ----------------------------------------------------------------------
+# Shard (servidor)
+# ----------------------------------------------------------------------
+
+class ShardServer(socketserver.ThreadingTCPServer):
+    """
+    Serve a busca e a manutenção de uma partição da galeria.
+
+    Args:
+        nome (str): Nome do shard
+        pasta (str): Pasta do EmbeddingStore da partição
+        endereco (tuple): (host, porta)
+        atraso (float): Atraso artificial por consulta em segundos (testes de prazo)
+        quantizador (ScalarQuantizer, optional): Busca sobre códigos float16/int8
+            (galeria em `<pasta>/quantizado_<modo>/` se existir, senão quantiza o store)
+        rerank (int, optional): Linhas reordenadas com a distância exata na busca quantizada
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, nome, pasta, endereco, atraso=0.0, quantizador=None, rerank=None):
+        self.nome = nome
+        self.store = EmbeddingStore(pasta)
+        self.atraso = atraso
+        self.rerank = rerank
+        self.galeria = None
+        if quantizador is not None:
+            codigos = Path(pasta) / f"quantizado_{quantizador.modo}"
+            if (codigos / "meta.json").exists():
+                self.galeria = QuantizedGallery.carregar(codigos, self.store)
+            else:
+                self.galeria = QuantizedGallery(self.store, quantizador)
+        self.trava = threading.Lock()
+        super().__init__(endereco, _ShardHandler)
+
+    def tratar(self, mensagem):
+        op = mensagem.get('op')
+        if op == 'buscar' and self.atraso:
+            time.sleep(self.atraso)
+        with self.trava:
+            # Acréscimos feitos por outro processo no store (ex.: cadastro) ficam visíveis
+            if self.galeria is not None:
+                self.galeria.atualizar()
+            else:
+                self.store.atualizar()
+            if op == 'buscar':
+                return self._buscar(mensagem)
+            if op == 'info':
+                return {'shard': self.nome, 'pessoas': len(self.store.pessoas), 'linhas': len(self.store),
+                        'dim': self.store.dim, 'geracao': self.store.geracao}
+            if op == 'contagens':
+                return {'contagens': {p: len(self.store.linhas_pessoa(p)) for p in self.store.pessoas}}
+            if op == 'exportar':
+                registros, vetores = self.store.amostras_pessoa(mensagem['pessoa'])
+                return {'registros': registros, 'vetores': codificar_vetores(vetores), 'dim': self.store.dim}
+            if op == 'importar':
+                registros = mensagem['registros']
+                vetores = decodificar_vetores(mensagem['vetores'], mensagem['dim'])
+                self.store.substituir_pessoa(mensagem['pessoa'], [r['amostra'] for r in registros], vetores,
+                                             [r.get('mtime') for r in registros],
+                                             registros[0].get('modelo', '') if registros else '')
+                return {'linhas': len(registros)}
+            if op == 'remover':
+                for pessoa in mensagem['pessoas']:
+                    self.store.remover_pessoa(pessoa)
+                return {'removidas': len(mensagem['pessoas'])}
+            if op == 'compactar':
+                return self.store.compactar()
+        return {'erro': f"operação desconhecida: {op}"}
+
+    def _buscar(self, mensagem):
+        inicio = time.perf_counter()
+        resultados = []
+        if len(self.store):
+            embedding = np.asarray(mensagem['embedding'], dtype=np.float32)
+            if self.galeria is not None:
+                resultados = self.galeria.buscar(embedding, k=mensagem.get('k', 5), rerank=self.rerank)
+            else:
+                resultados = self.store.buscar(embedding, k=mensagem.get('k', 5))
+        return {'shard': self.nome, 'resultados': resultados, 'linhas': len(self.store),
+                'ms': 1000 * (time.perf_counter() - inicio)}
+
+
+class _ShardHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        while True:
+            mensagem = receber_mensagem(self.request)
+            if mensagem is None:
+                return
+            try:
+                resposta = self.server.tratar(mensagem)
+            except Exception as e:
+                resposta = {'erro': f"{type(e).__name__}: {e}"}
+            resposta['id'] = mensagem.get('id')
+            enviar_mensagem(self.request, resposta)
+
+
+def servir_shard(nome, pasta, host="127.0.0.1", porta=PORTA_INICIAL, atraso=0.0, quantizador=None, rerank=None):
+    """Executa um shard até o processo ser encerrado."""
+    with ShardServer(nome, pasta, (host, porta), atraso, quantizador, rerank) as servidor:
+        servidor.serve_forever()
+
+
+def iniciar_shards_locais(mapa, nomes=None, atrasos=None, quantizador=None, rerank=None):
+    """
+    Sobe um processo por shard do mapa (endereços locais), para testes e
+    para hosts que rodam vários shards.
+
+    Args:
+        mapa (ShardMap): Mapa com 'endereco' e 'pasta' de cada shard
+        nomes (list, optional): Shards a iniciar (padrão: todos)
+        atrasos (dict, optional): shard -> atraso artificial em segundos
+        quantizador (ScalarQuantizer, optional): Busca quantizada em todos os shards
+        rerank (int, optional): Linhas reordenadas com a distância exata
+
+    Returns:
+        list: Processos iniciados (encerre com .terminate())
+    """
+    import multiprocessing as mp
+
+    contexto = mp.get_context("spawn")
+    nomes = list(mapa.shards) if nomes is None else list(nomes)
+    processos = []
+    for nome in nomes:
+        shard = mapa.shards[nome]
+        host, porta = _endereco(shard['endereco'])
+        processo = contexto.Process(target=servir_shard, daemon=True,
+                                    args=(nome, shard['pasta'], host, porta, (atrasos or {}).get(nome, 0.0),
+                                          quantizador, rerank))
+        processo.start()
+        processos.append(processo)
+
+    # Espera cada shard aceitar conexões
+    limite = time.monotonic() + 30
+    for nome in nomes:
+        shard = mapa.shards[nome]
+        while True:
+            try:
+                socket.create_connection(_endereco(shard['endereco']), timeout=1).close()
+                break
+            except OSError:
+                if time.monotonic() > limite:
+                    for processo in processos:
+                        processo.terminate()
+                    raise RuntimeError(f"Shard não respondeu em {shard['endereco']}")
+                time.sleep(0.05)
+    return processos
+
+
+# ----------------------------------------------------------------------
+# Mapa de shards
+# ----------------------------------------------------------------------
+
+class ShardMap:
+    """
+    Shards e atribuição pessoa -> shard, gravados em mapa.json.
+
+    Args:
+        path (str): Caminho do mapa.json
+    """
+
+    def __init__(self, path=os.path.join(DEFAULT_SHARDS_PATH, MAPA_NAME)):
+        self.path = Path(path)
+        self.versao = 0
+        self.shards = {}
+        self.pessoas = {}
+        if self.path.exists():
+            with open(self.path) as f:
+                dados = json.load(f)
+            self.versao, self.shards, self.pessoas = dados['versao'], dados['shards'], dados['pessoas']
+
+    def salvar(self):
+        """Grava o mapa (escrita atômica, nova versão)."""
+        self.versao += 1
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp = self.path.with_suffix(".json.tmp")
+        with open(temp, "w") as f:
+            json.dump({'versao': self.versao, 'shards': self.shards, 'pessoas': self.pessoas}, f,
+                      indent=2, ensure_ascii=False)
+        os.replace(temp, self.path)
+
+    def atribuir(self, pessoa, linhas_por_shard):
+        """
+        Shard de uma pessoa; pessoas novas vão para o shard com menos linhas.
+
+        Args:
+            pessoa (str): Nome da pessoa
+            linhas_por_shard (dict): Linhas atuais de cada shard
+        """
+        if pessoa not in self.pessoas:
+            self.pessoas[pessoa] = min(self.shards, key=lambda nome: (linhas_por_shard.get(nome, 0), nome))
+        return self.pessoas[pessoa]
+
+    def planejar_rebalanceamento(self, linhas_por_pessoa, tolerancia=0.1):
+        """
+        Movimentos que deixam os shards a até `tolerancia` da média de linhas.
+        Pessoas de shards que saíram do mapa sempre são movidas.
+
+        Args:
+            linhas_por_pessoa (dict): Linhas de cada pessoa
+            tolerancia (float): Desvio aceito, em fração da média
+
+        Returns:
+            list: (pessoa, origem, destino)
+        """
+        if not self.shards:
+            return []
+        atribuicao = dict(self.pessoas)
+        contagem = {nome: 0 for nome in self.shards}
+        movimentos = []
+        for pessoa, shard in sorted(atribuicao.items()):
+            if shard not in contagem:
+                destino = min(contagem, key=lambda nome: (contagem[nome], nome))
+                movimentos.append((pessoa, shard, destino))
+                atribuicao[pessoa] = shard = destino
+            contagem[shard] += linhas_por_pessoa.get(pessoa, 0)
+
+        media = sum(contagem.values()) / len(contagem)
+        while True:
+            cheio = max(contagem, key=lambda nome: (contagem[nome], nome))
+            vazio = min(contagem, key=lambda nome: (contagem[nome], nome))
+            diferenca = contagem[cheio] - contagem[vazio]
+            if diferenca <= 2 * tolerancia * media:
+                break
+            # Qualquer pessoa menor que a diferença aproxima os dois shards; a ideal tem metade dela
+            candidatas = [(abs(linhas_por_pessoa.get(p, 0) - diferenca / 2), p) for p, s in atribuicao.items()
+                          if s == cheio and 0 < linhas_por_pessoa.get(p, 0) < diferenca]
+            if not candidatas:
+                break
+            pessoa = min(candidatas)[1]
+            movimentos.append((pessoa, cheio, vazio))
+            atribuicao[pessoa] = vazio
+            contagem[cheio] -= linhas_por_pessoa[pessoa]
+            contagem[vazio] += linhas_por_pessoa[pessoa]
+        return movimentos
+
+
+def particionar_store(store, pasta_shards, n_shards, host="127.0.0.1", porta_inicial=PORTA_INICIAL):
+    """
+    Divide um EmbeddingStore em `n_shards` stores por pessoa (equilibrados
+    pelo número de linhas) e grava o mapa.
+
+    Returns:
+        ShardMap
+    """
+    pasta_shards = Path(pasta_shards)
+    mapa = ShardMap(pasta_shards / MAPA_NAME)
+    mapa.shards = {f"s{i}": {'endereco': f"{host}:{porta_inicial + i}", 'pasta': str(pasta_shards / f"s{i}")}
+                   for i in range(n_shards)}
+    mapa.pessoas = {}
+    destinos = {nome: EmbeddingStore(shard['pasta'], dim=store.dim) for nome, shard in mapa.shards.items()}
+
+    linhas = {p: len(store.linhas_pessoa(p)) for p in store.pessoas}
+    linhas_por_shard = {}
+    # Maiores primeiro, cada uma no shard mais vazio
+    for pessoa in sorted(linhas, key=lambda p: (-linhas[p], p)):
+        nome = mapa.atribuir(pessoa, linhas_por_shard)
+        linhas_por_shard[nome] = linhas_por_shard.get(nome, 0) + linhas[pessoa]
+        registros, vetores = store.amostras_pessoa(pessoa)
+        destinos[nome].adicionar(pessoa, [r['amostra'] for r in registros], vetores,
+                                 [r.get('mtime') for r in registros], registros[0].get('modelo', ''))
+    mapa.salvar()
+    return mapa
+
+
+# ----------------------------------------------------------------------
+# Coordenador
+# ----------------------------------------------------------------------
+
+class ShardUnavailable(RuntimeError):
+    """Shard não respondeu dentro do prazo ou fechou a conexão."""
+
+
+class _Conexoes:
+    """Conexões reaproveitadas com um shard (uma por requisição em andamento)."""
+
+    def __init__(self, endereco):
+        self.endereco = _endereco(endereco)
+        self._livres = []
+        self._trava = threading.Lock()
+
+    def requisitar(self, mensagem, timeout):
+        with self._trava:
+            sock = self._livres.pop() if self._livres else None
+        try:
+            if sock is None:
+                sock = socket.create_connection(self.endereco, timeout=max(timeout, 0.001))
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.settimeout(max(timeout, 0.001))
+            enviar_mensagem(sock, mensagem)
+            resposta = receber_mensagem(sock)
+        except OSError as e:
+            # Uma resposta atrasada chegaria nesta conexão fora de ordem: descarta
+            if sock is not None:
+                sock.close()
+            raise ShardUnavailable(str(e)) from e
+        if resposta is None:
+            sock.close()
+            raise ShardUnavailable("conexão fechada pelo shard")
+        with self._trava:
+            self._livres.append(sock)
+        return resposta
+
+    def fechar(self):
+        with self._trava:
+            for sock in self._livres:
+                sock.close()
+            self._livres = []
+
+
+class ScatterGatherCoordinator:
+    """
+    Envia consultas a todos os shards e junta os resultados dentro do prazo.
+
+    Args:
+        mapa (ShardMap): Shards e atribuição de pessoas
+        prazo (float): Prazo padrão por consulta, em segundos
+    """
+
+    def __init__(self, mapa, prazo=0.25):
+        self.mapa = mapa
+        self.prazo = prazo
+        self._conexoes = {nome: _Conexoes(shard['endereco']) for nome, shard in mapa.shards.items()}
+        self._executor = ThreadPoolExecutor(max_workers=max(4, 4 * len(mapa.shards)))
+        self._ids = itertools.count(1)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+        return False
+
+    def fechar(self):
+        self._executor.shutdown(wait=False)
+        for conexoes in self._conexoes.values():
+            conexoes.fechar()
+
+    def _requisitar(self, shard, mensagem, timeout=None):
+        resposta = self._conexoes[shard].requisitar(mensagem, self.prazo if timeout is None else timeout)
+        if 'erro' in resposta:
+            raise RuntimeError(f"{shard}: {resposta['erro']}")
+        return resposta
+
+    def identificar(self, embedding, k=5, prazo=None):
+        """
+        Identificação 1:N em todos os shards.
+
+        Args:
+            embedding (np.array): Embedding (d,) da consulta
+            k (int): Pessoas no resultado
+            prazo (float, optional): Segundos de espera pelos shards
+
+        Returns:
+            dict: 'resultados' (top-k global), 'parcial', 'respondidos',
+                'atrasados', 'falhas' e 'ms'
+        """
+        prazo = self.prazo if prazo is None else prazo
+        inicio = time.perf_counter()
+        mensagem = {'op': 'buscar', 'id': next(self._ids), 'k': k,
+                    'embedding': np.asarray(embedding, dtype=np.float32).ravel().tolist()}
+
+        futuros = {self._executor.submit(self._requisitar, nome, mensagem, prazo): nome for nome in self._conexoes}
+        prontos, pendentes = wait(futuros, timeout=prazo)
+
+        melhores, respondidos, falhas = {}, [], {}
+        for futuro in prontos:
+            nome = futuros[futuro]
+            try:
+                resposta = futuro.result()
+            except Exception as e:
+                falhas[nome] = str(e)
+                continue
+            respondidos.append(nome)
+            for r in resposta['resultados']:
+                # Pessoa em dois shards (rebalanceamento em andamento): fica a menor distância
+                if r['pessoa'] not in melhores or r['distancia'] < melhores[r['pessoa']]['distancia']:
+                    melhores[r['pessoa']] = dict(r, shard=nome)
+        atrasados = sorted(futuros[f] for f in pendentes)
+
+        resultados = sorted(melhores.values(), key=lambda r: r['distancia'])[:k]
+        return {
+            'resultados': resultados,
+            'parcial': bool(atrasados or falhas),
+            'respondidos': sorted(respondidos),
+            'atrasados': atrasados,
+            'falhas': falhas,
+            'ms': 1000 * (time.perf_counter() - inicio)
+        }
+
+    def info(self, timeout=5.0):
+        """Estado de cada shard (ou o erro)."""
+        estado = {}
+        for nome in self._conexoes:
+            try:
+                estado[nome] = self._requisitar(nome, {'op': 'info'}, timeout)
+            except Exception as e:
+                estado[nome] = {'erro': str(e)}
+        return estado
+
+    def linhas_por_pessoa(self, timeout=30.0):
+        """Linhas de cada pessoa, somando todos os shards."""
+        linhas = {}
+        for nome in self._conexoes:
+            for pessoa, n in self._requisitar(nome, {'op': 'contagens'}, timeout)['contagens'].items():
+                linhas[pessoa] = linhas.get(pessoa, 0) + n
+        return linhas
+
+    def adicionar_pessoa(self, pessoa, amostras, embeddings, mtimes=None, modelo="", timeout=30.0):
+        """Grava (ou substitui) uma pessoa no shard indicado pelo mapa."""
+        estado = self.info(timeout)
+        fora = sorted(nome for nome, e in estado.items() if 'erro' in e)
+        if fora:
+            raise ShardUnavailable(f"Shards indisponíveis: {', '.join(fora)}")
+        linhas_por_shard = {nome: e['linhas'] for nome, e in estado.items()}
+        shard = self.mapa.atribuir(pessoa, linhas_por_shard)
+        mtimes = mtimes if mtimes is not None else [None] * len(amostras)
+        registros = [{'amostra': str(a), 'mtime': m, 'modelo': modelo} for a, m in zip(amostras, mtimes)]
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        self._requisitar(shard, {'op': 'importar', 'pessoa': pessoa, 'registros': registros,
+                                 'vetores': codificar_vetores(embeddings), 'dim': embeddings.shape[-1]}, timeout)
+        self.mapa.salvar()
+        return shard
+
+    def rebalancear(self, tolerancia=0.1, timeout=60.0, compactar=True):
+        """
+        Move pessoas entre shards até equilibrar as linhas.
+
+        Returns:
+            list: Movimentos executados (pessoa, origem, destino)
+        """
+        movimentos = self.mapa.planejar_rebalanceamento(self.linhas_por_pessoa(timeout), tolerancia)
+        origens = set()
+        for pessoa, origem, destino in movimentos:
+            if origem in self._conexoes:
+                dados = self._requisitar(origem, {'op': 'exportar', 'pessoa': pessoa}, timeout)
+                self._requisitar(destino, {'op': 'importar', 'pessoa': pessoa, 'registros': dados['registros'],
+                                           'vetores': dados['vetores'], 'dim': dados['dim']}, timeout)
+            self.mapa.pessoas[pessoa] = destino
+            self.mapa.salvar()
+            if origem in self._conexoes:
+                self._requisitar(origem, {'op': 'remover', 'pessoas': [pessoa]}, timeout)
+                origens.add(origem)
+        if compactar:
+            for origem in origens:
+                self._requisitar(origem, {'op': 'compactar'}, timeout)
+        return movimentos
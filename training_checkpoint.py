@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Módulo de checkpoints periódicos de treinamento.
+Cada checkpoint é uma pasta com os pesos e o estado do otimizador
+(tf.train.Checkpoint), arrays extras (.npz) e o estado do laço de treino
+(época, passo, histórico, early stopping, seeds) em estado.json. A pasta é
+escrita com outro nome e renomeada no fim, então um checkpoint visível está
+sempre completo, mesmo que a máquina caia no meio da gravação.
+
+Estrutura:
+    modelos/checkpoints/
+        ckpt_000001200/
+            tf.index, tf.data-00000-of-00001
+            extras.npz
+            estado.json
+        ckpt_000001500/
+        ...
+"""
+
+import json
+import os
+import shutil
+import signal
+import time
+from pathlib import Path
+
+import numpy as np
+
+
+PREFIXO = "ckpt_"
+
+
+class TrainingCheckpointer:
+    """
+    Grava e restaura checkpoints de treinamento com política de retenção.
+
+    Args:
+        pasta (str): Pasta dos checkpoints
+        manter (int): Quantos checkpoints mais recentes manter
+        intervalo_passos (int, optional): Grava a cada N passos de treino
+        intervalo_segundos (float, optional): Grava se passou esse tempo
+            desde a última gravação (o trabalho perdido numa interrupção é
+            no máximo um intervalo)
+    """
+
+    def __init__(self, pasta, manter=3, intervalo_passos=None, intervalo_segundos=300):
+        self.pasta = Path(pasta)
+        self.manter = max(1, manter)
+        self.intervalo_passos = intervalo_passos
+        self.intervalo_segundos = intervalo_segundos
+        self._ultimo_passo = 0
+        self._ultimo_tempo = time.monotonic()
+
+    def listar(self):
+        """Checkpoints completos, do mais antigo para o mais recente."""
+        if not self.pasta.exists():
+            return []
+        return sorted(p for p in self.pasta.iterdir()
+                      if p.is_dir() and p.name.startswith(PREFIXO) and (p / "estado.json").exists())
+
+    def ultimo(self):
+        """Checkpoint mais recente (ou None)."""
+        checkpoints = self.listar()
+        return checkpoints[-1] if checkpoints else None
+
+    def limpar(self):
+        """Remove todos os checkpoints (início de um treino novo)."""
+        if self.pasta.exists():
+            shutil.rmtree(self.pasta)
+
+    def deve_salvar(self, passo_global):
+        """Indica se o intervalo de passos ou de tempo foi atingido."""
+        if self.intervalo_passos and passo_global - self._ultimo_passo >= self.intervalo_passos:
+            return True
+        if self.intervalo_segundos and time.monotonic() - self._ultimo_tempo >= self.intervalo_segundos:
+            return True
+        return False
+
+    def salvar(self, passo_global, rastreaveis, estado, extras=None):
+        """
+        Grava um checkpoint de forma atômica e aplica a retenção.
+
+        Args:
+            passo_global (int): Passos de treino já executados (nome do checkpoint)
+            rastreaveis (dict): Objetos TensorFlow (modelo, otimizador, geradores)
+            estado (dict): Estado do laço de treino (serializável em JSON)
+            extras (dict, optional): Arrays NumPy (ex.: melhores pesos)
+
+        Returns:
+            Path: Pasta do checkpoint
+        """
+        import tensorflow as tf
+
+        self.pasta.mkdir(parents=True, exist_ok=True)
+        destino = self.pasta / f"{PREFIXO}{passo_global:09d}"
+        temp = self.pasta / f".{destino.name}.tmp"
+        if temp.exists():
+            shutil.rmtree(temp)
+        temp.mkdir()
+
+        tf.train.Checkpoint(**rastreaveis).write(str(temp / "tf"))
+        np.savez(temp / "extras.npz", **(extras or {}))
+        estado = dict(estado, passo_global=passo_global, salvo_em=time.time())
+        with open(temp / "estado.json", "w") as f:
+            json.dump(estado, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+
+        if destino.exists():
+            shutil.rmtree(destino)
+        os.replace(temp, destino)
+
+        self._ultimo_passo = passo_global
+        self._ultimo_tempo = time.monotonic()
+        self._aplicar_retencao()
+        return destino
+
+    def restaurar(self, caminho, rastreaveis):
+        """
+        Restaura um checkpoint nos objetos dados.
+
+        Returns:
+            tuple: (estado, extras)
+        """
+        import tensorflow as tf
+
+        caminho = Path(caminho)
+        status = tf.train.Checkpoint(**rastreaveis).read(str(caminho / "tf"))
+        status.assert_existing_objects_matched()
+        with open(caminho / "estado.json") as f:
+            estado = json.load(f)
+        with np.load(caminho / "extras.npz") as dados:
+            extras = {k: dados[k] for k in dados.files}
+
+        self._ultimo_passo = estado['passo_global']
+        self._ultimo_tempo = time.monotonic()
+        return estado, extras
+
+    def _aplicar_retencao(self):
+        for antigo in self.listar()[:-self.manter]:
+            shutil.rmtree(antigo, ignore_errors=True)
+        for temp in self.pasta.glob(f".{PREFIXO}*.tmp"):
+            shutil.rmtree(temp, ignore_errors=True)
+
+
+class PreemptionSignal:
+    """
+    Captura SIGTERM/SIGINT (aviso de preempção de máquinas spot) para que o
+    laço de treino grave um checkpoint e saia no próximo passo.
+
+    Exemplo:
+        with PreemptionSignal() as parada:
+            for passo in ...:
+                if parada.solicitada: ...
+    """
+
+    def __init__(self, sinais=(signal.SIGTERM, signal.SIGINT)):
+        self.sinais = sinais
+        self.solicitada = False
+        self._anteriores = {}
+
+    def _tratar(self, signum, frame):
+        self.solicitada = True
+
+    def __enter__(self):
+        for sinal in self.sinais:
+            try:
+                self._anteriores[sinal] = signal.signal(sinal, self._tratar)
+            except ValueError:
+                pass  # fora da thread principal: sem captura
+        return self
+
+    def __exit__(self, *exc):
+        for sinal, anterior in self._anteriores.items():
+            signal.signal(sinal, anterior)
+        return False
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Módulo de cache para verificações repetidas de assinaturas.
+Guarda distâncias de pares já verificados (chave simétrica pelos hashes de
+conteúdo das duas imagens) e, em um segundo nível, os embeddings de cada
+imagem, para que pares que compartilham uma imagem não repitam a inferência.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+def content_hash(data):
+    """
+    Calcula o hash do conteúdo de uma imagem.
+
+    Args:
+        data (bytes): Bytes do arquivo
+
+    Returns:
+        str: Hash hexadecimal
+    """
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def file_fingerprint(path, chunk_size=1 << 20):
+    """
+    Calcula a impressão digital de um arquivo (ex.: o modelo salvo).
+
+    Args:
+        path: Caminho do arquivo
+        chunk_size (int): Tamanho dos blocos de leitura
+
+    Returns:
+        str: Hash hexadecimal do conteúdo
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class LRUCache:
+    """
+    Cache LRU limitado por número de entradas e por tempo de vida (TTL).
+
+    Args:
+        max_entries (int): Número máximo de entradas
+        ttl (float, optional): Tempo de vida em segundos (None = sem expiração)
+        clock: Função de tempo (injetável para testes)
+    """
+
+    def __init__(self, max_entries=1024, ttl=None, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Retorna o valor ou None (conta acerto/falha)."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires is None or expires > self.clock():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+                self.evictions += 1
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        """Insere ou atualiza uma entrada, descartando as menos recentes."""
+        expires = self.clock() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, predicate):
+        """Remove as entradas cuja chave satisfaz `predicate`."""
+        with self._lock:
+            keys = [key for key in self._data if predicate(key)]
+            for key in keys:
+                del self._data[key]
+            return len(keys)
+
+    def clear(self):
+        """Remove todas as entradas."""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        """Contadores do cache."""
+        total = self.hits + self.misses
+        return {
+            'entradas': len(self._data),
+            'acertos': self.hits,
+            'falhas': self.misses,
+            'descartes': self.evictions,
+            'taxa_acerto': self.hits / total if total else 0.0
+        }
+
+
+class VerificationCache:
+    """
+    Cache em dois níveis para verificações de pares de assinaturas.
+
+    - Resultados: distância do par, chave (hash_menor, hash_maior,
+      impressão do modelo, configuração de preprocessamento). A ordem dos
+      argumentos não importa.
+    - Embeddings: vetor de cada imagem, chave (hash, impressão do modelo,
+      configuração de preprocessamento).
+
+    A decisão (mesma pessoa ou não) não é guardada: ela é recalculada com o
+    threshold vigente a partir da distância.
+    """
+
+    def __init__(self, max_resultados=4096, max_embeddings=8192, ttl=3600):
+        self.resultados = LRUCache(max_resultados, ttl)
+        self.embeddings = LRUCache(max_embeddings, ttl)
+
+    @staticmethod
+    def chave_par(hash_a, hash_b, model_fingerprint, preprocess_config):
+        """Chave simétrica de um par de imagens."""
+        primeiro, segundo = sorted((hash_a, hash_b))
+        return (primeiro, segundo, model_fingerprint, preprocess_config)
+
+    @staticmethod
+    def chave_imagem(image_hash, model_fingerprint, preprocess_config):
+        """Chave de uma imagem individual."""
+        return (image_hash, model_fingerprint, preprocess_config)
+
+    def obter_distancia(self, chave):
+        return self.resultados.get(chave)
+
+    def guardar_distancia(self, chave, distancia):
+        self.resultados.put(chave, distancia)
+
+    def obter_embedding(self, chave):
+        return self.embeddings.get(chave)
+
+    def guardar_embedding(self, chave, embedding):
+        self.embeddings.put(chave, embedding)
+
+    def invalidar_modelo(self, model_fingerprint):
+        """Remove tudo que foi calculado com um modelo específico."""
+        removidos = self.resultados.invalidate(lambda chave: chave[2] == model_fingerprint)
+        removidos += self.embeddings.invalidate(lambda chave: chave[1] == model_fingerprint)
+        return removidos
+
+    def estatisticas(self):
+        """Contadores de acertos/falhas dos dois níveis."""
+        return {
+            'resultados': self.resultados.stats(),
+            'embeddings': self.embeddings.stats()
+        }
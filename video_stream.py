@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Módulo de verificação a partir de vídeo (arquivo gravado ou câmera).
+Cada quadro recebe uma pontuação barata em baixa resolução (nitidez, cobertura
+de tinta e estabilidade em relação ao quadro anterior) e só os K melhores são
+guardados. Ao final, apenas esses quadros passam por `preprocess_phone_image`
+e pela rede base, em um único lote.
+"""
+
+import heapq
+import time
+
+import cv2
+import numpy as np
+
+from data_preprocessing import preprocess_phone_image
+from metrics import medir_etapa, medir_verificacao
+from model import compute_embeddings
+
+
+def abrir_fonte(fonte):
+    """
+    Abre um arquivo de vídeo ou uma câmera.
+
+    Args:
+        fonte: Caminho do vídeo ou índice da câmera ("0", 1, ...)
+
+    Returns:
+        cv2.VideoCapture: Captura aberta
+    """
+    alvo = int(fonte) if str(fonte).isdigit() else str(fonte)
+    captura = cv2.VideoCapture(alvo)
+    if not captura.isOpened():
+        raise ValueError(f"Não foi possível abrir a fonte de vídeo: {fonte}")
+    return captura
+
+
+def iterar_quadros(fonte, max_quadros=None, duracao=None):
+    """
+    Lê os quadros de uma fonte até o fim, `max_quadros` ou `duracao` segundos.
+
+    Yields:
+        tuple: (índice, quadro BGR)
+    """
+    captura = abrir_fonte(fonte)
+    inicio = time.perf_counter()
+    try:
+        indice = 0
+        while max_quadros is None or indice < max_quadros:
+            if duracao is not None and time.perf_counter() - inicio >= duracao:
+                break
+            ok, quadro = captura.read()
+            if not ok:
+                break
+            yield indice, quadro
+            indice += 1
+    finally:
+        captura.release()
+
+
+class FrameScorer:
+    """
+    Pontua quadros numa cópia reduzida (maior lado = `lado` pixels).
+
+    A pontuação é a cobertura de tinta (0 sem assinatura visível) vezes a
+    média ponderada de nitidez (variância do Laplaciano) e estabilidade
+    (diferença média para o quadro anterior). O custo é dominado pela
+    redução do quadro; o resto roda em ~160x90 pixels.
+
+    Args:
+        lado (int): Maior lado da cópia reduzida
+        tinta (tuple): Faixa de fração de tinta considerada ideal
+        nitidez_referencia (float): Variância do Laplaciano que vale 0.5
+        movimento_referencia (float): Diferença média (0-255) que zera a estabilidade
+        peso_nitidez (float): Peso da nitidez (o resto vai para a estabilidade)
+    """
+
+    def __init__(self, lado=160, tinta=(0.01, 0.20), nitidez_referencia=150.0,
+                 movimento_referencia=20.0, peso_nitidez=0.6):
+        self.lado = lado
+        self.tinta = tinta
+        self.nitidez_referencia = nitidez_referencia
+        self.movimento_referencia = movimento_referencia
+        self.peso_nitidez = peso_nitidez
+        self._anterior = None
+
+    def reduzir(self, quadro):
+        """Cópia reduzida em escala de cinza do quadro."""
+        altura, largura = quadro.shape[:2]
+        escala = min(1.0, self.lado / max(altura, largura))
+        if escala < 1.0:
+            quadro = cv2.resize(quadro, (max(1, round(largura * escala)), max(1, round(altura * escala))),
+                                interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(quadro, cv2.COLOR_BGR2GRAY) if quadro.ndim == 3 else quadro
+
+    def pontuar(self, quadro):
+        """
+        Pontua um quadro (os quadros devem chegar em ordem).
+
+        Returns:
+            dict: 'nitidez', 'tinta', 'estabilidade' e 'pontuacao' em [0, 1]
+        """
+        pequeno = self.reduzir(quadro)
+
+        variancia = cv2.Laplacian(pequeno, cv2.CV_32F).var()
+        nitidez = float(variancia / (variancia + self.nitidez_referencia))
+
+        _, binaria = cv2.threshold(pequeno, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+        fracao = cv2.countNonZero(binaria) / binaria.size
+        minimo, maximo = self.tinta
+        if fracao < minimo:
+            tinta = fracao / minimo
+        elif fracao > maximo:
+            tinta = max(0.0, 1.0 - (fracao - maximo) / maximo)
+        else:
+            tinta = 1.0
+
+        if self._anterior is None or self._anterior.shape != pequeno.shape:
+            estabilidade = 0.5
+        else:
+            movimento = cv2.absdiff(pequeno, self._anterior).mean()
+            estabilidade = max(0.0, 1.0 - movimento / self.movimento_referencia)
+        self._anterior = pequeno
+
+        pontuacao = tinta * (self.peso_nitidez * nitidez + (1 - self.peso_nitidez) * estabilidade)
+        return {
+            'nitidez': nitidez,
+            'tinta': float(tinta),
+            'estabilidade': float(estabilidade),
+            'pontuacao': float(pontuacao)
+        }
+
+
+class BestFrames:
+    """
+    Mantém os K quadros de maior pontuação vistos até agora.
+
+    Quadros a menos de `intervalo_minimo` do quadro já guardado competem
+    com ele em vez de ocupar outra vaga, para que os K escolhidos não sejam
+    praticamente o mesmo instante do vídeo.
+
+    Args:
+        k (int): Quantidade de quadros mantidos
+        intervalo_minimo (int): Distância mínima (em quadros) entre escolhidos
+    """
+
+    def __init__(self, k=5, intervalo_minimo=5):
+        self.k = k
+        self.intervalo_minimo = intervalo_minimo
+        self._heap = []  # (pontuacao, indice, quadro, detalhes), menor no topo
+
+    def __len__(self):
+        return len(self._heap)
+
+    def minimo(self):
+        """Menor pontuação guardada (-inf enquanto há vagas)."""
+        return self._heap[0][0] if len(self._heap) >= self.k else float('-inf')
+
+    def adicionar(self, indice, quadro, detalhes):
+        """
+        Considera um quadro; só copia o quadro quando ele entra na seleção.
+
+        Returns:
+            bool: True se o quadro foi guardado
+        """
+        pontuacao = detalhes['pontuacao']
+        vizinhos = [i for i, item in enumerate(self._heap) if abs(item[1] - indice) < self.intervalo_minimo]
+        if vizinhos:
+            if max(self._heap[i][0] for i in vizinhos) >= pontuacao:
+                return False
+            self._heap = [item for i, item in enumerate(self._heap) if i not in vizinhos]
+            heapq.heapify(self._heap)
+        elif pontuacao <= self.minimo():
+            return False
+
+        item = (pontuacao, indice, quadro.copy(), detalhes)
+        if len(self._heap) >= self.k:
+            heapq.heapreplace(self._heap, item)
+        else:
+            heapq.heappush(self._heap, item)
+        return True
+
+    def quadros(self):
+        """
+        Returns:
+            list: dicts com 'indice', 'quadro' e a pontuação, do melhor para o pior
+        """
+        return [
+            dict(detalhes, indice=indice, quadro=quadro)
+            for _, indice, quadro, detalhes in sorted(self._heap, key=lambda item: (-item[0], item[1]))
+        ]
+
+
+class StreamVerifier:
+    """
+    Seleciona os melhores quadros de um vídeo e verifica-os em lote.
+
+    Args:
+        cadastro: SignatureEnrollment carregado (templates da galeria)
+        threshold (float): Distância máxima para "mesma pessoa"
+        k (int): Quadros verificados por vídeo
+        intervalo_minimo (int): Distância mínima entre os quadros escolhidos
+        recortar (bool): Recorta a região com tinta no preprocessamento
+        scorer (FrameScorer, optional): Pontuador (um novo por vídeo se None)
+    """
+
+    def __init__(self, cadastro, threshold, k=5, intervalo_minimo=5, recortar=False, scorer=None):
+        self.cadastro = cadastro
+        self.threshold = threshold
+        self.k = k
+        self.intervalo_minimo = intervalo_minimo
+        self.recortar = recortar
+        self.scorer = scorer
+
+    def selecionar(self, quadros):
+        """
+        Pontua os quadros em sequência e guarda os K melhores.
+
+        Args:
+            quadros: Iterável de (índice, quadro BGR), ex.: iterar_quadros()
+
+        Returns:
+            tuple: (lista de quadros escolhidos, estatísticas de tempo)
+        """
+        scorer = self.scorer or FrameScorer()
+        melhores = BestFrames(self.k, self.intervalo_minimo)
+        total, tempo_pontuacao = 0, 0.0
+        inicio = time.perf_counter()
+        for indice, quadro in quadros:
+            t0 = time.perf_counter()
+            detalhes = scorer.pontuar(quadro)
+            tempo_pontuacao += time.perf_counter() - t0
+            melhores.adicionar(indice, quadro, detalhes)
+            total += 1
+        duracao = time.perf_counter() - inicio
+        return melhores.quadros(), {
+            'quadros': total,
+            'segundos': duracao,
+            'ms_pontuacao_por_quadro': 1000 * tempo_pontuacao / max(total, 1),
+            'fps_pontuacao': total / tempo_pontuacao if tempo_pontuacao > 0 else float('inf')
+        }
+
+    def verificar(self, selecionados, pessoas=None):
+        """
+        Preprocessa os quadros escolhidos, calcula os embeddings em uma única
+        passada e compara cada um com os templates da galeria.
+
+        Cada pessoa recebe, por quadro, a menor distância aos seus medoides;
+        a decisão é por maioria dos quadros (um quadro ruim não decide sozinho).
+
+        Args:
+            selecionados (list): Saída de selecionar()
+            pessoas (list, optional): Restringe a comparação a essas pessoas
+
+        Returns:
+            tuple: (resultados por pessoa, imagens preprocessadas (n, 155, 220, 1))
+        """
+        with medir_verificacao('video'):
+            return self._verificar(selecionados, pessoas)
+
+    def _verificar(self, selecionados, pessoas=None):
+        if not selecionados:
+            return [], np.zeros((0, 155, 220, 1), dtype=np.uint8)
+
+        # preprocess_phone_image já mede decode, melhoria, binarização e redimensionamento
+        imagens = np.stack([
+            preprocess_phone_image(s['quadro'], recortar=self.recortar)[0] for s in selecionados
+        ])[..., None]
+        with medir_etapa('embedding'):
+            embeddings = compute_embeddings(self.cadastro.embedding_model, imagens, batch_size=len(imagens))
+
+        with medir_etapa('distancia'):
+            por_pessoa = {}
+            for selecionado, embedding in zip(selecionados, embeddings):
+                for comparacao in self.cadastro.comparar(embedding, pessoas):
+                    distancia = min(m['distancia'] for m in comparacao['medoides'])
+                    por_pessoa.setdefault(comparacao['pessoa'], []).append((selecionado['indice'], distancia))
+
+        resultados = []
+        for pessoa, distancias in por_pessoa.items():
+            valores = np.array([d for _, d in distancias])
+            votos = int(np.sum(valores <= self.threshold))
+            resultados.append({
+                'pessoa': pessoa,
+                'min_distancia': float(valores.min()),
+                'mediana_distancia': float(np.median(valores)),
+                'votos': votos,
+                'quadros': len(valores),
+                'mesma_pessoa': 2 * votos > len(valores),
+                'distancias_por_quadro': [{'indice': int(i), 'distancia': float(d)} for i, d in distancias]
+            })
+        resultados.sort(key=lambda r: r['mediana_distancia'])
+        return resultados, imagens
+
+    def processar(self, fonte, pessoas=None, max_quadros=None, duracao=None):
+        """
+        Lê a fonte, escolhe os melhores quadros e verifica-os.
+
+        Returns:
+            dict: 'resultados', 'selecionados' (sem os quadros), 'estatisticas' e 'imagens'
+        """
+        selecionados, estatisticas = self.selecionar(iterar_quadros(fonte, max_quadros, duracao))
+        resultados, imagens = self.verificar(selecionados, pessoas)
+        return {
+            'resultados': resultados,
+            'selecionados': [{k: v for k, v in s.items() if k != 'quadro'} for s in selecionados],
+            'estatisticas': estatisticas,
+            'imagens': imagens
+        }